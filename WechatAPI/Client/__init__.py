@@ -4,9 +4,12 @@ from .chatroom import ChatroomMixin
 from .friend import FriendMixin
 from .hongbao import HongBaoMixin
 from .login import LoginMixin
+from .media import MediaHandle
 from .message import MessageMixin
 from .protect import protector
+from .send_scheduler import PRIORITY_BROADCAST, PRIORITY_INTERACTIVE, SendScheduler, send_priority
 from .tool import ToolMixin
+from .transcoder import Transcoder, transcoder
 from .user import UserMixin
 
 
@@ -39,8 +42,7 @@ class WechatAPIClient(LoginMixin, MessageMixin, FriendMixin, ChatroomMixin, User
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
         output = ""
-        for id in at:
-            nickname = await self.get_nickname(id)
+        for nickname in await self.get_nickname(list(at)):
             output += f"@{nickname}\u2005"
 
         output += content
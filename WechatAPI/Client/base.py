@@ -1,6 +1,14 @@
+import asyncio
+import json
+import weakref
 from dataclasses import dataclass
+from typing import Dict, Optional
+
+import aiohttp
 
 from WechatAPI.errors import *
+from .contact_cache import ContactCache
+from .media import MediaHandle
 
 
 @dataclass
@@ -34,6 +42,9 @@ class Section:
 class WechatAPIClientBase:
     """微信API客户端基类
 
+    同一个事件循环中的所有请求共用一个长连接的 aiohttp.ClientSession，首次请求时创建，调用 close() 关闭。
+    管理后台运行在另一个线程的事件循环中，会得到自己的会话。连接参数需要在第一次请求前设置。
+
     Args:
         ip (str): 服务器IP地址
         port (int): 服务器端口
@@ -44,7 +55,37 @@ class WechatAPIClientBase:
         alias (str): 别名
         phone (str): 手机号
         ignore_protect (bool): 是否忽略保护机制
+        unix_socket (str): WechatAPI服务的Unix域套接字路径，为空时使用TCP
+        pool_size (int): 连接池大小
+        keepalive_timeout (float): 空闲连接保持时间(秒)
+        request_timeout (float): 没有单独配置的接口的默认超时时间(秒)
+        contacts (ContactCache): 联系人缓存
     """
+
+    # 单独配置超时时间的接口(秒)，其余接口使用 request_timeout
+    ENDPOINT_TIMEOUTS = {
+        "/IsRunning": 5,
+        "/CheckDatabaseOK": 5,
+        "/Sync": 10,
+        "/Heartbeat": 10,
+        "/SendTextMsg": 30,
+        "/SendAppMsg": 30,
+        "/SendShareLink": 30,
+        "/SendEmojiMsg": 30,
+        "/SendCardMsg": 30,
+        "/SendCDNFileMsg": 30,
+        "/SendCDNImgMsg": 30,
+        "/SendCDNVideoMsg": 30,
+        "/RevokeMsg": 30,
+        "/SendImageMsg": 120,
+        "/SendVoiceMsg": 120,
+        "/CdnDownloadImg": 120,
+        "/DownloadVoice": 120,
+        "/DownloadAttach": 300,
+        "/DownloadVideo": 300,
+        "/SendVideoMsg": 600,
+    }
+
     def __init__(self, ip: str, port: int):
         self.ip = ip
         self.port = port
@@ -56,9 +97,109 @@ class WechatAPIClientBase:
 
         self.ignore_protect = False
 
+        # 连接设置
+        self.unix_socket = ""
+        self.pool_size = 100
+        self.keepalive_timeout = 60
+        self.request_timeout = 120
+        self._sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = \
+            weakref.WeakKeyDictionary()
+
+        self.contacts = ContactCache(self)
+
         # 调用所有 Mixin 的初始化方法
         super().__init__()
 
+    @property
+    def base_url(self) -> str:
+        if self.unix_socket:
+            # 使用Unix域套接字时主机名只用于Host请求头
+            return "http://localhost"
+        return f"http://{self.ip}:{self.port}"
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """获取当前事件循环共享的会话，不存在或已关闭时创建"""
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            if self.unix_socket:
+                connector = aiohttp.UnixConnector(path=self.unix_socket, limit=self.pool_size,
+                                                  keepalive_timeout=self.keepalive_timeout)
+            else:
+                connector = aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.pool_size,
+                                                 keepalive_timeout=self.keepalive_timeout, ttl_dns_cache=300)
+            session = aiohttp.ClientSession(connector=connector,
+                                            timeout=aiohttp.ClientTimeout(total=self.request_timeout))
+            self._sessions[loop] = session
+        return session
+
+    def _timeout(self, path: str, timeout: Optional[float] = None) -> aiohttp.ClientTimeout:
+        return aiohttp.ClientTimeout(total=timeout or self.ENDPOINT_TIMEOUTS.get(path, self.request_timeout))
+
+    async def _post(self, path: str, json_param: dict, timeout: Optional[float] = None) -> dict:
+        """向WechatAPI发送POST请求并返回JSON响应
+
+        Args:
+            path (str): 接口路径，例如 /SendTextMsg
+            json_param (dict): 请求参数
+            timeout (float, optional): 超时时间(秒)，默认使用 ENDPOINT_TIMEOUTS 中的配置
+
+        Returns:
+            dict: 响应JSON
+        """
+        session = await self._get_session()
+        async with session.post(self.base_url + path, json=json_param, timeout=self._timeout(path, timeout)) as response:
+            return await response.json()
+
+    async def _post_media(self, path: str, json_param: dict, media: Dict[str, MediaHandle],
+                          timeout: Optional[float] = None) -> dict:
+        """与 _post 相同，media 中的字段以base64字符串的形式流式写入请求体
+
+        请求体分块生成，不会在内存中拼出完整的base64字符串和JSON，上传大文件时内存占用只有一个块的大小。
+
+        Args:
+            path (str): 接口路径，例如 /SendVideoMsg
+            json_param (dict): 普通请求参数
+            media (Dict[str, MediaHandle]): 媒体字段名 -> 媒体数据，例如 {"Base64": video}
+            timeout (float, optional): 超时时间(秒)，默认使用 ENDPOINT_TIMEOUTS 中的配置
+
+        Returns:
+            dict: 响应JSON
+        """
+
+        async def body():
+            separator = b"{"
+            for key, value in json_param.items():
+                yield separator + json.dumps(key).encode() + b":" + json.dumps(value).encode()
+                separator = b","
+            for key, handle in media.items():
+                yield separator + json.dumps(key).encode() + b':"'
+                separator = b","
+                async for chunk in handle.base64_chunks():
+                    yield chunk
+                yield b'"'
+            yield b"}" if separator == b"," else b"{}"
+
+        for handle in media.values():
+            await handle.load()
+        session = await self._get_session()
+        async with session.post(self.base_url + path, data=body(), headers={"Content-Type": "application/json"},
+                                timeout=self._timeout(path, timeout)) as response:
+            return await response.json()
+
+    async def _get(self, path: str, timeout: Optional[float] = None) -> aiohttp.ClientResponse:
+        """向WechatAPI发送GET请求，返回已读取内容的响应"""
+        session = await self._get_session()
+        async with session.get(self.base_url + path, timeout=self._timeout(path, timeout)) as response:
+            await response.read()
+            return response
+
+    async def close(self):
+        """关闭当前事件循环的共享会话和连接池"""
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None and not session.closed:
+            await session.close()
+
     @staticmethod
     def error_handler(json_resp):
         """处理API响应中的错误码
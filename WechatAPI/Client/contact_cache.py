@@ -0,0 +1,251 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from loguru import logger
+
+# GetContractDetail 一次最多查询的联系人数
+DETAIL_BATCH_SIZE = 20
+
+
+def _string(value: Any) -> str:
+    """WechatAPI 返回的文本字段有时是 {"string": "..."}，有时直接是字符串"""
+    if isinstance(value, dict):
+        return value.get("string") or ""
+    return value or ""
+
+
+def normalize_contact(detail: dict) -> dict:
+    """把 GetContractDetail/GetContact 返回的联系人转换为缓存使用的精简结构"""
+    return {
+        "wxid": _string(detail.get("UserName")),
+        "nickname": _string(detail.get("NickName")),
+        "remark": _string(detail.get("Remark")),
+        "alias": _string(detail.get("Alias")),
+        "avatar": detail.get("SmallHeadImgUrl") or detail.get("BigHeadImgUrl") or "",
+    }
+
+
+class ContactCache:
+    """联系人缓存，由 WechatAPIClient.contacts 提供，整个进程共用
+
+    - 联系人列表使用 GetContractList 返回的 CurrentWxcontactSeq/CurrentChatRoomContactSeq 游标增量同步，
+      第一次从头获取，之后只获取游标之后的变化
+    - 昵称、备注、头像按 wxid 缓存，get_many() 中未命中的 wxid 会和同一时刻其他调用的未命中合并，
+      按每批20个查询，同一个 wxid 同一时间只会查询一次
+    - 群成员列表按群缓存
+    - 系统消息(入群、退群、改名等)会让对应的群和联系人失效
+
+    所有方法都应在机器人的事件循环中调用，其他事件循环(例如管理后台)请使用 call()。
+
+    Args:
+        client: WechatAPIClient
+        ttl: 缓存有效期(秒)
+    """
+
+    def __init__(self, client, ttl: float = 3600):
+        self.client = client
+        self.ttl = ttl
+
+        self._contacts: Dict[str, tuple] = {}  # wxid -> (缓存时间, 联系人)
+        self._members: Dict[str, tuple] = {}  # 群id -> (缓存时间, 成员列表)
+
+        self._ids: Dict[str, None] = {}  # 通讯录中的联系人，保持顺序
+        self._wx_seq = 0
+        self._chatroom_seq = 0
+        self._list_synced_at = 0.0
+
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._pending: List[str] = []
+        self._flush_scheduled = False
+        self._member_inflight: Dict[str, asyncio.Future] = {}
+        self._list_lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.hits = 0
+        self.misses = 0
+
+    async def call(self, method: Callable[..., Awaitable], *args, **kwargs):
+        """在缓存所属的事件循环中执行 method，供其他线程的事件循环调用"""
+        loop = asyncio.get_running_loop()
+        if self._loop is None or self._loop is loop or not self._loop.is_running():
+            return await method(*args, **kwargs)
+        future = asyncio.run_coroutine_threadsafe(method(*args, **kwargs), self._loop)
+        return await asyncio.wrap_future(future)
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 事件循环变了(例如重新登录后重建)，丢弃与旧循环绑定的等待对象
+            self._loop = loop
+            self._inflight.clear()
+            self._member_inflight.clear()
+            self._pending.clear()
+            self._flush_scheduled = False
+            self._list_lock = asyncio.Lock()
+
+    def _fresh(self, entry: Optional[tuple]) -> bool:
+        return entry is not None and time.monotonic() - entry[0] < self.ttl
+
+    # 联系人列表
+
+    async def list_ids(self, refresh: bool = False) -> List[str]:
+        """获取通讯录中所有联系人和群的 wxid
+
+        Args:
+            refresh: 是否丢弃游标从头同步，默认只同步上次之后的变化
+        """
+        self._bind_loop()
+        async with self._list_lock:
+            # 增量同步拿不到被删除的联系人，超过有效期后从头同步一次
+            full = refresh or not self._list_synced_at or time.monotonic() - self._list_synced_at >= self.ttl
+            if full:
+                self._ids.clear()
+                self._wx_seq = self._chatroom_seq = 0
+                if refresh:
+                    self._contacts.clear()
+                    self._members.clear()
+
+            added = 0
+            while True:
+                contact_list = await self.client.get_contract_list(self._wx_seq, self._chatroom_seq)
+                for wxid in contact_list.get("ContactUsernameList") or []:
+                    if wxid not in self._ids:
+                        self._ids[wxid] = None
+                        added += 1
+                    if not full:
+                        # 游标之后返回的是有变化的联系人，需要重新获取详情
+                        self.invalidate_chatroom(wxid)
+                self._wx_seq = contact_list.get("CurrentWxcontactSeq", self._wx_seq)
+                self._chatroom_seq = contact_list.get("CurrentChatRoomContactSeq", self._chatroom_seq)
+                if contact_list.get("CountinueFlag") != 1:
+                    break
+
+            if full:
+                self._list_synced_at = time.monotonic()
+                logger.debug("联系人列表同步完成: 共{}个", len(self._ids))
+            elif added:
+                logger.debug("联系人列表增量同步: 新增{}个", added)
+            return list(self._ids)
+
+    async def chatrooms(self, refresh: bool = False) -> List[str]:
+        """获取通讯录中所有群聊"""
+        return [wxid for wxid in await self.list_ids(refresh) if wxid.endswith("@chatroom")]
+
+    # 联系人详情
+
+    async def get(self, wxid: str) -> dict:
+        """获取单个联系人，结构见 normalize_contact()"""
+        return (await self.get_many([wxid]))[wxid]
+
+    async def get_many(self, wxids: Iterable[str]) -> Dict[str, dict]:
+        """批量获取联系人，返回 {wxid: 联系人}，查询失败的联系人只包含 wxid"""
+        self._bind_loop()
+        result = {}
+        waiting = {}
+        for wxid in wxids:
+            if wxid in result or wxid in waiting:
+                continue
+            entry = self._contacts.get(wxid)
+            if self._fresh(entry):
+                self.hits += 1
+                result[wxid] = entry[1]
+                continue
+            self.misses += 1
+            future = self._inflight.get(wxid)
+            if future is None:
+                future = self._inflight[wxid] = self._loop.create_future()
+                self._pending.append(wxid)
+            waiting[wxid] = future
+
+        if self._pending and not self._flush_scheduled:
+            # 等到本轮事件循环结束再查询，让同时发生的未命中合并成更少的请求
+            self._flush_scheduled = True
+            self._loop.call_soon(lambda: asyncio.ensure_future(self._flush()))
+
+        for wxid, future in waiting.items():
+            result[wxid] = await asyncio.shield(future)
+        return result
+
+    async def _flush(self):
+        pending, self._pending = self._pending, []
+        self._flush_scheduled = False
+        chunks = [pending[i:i + DETAIL_BATCH_SIZE] for i in range(0, len(pending), DETAIL_BATCH_SIZE)]
+        await asyncio.gather(*(self._fetch(chunk) for chunk in chunks))
+
+    async def _fetch(self, wxids: List[str]):
+        contacts = {}
+        try:
+            for detail in await self.client.get_contract_detail(wxids) or []:
+                contact = normalize_contact(detail)
+                if contact["wxid"]:
+                    contacts[contact["wxid"]] = contact
+        except Exception as e:
+            logger.warning("获取联系人详情失败: {} 错误: {}", wxids, e)
+
+        now = time.monotonic()
+        for wxid in wxids:
+            contact = contacts.get(wxid)
+            if contact is not None:
+                self._contacts[wxid] = (now, contact)
+            else:
+                contact = {"wxid": wxid, "nickname": "", "remark": "", "alias": "", "avatar": ""}
+            future = self._inflight.pop(wxid, None)
+            if future is not None and not future.done():
+                future.set_result(contact)
+
+    async def nickname(self, wxid: str) -> str:
+        """获取昵称"""
+        return (await self.get(wxid))["nickname"]
+
+    async def nicknames(self, wxids: Iterable[str]) -> List[str]:
+        """按顺序获取多个昵称"""
+        wxids = list(wxids)
+        contacts = await self.get_many(wxids)
+        return [contacts[wxid]["nickname"] for wxid in wxids]
+
+    # 群成员
+
+    async def members(self, chatroom: str) -> List[dict]:
+        """获取群成员列表，格式与 get_chatroom_member_list 相同"""
+        self._bind_loop()
+        entry = self._members.get(chatroom)
+        if self._fresh(entry):
+            return entry[1]
+
+        future = self._member_inflight.get(chatroom)
+        if future is None:
+            future = self._member_inflight[chatroom] = asyncio.ensure_future(self._fetch_members(chatroom))
+        return await asyncio.shield(future)
+
+    async def _fetch_members(self, chatroom: str) -> List[dict]:
+        try:
+            members = await self.client.get_chatroom_member_list(chatroom) or []
+            self._members[chatroom] = (time.monotonic(), members)
+            return members
+        finally:
+            self._member_inflight.pop(chatroom, None)
+
+    # 失效
+
+    def invalidate(self, wxid: str):
+        """联系人资料有变化"""
+        self._contacts.pop(wxid, None)
+
+    def invalidate_chatroom(self, chatroom: str):
+        """群资料或成员有变化"""
+        self._contacts.pop(chatroom, None)
+        self._members.pop(chatroom, None)
+
+    def remove(self, wxid: str):
+        """联系人或群已不在通讯录中"""
+        self._ids.pop(wxid, None)
+        self.invalidate_chatroom(wxid)
+
+    def clear(self):
+        """清空所有缓存，下次获取联系人列表时从头同步"""
+        self._contacts.clear()
+        self._members.clear()
+        self._ids.clear()
+        self._wx_seq = self._chatroom_seq = 0
+        self._list_synced_at = 0.0
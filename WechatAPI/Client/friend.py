@@ -1,6 +1,5 @@
 from typing import Union
 
-import aiohttp
 
 from .base import *
 from .protect import protector
@@ -35,15 +34,13 @@ class FriendMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "Scene": scene, "V1": v1, "V2": v2}
-            response = await session.post(f'http://{self.ip}:{self.port}/AcceptFriend', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "Scene": scene, "V1": v1, "V2": v2}
+        json_resp = await self._post('/AcceptFriend', json_param)
 
-            if json_resp.get("Success"):
-                return True
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return True
+        else:
+            self.error_handler(json_resp)
 
     async def get_contact(self, wxid: Union[str, list[str]]) -> Union[dict, list[dict]]:
         """获取联系人信息
@@ -60,19 +57,17 @@ class FriendMixin(WechatAPIClientBase):
         if isinstance(wxid, list):
             wxid = ",".join(wxid)
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "RequestWxids": wxid}
-            response = await session.post(f'http://{self.ip}:{self.port}/GetContact', json=json_param)
-            json_resp = await response.json()
-
-            if json_resp.get("Success"):
-                contact_list = json_resp.get("Data").get("ContactList")
-                if len(contact_list) == 1:
-                    return contact_list[0]
-                else:
-                    return contact_list
+        json_param = {"Wxid": self.wxid, "RequestWxids": wxid}
+        json_resp = await self._post('/GetContact', json_param)
+
+        if json_resp.get("Success"):
+            contact_list = json_resp.get("Data").get("ContactList")
+            if len(contact_list) == 1:
+                return contact_list[0]
             else:
-                self.error_handler(json_resp)
+                return contact_list
+        else:
+            self.error_handler(json_resp)
 
     async def get_contract_detail(self, wxid: Union[str, list[str]], chatroom: str = "") -> list:
         """获取联系人详情
@@ -93,15 +88,13 @@ class FriendMixin(WechatAPIClientBase):
             wxid = ",".join(wxid)
 
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "RequestWxids": wxid, "Chatroom": chatroom}
-            response = await session.post(f'http://{self.ip}:{self.port}/GetContractDetail', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "RequestWxids": wxid, "Chatroom": chatroom}
+        json_resp = await self._post('/GetContractDetail', json_param)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data").get("ContactList")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return json_resp.get("Data").get("ContactList")
+        else:
+            self.error_handler(json_resp)
 
     async def get_contract_list(self, wx_seq: int = 0, chatroom_seq: int = 0) -> dict:
         """获取联系人列表
@@ -116,37 +109,25 @@ class FriendMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "CurrentWxcontactSeq": wx_seq, "CurrentChatroomContactSeq": chatroom_seq}
-            response = await session.post(f'http://{self.ip}:{self.port}/GetContractList', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "CurrentWxcontactSeq": wx_seq, "CurrentChatroomContactSeq": chatroom_seq}
+        json_resp = await self._post('/GetContractList', json_param)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return json_resp.get("Data")
+        else:
+            self.error_handler(json_resp)
 
     async def get_nickname(self, wxid: Union[str, list[str]]) -> Union[str, list[str]]:
         """获取用户昵称
 
         Args:
-            wxid: 用户wxid，可以是单个wxid或最多20个wxid的列表
+            wxid: 用户wxid，可以是单个wxid或wxid列表
 
         Returns:
             Union[str, list[str]]: 如果输入单个wxid返回str，如果输入wxid列表则返回对应的昵称列表
-        """
-        data = await self.get_contract_detail(wxid)
 
+        昵称通过 self.contacts 缓存获取，同时进行的查询会合并成批量请求。
+        """
         if isinstance(wxid, str):
-            try:
-                return data[0].get("NickName").get("string")
-            except:
-                return ""
-        else:
-            result = []
-            for contact in data:
-                try:
-                    result.append(contact.get("NickName").get("string"))
-                except:
-                    result.append("")
-            return result
+            return await self.contacts.nickname(wxid)
+        return await self.contacts.nicknames(wxid)
@@ -0,0 +1,209 @@
+import asyncio
+import base64
+import contextlib
+import hashlib
+import mmap
+import os
+import re
+import tempfile
+from typing import AsyncIterator, Awaitable, Callable, Iterator, Optional, Union
+
+# 超过该大小的媒体写入临时文件，不常驻内存
+SPOOL_THRESHOLD = 4 * 1024 * 1024
+# 流式读取的块大小，是3的倍数，各块分别编码的base64可以直接拼接
+CHUNK_SIZE = 3 * 64 * 1024
+# b64decode 默认忽略的字符(换行等)，分块解码前先去掉，否则各块长度不再是4的倍数
+_NOT_BASE64 = re.compile(r"[^A-Za-z0-9+/=]")
+
+MediaLike = Union[str, bytes, os.PathLike, "MediaHandle"]
+
+
+class MediaHandle:
+    """图片、语音、视频、文件等媒体数据的句柄
+
+    数据可以是内存中的字节、临时文件或用户提供的文件路径(通过mmap读取)，也可以是尚未下载的数据，
+    第一次读取时才调用 loader 下载，多个调用方同时读取时只下载一次。
+    需要base64时通过 base64() 或 base64_chunks() 按需生成，上传时使用后者流式写入请求体，
+    大文件不会在内存中同时存在字节和base64两份拷贝。
+
+    用法:
+        handle = MediaHandle.of(video)  # base64字符串、字节、文件路径或 MediaHandle
+        data = await handle.read()
+        path = await handle.path()  # 需要文件路径的工具，例如 ffmpeg、MediaInfo
+
+    Args:
+        data: 内存中的数据
+        path: 文件路径
+        loader: 返回媒体数据(任意 MediaLike)的协程函数，第一次读取时调用
+    """
+
+    def __init__(self, data: Optional[bytes] = None, path: Union[str, os.PathLike, None] = None,
+                 loader: Optional[Callable[[], Awaitable[MediaLike]]] = None):
+        self._data = data
+        self._path = os.fspath(path) if path is not None else None
+        self._temp_path: Optional[str] = None  # 由句柄创建、close() 时删除的文件
+        self._loader = loader
+        self._loading: Optional[asyncio.Future] = None
+        self._digests = {}
+
+    @classmethod
+    def of(cls, media: MediaLike) -> "MediaHandle":
+        """把base64字符串、字节、文件路径转换为句柄，已经是句柄时原样返回"""
+        if isinstance(media, MediaHandle):
+            return media
+        if isinstance(media, str):
+            return cls.from_base64(media)
+        if isinstance(media, (bytes, bytearray, memoryview)):
+            return cls(data=bytes(media))
+        if isinstance(media, os.PathLike):
+            return cls(path=media)
+        raise ValueError("media can only be str, bytes, os.PathLike or MediaHandle")
+
+    @classmethod
+    def from_base64(cls, data: str) -> "MediaHandle":
+        """分块解码base64字符串，解码后超过 SPOOL_THRESHOLD 的写入临时文件"""
+        if len(data) // 4 * 3 <= SPOOL_THRESHOLD:
+            return cls(data=base64.b64decode(data))
+
+        handle = cls()
+        fd, handle._temp_path = tempfile.mkstemp(prefix="wechatapi-media-")
+        step = CHUNK_SIZE // 3 * 4
+        rest = ""
+        with os.fdopen(fd, "wb") as f:
+            for start in range(0, len(data), step):
+                # 与一次性 b64decode 相同，忽略换行等非base64字符；不足4个字符的部分留到下一块一起解码
+                chunk = rest + _NOT_BASE64.sub("", data[start:start + step])
+                usable = len(chunk) // 4 * 4
+                f.write(base64.b64decode(chunk[:usable]))
+                rest = chunk[usable:]
+            if rest:
+                f.write(base64.b64decode(rest))
+        handle._path = handle._temp_path
+        return handle
+
+    @classmethod
+    def lazy(cls, loader: Callable[[], Awaitable[MediaLike]]) -> "MediaHandle":
+        """第一次读取时才调用 loader 获取数据的句柄"""
+        return cls(loader=loader)
+
+    @property
+    def loaded(self) -> bool:
+        return self._loader is None
+
+    async def load(self) -> "MediaHandle":
+        """确保数据已下载，同时读取时共用同一次下载"""
+        if self._loader is None:
+            return self
+        if self._loading is None:
+            self._loading = asyncio.ensure_future(self._load())
+        await asyncio.shield(self._loading)
+        return self
+
+    async def _load(self):
+        try:
+            source = MediaHandle.of(await self._loader())
+            await source.load()
+            self._data, self._path, self._temp_path = source._data, source._path, source._temp_path
+            source._temp_path = None  # 临时文件转交给当前句柄
+            self._loader = None
+        finally:
+            if self._loader is not None:
+                # 下载失败，下次读取时重试
+                self._loading = None
+
+    @property
+    def size(self) -> int:
+        """数据大小(字节)，需要先 load()"""
+        if self._data is not None:
+            return len(self._data)
+        if self._path is not None:
+            return os.path.getsize(self._path)
+        return 0
+
+    @contextlib.contextmanager
+    def view(self) -> Iterator[memoryview]:
+        """以 memoryview 访问数据，文件通过mmap映射，不会整个读入内存。需要先 load()"""
+        if self._data is not None:
+            yield memoryview(self._data)
+            return
+        if self._path is None or self.size == 0:
+            yield memoryview(b"")
+            return
+        with open(self._path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                yield view
+            finally:
+                view.release()
+
+    async def read(self) -> bytes:
+        """读取全部数据"""
+        await self.load()
+        if self._data is not None:
+            return self._data
+        with self.view() as view:
+            return bytes(view)
+
+    async def base64(self) -> str:
+        """完整的base64字符串，兼容只接受base64的接口"""
+        await self.load()
+        with self.view() as view:
+            return base64.b64encode(view).decode()
+
+    async def chunks(self, size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """分块读取数据"""
+        await self.load()
+        with self.view() as view:
+            for start in range(0, len(view), size):
+                yield bytes(view[start:start + size])
+
+    async def base64_chunks(self) -> AsyncIterator[bytes]:
+        """分块生成base64，拼接后与 base64() 相同，用于流式上传"""
+        async for chunk in self.chunks(CHUNK_SIZE):
+            yield base64.b64encode(chunk)
+
+    async def digest(self, algorithm: str = "sha256") -> str:
+        """计算哈希值(十六进制)，结果会被缓存"""
+        if algorithm not in self._digests:
+            await self.load()
+
+            def compute():
+                hasher = hashlib.new(algorithm)
+                with self.view() as view:
+                    for start in range(0, len(view), CHUNK_SIZE):
+                        hasher.update(view[start:start + CHUNK_SIZE])
+                return hasher.hexdigest()
+
+            self._digests[algorithm] = await asyncio.to_thread(compute) if self.size > SPOOL_THRESHOLD else compute()
+        return self._digests[algorithm]
+
+    async def path(self, suffix: str = "") -> str:
+        """数据所在的文件路径，内存中的数据会写入临时文件，close() 时删除"""
+        await self.load()
+        if self._path is None:
+            fd, self._temp_path = tempfile.mkstemp(prefix="wechatapi-media-", suffix=suffix)
+            with os.fdopen(fd, "wb") as f:
+                f.write(self._data or b"")
+            self._path = self._temp_path
+            # 数据已经在文件中，释放内存
+            self._data = None
+        return self._path
+
+    def close(self):
+        """删除句柄创建的临时文件"""
+        if self._temp_path is not None:
+            with contextlib.suppress(OSError):
+                os.remove(self._temp_path)
+            if self._path == self._temp_path:
+                self._path = None
+            self._temp_path = None
+
+    def __copy__(self):
+        # 复制消息时共享同一个句柄，下载结果对所有副本可见
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __del__(self):
+        self.close()
@@ -0,0 +1,71 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class MediaCache:
+    """已上传媒体的CDN引用缓存，由 WechatAPIClient.media_cache 提供
+
+    以媒体内容的哈希为键，保存第一次上传后生成的消息xml。再次发送相同内容时通过
+    SendCDNImgMsg/SendCDNVideoMsg 转发xml，不再上传整个文件。
+
+    Args:
+        ttl: 引用有效期(秒)，超过后重新上传
+        capacity: 最多缓存的引用数，超过时淘汰最久未使用的
+    """
+
+    def __init__(self, ttl: float = 86400, capacity: int = 1000):
+        self.ttl = ttl
+        self.capacity = capacity
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0  # 转发失败被丢弃的引用数
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    @staticmethod
+    def key(kind: str, *digests: str) -> str:
+        """计算缓存键，kind 为媒体类型，digests 为媒体内容(例如视频和封面)的sha256，见 MediaHandle.digest()"""
+        if len(digests) == 1:
+            return f"{kind}:{digests[0]}"
+        return f"{kind}:{hashlib.sha256(':'.join(digests).encode()).hexdigest()}"
+
+    def get(self, key: str) -> Optional[str]:
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] >= self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, xml: Optional[str]):
+        if not xml or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), xml)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: str):
+        """引用已失效(转发失败)"""
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.invalidated += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -1,64 +1,73 @@
 import asyncio
-import base64
 import os
-from asyncio import Future
-from asyncio import Queue, sleep
-from io import BytesIO
 from pathlib import Path
-from typing import Union
+from typing import Optional, Union
 
-import aiohttp
-import pysilk
 from loguru import logger
-from pydub import AudioSegment
 from pymediainfo import MediaInfo
 
 from .base import *
+from .media import MediaHandle, MediaLike
+from .media_cache import MediaCache
 from .protect import protector
+from .send_scheduler import SendScheduler
+from .transcoder import transcoder
 from ..errors import *
 
 
-class MessageMixin(WechatAPIClientBase):
-    def __init__(self, ip: str, port: int):
-        # 初始化消息队列
-        super().__init__(ip, port)
-        self._message_queue = Queue()
-        self._is_processing = False
+def _field(data: dict, *names: str):
+    """按候选字段名(不区分大小写)取响应中的值，{"string": ...} 形式的值会被展开"""
+    lowered = {key.lower(): value for key, value in data.items()}
+    for name in names:
+        value = lowered.get(name.lower())
+        if isinstance(value, dict):
+            value = value.get("string")
+        if value:
+            return value
+    return None
 
-    async def _process_message_queue(self):
-        """
-        处理消息队列的异步方法
-        """
-        if self._is_processing:
-            return
 
-        self._is_processing = True
-        while True:
-            if self._message_queue.empty():
-                self._is_processing = False
-                break
+def _image_cdn_xml(data: dict, length: int, md5: str) -> Optional[str]:
+    """根据 SendImageMsg 的响应生成图片消息xml，格式与收到的图片消息相同，可用于 SendCDNImgMsg"""
+    aes_key = _field(data, "Aeskey")
+    file_id = _field(data, "Fileid")
+    if not aes_key or not file_id:
+        return None
 
-            func, args, kwargs, future = await self._message_queue.get()
-            try:
-                result = await func(*args, **kwargs)
-                future.set_result(result)
-            except Exception as e:
-                future.set_exception(e)
-            finally:
-                self._message_queue.task_done()
-                await sleep(1)  # 消息发送间隔1秒
+    length = data.get("TotalLen") or length
+    thumb_length = data.get("CDNThumbImgSize") or length
+    return (f'<?xml version="1.0"?><msg><img aeskey="{aes_key}" encryver="1" cdnthumbaeskey="{aes_key}" '
+            f'cdnthumburl="{file_id}" cdnthumblength="{thumb_length}" cdnmidimgurl="{file_id}" length="{length}" '
+            f'cdnbigimgurl="{file_id}" hdlength="{length}" md5="{md5}" /></msg>')
+
+
+def _video_cdn_xml(data: dict, length: int, md5: str, play_length: int) -> Optional[str]:
+    """根据 SendVideoMsg 的响应生成视频消息xml，可用于 SendCDNVideoMsg"""
+    aes_key = _field(data, "Aeskey")
+    video_url = _field(data, "CdnVideoUrl", "VideoFileId", "Fileid")
+    if not aes_key or not video_url:
+        return None
+
+    thumb_aes_key = _field(data, "CdnThumbAeskey", "ThumbAeskey") or aes_key
+    thumb_url = _field(data, "CdnThumbUrl", "ThumbFileId") or video_url
+    thumb_length = _field(data, "CdnThumbLength", "ThumbTotalLen") or 0
+    return (f'<?xml version="1.0"?><msg><videomsg aeskey="{aes_key}" cdnthumbaeskey="{thumb_aes_key}" '
+            f'cdnvideourl="{video_url}" cdnthumburl="{thumb_url}" length="{length}" '
+            f'playlength="{play_length}" cdnthumblength="{thumb_length}" md5="{md5}" /></msg>')
+
+
+class MessageMixin(WechatAPIClientBase):
+    def __init__(self, ip: str, port: int):
+        # 初始化消息发送调度
+        super().__init__(ip, port)
+        self.sender = SendScheduler()
+        self.media_cache = MediaCache()
 
     async def _queue_message(self, func, *args, **kwargs):
         """
-        将消息添加到队列
+        将消息交给发送调度，第一个参数为接收人wxid
         """
-        future = Future()
-        await self._message_queue.put((func, args, kwargs, future))
-
-        if not self._is_processing:
-            asyncio.create_task(self._process_message_queue())
-
-        return await future
+        return await self.sender.submit(args[0], func, *args, **kwargs)
 
     async def revoke_message(self, wxid: str, client_msg_id: int, create_time: int, new_msg_id: int) -> bool:
         """撤回消息。
@@ -82,20 +91,18 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "ClientMsgId": client_msg_id, "CreateTime": create_time,
-                          "NewMsgId": new_msg_id}
-            response = await session.post(f'http://{self.ip}:{self.port}/RevokeMsg', json=json_param)
-            json_resp = await response.json()
-
-            if json_resp.get("Success"):
-                logger.info("消息撤回成功: 对方wxid:{} ClientMsgId:{} CreateTime:{} NewMsgId:{}",
-                            wxid,
-                            client_msg_id,
-                            new_msg_id)
-                return True
-            else:
-                self.error_handler(json_resp)
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "ClientMsgId": client_msg_id, "CreateTime": create_time,
+                      "NewMsgId": new_msg_id}
+        json_resp = await self._post('/RevokeMsg', json_param)
+
+        if json_resp.get("Success"):
+            logger.info("消息撤回成功: 对方wxid:{} ClientMsgId:{} CreateTime:{} NewMsgId:{}",
+                        wxid,
+                        client_msg_id,
+                        new_msg_id)
+            return True
+        else:
+            self.error_handler(json_resp)
 
     async def send_text_message(self, wxid: str, content: str, at: Union[list, str] = "") -> tuple[int, int, int]:
         """发送文本消息。
@@ -113,7 +120,8 @@ class MessageMixin(WechatAPIClientBase):
             BanProtection: 登录新设备后4小时内操作
             根据error_handler处理错误
         """
-        return await self._queue_message(self._send_text_message, wxid, content, at)
+        # 没有@的文本可以和同一会话中排队的相邻文本合并发送
+        return await self._queue_message(self._send_text_message, wxid, content, at, text=None if at else content)
 
     async def _send_text_message(self, wxid: str, content: str, at: list[str] = None) -> tuple[int, int, int]:
         """
@@ -133,24 +141,22 @@ class MessageMixin(WechatAPIClientBase):
         else:
             raise ValueError("Argument 'at' should be str or list")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": content, "Type": 1, "At": at_str}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendTextMsg', json=json_param)
-            json_resp = await response.json()
-            if json_resp.get("Success"):
-                logger.info("发送文字消息: 对方wxid:{} at:{} 内容:{}", wxid, at, content)
-                data = json_resp.get("Data")
-                return data.get("List")[0].get("ClientMsgid"), data.get("List")[0].get("Createtime"), data.get("List")[
-                    0].get("NewMsgId")
-            else:
-                self.error_handler(json_resp)
-
-    async def send_image_message(self, wxid: str, image: Union[str, bytes, os.PathLike]) -> tuple[int, int, int]:
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": content, "Type": 1, "At": at_str}
+        json_resp = await self._post('/SendTextMsg', json_param)
+        if json_resp.get("Success"):
+            logger.info("发送文字消息: 对方wxid:{} at:{} 内容:{}", wxid, at, content)
+            data = json_resp.get("Data")
+            return data.get("List")[0].get("ClientMsgid"), data.get("List")[0].get("Createtime"), data.get("List")[
+                0].get("NewMsgId")
+        else:
+            self.error_handler(json_resp)
+
+    async def send_image_message(self, wxid: str, image: MediaLike) -> tuple[int, int, int]:
         """发送图片消息。
 
         Args:
             wxid (str): 接收人wxid
-            image (str, byte, os.PathLike): 图片，支持base64字符串，图片byte，图片路径
+            image (str, byte, os.PathLike, MediaHandle): 图片，支持base64字符串，图片byte，图片路径，MediaHandle
 
         Returns:
             tuple[int, int, int]: 返回(ClientImgId, CreateTime, NewMsgId)
@@ -163,44 +169,66 @@ class MessageMixin(WechatAPIClientBase):
         """
         return await self._queue_message(self._send_image_message, wxid, image)
 
-    async def _send_image_message(self, wxid: str, image: Union[str, bytes, os.PathLike]) -> tuple[
-        int, int, int]:
+    async def upload_image_message(self, wxid: str, image: MediaLike) -> tuple[
+        tuple[str, int, int], Optional[str]]:
+        """上传并发送图片消息，同时返回图片的CDN引用，用于把同一张图片再发给其他人时避免重复上传。
+
+        Args:
+            wxid (str): 接收人wxid
+            image (str, byte, os.PathLike, MediaHandle): 图片，支持base64字符串，图片byte，图片路径，MediaHandle
+
+        Returns:
+            tuple[tuple[str, int, int], Optional[str]]: 返回((ClientImgId, CreateTime, NewMsgId), xml)，
+            xml 可以传给 send_cdn_img_msg，WechatAPI 没有返回CDN信息时为None
+
+        Raises:
+            UserLoggedOut: 未登录时调用
+            BanProtection: 登录新设备后4小时内操作
+            根据error_handler处理错误
+        """
+        return await self._queue_message(self._upload_image_message, wxid, image)
+
+    async def _send_image_message(self, wxid: str, image: MediaLike) -> tuple[int, int, int]:
+        image = MediaHandle.of(image)
+        cache_key = MediaCache.key("image", await image.digest())
+        xml = self.media_cache.get(cache_key)
+        if xml:
+            # 相同的图片上传过，转发CDN引用
+            try:
+                return await self._send_cdn_img_msg(wxid, xml)
+            except Exception as e:
+                logger.warning("转发已上传的图片失败，重新上传: 对方wxid:{} 错误:{}", wxid, e)
+                self.media_cache.discard(cache_key)
+        return (await self._upload_image_message(wxid, image))[0]
+
+    async def _upload_image_message(self, wxid: str, image: MediaLike) -> tuple[tuple[str, int, int], Optional[str]]:
         if not self.wxid:
             raise UserLoggedOut("请先登录")
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        if isinstance(image, str):
-            pass
-        elif isinstance(image, bytes):
-            image = base64.b64encode(image).decode()
-        elif isinstance(image, os.PathLike):
-            with open(image, 'rb') as f:
-                image = base64.b64encode(f.read()).decode()
+        image = MediaHandle.of(image)
+        json_resp = await self._post_media('/SendImageMsg', {"Wxid": self.wxid, "ToWxid": wxid}, {"Base64": image})
+
+        if json_resp.get("Success"):
+            logger.info("发送图片消息: 对方wxid:{} 图片base64略", wxid)
+            data = json_resp.get("Data")
+            result = data.get("ClientImgId").get("string"), data.get("CreateTime"), data.get("Newmsgid")
+            xml = _image_cdn_xml(data, image.size, await image.digest("md5"))
+            self.media_cache.put(MediaCache.key("image", await image.digest()), xml)
+            return result, xml
         else:
-            raise ValueError("Argument 'image' can only be str, bytes, or os.PathLike")
-
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Base64": image}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendImageMsg', json=json_param)
-            json_resp = await response.json()
-
-            if json_resp.get("Success"):
-                json_param.pop('Base64')
-                logger.info("发送图片消息: 对方wxid:{} 图片base64略", wxid)
-                data = json_resp.get("Data")
-                return data.get("ClientImgId").get("string"), data.get("CreateTime"), data.get("Newmsgid")
-            else:
-                self.error_handler(json_resp)
-
-    async def send_video_message(self, wxid: str, video: Union[str, bytes, os.PathLike],
-                                 image: [str, bytes, os.PathLike] = None):
+            self.error_handler(json_resp)
+
+    async def send_video_message(self, wxid: str, video: MediaLike,
+                                 image: MediaLike = None):
         """发送视频消息。不推荐使用，上传速度很慢300KB/s。如要使用，可压缩视频，或者发送链接卡片而不是视频。
 
                 Args:
                     wxid (str): 接收人wxid
-                    video (str, bytes, os.PathLike): 视频 接受base64字符串，字节，文件路径
-                    image (str, bytes, os.PathLike): 视频封面图片 接受base64字符串，字节，文件路径
+                    video (str, bytes, os.PathLike, MediaHandle): 视频 接受base64字符串，字节，文件路径，MediaHandle。
+                        文件路径和 MediaHandle 流式上传，不会把整个视频读入内存
+                    image (str, bytes, os.PathLike, MediaHandle): 视频封面图片 接受base64字符串，字节，文件路径，MediaHandle
 
                 Returns:
                     tuple[int, int]: 返回(ClientMsgid, NewMsgId)
@@ -213,62 +241,45 @@ class MessageMixin(WechatAPIClientBase):
                 """
         if not image:
             image = Path(os.path.join(Path(__file__).resolve().parent, "fallback.png"))
-        # get video base64 and duration
-        if isinstance(video, str):
-            vid_base64 = video
-            video = base64.b64decode(video)
-            file_len = len(video)
-            media_info = MediaInfo.parse(BytesIO(video))
-        elif isinstance(video, bytes):
-            vid_base64 = base64.b64encode(video).decode()
-            file_len = len(video)
-            media_info = MediaInfo.parse(BytesIO(video))
-        elif isinstance(video, os.PathLike):
-            with open(video, "rb") as f:
-                file_len = len(f.read())
-                vid_base64 = base64.b64encode(f.read()).decode()
-            media_info = MediaInfo.parse(video)
-        else:
-            raise ValueError("video should be str, bytes, or path")
-        duration = media_info.tracks[0].duration
+        video = MediaHandle.of(video)
+        image = MediaHandle.of(image)
 
-        # get image base64
-        if isinstance(image, str):
-            image_base64 = image
-        elif isinstance(image, bytes):
-            image_base64 = base64.b64encode(image).decode()
-        elif isinstance(image, os.PathLike):
-            with open(image, "rb") as f:
-                image_base64 = base64.b64encode(f.read()).decode()
-        else:
-            raise ValueError("image should be str, bytes, or path")
+        # 相同的视频和封面上传过，转发CDN引用
+        cache_key = MediaCache.key("video", await video.digest(), await image.digest())
+        xml = self.media_cache.get(cache_key)
+        if xml:
+            try:
+                return await self.send_cdn_video_msg(wxid, xml)
+            except Exception as e:
+                logger.warning("转发已上传的视频失败，重新上传: 对方wxid:{} 错误:{}", wxid, e)
+                self.media_cache.discard(cache_key)
+
+        # get video duration，MediaInfo 直接读取文件，不把视频读入内存
+        media_info = await asyncio.to_thread(MediaInfo.parse, await video.path(".mp4"))
+        duration = media_info.tracks[0].duration
 
         # 打印预估时间，300KB/s
-        predict_time = int(file_len / 1024 / 300)
+        predict_time = int(video.size / 1024 / 300)
         logger.info("开始发送视频: 对方wxid:{} 视频base64略 图片base64略 预计耗时:{}秒", wxid, predict_time)
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Base64": vid_base64, "ImageBase64": image_base64,
-                          "PlayLength": duration}
-            async with session.post(f'http://{self.ip}:{self.port}/SendVideoMsg', json=json_param) as resp:
-                json_resp = await resp.json()
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "PlayLength": duration}
+        json_resp = await self._post_media('/SendVideoMsg', json_param, {"Base64": video, "ImageBase64": image})
 
         if json_resp.get("Success"):
-            json_param.pop('Base64')
-            json_param.pop('ImageBase64')
             logger.info("发送视频成功: 对方wxid:{} 时长:{} 视频base64略 图片base64略", wxid, duration)
             data = json_resp.get("Data")
+            self.media_cache.put(cache_key, _video_cdn_xml(data, video.size, await video.digest("md5"), duration))
             return data.get("clientMsgId"), data.get("newMsgId")
         else:
             self.error_handler(json_resp)
 
-    async def send_voice_message(self, wxid: str, voice: Union[str, bytes, os.PathLike], format: str = "amr") -> \
+    async def send_voice_message(self, wxid: str, voice: MediaLike, format: str = "amr") -> \
             tuple[int, int, int]:
         """发送语音消息。
 
         Args:
             wxid (str): 接收人wxid
-            voice (str, bytes, os.PathLike): 语音 接受base64字符串，字节，文件路径
+            voice (str, bytes, os.PathLike, MediaHandle): 语音 接受base64字符串，字节，文件路径，MediaHandle
             format (str, optional): 语音格式，支持amr/wav/mp3. Defaults to "amr".
 
         Returns:
@@ -282,73 +293,30 @@ class MessageMixin(WechatAPIClientBase):
         """
         return await self._queue_message(self._send_voice_message, wxid, voice, format)
 
-    async def _send_voice_message(self, wxid: str, voice: Union[str, bytes, os.PathLike], format: str = "amr") -> \
+    async def _send_voice_message(self, wxid: str, voice: MediaLike, format: str = "amr") -> \
             tuple[int, int, int]:
         if not self.wxid:
             raise UserLoggedOut("请先登录")
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
-        elif format not in ["amr", "wav", "mp3"]:
-            raise ValueError("format must be one of amr, wav, mp3")
-
-        # read voice to byte
-        if isinstance(voice, str):
-            voice_byte = base64.b64decode(voice)
-        elif isinstance(voice, bytes):
-            voice_byte = voice
-        elif isinstance(voice, os.PathLike):
-            with open(voice, "rb") as f:
-                voice_byte = f.read()
-        else:
-            raise ValueError("voice should be str, bytes, or path")
-
-        # get voice duration and b64
-        if format.lower() == "amr":
-            audio = AudioSegment.from_file(BytesIO(voice_byte), format="amr")
-            voice_base64 = base64.b64encode(voice_byte).decode()
-        elif format.lower() == "wav":
-            audio = AudioSegment.from_file(BytesIO(voice_byte), format="wav").set_channels(1)
-            audio = audio.set_frame_rate(self._get_closest_frame_rate(audio.frame_rate))
-            voice_base64 = base64.b64encode(
-                await pysilk.async_encode(audio.raw_data, sample_rate=audio.frame_rate)).decode()
-        elif format.lower() == "mp3":
-            audio = AudioSegment.from_file(BytesIO(voice_byte), format="mp3").set_channels(1)
-            audio = audio.set_frame_rate(self._get_closest_frame_rate(audio.frame_rate))
-            voice_base64 = base64.b64encode(
-                await pysilk.async_encode(audio.raw_data, sample_rate=audio.frame_rate)).decode()
-        else:
+        elif format.lower() not in ["amr", "wav", "mp3"]:
             raise ValueError("format must be one of amr, wav, mp3")
 
-        duration = len(audio)
+        # 解码、重采样、编码在转码进程池中执行，不占用事件循环
+        format = format.lower()
+        voice_byte, duration = await transcoder.encode_voice(await MediaHandle.of(voice).read(), format)
 
         format_dict = {"amr": 0, "wav": 4, "mp3": 4}
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Base64": voice_base64, "VoiceTime": duration,
-                          "Type": format_dict[format]}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendVoiceMsg', json=json_param)
-            json_resp = await response.json()
-
-            if json_resp.get("Success"):
-                json_param.pop('Base64')
-                logger.info("发送语音消息: 对方wxid:{} 时长:{} 格式:{} 音频base64略", wxid, duration, format)
-                data = json_resp.get("Data")
-                return int(data.get("ClientMsgId")), data.get("CreateTime"), data.get("NewMsgId")
-            else:
-                self.error_handler(json_resp)
-
-    @staticmethod
-    def _get_closest_frame_rate(frame_rate: int) -> int:
-        supported = [8000, 12000, 16000, 24000]
-        closest_rate = None
-        smallest_diff = float('inf')
-        for num in supported:
-            diff = abs(frame_rate - num)
-            if diff < smallest_diff:
-                smallest_diff = diff
-                closest_rate = num
-
-        return closest_rate
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "VoiceTime": duration, "Type": format_dict[format]}
+        json_resp = await self._post_media('/SendVoiceMsg', json_param, {"Base64": MediaHandle(data=voice_byte)})
+
+        if json_resp.get("Success"):
+            logger.info("发送语音消息: 对方wxid:{} 时长:{} 格式:{} 音频base64略", wxid, duration, format)
+            data = json_resp.get("Data")
+            return int(data.get("ClientMsgId")), data.get("CreateTime"), data.get("NewMsgId")
+        else:
+            self.error_handler(json_resp)
 
     async def send_link_message(self, wxid: str, url: str, title: str = "", description: str = "",
                                 thumb_url: str = "") -> tuple[str, int, int]:
@@ -378,23 +346,21 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Url": url, "Title": title, "Desc": description,
-                          "ThumbUrl": thumb_url}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendShareLink', json=json_param)
-            json_resp = await response.json()
-
-            if json_resp.get("Success"):
-                logger.info("发送链接消息: 对方wxid:{} 链接:{} 标题:{} 描述:{} 缩略图链接:{}",
-                            wxid,
-                            url,
-                            title,
-                            description,
-                            thumb_url)
-                data = json_resp.get("Data")
-                return data.get("clientMsgId"), data.get("createTime"), data.get("newMsgId")
-            else:
-                self.error_handler(json_resp)
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Url": url, "Title": title, "Desc": description,
+                      "ThumbUrl": thumb_url}
+        json_resp = await self._post('/SendShareLink', json_param)
+
+        if json_resp.get("Success"):
+            logger.info("发送链接消息: 对方wxid:{} 链接:{} 标题:{} 描述:{} 缩略图链接:{}",
+                        wxid,
+                        url,
+                        title,
+                        description,
+                        thumb_url)
+            data = json_resp.get("Data")
+            return data.get("clientMsgId"), data.get("createTime"), data.get("newMsgId")
+        else:
+            self.error_handler(json_resp)
 
     async def send_emoji_message(self, wxid: str, md5: str, total_length: int) -> list[dict]:
         """发送表情消息。
@@ -420,16 +386,14 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Md5": md5, "TotalLen": total_length}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendEmojiMsg', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Md5": md5, "TotalLen": total_length}
+        json_resp = await self._post('/SendEmojiMsg', json_param)
 
-            if json_resp.get("Success"):
-                logger.info("发送表情消息: 对方wxid:{} md5:{} 总长度:{}", wxid, md5, total_length)
-                return json_resp.get("Data").get("emojiItem")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            logger.info("发送表情消息: 对方wxid:{} md5:{} 总长度:{}", wxid, md5, total_length)
+            return json_resp.get("Data").get("emojiItem")
+        else:
+            self.error_handler(json_resp)
 
     async def send_card_message(self, wxid: str, card_wxid: str, card_nickname: str, card_alias: str = "") -> tuple[
         int, int, int]:
@@ -458,22 +422,20 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "CardWxid": card_wxid, "CardAlias": card_alias,
-                          "CardNickname": card_nickname}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendCardMsg', json=json_param)
-            json_resp = await response.json()
-
-            if json_resp.get("Success"):
-                logger.info("发送名片消息: 对方wxid:{} 名片wxid:{} 名片备注:{} 名片昵称:{}", wxid,
-                            card_wxid,
-                            card_alias,
-                            card_nickname)
-                data = json_resp.get("Data")
-                return data.get("List")[0].get("ClientMsgid"), data.get("List")[0].get("Createtime"), data.get("List")[
-                    0].get("NewMsgId")
-            else:
-                self.error_handler(json_resp)
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "CardWxid": card_wxid, "CardAlias": card_alias,
+                      "CardNickname": card_nickname}
+        json_resp = await self._post('/SendCardMsg', json_param)
+
+        if json_resp.get("Success"):
+            logger.info("发送名片消息: 对方wxid:{} 名片wxid:{} 名片备注:{} 名片昵称:{}", wxid,
+                        card_wxid,
+                        card_alias,
+                        card_nickname)
+            data = json_resp.get("Data")
+            return data.get("List")[0].get("ClientMsgid"), data.get("List")[0].get("Createtime"), data.get("List")[
+                0].get("NewMsgId")
+        else:
+            self.error_handler(json_resp)
 
     async def send_app_message(self, wxid: str, xml: str, type: int) -> tuple[str, int, int]:
         """发送应用消息。
@@ -499,18 +461,16 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Xml": xml, "Type": type}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendAppMsg', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Xml": xml, "Type": type}
+        json_resp = await self._post('/SendAppMsg', json_param)
 
-            if json_resp.get("Success"):
-                json_param["Xml"] = json_param["Xml"].replace("\n", "")
-                logger.info("发送app消息: 对方wxid:{} 类型:{} xml:{}", wxid, type, json_param["Xml"])
-                return json_resp.get("Data").get("clientMsgId"), json_resp.get("Data").get(
-                    "createTime"), json_resp.get("Data").get("newMsgId")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            json_param["Xml"] = json_param["Xml"].replace("\n", "")
+            logger.info("发送app消息: 对方wxid:{} 类型:{} xml:{}", wxid, type, json_param["Xml"])
+            return json_resp.get("Data").get("clientMsgId"), json_resp.get("Data").get(
+                "createTime"), json_resp.get("Data").get("newMsgId")
+        else:
+            self.error_handler(json_resp)
 
     async def send_cdn_file_msg(self, wxid: str, xml: str) -> tuple[str, int, int]:
         """转发文件消息。
@@ -535,17 +495,15 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": xml}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendCDNFileMsg', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": xml}
+        json_resp = await self._post('/SendCDNFileMsg', json_param)
 
-            if json_resp.get("Success"):
-                logger.info("转发文件消息: 对方wxid:{} xml:{}", wxid, xml)
-                data = json_resp.get("Data")
-                return data.get("clientMsgId"), data.get("createTime"), data.get("newMsgId")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            logger.info("转发文件消息: 对方wxid:{} xml:{}", wxid, xml)
+            data = json_resp.get("Data")
+            return data.get("clientMsgId"), data.get("createTime"), data.get("newMsgId")
+        else:
+            self.error_handler(json_resp)
 
     async def send_cdn_img_msg(self, wxid: str, xml: str) -> tuple[str, int, int]:
         """转发图片消息。
@@ -570,17 +528,15 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": xml}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendCDNImgMsg', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": xml}
+        json_resp = await self._post('/SendCDNImgMsg', json_param)
 
-            if json_resp.get("Success"):
-                logger.info("转发图片消息: 对方wxid:{} xml:{}", wxid, xml)
-                data = json_resp.get("Data")
-                return data.get("ClientImgId").get("string"), data.get("CreateTime"), data.get("Newmsgid")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            logger.info("转发图片消息: 对方wxid:{} xml:{}", wxid, xml)
+            data = json_resp.get("Data")
+            return data.get("ClientImgId").get("string"), data.get("CreateTime"), data.get("Newmsgid")
+        else:
+            self.error_handler(json_resp)
 
     async def send_cdn_video_msg(self, wxid: str, xml: str) -> tuple[str, int]:
         """转发视频消息。
@@ -605,21 +561,22 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": xml}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendCDNVideoMsg', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": xml}
+        json_resp = await self._post('/SendCDNVideoMsg', json_param)
 
-            if json_resp.get("Success"):
-                logger.info("转发视频消息: 对方wxid:{} xml:{}", wxid, xml)
-                data = json_resp.get("Data")
-                return data.get("clientMsgId"), data.get("newMsgId")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            logger.info("转发视频消息: 对方wxid:{} xml:{}", wxid, xml)
+            data = json_resp.get("Data")
+            return data.get("clientMsgId"), data.get("newMsgId")
+        else:
+            self.error_handler(json_resp)
 
-    async def sync_message(self) -> dict:
+    async def sync_message(self, timeout: float = 10) -> dict:
         """同步消息。
 
+        Args:
+            timeout (float, optional): 请求超时时间(秒)，长轮询模式下需大于服务端挂起时间. Defaults to 10.
+
         Returns:
             dict: 返回同步到的消息数据
 
@@ -630,12 +587,10 @@ class MessageMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
-            json_param = {"Wxid": self.wxid, "Scene": 0, "Synckey": ""}
-            response = await session.post(f'http://{self.ip}:{self.port}/Sync', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "Scene": 0, "Synckey": ""}
+        json_resp = await self._post('/Sync', json_param, timeout=timeout)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return json_resp.get("Data")
+        else:
+            self.error_handler(json_resp)
@@ -0,0 +1,358 @@
+"""
+消息发送调度
+替代原来所有消息共用一个先进先出队列、每条之后固定 sleep(1) 的发送方式
+
+- 每个接收人一个令牌桶，另有一个全局令牌桶，限制的是发送频率而不是在每条消息后等待
+- 不同接收人之间轮流发送，一个会话大量排队不会阻塞其他会话；同一接收人的消息按顺序逐条发送
+- 两个优先级: 交互回复(默认)优先于定时群发，定时任务(@schedule)中发送的消息自动使用群发优先级
+- 同一会话中排队的连续纯文本消息(没有@)合并成一条发送
+"""
+
+import asyncio
+import contextlib
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass, asdict, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+PRIORITY_INTERACTIVE = 0  # 交互回复
+PRIORITY_BROADCAST = 1  # 定时群发
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BROADCAST)
+
+MAX_BUCKETS = 10000  # 最多保留多少个接收人的令牌桶，超出时丢弃最久没用的
+
+_priority: ContextVar[int] = ContextVar("send_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextlib.contextmanager
+def send_priority(priority: int):
+    """在 with 块内(包括其中创建的任务)发送的消息使用指定优先级
+
+    例子:
+
+        with send_priority(PRIORITY_BROADCAST):
+            for chatroom in chatrooms:
+                await bot.send_text_message(chatroom, "早上好")
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """令牌桶，rate <= 0 时不限速
+
+    Args:
+        rate: 每秒补充的令牌数
+        burst: 令牌桶容量，即允许的突发数量
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now: float) -> float:
+        """距离有一个可用令牌还需等待的秒数"""
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        if self.rate <= 0:
+            return
+        self._refill(now)
+        self.tokens -= 1
+
+
+@dataclass
+class SendStats:
+    """发送统计数据"""
+    submitted: int = 0  # 提交的消息数
+    sent: int = 0  # 实际发送的请求数(合并后)
+    failed: int = 0  # 发送失败的请求数
+    coalesced: int = 0  # 被合并到前一条中的文本消息数
+    depth: int = 0  # 当前排队中的消息数
+    max_depth: int = 0  # 历史最大排队数
+    lane_depth: List[int] = field(default_factory=lambda: [0] * len(PRIORITIES))  # 各优先级排队数
+    inflight: int = 0  # 正在发送的请求数
+    chats: int = 0  # 有排队消息的会话数
+    last_wait: float = 0.0  # 最近一条消息从提交到开始发送的等待时间(秒)
+    avg_wait: float = 0.0  # 等待时间的指数移动平均(秒)
+    max_wait: float = 0.0  # 最大等待时间(秒)
+    last_latency: float = 0.0  # 最近一次发送请求耗时(秒)
+    avg_latency: float = 0.0  # 发送耗时的指数移动平均(秒)
+    max_latency: float = 0.0  # 最大发送耗时(秒)
+
+    def record_wait(self, wait: float):
+        self.last_wait = wait
+        self.max_wait = max(self.max_wait, wait)
+        self.avg_wait = wait if self.sent == 0 else self.avg_wait * 0.9 + wait * 0.1
+
+    def record_latency(self, latency: float):
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+        self.avg_latency = latency if self.sent <= 1 else self.avg_latency * 0.9 + latency * 0.1
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass(slots=True)
+class _Job:
+    func: Callable[..., Awaitable[Any]]
+    args: tuple
+    kwargs: dict
+    futures: List[asyncio.Future]
+    enqueued: List[float]  # 每条消息的提交时间，与 futures 一一对应
+    text: Optional[str] = None  # 可以合并的纯文本消息内容
+
+
+class _Chat:
+    __slots__ = ("lanes", "bucket", "busy")
+
+    def __init__(self, bucket: TokenBucket):
+        self.lanes: Tuple[Deque[_Job], ...] = tuple(deque() for _ in PRIORITIES)
+        self.bucket = bucket
+        self.busy = False
+
+    def empty(self) -> bool:
+        return not any(self.lanes)
+
+
+class SendScheduler:
+    """按接收人限速、轮流发送的消息发送调度器，由 WechatAPIClient.sender 提供
+
+    Args:
+        config: main_config.toml 中的 [MessageSend] 配置
+    """
+
+    def __init__(self, config: Optional[dict] = None):
+        self.configure(config or {})
+
+        self.stats = SendStats()
+
+        self._chats: Dict[str, _Chat] = {}
+        # 接收人 -> 令牌桶，按最近使用排序。会话的队列发完后仍然保留，否则下一条消息会拿到装满的令牌桶
+        self._buckets: Dict[str, TokenBucket] = {}
+        # 各优先级中有排队消息的会话，轮流取出
+        self._ready: Tuple[Deque[str], ...] = tuple(deque() for _ in PRIORITIES)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._last_report = time.monotonic()
+
+    def configure(self, config: dict):
+        """应用配置，需要在发送第一条消息前调用"""
+        self.config = config
+        self.global_rate = config.get("global-rate", 5)
+        self.global_burst = config.get("global-burst", 10)
+        self.chat_rate = config.get("chat-rate", 1)
+        self.chat_burst = config.get("chat-burst", 3)
+        self.concurrency = max(1, config.get("concurrency", 4))
+        self.coalesce_text = config.get("coalesce-text", True)
+        self.coalesce_max_length = config.get("coalesce-max-length", 2000)
+        self.report_interval = config.get("report-interval", 300)
+        self._global_bucket = TokenBucket(self.global_rate, self.global_burst)
+        self._buckets = {}
+
+    async def submit(self, wxid: str, func: Callable[..., Awaitable[Any]], *args, text: Optional[str] = None,
+                     priority: Optional[int] = None, **kwargs) -> Any:
+        """提交一条消息并等待发送结果
+
+        Args:
+            wxid: 接收人
+            func: 实际发送消息的方法
+            text: 可以和相邻文本合并时传入消息内容，合并发送的消息得到相同的返回值
+            priority: 优先级，默认使用 send_priority() 设置的优先级
+        """
+        if priority is None:
+            priority = _priority.get()
+        loop = asyncio.get_running_loop()
+        if self._loop is not None and self._loop is not loop and self._loop.is_running():
+            # 其他线程的事件循环(例如管理后台)，交给调度器所在的事件循环发送
+            future = asyncio.run_coroutine_threadsafe(
+                self.submit(wxid, func, *args, text=text, priority=priority, **kwargs), self._loop)
+            return await asyncio.wrap_future(future)
+
+        self._ensure_started(loop)
+        future = loop.create_future()
+        job = _Job(func, args, kwargs, [future], [time.monotonic()], text if self.coalesce_text else None)
+
+        chat = self._chats.get(wxid)
+        if chat is None:
+            chat = self._chats[wxid] = _Chat(self._bucket(wxid))
+        lane = chat.lanes[priority]
+        if not lane:
+            self._ready[priority].append(wxid)
+        lane.append(job)
+
+        stats = self.stats
+        stats.submitted += 1
+        stats.depth += 1
+        stats.lane_depth[priority] += 1
+        stats.max_depth = max(stats.max_depth, stats.depth)
+        stats.chats = len(self._chats)
+        self._wakeup.set()
+        self._maybe_report()
+
+        return await future
+
+    def _bucket(self, wxid: str) -> TokenBucket:
+        """接收人的令牌桶"""
+        bucket = self._buckets.pop(wxid, None)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            if len(self._buckets) >= MAX_BUCKETS:
+                del self._buckets[next(iter(self._buckets))]
+        self._buckets[wxid] = bucket
+        return bucket
+
+    def _ensure_started(self, loop: asyncio.AbstractEventLoop):
+        if self._loop is not loop:
+            # 事件循环变了(例如重新登录后重建)，之前的排队已不可能完成
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._task = None
+            self._chats.clear()
+            for ready in self._ready:
+                ready.clear()
+            self.stats.depth = self.stats.inflight = self.stats.chats = 0
+            self.stats.lane_depth = [0] * len(PRIORITIES)
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+
+    async def close(self):
+        """停止调度，未发送的消息以 CancelledError 结束"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for chat in self._chats.values():
+            for lane in chat.lanes:
+                for job in lane:
+                    for future in job.futures:
+                        future.cancel()
+        self._chats.clear()
+        for ready in self._ready:
+            ready.clear()
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            now = time.monotonic()
+            picked, wait = self._pick(now)
+            if picked is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            key, chat, job = picked
+            self._global_bucket.take(now)
+            chat.bucket.take(now)
+            chat.busy = True
+            self.stats.inflight += 1
+            asyncio.create_task(self._send(key, chat, job, now))
+
+    def _pick(self, now: float) -> Tuple[Optional[tuple], Optional[float]]:
+        """按优先级轮流选出下一条可以发送的消息，没有时返回需要等待的时间(None 表示等待唤醒)"""
+        if self.stats.inflight >= self.concurrency:
+            return None, None
+        global_delay = self._global_bucket.delay(now)
+        if global_delay > 0:
+            return None, global_delay
+
+        wait = None
+        for priority, ready in enumerate(self._ready):
+            for _ in range(len(ready)):
+                key = ready.popleft()
+                chat = self._chats[key]
+                lane = chat.lanes[priority]
+                if chat.busy:
+                    # 同一接收人上一条还没发完，发完后会唤醒调度
+                    ready.append(key)
+                    continue
+                delay = chat.bucket.delay(now)
+                if delay > 0:
+                    wait = delay if wait is None else min(wait, delay)
+                    ready.append(key)
+                    continue
+
+                job = lane.popleft()
+                self._coalesce(job, lane)
+                if lane:
+                    ready.append(key)
+                self.stats.depth -= len(job.futures)
+                self.stats.lane_depth[priority] -= len(job.futures)
+                return (key, chat, job), None
+        return None, wait
+
+    def _coalesce(self, job: _Job, lane: Deque[_Job]):
+        """把紧跟在后面的纯文本消息合并进 job"""
+        if job.text is None:
+            return
+        merged = False
+        while lane and lane[0].text is not None \
+                and len(job.text) + 1 + len(lane[0].text) <= self.coalesce_max_length:
+            following = lane.popleft()
+            job.text = f"{job.text}\n{following.text}"
+            job.futures.extend(following.futures)
+            job.enqueued.extend(following.enqueued)
+            self.stats.coalesced += 1
+            merged = True
+        if merged:
+            job.args = (job.args[0], job.text, *job.args[2:])
+
+    async def _send(self, key: str, chat: _Chat, job: _Job, started: float):
+        stats = self.stats
+        for enqueued_at in job.enqueued:
+            stats.record_wait(started - enqueued_at)
+        try:
+            result = await job.func(*job.args, **job.kwargs)
+        except Exception as e:
+            stats.failed += 1
+            for future in job.futures:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for future in job.futures:
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            stats.sent += 1
+            stats.record_latency(time.monotonic() - started)
+            stats.inflight -= 1
+            chat.busy = False
+            if chat.empty():
+                del self._chats[key]
+            stats.chats = len(self._chats)
+            self._wakeup.set()
+
+    def _maybe_report(self):
+        if not self.report_interval:
+            return
+        now = time.monotonic()
+        if now - self._last_report >= self.report_interval:
+            self._last_report = now
+            stats = self.stats
+            logger.debug("消息发送统计: 排队:{} (交互:{} 群发:{}) 最大排队:{} 会话:{} 发送中:{} 已发送:{} 失败:{} 合并:{} "
+                         "平均等待:{:.3f}s 最大等待:{:.3f}s 平均耗时:{:.3f}s 最大耗时:{:.3f}s",
+                         stats.depth, *stats.lane_depth, stats.max_depth, stats.chats, stats.inflight, stats.sent,
+                         stats.failed, stats.coalesced, stats.avg_wait, stats.max_wait, stats.avg_latency,
+                         stats.max_latency)
@@ -1,13 +1,9 @@
 import base64
-import io
 import os
 
-import aiohttp
-import pysilk
-from pydub import AudioSegment
-
 from .base import *
 from .protect import protector
+from .transcoder import transcoder, wav_to_amr
 from ..errors import *
 
 
@@ -29,15 +25,13 @@ class ToolMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "AesKey": aeskey, "Cdnmidimgurl": cdnmidimgurl}
-            response = await session.post(f'http://{self.ip}:{self.port}/CdnDownloadImg', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "AesKey": aeskey, "Cdnmidimgurl": cdnmidimgurl}
+        json_resp = await self._post('/CdnDownloadImg', json_param)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return json_resp.get("Data")
+        else:
+            self.error_handler(json_resp)
 
     async def download_voice(self, msg_id: str, voiceurl: str, length: int) -> str:
         """下载语音文件。
@@ -57,15 +51,13 @@ class ToolMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "MsgId": msg_id, "Voiceurl": voiceurl, "Length": length}
-            response = await session.post(f'http://{self.ip}:{self.port}/DownloadVoice', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "MsgId": msg_id, "Voiceurl": voiceurl, "Length": length}
+        json_resp = await self._post('/DownloadVoice', json_param)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data").get("data").get("buffer")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return json_resp.get("Data").get("data").get("buffer")
+        else:
+            self.error_handler(json_resp)
 
     async def download_attach(self, attach_id: str) -> dict:
         """下载附件。
@@ -83,22 +75,14 @@ class ToolMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            # 设置请求超时时间为5分钟，以处理大文件
-            timeout = aiohttp.ClientTimeout(total=300)  # 5分钟
-
-            json_param = {"Wxid": self.wxid, "AttachId": attach_id}
-            response = await session.post(
-                f'http://{self.ip}:{self.port}/DownloadAttach',
-                json=json_param,
-                timeout=timeout
-            )
-            json_resp = await response.json()
+        # 大文件下载较慢，超时时间见 ENDPOINT_TIMEOUTS
+        json_param = {"Wxid": self.wxid, "AttachId": attach_id}
+        json_resp = await self._post('/DownloadAttach', json_param)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data").get("data").get("buffer")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return json_resp.get("Data").get("data").get("buffer")
+        else:
+            self.error_handler(json_resp)
 
     async def download_video(self, msg_id) -> str:
         """下载视频。
@@ -116,15 +100,32 @@ class ToolMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "MsgId": msg_id}
-            response = await session.post(f'http://{self.ip}:{self.port}/DownloadVideo', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "MsgId": msg_id}
+        json_resp = await self._post('/DownloadVideo', json_param)
+
+        if json_resp.get("Success"):
+            return json_resp.get("Data").get("data").get("buffer")
+        else:
+            self.error_handler(json_resp)
+
+    # 以下方法返回 MediaHandle，第一次读取时才下载，下载结果分块解码，大文件保存在临时文件中。
+    # 句柄可以直接传给 send_image_message/send_video_message 等方法，上传时流式编码。
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data").get("data").get("buffer")
-            else:
-                self.error_handler(json_resp)
+    def image_media(self, aeskey: str, cdnmidimgurl: str) -> MediaHandle:
+        """CDN高清图片的句柄，参数同 download_image"""
+        return MediaHandle.lazy(lambda: self.download_image(aeskey, cdnmidimgurl))
+
+    def voice_media(self, msg_id: str, voiceurl: str, length: int) -> MediaHandle:
+        """语音(silk)的句柄，参数同 download_voice"""
+        return MediaHandle.lazy(lambda: self.download_voice(msg_id, voiceurl, length))
+
+    def attach_media(self, attach_id: str) -> MediaHandle:
+        """附件的句柄，参数同 download_attach"""
+        return MediaHandle.lazy(lambda: self.download_attach(attach_id))
+
+    def video_media(self, msg_id) -> MediaHandle:
+        """视频的句柄，参数同 download_video"""
+        return MediaHandle.lazy(lambda: self.download_video(msg_id))
 
     async def set_step(self, count: int) -> bool:
         """设置步数。
@@ -145,15 +146,13 @@ class ToolMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "StepCount": count}
-            response = await session.post(f'http://{self.ip}:{self.port}/SetStep', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "StepCount": count}
+        json_resp = await self._post('/SetStep', json_param)
 
-            if json_resp.get("Success"):
-                return True
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return True
+        else:
+            self.error_handler(json_resp)
 
     async def set_proxy(self, proxy: Proxy) -> bool:
         """设置代理。
@@ -171,18 +170,16 @@ class ToolMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid,
-                          "Proxy": {"ProxyIp": f"{proxy.ip}:{proxy.port}",
-                                    "ProxyUser": proxy.username,
-                                    "ProxyPassword": proxy.password}}
-            response = await session.post(f'http://{self.ip}:{self.port}/SetProxy', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid,
+                      "Proxy": {"ProxyIp": f"{proxy.ip}:{proxy.port}",
+                                "ProxyUser": proxy.username,
+                                "ProxyPassword": proxy.password}}
+        json_resp = await self._post('/SetProxy', json_param)
 
-            if json_resp.get("Success"):
-                return True
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return True
+        else:
+            self.error_handler(json_resp)
 
     async def check_database(self) -> bool:
         """检查数据库状态。
@@ -190,14 +187,13 @@ class ToolMixin(WechatAPIClientBase):
         Returns:
             bool: 数据库正常返回True，否则返回False
         """
-        async with aiohttp.ClientSession() as session:
-            response = await session.get(f'http://{self.ip}:{self.port}/CheckDatabaseOK')
-            json_resp = await response.json()
+        response = await self._get('/CheckDatabaseOK')
+        json_resp = await response.json()
 
-            if json_resp.get("Running"):
-                return True
-            else:
-                return False
+        if json_resp.get("Running"):
+            return True
+        else:
+            return False
 
     @staticmethod
     def base64_to_file(base64_str: str, file_name: str, file_path: str) -> bool:
@@ -281,11 +277,11 @@ class ToolMixin(WechatAPIClientBase):
         Returns:
             bytes: wav格式的字节数据
         """
-        return await pysilk.async_decode(silk_byte, to_wav=True)
+        return await transcoder.silk_to_wav(silk_byte)
 
     @staticmethod
     def wav_byte_to_amr_byte(wav_byte: bytes) -> bytes:
-        """将WAV字节数据转换为AMR格式。
+        """将WAV字节数据转换为AMR格式。同步执行，在事件循环中请使用 await transcoder.wav_to_amr()。
 
         Args:
             wav_byte (bytes): WAV格式的字节数据
@@ -297,21 +293,7 @@ class ToolMixin(WechatAPIClientBase):
             Exception: 转换失败时抛出异常
         """
         try:
-            # 从字节数据创建 AudioSegment 对象
-            audio = AudioSegment.from_wav(io.BytesIO(wav_byte))
-
-            # 设置 AMR 编码的标准参数
-            audio = audio.set_frame_rate(8000).set_channels(1)
-
-            # 创建一个字节缓冲区来存储 AMR 数据
-            output = io.BytesIO()
-
-            # 导出为 AMR 格式
-            audio.export(output, format="amr")
-
-            # 获取字节数据
-            return output.getvalue()
-
+            return wav_to_amr(wav_byte)
         except Exception as e:
             raise Exception(f"转换WAV到AMR失败: {str(e)}")
 
@@ -337,10 +319,8 @@ class ToolMixin(WechatAPIClientBase):
         Returns:
             bytes: silk格式的字节数据
         """
-        # get pcm data
-        audio = AudioSegment.from_wav(io.BytesIO(wav_byte))
-        pcm = audio.raw_data
-        return await pysilk.async_encode(pcm, data_rate=audio.frame_rate, sample_rate=audio.frame_rate)
+        silk, _ = await transcoder.to_silk(wav_byte, "wav")
+        return silk
 
     @staticmethod
     async def wav_byte_to_silk_base64(wav_byte: bytes) -> str:
@@ -0,0 +1,335 @@
+"""
+音频转码
+语音的 silk/wav/mp3/amr 转换原来在事件循环中直接用 pydub 解码、重采样、导出，CPU占满时会卡住消息处理
+
+- 转码在进程池中执行，同时提交的任务数有上限，超过时等待，不会无限堆积
+- wav 用标准库直接读取PCM并重采样，amr 从帧头计算时长，都不经过 ffmpeg；mp3 等格式才使用 pydub
+- 最近的转换结果按内容哈希缓存，同一段语音重复发送、或同时被多个插件读取只转换一次
+- 记录排队和转码耗时
+"""
+
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import os
+import time
+import warnings
+import wave
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, asdict
+from functools import partial
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pysilk
+from loguru import logger
+from pydub import AudioSegment
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    try:
+        import audioop
+    except ImportError:  # Python 3.13 移除了 audioop，wav 也改用 pydub
+        audioop = None
+
+# silk 编码支持的采样率
+SILK_SAMPLE_RATES = (8000, 12000, 16000, 24000)
+
+# AMR-NB 各帧类型的帧长(字节，含1字节帧头)，每帧20ms
+_AMR_FRAME_SIZES = {0: 13, 1: 14, 2: 16, 3: 18, 4: 20, 5: 21, 6: 27, 7: 32, 8: 6, 15: 1}
+_AMR_HEADER = b"#!AMR\n"
+
+
+def closest_sample_rate(rate: int) -> int:
+    """silk 支持的采样率中最接近 rate 的一个"""
+    return min(SILK_SAMPLE_RATES, key=lambda supported: abs(rate - supported))
+
+
+# 以下函数在进程池中执行，只接受和返回可以 pickle 的值
+
+def _wav_to_pcm(data: bytes) -> Optional[Tuple[bytes, int]]:
+    """直接解析wav，返回(16位单声道PCM, 采样率)，采样率已转换为 silk 支持的值。不支持的wav返回None"""
+    if audioop is None:
+        return None
+    try:
+        with wave.open(io.BytesIO(data), "rb") as f:
+            channels, width, rate = f.getnchannels(), f.getsampwidth(), f.getframerate()
+            frames = f.readframes(f.getnframes())
+    except (wave.Error, EOFError):
+        return None
+    if channels > 2:
+        return None
+
+    if width != 2:
+        if width == 1:
+            frames = audioop.bias(frames, 1, -128)  # 8位wav是无符号的
+        frames = audioop.lin2lin(frames, width, 2)
+    if channels == 2:
+        frames = audioop.tomono(frames, 2, 0.5, 0.5)
+    target = closest_sample_rate(rate)
+    if target != rate:
+        frames, _ = audioop.ratecv(frames, 2, 1, rate, target, None)
+    return frames, target
+
+
+def _decode_pcm(data: bytes, format: str) -> Tuple[bytes, int]:
+    """把任意格式解码为(16位单声道PCM, silk 支持的采样率)，wav 优先直接解析"""
+    if format == "wav":
+        pcm = _wav_to_pcm(data)
+        if pcm is not None:
+            return pcm
+
+    audio = AudioSegment.from_file(io.BytesIO(data), format=format).set_channels(1).set_sample_width(2)
+    audio = audio.set_frame_rate(closest_sample_rate(audio.frame_rate))
+    return audio.raw_data, audio.frame_rate
+
+
+def _amr_duration(data: bytes) -> Optional[int]:
+    """从 AMR-NB 帧头计算时长(毫秒)，不是 AMR-NB 时返回None"""
+    if not data.startswith(_AMR_HEADER):
+        return None
+    position, frames = len(_AMR_HEADER), 0
+    while position < len(data):
+        size = _AMR_FRAME_SIZES.get((data[position] >> 3) & 0x0F, 1)
+        position += size
+        frames += 1
+    return frames * 20
+
+
+def duration(data: bytes, format: str) -> int:
+    """音频时长(毫秒)"""
+    if format == "amr":
+        milliseconds = _amr_duration(data)
+        if milliseconds is not None:
+            return milliseconds
+    if format == "silk":
+        data, format = pysilk.decode(data, to_wav=True), "wav"
+    if format == "wav":
+        try:
+            with wave.open(io.BytesIO(data), "rb") as f:
+                return int(f.getnframes() * 1000 / f.getframerate())
+        except (wave.Error, EOFError):
+            pass
+
+    return len(AudioSegment.from_file(io.BytesIO(data), format=format))
+
+
+def silk_to_wav(data: bytes) -> bytes:
+    return pysilk.decode(data, to_wav=True)
+
+
+def to_silk(data: bytes, format: str) -> Tuple[bytes, int]:
+    """转换为silk，返回(silk数据, 时长毫秒)"""
+    pcm, rate = _decode_pcm(data, format)
+    return pysilk.encode(pcm, data_rate=rate, sample_rate=rate), len(pcm) * 1000 // (rate * 2)
+
+
+def wav_to_amr(data: bytes) -> bytes:
+    audio = AudioSegment.from_wav(io.BytesIO(data)).set_frame_rate(8000).set_channels(1)
+    output = io.BytesIO()
+    audio.export(output, format="amr")
+    return output.getvalue()
+
+
+def encode_voice(data: bytes, format: str) -> Tuple[bytes, int]:
+    """把 send_voice_message 接受的格式转换为 SendVoiceMsg 需要的数据，返回(数据, 时长毫秒)
+
+    amr 原样发送，只计算时长；wav、mp3 转换为silk
+    """
+    if format == "amr":
+        return data, duration(data, "amr")
+    return to_silk(data, format)
+
+
+@dataclass
+class TranscodeStats:
+    """转码统计数据"""
+    submitted: int = 0  # 提交的转码数
+    completed: int = 0  # 实际执行的转码数
+    failed: int = 0  # 失败的转码数
+    cache_hits: int = 0  # 命中缓存或与进行中的相同转码合并的次数
+    cache_bytes: int = 0  # 缓存占用(字节)
+    queued: int = 0  # 等待进入进程池的任务数
+    running: int = 0  # 进程池中的任务数
+    max_queued: int = 0  # 历史最大等待数
+    last_wait: float = 0.0  # 最近一次排队时间(秒)
+    avg_wait: float = 0.0  # 排队时间的指数移动平均(秒)
+    max_wait: float = 0.0  # 最大排队时间(秒)
+    last_time: float = 0.0  # 最近一次转码耗时(秒)
+    avg_time: float = 0.0  # 转码耗时的指数移动平均(秒)
+    max_time: float = 0.0  # 最大转码耗时(秒)
+
+    def record(self, wait: float, elapsed: float):
+        self.last_wait, self.last_time = wait, elapsed
+        self.max_wait = max(self.max_wait, wait)
+        self.max_time = max(self.max_time, elapsed)
+        first = self.completed + self.failed <= 1
+        self.avg_wait = wait if first else self.avg_wait * 0.9 + wait * 0.1
+        self.avg_time = elapsed if first else self.avg_time * 0.9 + elapsed * 0.1
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class Transcoder:
+    """音频转码服务，整个进程共用一个实例 transcoder
+
+    用法:
+        wav = await transcoder.silk_to_wav(silk_bytes)
+        silk, duration = await transcoder.encode_voice(mp3_bytes, "mp3")
+
+    Args:
+        config: main_config.toml 中的 [Transcode] 配置
+    """
+
+    def __init__(self, config: Optional[dict] = None):
+        self.configure(config or {})
+
+        self.stats = TranscodeStats()
+
+        self._executor: Optional[Executor] = None
+        self._cache: "OrderedDict[str, Any]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._last_report = time.monotonic()
+
+    def configure(self, config: dict):
+        """应用配置，进程池在第一次转码时按配置创建"""
+        self.config = config
+        self.workers = config.get("workers", min(4, os.cpu_count() or 1))
+        self.queue_size = max(1, config.get("queue-size", 32))
+        self.cache_size = config.get("cache-size", 32) * 1024 * 1024
+        self.report_interval = config.get("report-interval", 300)
+
+    async def silk_to_wav(self, data: bytes) -> bytes:
+        return await self.run(silk_to_wav, data)
+
+    async def to_silk(self, data: bytes, format: str = "wav") -> Tuple[bytes, int]:
+        return await self.run(to_silk, data, format)
+
+    async def wav_to_amr(self, data: bytes) -> bytes:
+        return await self.run(wav_to_amr, data)
+
+    async def encode_voice(self, data: bytes, format: str) -> Tuple[bytes, int]:
+        return await self.run(encode_voice, data, format)
+
+    async def duration(self, data: bytes, format: str) -> int:
+        return await self.run(duration, data, format)
+
+    async def run(self, func: Callable[..., Any], data: bytes, *args) -> Any:
+        """在进程池中执行 func(data, *args)，结果按 (func, data的哈希, args) 缓存。func 必须是模块级函数"""
+        self._bind_loop()
+        self.stats.submitted += 1
+        key = f"{func.__name__}:{hashlib.sha256(data).hexdigest()}:{args!r}"
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self.stats.cache_hits += 1
+            return self._cache[key]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            # 相同内容正在转换，等待同一个结果
+            self.stats.cache_hits += 1
+        else:
+            # 转换在单独的任务中执行，某个调用者被取消不会影响其他等待同一结果的调用者
+            task = self._inflight[key] = asyncio.ensure_future(self._execute(func, data, *args))
+            task.add_done_callback(partial(self._finished, key))
+        return await asyncio.shield(task)
+
+    def _finished(self, key: str, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 读取异常，没有等待者时也不报 "exception was never retrieved"
+        if not task.cancelled() and task.exception() is None:
+            self._remember(key, task.result())
+
+    async def _execute(self, func: Callable[..., Any], data: bytes, *args) -> Any:
+        stats = self.stats
+        enqueued = time.monotonic()
+        stats.queued += 1
+        stats.max_queued = max(stats.max_queued, stats.queued)
+        try:
+            await self._slots.acquire()
+        finally:
+            stats.queued -= 1
+
+        started = time.monotonic()
+        stats.running += 1
+        try:
+            result = await self._loop.run_in_executor(self._get_executor(), func, data, *args)
+        except BrokenProcessPool:
+            # 工作进程异常退出(例如被OOM杀掉)，下次转码时重建进程池
+            stats.failed += 1
+            self._executor = None
+            raise
+        except Exception:
+            stats.failed += 1
+            raise
+        else:
+            stats.completed += 1
+            return result
+        finally:
+            stats.running -= 1
+            stats.record(started - enqueued, time.monotonic() - started)
+            self._slots.release()
+            self._maybe_report()
+
+    def _get_executor(self) -> Optional[Executor]:
+        """workers 为0时使用事件循环默认的线程池"""
+        if self._executor is None and self.workers > 0:
+            # spawn 避免在多线程进程(管理后台、日志线程)中 fork
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 事件循环变了(例如重新登录后重建)，丢弃与旧循环绑定的等待对象
+            self._loop = loop
+            self._inflight.clear()
+            self._slots = asyncio.Semaphore(self.queue_size)
+            self.stats.queued = self.stats.running = 0
+
+    def _remember(self, key: str, result: Any):
+        size = self._size(result)
+        if size > self.cache_size:
+            return
+        self._cache[key] = result
+        self.stats.cache_bytes += size
+        while self.stats.cache_bytes > self.cache_size:
+            _, evicted = self._cache.popitem(last=False)
+            self.stats.cache_bytes -= self._size(evicted)
+
+    @staticmethod
+    def _size(result: Any) -> int:
+        if isinstance(result, tuple):
+            return sum(len(item) for item in result if isinstance(item, bytes))
+        return len(result) if isinstance(result, bytes) else 0
+
+    def close(self):
+        """关闭进程池，正在排队的转码被取消"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._cache.clear()
+        self.stats.cache_bytes = 0
+
+    def _maybe_report(self):
+        if not self.report_interval:
+            return
+        now = time.monotonic()
+        if now - self._last_report >= self.report_interval:
+            self._last_report = now
+            stats = self.stats
+            logger.debug("音频转码统计: 排队:{} 最大排队:{} 执行中:{} 完成:{} 失败:{} 缓存命中:{} 缓存:{}KB "
+                         "平均排队:{:.3f}s 最大排队:{:.3f}s 平均耗时:{:.3f}s 最大耗时:{:.3f}s",
+                         stats.queued, stats.max_queued, stats.running, stats.completed, stats.failed,
+                         stats.cache_hits, stats.cache_bytes // 1024, stats.avg_wait, stats.max_wait,
+                         stats.avg_time, stats.max_time)
+
+
+transcoder = Transcoder()
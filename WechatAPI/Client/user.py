@@ -1,5 +1,3 @@
-import aiohttp
-
 from .base import *
 from .protect import protector
 from ..errors import *
@@ -25,15 +23,13 @@ class UserMixin(WechatAPIClientBase):
         if not wxid:
             wxid = self.wxid
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": wxid}
-            response = await session.post(f'http://{self.ip}:{self.port}/GetProfile', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": wxid}
+        json_resp = await self._post('/GetProfile', json_param)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data").get("userInfo")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return json_resp.get("Data").get("userInfo")
+        else:
+            self.error_handler(json_resp)
 
     async def get_my_qrcode(self, style: int = 0) -> str:
         """获取个人二维码。
@@ -54,15 +50,13 @@ class UserMixin(WechatAPIClientBase):
         elif protector.check(14400) and not self.ignore_protect:
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "Style": style}
-            response = await session.post(f'http://{self.ip}:{self.port}/GetMyQRCode', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "Style": style}
+        json_resp = await self._post('/GetMyQRCode', json_param)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data").get("qrcode").get("buffer")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return json_resp.get("Data").get("qrcode").get("buffer")
+        else:
+            self.error_handler(json_resp)
 
     async def is_logged_in(self, wxid: str = None) -> bool:
         """检查是否登录。
@@ -1208,6 +1208,105 @@ except:
             "data": get_system_status()
         }
 
+    # API: 消息记录存储状态 (需要认证)
+    @app.get("/api/system/message-db", response_class=JSONResponse)
+    async def api_message_db_status(request: Request):
+        # 检查认证状态
+        username = await check_auth(request)
+        if not username:
+            return JSONResponse(status_code=401, content={"success": False, "error": "未认证"})
+
+        from database.messsagDB import MessageDB
+        from database.message_retention import get_retention_status
+
+        message_db = MessageDB._instance
+        return {
+            "success": True,
+            "data": {
+                "buffer": message_db.stats.as_dict() if message_db is not None else None,
+                "retention": get_retention_status()
+            }
+        }
+
+    @app.get("/api/system/send-queue", response_class=JSONResponse)
+    async def api_send_queue_status(request: Request):
+        # 检查认证状态
+        username = await check_auth(request)
+        if not username:
+            return JSONResponse(status_code=401, content={"success": False, "error": "未认证"})
+
+        sender = getattr(getattr(bot_instance, "bot", None), "sender", None)
+        return {
+            "success": True,
+            "data": sender.stats.as_dict() if sender is not None else None
+        }
+
+    @app.get("/api/system/transcoder", response_class=JSONResponse)
+    async def api_transcoder_status(request: Request):
+        # 检查认证状态
+        username = await check_auth(request)
+        if not username:
+            return JSONResponse(status_code=401, content={"success": False, "error": "未认证"})
+
+        from WechatAPI import transcoder
+        return {
+            "success": True,
+            "data": {**transcoder.stats.as_dict(), "workers": transcoder.workers, "queue_size": transcoder.queue_size}
+        }
+
+    @app.get("/api/system/message-log", response_class=JSONResponse)
+    async def api_message_log_status(request: Request):
+        # 检查认证状态
+        username = await check_auth(request)
+        if not username:
+            return JSONResponse(status_code=401, content={"success": False, "error": "未认证"})
+
+        from utils.message_log import message_log
+        return {
+            "success": True,
+            "data": {
+                **message_log.stats.as_dict(),
+                "sample_rate": message_log.sample_rate,
+                "chat_rate": message_log.chat_rate,
+                "verbose_wxids": message_log.verbose_list()
+            }
+        }
+
+    @app.post("/api/system/message-log/verbose", response_class=JSONResponse)
+    async def api_message_log_verbose(request: Request):
+        """对某个会话或发送人打开详细消息日志"""
+        # 检查认证状态
+        username = await check_auth(request)
+        if not username:
+            return JSONResponse(status_code=401, content={"success": False, "error": "未认证"})
+
+        from utils.message_log import message_log
+        try:
+            data = await request.json()
+            wxid = str(data.get("wxid", "")).strip()
+            minutes = float(data.get("minutes", 30))
+        except Exception:
+            return JSONResponse(status_code=400, content={"success": False, "error": "参数错误"})
+        if not wxid:
+            return JSONResponse(status_code=400, content={"success": False, "error": "wxid不能为空"})
+
+        logger.info(f"用户 {username} 打开 {wxid} 的详细消息日志")
+        message_log.set_verbose(wxid, minutes)
+        return {"success": True, "data": message_log.verbose_list()}
+
+    @app.delete("/api/system/message-log/verbose/{wxid}", response_class=JSONResponse)
+    async def api_message_log_quiet(wxid: str, request: Request):
+        """关闭某个会话或发送人的详细消息日志"""
+        # 检查认证状态
+        username = await check_auth(request)
+        if not username:
+            return JSONResponse(status_code=401, content={"success": False, "error": "未认证"})
+
+        from utils.message_log import message_log
+        if not message_log.clear_verbose(wxid):
+            return JSONResponse(content={"success": False, "error": "该wxid没有打开详细日志"})
+        return {"success": True, "data": message_log.verbose_list()}
+
     # API: 系统信息 (需要认证)
     @app.get("/api/system/info", response_class=JSONResponse)
     async def api_system_info(request: Request):
@@ -3517,38 +3616,33 @@ except:
 
     # API: 系统日志 (需要认证)
     @app.get("/api/system/logs", response_class=JSONResponse)
-    async def api_system_logs(request: Request, log_level: str = None, limit: int = 100):
-        """获取系统日志"""
+    async def api_system_logs(request: Request, log_level: str = None, min_level: str = None, limit: int = 100,
+                              before: int = None, after: int = None, since: str = None, until: str = None,
+                              file: str = None):
+        """获取系统日志
+
+        不指定 after 时返回 before(默认为文件末尾)之前最后的 limit 条，指定 after 时返回之后最早的 limit 条。
+        返回的 cursor 用于继续翻页，end 用于 /ws/system/logs 跟随新日志
+        """
         # 检查认证状态
         username = await check_auth(request)
         if not username:
             return JSONResponse(status_code=401, content={"success": False, "error": "未认证"})
 
         try:
-            # 可能的日志文件位置
-            log_paths = [
-                "logs/latest.log",
-                "logs/xybot.log",
-                "logs/XYBot_*.log",
-                "_data/logs/XYBot_*.log",
-                "../logs/XYBot_*.log",
-                "./logs/XYBot_*.log",
-                # 相对于当前目录的位置
-                os.path.join(current_dir, "../logs/latest.log"),
-                os.path.join(current_dir, "../logs/xybot.log"),
-                os.path.join(current_dir, "../logs/XYBot_*.log"),
-                os.path.join(current_dir, "./logs/latest.log"),
-            ]
+            from utils.log_reader import log_reader, select_levels
+
+            try:
+                levels = select_levels(log_level, min_level)
+            except ValueError as e:
+                return JSONResponse(status_code=400, content={"success": False, "error": str(e)})
 
-            # 查找存在的日志文件
-            found_logs = []
-            for path_pattern in log_paths:
-                for log_file in glob.glob(path_pattern):
-                    if os.path.exists(log_file) and os.path.isfile(log_file):
-                        found_logs.append(log_file)
+            limit = min(max(limit, 1), 1000)
+            page = await asyncio.to_thread(log_reader.read, file, limit, before, after, levels, since, until)
+            log_files = [os.path.basename(path) for path in log_reader.log_files()]
 
             # 如果没找到日志文件
-            if not found_logs:
+            if page is None:
                 logger.warning("未找到任何日志文件")
                 return {
                     "success": True,
@@ -3557,58 +3651,7 @@ except:
                     "message": "未找到任何日志文件"
                 }
 
-            # 选择最新的日志文件
-            latest_log = max(found_logs, key=os.path.getmtime)
-            logger.info(f"读取日志文件: {latest_log}")
-
-            # 读取日志文件并按行返回最新的limit行
-            log_entries = []
-            log_files = [os.path.basename(log) for log in found_logs]
-
-            with open(latest_log, "r", encoding="utf-8", errors="ignore") as f:
-                lines = f.readlines()
-                # 获取最后的limit行
-                lines = lines[-limit:] if len(lines) > limit else lines
-
-                for line in lines:
-                    line = line.strip()
-                    if not line:
-                        continue
-
-                    # 解析日志行
-                    log_entry = {"raw": line}
-
-                    # 尝试解析日志级别
-                    level_match = re.search(r'\|\s*(DEBUG|INFO|WARNING|ERROR|CRITICAL)\s*\|', line)
-                    if level_match:
-                        log_entry["level"] = level_match.group(1).lower()
-                    else:
-                        log_entry["level"] = "info"  # 默认级别
-
-                    # 如果指定了级别过滤，且不匹配，则跳过
-                    if log_level and log_entry["level"] != log_level.lower():
-                        continue
-
-                    # 尝试解析时间戳
-                    time_match = re.search(r'(\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2})', line)
-                    if time_match:
-                        log_entry["timestamp"] = time_match.group(1)
-
-                    # 尝试解析消息内容
-                    content_match = re.search(r'\|\s*(DEBUG|INFO|WARNING|ERROR|CRITICAL)\s*\|\s*(.*)', line)
-                    if content_match:
-                        log_entry["message"] = content_match.group(2).strip()
-                    else:
-                        log_entry["message"] = line
-
-                    log_entries.append(log_entry)
-
-            return {
-                "success": True,
-                "logs": log_entries,
-                "log_files": log_files,
-                "current_log": os.path.basename(latest_log)
-            }
+            return {"success": True, "log_files": log_files, **page}
 
         except Exception as e:
             logger.error(f"获取系统日志时出错: {str(e)}")
@@ -3618,6 +3661,54 @@ except:
                 content={"success": False, "error": f"获取系统日志失败: {str(e)}"}
             )
 
+    # WebSocket: 跟随系统日志 (需要认证)
+    @app.websocket("/ws/system/logs")
+    async def ws_system_logs(websocket: WebSocket, log_level: str = None, min_level: str = None,
+                             after: int = None, file: str = None):
+        """推送新追加的系统日志，after 为 /api/system/logs 返回的 end，不指定时从当前末尾开始"""
+        from utils.log_reader import log_reader, select_levels
+
+        if not await check_auth(websocket):
+            await websocket.close(code=1008)
+            return
+        await websocket.accept()
+        try:
+            levels = select_levels(log_level, min_level)
+        except ValueError as e:
+            await websocket.send_json({"type": "error", "error": str(e)})
+            await websocket.close(code=1003)
+            return
+
+        async def wait_disconnect():
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+
+        disconnected = asyncio.create_task(wait_disconnect())
+        path = log_reader.resolve(file) if after is not None else None
+        position = after
+        # 只有跟随的是最新的日志文件时才跟随日志轮转，查看历史日志时停留在该文件
+        rotate = path is None or path == log_reader.resolve()
+        try:
+            while not disconnected.done():
+                previous = path
+                path, position, records = await asyncio.to_thread(log_reader.follow, path, position, levels,
+                                                                  rotate=rotate)
+                # 有新日志或者换了日志文件时推送，cursor 用于断线重连
+                if records or (previous and path != previous):
+                    await websocket.send_json({
+                        "type": "logs",
+                        "logs": [record.as_dict() for record in records],
+                        "current_log": os.path.basename(path) if path else "",
+                        "cursor": position,
+                    })
+                await asyncio.wait({disconnected}, timeout=1)
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        except Exception as e:
+            logger.error(f"推送系统日志失败: {e}")
+        finally:
+            disconnected.cancel()
+
     # API: 联系人管理 (需要认证)
     @app.get("/api/contacts", response_class=JSONResponse)
     async def api_contacts(request: Request, refresh: bool = False):
@@ -3630,33 +3721,8 @@ except:
                 "error": "未授权访问"
             })
 
-        # 缓存文件路径
-        cache_dir = os.path.join("data", "cache")
-        os.makedirs(cache_dir, exist_ok=True)
-        contacts_cache_file = os.path.join(cache_dir, "contacts_cache.json")
-
-        # 如果不是强制刷新，尝试从缓存读取
-        if not refresh and os.path.exists(contacts_cache_file):
-            try:
-                # 检查缓存是否在24小时内
-                cache_time = os.path.getmtime(contacts_cache_file)
-                current_time = time.time()
-                cache_age = current_time - cache_time
-
-                # 如果缓存不超过24小时，直接返回缓存数据
-                if cache_age < 24 * 3600:  # 24小时 = 86400秒
-                    logger.info(f"从缓存加载联系人列表（缓存时间：{datetime.fromtimestamp(cache_time).strftime('%Y-%m-%d %H:%M:%S')}）")
-                    with open(contacts_cache_file, 'r', encoding='utf-8') as f:
-                        cached_data = json.load(f)
-                        return JSONResponse(content=cached_data)
-                else:
-                    logger.info("联系人缓存已过期（超过24小时），将重新获取")
-            except Exception as e:
-                logger.error(f"读取联系人缓存失败: {e}")
-
         logger.info("请求联系人列表API")
 
-        # 使用固定wxid调用微信API获取联系人列表
         try:
             # 确保bot_instance可用
             if not bot_instance or not hasattr(bot_instance, 'bot'):
@@ -3667,298 +3733,40 @@ except:
                     "data": []
                 })
 
-            # 检查get_contract_list方法
-            if not hasattr(bot_instance.bot, 'get_contract_list'):
-                logger.error("bot.get_contract_list方法不存在")
-                return JSONResponse(content={
-                    "success": False,
-                    "error": "微信API不支持获取联系人列表",
-                    "data": []
-                })
-
-            # 获取API请求的URL
-            if hasattr(bot_instance.bot, 'ip') and hasattr(bot_instance.bot, 'port'):
-                api_url = f"http://{bot_instance.bot.ip}:{bot_instance.bot.port}/GetContractList"
-                logger.info(f"请求URL: {api_url}")
-
-            # 从bot状态中获取微信ID
-            bot_status = get_bot_status()
-            wxid = None
-
-            # 检查bot_status中是否包含wxid
-            if bot_status and "wxid" in bot_status:
-                wxid = bot_status["wxid"]
-                logger.info(f"从系统状态获取到wxid: {wxid}")
-            else:
-                # 尝试从bot实例中获取wxid
-                if hasattr(bot_instance.bot, 'wxid') and bot_instance.bot.wxid:
-                    wxid = bot_instance.bot.wxid
-                    logger.info(f"从bot实例获取到wxid: {wxid}")
-                else:
-                    # 回退到原来的固定wxid
-                    wxid = "wxid_uz9za1pqr3ea22"
-                    logger.warning(f"无法获取动态wxid，使用固定wxid: {wxid}")
-
-            request_params = {
-                "Wxid": wxid,
-                "CurrentWxcontactSeq": 0,
-                "CurrentChatroomContactSeq": 0
-            }
-            logger.info(f"请求方式: POST")
-            logger.info(f"请求参数: {request_params}")
-
-            # 保存原始wxid
-            original_wxid = None
-            if hasattr(bot_instance.bot, 'wxid'):
-                original_wxid = bot_instance.bot.wxid
-
-            # 设置wxid并调用API
-            bot_instance.bot.wxid = wxid
-
-            # 调用API获取联系人
-            import asyncio
-            if asyncio.get_event_loop().is_running():
-                contacts_data = await bot_instance.bot.get_contract_list(wx_seq=0, chatroom_seq=0)
-            else:
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    contacts_data = loop.run_until_complete(bot_instance.bot.get_contract_list(wx_seq=0, chatroom_seq=0))
-                finally:
-                    loop.close()
-
-            # 恢复原始wxid
-            if original_wxid is not None:
-                bot_instance.bot.wxid = original_wxid
-
-            # 打印返回数据的完整结构，帮助调试
-            logger.debug(f"API返回数据结构: {contacts_data}")
-
-            # 检查返回数据
-            if not contacts_data or not isinstance(contacts_data, dict):
-                logger.error(f"API返回数据无效: {contacts_data}")
-                return JSONResponse(content={
-                    "success": False,
-                    "error": "获取联系人列表失败，返回数据无效",
-                    "data": []
-                })
-
-            # 检查ContactUsernameList字段 - 直接在顶层
-            if 'ContactUsernameList' not in contacts_data or not isinstance(contacts_data['ContactUsernameList'], list):
-                logger.error(f"返回数据中没有ContactUsernameList字段或格式不正确: {contacts_data}")
-                return JSONResponse(content={
-                    "success": False,
-                    "error": "获取联系人列表失败，返回数据格式不正确",
-                    "data": []
-                })
-
-            # 提取联系人列表
-            contact_usernames = contacts_data['ContactUsernameList']
+            # 联系人缓存属于机器人的事件循环，通过 call() 在该循环中执行
+            contacts = bot_instance.bot.contacts
+            contact_usernames = await contacts.call(contacts.list_ids, refresh)
+            details = await contacts.call(contacts.get_many, contact_usernames)
             logger.info(f"找到{len(contact_usernames)}个联系人ID")
 
-            # 构建联系人对象
             contact_list = []
+            for username in contact_usernames:
+                # 根据wxid格式确定联系人类型
+                contact_type = "friend"
+                if username.endswith("@chatroom"):
+                    contact_type = "group"
+                elif username.startswith("gh_"):
+                    contact_type = "official"
+
+                detail = details[username]
+                contact_list.append({
+                    "wxid": username,
+                    # 优先使用备注，其次昵称，最后是wxid
+                    "name": detail["remark"] or detail["nickname"] or username,
+                    "nickname": detail["nickname"] or username,
+                    "remark": detail["remark"],
+                    "avatar": detail["avatar"] or "/static/img/favicon.ico",
+                    "type": contact_type,
+                    "online": True,
+                    "starred": False
+                })
 
-            # 检查是否支持获取联系人详情
-            has_contract_detail_method = hasattr(bot_instance.bot, 'get_contract_detail')
-
-            if has_contract_detail_method:
-                logger.info("使用get_contract_detail方法获取联系人详细信息")
-
-                # 分批获取联系人详情 (每批最多20个)
-                batch_size = 20
-                all_contact_details = {}
-
-                for i in range(0, len(contact_usernames), batch_size):
-                    batch = contact_usernames[i:i+batch_size]
-                    logger.debug(f"获取联系人详情批次 {i//batch_size+1}/{(len(contact_usernames)+batch_size-1)//batch_size}: {batch}")
-
-                    try:
-                        # 调用API获取联系人详情
-                        if asyncio.get_event_loop().is_running():
-                            contact_details = await bot_instance.bot.get_contract_detail(batch)
-                        else:
-                            loop = asyncio.new_event_loop()
-                            asyncio.set_event_loop(loop)
-                            try:
-                                contact_details = loop.run_until_complete(bot_instance.bot.get_contract_detail(batch))
-                            finally:
-                                loop.close()
-
-                        # 改为INFO级别确保输出
-                        logger.info(f"批次{i//batch_size+1}获取到联系人详情: {len(contact_details)}个")
-
-                        # 强制打印每个批次的第一个联系人信息作为样本
-                        if contact_details and len(contact_details) > 0:
-                            logger.info(f"联系人详情样本结构: {json.dumps(contact_details[0], ensure_ascii=False)}")
-
-                        # 显式记录关键字段是否存在
-                        if contact_details and len(contact_details) > 0:
-                            first_contact = contact_details[0]
-                            logger.info(f"联系人[{first_contact.get('Username', 'unknown')}]有以下字段: {sorted(first_contact.keys())}")
-
-                            # 检查并记录关键字段
-                            for field in ['Username', 'NickName', 'Remark', 'SmallHeadImgUrl', 'BigHeadImgUrl']:
-                                if field in first_contact:
-                                    logger.info(f"字段[{field}]存在，值为: {first_contact[field]}")
-                                else:
-                                    logger.info(f"字段[{field}]不存在")
-
-                        # 将联系人详情与wxid关联
-                        for contact_detail in contact_details:
-                            # 修正UserName字段名大小写问题
-                            if 'UserName' in contact_detail and contact_detail['UserName']:
-                                # 处理嵌套结构，UserName可能是{"string": "wxid"}格式
-                                if isinstance(contact_detail['UserName'], dict) and 'string' in contact_detail['UserName']:
-                                    wxid = contact_detail['UserName']['string']
-                                else:
-                                    wxid = str(contact_detail['UserName'])
-
-                                all_contact_details[wxid] = contact_detail
-                                if wxid in batch[:3]:  # 只记录前3个，避免日志过多
-                                    logger.info(f"联系人[{wxid}]头像信息: " +
-                                              f"SmallHeadImgUrl={contact_detail.get('SmallHeadImgUrl', 'None')}, " +
-                                              f"BigHeadImgUrl={contact_detail.get('BigHeadImgUrl', 'None')}")
-                    except Exception as e:
-                        logger.error(f"获取联系人详情批次失败 ({i}~{i+batch_size-1}): {e}")
-                        logger.error(traceback.format_exc())
-
-                # 根据获取的详细信息创建联系人对象
-                for username in contact_usernames:
-                    # 根据wxid格式确定联系人类型
-                    contact_type = "friend"
-                    if username.endswith("@chatroom"):
-                        contact_type = "group"
-                    elif username.startswith("gh_"):
-                        contact_type = "official"
-
-                    # 获取联系人详情
-                    contact_detail = all_contact_details.get(username, {})
-
-                    # 提取字段
-                    nickname = ""
-                    remark = ""
-                    avatar = "/static/img/favicon.ico"
-
-                    # 提取昵称 - 处理嵌套结构
-                    if contact_detail and 'NickName' in contact_detail:
-                        if isinstance(contact_detail['NickName'], dict) and 'string' in contact_detail['NickName']:
-                            nickname = contact_detail['NickName']['string'] or username
-                        else:
-                            nickname = str(contact_detail['NickName']) or username
-
-                    # 提取备注 - 处理嵌套结构
-                    if contact_detail and 'Remark' in contact_detail:
-                        if isinstance(contact_detail['Remark'], dict) and 'string' in contact_detail['Remark']:
-                            remark = contact_detail['Remark']['string'] or ""
-                        elif isinstance(contact_detail['Remark'], str):
-                            remark = contact_detail['Remark']
-
-                    # 提取头像URL - 直接使用URL，无需处理嵌套结构
-                    if contact_detail and 'SmallHeadImgUrl' in contact_detail and contact_detail['SmallHeadImgUrl']:
-                        avatar = contact_detail['SmallHeadImgUrl']
-                    elif contact_detail and 'BigHeadImgUrl' in contact_detail and contact_detail['BigHeadImgUrl']:
-                        avatar = contact_detail['BigHeadImgUrl']
-
-                    # 确定显示名称（优先使用备注，其次昵称，最后是wxid）
-                    display_name = remark or nickname or username
-
-                    # 创建联系人对象
-                    contact = {
-                        "wxid": username,
-                        "name": display_name,
-                        "nickname": nickname,
-                        "remark": remark,
-                        "avatar": avatar,
-                        "type": contact_type,
-                        "online": True,
-                        "starred": False
-                    }
-                    contact_list.append(contact)
-            else:
-                # 回退到使用昵称API
-                has_nickname_method = hasattr(bot_instance.bot, 'get_nickname')
-                if has_nickname_method:
-                    logger.info("使用get_nickname方法获取联系人昵称")
-
-                    # 分批获取联系人昵称 (每批最多20个)
-                    batch_size = 20
-                    all_nicknames = {}
-
-                    # 分批处理联系人
-                    for i in range(0, len(contact_usernames), batch_size):
-                        batch = contact_usernames[i:i+batch_size]
-                        try:
-                            # 调用API获取昵称
-                            if asyncio.get_event_loop().is_running():
-                                nicknames = await bot_instance.bot.get_nickname(batch)
-                            else:
-                                loop = asyncio.new_event_loop()
-                                asyncio.set_event_loop(loop)
-                                try:
-                                    nicknames = loop.run_until_complete(bot_instance.bot.get_nickname(batch))
-                                finally:
-                                    loop.close()
-
-                            # 将昵称与wxid关联
-                            for j, wxid in enumerate(batch):
-                                if j < len(nicknames) and nicknames[j]:
-                                    all_nicknames[wxid] = nicknames[j]
-                                else:
-                                    all_nicknames[wxid] = wxid
-                        except Exception as e:
-                            logger.error(f"获取昵称批次失败 ({i}~{i+batch_size-1}): {e}")
-                            # 对失败批次使用wxid作为昵称
-                            for wxid in batch:
-                                all_nicknames[wxid] = wxid
-                else:
-                    logger.warning("bot既没有get_contract_detail也没有get_nickname方法，将使用wxid作为昵称")
-                    all_nicknames = {username: username for username in contact_usernames}
-
-                # 根据获取的昵称创建联系人对象
-                for username in contact_usernames:
-                    # 根据wxid格式确定联系人类型
-                    contact_type = "friend"
-                    if username.endswith("@chatroom"):
-                        contact_type = "group"
-                    elif username.startswith("gh_"):
-                        contact_type = "official"
-
-                    # 获取昵称（如果有）
-                    nickname = all_nicknames.get(username, username)
-                    display_name = nickname if nickname else username
-
-                    # 创建联系人对象
-                    contact = {
-                        "wxid": username,
-                        "name": display_name,
-                        "nickname": nickname,
-                        "remark": "",
-                        "avatar": "/static/img/favicon.ico",
-                        "type": contact_type,
-                        "online": True,
-                        "starred": False
-                    }
-                    contact_list.append(contact)
-
-            # 创建响应数据
-            response_data = {
+            logger.success(f"成功获取到{len(contact_list)}个联系人")
+            return JSONResponse(content={
                 "success": True,
                 "data": contact_list,
                 "timestamp": int(time.time())
-            }
-
-            # 将结果缓存到文件
-            try:
-                with open(contacts_cache_file, 'w', encoding='utf-8') as f:
-                    json.dump(response_data, f, ensure_ascii=False, indent=2)
-                logger.info(f"联系人列表已缓存至 {contacts_cache_file}")
-            except Exception as e:
-                logger.error(f"缓存联系人列表失败: {e}")
-
-            # 返回联系人列表
-            logger.success(f"成功获取到{len(contact_list)}个联系人")
-            return JSONResponse(content=response_data)
+            })
 
         except Exception as e:
             logger.error(f"获取联系人列表失败: {e}")
@@ -4049,26 +3857,6 @@ except:
 
             logger.info(f"正在获取 {len(wxids)} 个联系人的详情")
 
-            # 尝试首先从缓存中获取联系人信息
-            cache_dir = os.path.join("data", "cache")
-            os.makedirs(cache_dir, exist_ok=True)
-            contacts_cache_file = os.path.join(cache_dir, "contacts_cache.json")
-
-            # 从缓存中加载现有联系人数据
-            cached_contacts = {}
-            if os.path.exists(contacts_cache_file):
-                try:
-                    with open(contacts_cache_file, 'r', encoding='utf-8') as f:
-                        cache_data = json.load(f)
-                        if isinstance(cache_data, dict) and 'data' in cache_data:
-                            for contact in cache_data['data']:
-                                if 'wxid' in contact:
-                                    cached_contacts[contact['wxid']] = contact
-                            logger.info(f"从缓存加载了 {len(cached_contacts)} 个联系人")
-                except Exception as e:
-                    logger.error(f"读取联系人缓存失败: {str(e)}")
-
-            # 获取机器人实例
             # 从会话数据中获取wxid
             session_cookie = request.cookies.get("session")
             wxid_from_session = None
@@ -4084,177 +3872,31 @@ except:
             wxapi = get_bot(wxid_from_session)
             if not wxapi:
                 logger.error("无法获取机器人实例")
-                # 如果有缓存数据，尝试从缓存返回
-                if cached_contacts:
-                    results = []
-                    missing_wxids = []
-                    for wxid in wxids:
-                        if wxid in cached_contacts:
-                            contact = cached_contacts[wxid]
-                            results.append({
-                                'wxid': wxid,
-                                'nickname': contact.get('nickname', wxid),
-                                'avatar': contact.get('avatar', ''),
-                                'remark': contact.get('remark', ''),
-                                'alias': contact.get('alias', ''),
-                                'from_cache': True
-                            })
-                        else:
-                            missing_wxids.append(wxid)
-                            results.append({'wxid': wxid, 'nickname': wxid, 'error': '详情未找到', 'from_cache': True})
-
-                    if missing_wxids:
-                        logger.warning(f"以下 {len(missing_wxids)} 个wxid在缓存中未找到: {missing_wxids}")
+                return JSONResponse(
+                    content={
+                        'success': False,
+                        'error': '无法获取微信机器人实例'
+                    }
+                )
 
-                    logger.info(f"从缓存返回 {len(results)} 个联系人详情")
-                    return JSONResponse(
-                        content={
-                            'success': True,
-                            'data': results,
-                            'from_cache': True
-                        }
-                    )
-                else:
-                    return JSONResponse(
-                        content={
-                            'success': False,
-                            'error': '无法获取微信机器人实例，且没有缓存数据'
-                        }
-                    )
+            contacts = wxapi.contacts
+            details = await contacts.call(contacts.get_many, wxids)
 
-            # 获取联系人详情
             results = []
-            success_count = 0
-            cached_count = 0
-            api_count = 0
-
             for wxid in wxids:
-                logger.debug(f"正在获取联系人详情: {wxid}")
-                # 首先检查缓存
-                if wxid in cached_contacts:
-                    cached_contact = cached_contacts[wxid]
-                    contact_info = {
+                detail = details[wxid]
+                if detail["nickname"] or detail["remark"]:
+                    results.append({
                         'wxid': wxid,
-                        'nickname': cached_contact.get('nickname', wxid),
-                        'avatar': cached_contact.get('avatar', ''),
-                        'remark': cached_contact.get('remark', ''),
-                        'alias': cached_contact.get('alias', ''),
-                        'from_cache': True
-                    }
-                    results.append(contact_info)
-                    success_count += 1
-                    cached_count += 1
-                    continue
-
-                # 缓存中没有，尝试从API获取
-                try:
-                    # 调用API获取联系人详情
-                    detail = await wxapi.get_contract_detail(wxid)
-
-                    # 处理返回结果
-                    if detail:
-                        # 检查detail是否为列表
-                        if isinstance(detail, list) and len(detail) > 0:
-                            # 如果是列表，获取第一个元素
-                            detail_item = detail[0]
-                            if isinstance(detail_item, dict):
-                                # 提取信息并添加到结果中
-                                contact_info = {
-                                    'wxid': wxid,
-                                    'nickname': detail_item.get('nickname', wxid),
-                                    'avatar': detail_item.get('avatar', ''),
-                                    'remark': detail_item.get('remark', ''),
-                                    'alias': detail_item.get('alias', '')
-                                }
-                                results.append(contact_info)
-                                success_count += 1
-                                api_count += 1
-                            else:
-                                logger.warning(f"联系人 {wxid} 详情项不是字典: {detail_item}")
-                                # 尝试从缓存获取备用数据
-                                if wxid in cached_contacts:
-                                    cached_contact = cached_contacts[wxid]
-                                    contact_info = {
-                                        'wxid': wxid,
-                                        'nickname': cached_contact.get('nickname', wxid),
-                                        'avatar': cached_contact.get('avatar', ''),
-                                        'remark': cached_contact.get('remark', ''),
-                                        'alias': cached_contact.get('alias', ''),
-                                        'from_cache': True
-                                    }
-                                    results.append(contact_info)
-                                    success_count += 1
-                                    cached_count += 1
-                                else:
-                                    results.append({'wxid': wxid, 'nickname': wxid, 'error': '详情格式错误'})
-                        elif isinstance(detail, dict):
-                            # 如果是字典，直接使用
-                            contact_info = {
-                                'wxid': wxid,
-                                'nickname': detail.get('nickname', wxid),
-                                'avatar': detail.get('avatar', ''),
-                                'remark': detail.get('remark', ''),
-                                'alias': detail.get('alias', '')
-                            }
-                            results.append(contact_info)
-                            success_count += 1
-                            api_count += 1
-                        else:
-                            logger.warning(f"联系人 {wxid} 详情格式不支持: {type(detail)}")
-                            # 尝试从缓存获取备用数据
-                            if wxid in cached_contacts:
-                                cached_contact = cached_contacts[wxid]
-                                contact_info = {
-                                    'wxid': wxid,
-                                    'nickname': cached_contact.get('nickname', wxid),
-                                    'avatar': cached_contact.get('avatar', ''),
-                                    'remark': cached_contact.get('remark', ''),
-                                    'alias': cached_contact.get('alias', ''),
-                                    'from_cache': True
-                                }
-                                results.append(contact_info)
-                                success_count += 1
-                                cached_count += 1
-                            else:
-                                results.append({'wxid': wxid, 'nickname': wxid, 'error': '详情格式不支持'})
-                    else:
-                        logger.warning(f"联系人 {wxid} 详情为空")
-                        # 尝试从缓存获取备用数据
-                        if wxid in cached_contacts:
-                            cached_contact = cached_contacts[wxid]
-                            contact_info = {
-                                'wxid': wxid,
-                                'nickname': cached_contact.get('nickname', wxid),
-                                'avatar': cached_contact.get('avatar', ''),
-                                'remark': cached_contact.get('remark', ''),
-                                'alias': cached_contact.get('alias', ''),
-                                'from_cache': True
-                            }
-                            results.append(contact_info)
-                            success_count += 1
-                            cached_count += 1
-                        else:
-                            results.append({'wxid': wxid, 'nickname': wxid, 'error': '详情为空'})
-                except Exception as e:
-                    logger.error(f"获取联系人 {wxid} 详情时出错: {str(e)}")
-                    # 尝试从缓存获取备用数据
-                    if wxid in cached_contacts:
-                        cached_contact = cached_contacts[wxid]
-                        contact_info = {
-                            'wxid': wxid,
-                            'nickname': cached_contact.get('nickname', wxid),
-                            'avatar': cached_contact.get('avatar', ''),
-                            'remark': cached_contact.get('remark', ''),
-                            'alias': cached_contact.get('alias', ''),
-                            'from_cache': True
-                        }
-                        results.append(contact_info)
-                        success_count += 1
-                        cached_count += 1
-                    else:
-                        results.append({'wxid': wxid, 'nickname': wxid, 'error': str(e)})
+                        'nickname': detail["nickname"] or wxid,
+                        'avatar': detail["avatar"],
+                        'remark': detail["remark"],
+                        'alias': detail["alias"]
+                    })
+                else:
+                    results.append({'wxid': wxid, 'nickname': wxid, 'error': '详情未找到'})
 
-            logger.info(f"成功获取 {success_count}/{len(wxids)} 个联系人详情 (缓存: {cached_count}, API: {api_count})")
+            logger.info(f"成功获取 {len(results)} 个联系人详情")
             return JSONResponse(
                 content={
                     'success': True,
@@ -9,10 +9,14 @@ from pathlib import Path
 from loguru import logger
 
 import WechatAPI
-from database.XYBotDB import XYBotDB
+from database.XYBotDB import XYBotDB, AsyncXYBotDB
 from database.keyvalDB import KeyvalDB
 from database.messsagDB import MessageDB
+from utils.broadcast import Broadcaster
 from utils.decorators import scheduler
+from utils.message_dispatcher import MessageDispatcher
+from utils.message_log import message_log
+from utils.message_sync import MessageSync
 from utils.plugin_manager import plugin_manager
 from utils.xybot import XYBot
 
@@ -141,6 +145,16 @@ async def bot_core():
     # 实例化WechatAPI客户端
     bot = WechatAPI.WechatAPIClient("127.0.0.1", api_config.get("port", 9000))
     bot.ignore_protect = config.get("XYBot", {}).get("ignore-protection", False)
+    bot.unix_socket = api_config.get("unix-socket", "")
+    bot.pool_size = api_config.get("pool-size", 100)
+    bot.keepalive_timeout = api_config.get("keepalive-timeout", 60)
+    bot.request_timeout = api_config.get("request-timeout", 120)
+    bot.contacts.ttl = api_config.get("contact-cache-ttl", 3600)
+    bot.media_cache.ttl = api_config.get("media-cache-ttl", 86400)
+    bot.media_cache.capacity = api_config.get("media-cache-size", 1000)
+    bot.sender.configure(config.get("MessageSend", {}))
+    WechatAPI.transcoder.configure(config.get("Transcode", {}))
+    message_log.configure(config.get("MessageLog", {}))
 
     # 等待WechatAPI服务启动
     time_out = 30  # 增加超时时间
@@ -383,23 +397,27 @@ async def bot_core():
     # 更新状态为就绪
     update_bot_status("ready", "机器人已准备就绪")
 
-    logger.success("开始处理消息")
-    while True:
-        now = time.time()
+    # 继续上次中断的群发
+    asyncio.create_task(Broadcaster().resume(bot))
 
-        try:
-            data = await bot.sync_message()
-        except Exception as e:
-            logger.warning("获取新消息失败 {}", e)
-            await asyncio.sleep(5)
-            continue
+    logger.success("开始处理消息")
+    dispatcher = MessageDispatcher(xybot.process_message, config.get("MessageDispatcher", {}), self_wxid=bot.wxid)
+    dispatcher.start()
 
-        data = data.get("AddMsgs")
-        if data:
+    message_sync = MessageSync(bot, config.get("MessageSync", {}))
+    try:
+        async for data in message_sync:
             for message in data:
-                asyncio.create_task(xybot.process_message(message))
-        # 使用异步睡眠替代忙等待循环
-        await asyncio.sleep(0.5)
-        
+                await dispatcher.submit(message)
+    finally:
+        await dispatcher.stop()
+        await bot.sender.close()
+        WechatAPI.transcoder.close()
+        message_log.close()
+        await message_db.close()
+        await keyval_db.close()
+        await AsyncXYBotDB().close()
+        await bot.close()
+
     # 返回机器人实例（此处不会执行到，因为上面的无限循环）
     return xybot
\ No newline at end of file
@@ -1,15 +1,20 @@
+import asyncio
 import datetime
+import time
 import tomllib
 from concurrent.futures import ThreadPoolExecutor
-from typing import Union
+from dataclasses import dataclass, asdict
+from typing import Union, Iterable, Optional, Dict, Tuple
 
 from loguru import logger
-from sqlalchemy import Column, String, Integer, DateTime, create_engine, JSON, Boolean
+from sqlalchemy import Column, String, Integer, DateTime, create_engine, JSON, Boolean, event
 from sqlalchemy import update
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+from database.user_cache import UserCache, CachedUser, UserRow
 from utils.singleton import Singleton
 
 Base = declarative_base()
@@ -36,13 +41,287 @@ class Chatroom(Base):
     llm_thread_id = Column(JSON, nullable=False, default=lambda: {}, comment='llm_thread_id')
 
 
+def _set_sqlite_pragma(dbapi_connection, connection_record):
+    """XYBotDB 和 AsyncXYBotDB 会同时访问同一个数据库文件，WAL 模式下读不阻塞写"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+def _async_url(database_url: str) -> str:
+    """把同步数据库地址转换为对应的异步驱动地址"""
+    url = make_url(database_url)
+    drivers = {"sqlite": "sqlite+aiosqlite", "mysql": "mysql+aiomysql", "postgresql": "postgresql+asyncpg"}
+    if url.drivername in drivers:
+        url = url.set(drivername=drivers[url.drivername])
+    return url.render_as_string(hide_password=False)
+
+
+# 数据库操作
+# 参数为同步 Session，XYBotDB 直接调用，AsyncXYBotDB 通过 AsyncSession.run_sync 在事件循环中调用。
+# 写操作不提交事务，出错时直接抛出异常，由调用方统一提交或回滚。
+
+# USER
+
+def _add_points(session, wxid: str, num: int) -> bool:
+    """用户积分增加"""
+    # Use UPDATE with atomic operation
+    result = session.execute(
+        update(User)
+        .where(User.wxid == wxid)
+        .values(points=User.points + num)
+    )
+    if result.rowcount == 0:
+        # User doesn't exist, create new
+        session.add(User(wxid=wxid, points=num))
+    logger.info(f"数据库: 用户{wxid}积分增加{num}")
+    return True
+
+
+def _set_points(session, wxid: str, num: int) -> bool:
+    """用户积分设置"""
+    result = session.execute(
+        update(User)
+        .where(User.wxid == wxid)
+        .values(points=num)
+    )
+    if result.rowcount == 0:
+        session.add(User(wxid=wxid, points=num))
+    logger.info(f"数据库: 用户{wxid}积分设置为{num}")
+    return True
+
+
+def _get_users(session, wxids: Iterable[str]) -> Dict[str, Optional[UserRow]]:
+    """读取用户缓存需要的字段，不存在的用户为 None"""
+    wxids = list(dict.fromkeys(wxids))
+    users = dict.fromkeys(wxids)
+    for chunk in (wxids[i:i + 500] for i in range(0, len(wxids), 500)):
+        rows = session.query(User.wxid, User.points, User.signin_stat, User.signin_streak, User.whitelist) \
+            .filter(User.wxid.in_(chunk)).all()
+        users.update((wxid, tuple(row)) for wxid, *row in rows)
+    return users
+
+
+def _set_signin_stat(session, wxid: str, signin_time: datetime.datetime) -> bool:
+    """用户登录时间设置"""
+    result = session.execute(
+        update(User)
+        .where(User.wxid == wxid)
+        .values(
+            signin_stat=signin_time,
+            signin_streak=User.signin_streak
+        )
+    )
+    if result.rowcount == 0:
+        session.add(User(wxid=wxid, signin_stat=signin_time, signin_streak=0))
+    logger.info(f"数据库: 用户{wxid}登录时间设置为{signin_time}")
+    return True
+
+
+def _reset_all_signin_stat(session) -> bool:
+    """重置所有用户登录时间"""
+    session.query(User).update({User.signin_stat: datetime.datetime.fromtimestamp(0)})
+    return True
+
+
+def _get_leaderboard(session, count: int) -> list:
+    users = session.query(User).order_by(User.points.desc()).limit(count).all()
+    return [(user.wxid, user.points) for user in users]
+
+
+def _set_whitelist(session, wxid: str, stat: bool) -> bool:
+    """用户白名单状态设置"""
+    user = session.query(User).filter_by(wxid=wxid).first()
+    if not user:
+        user = User(wxid=wxid)
+        session.add(user)
+    user.whitelist = stat
+    logger.info(f"数据库: 用户{wxid}白名单状态设置为{stat}")
+    return True
+
+
+def _get_whitelist_list(session) -> list:
+    users = session.query(User).filter_by(whitelist=True).all()
+    return [user.wxid for user in users]
+
+
+def _safe_trade_points(session, trader_wxid: str, target_wxid: str, num: int) -> bool:
+    """用户转账"""
+    # Start transaction with row-level locking
+    trader = session.query(User).filter_by(wxid=trader_wxid) \
+        .with_for_update().first()  # Acquire row lock
+    target = session.query(User).filter_by(wxid=target_wxid) \
+        .with_for_update().first()  # Acquire row lock
+
+    if (trader.points if trader else 0) < num:
+        logger.info(f"数据库: 转账失败, 用户{trader_wxid}积分不足")
+        return False
+
+    if not trader:
+        trader = User(wxid=trader_wxid, points=0)
+        session.add(trader)
+    if not target:
+        target = User(wxid=target_wxid, points=0)
+        session.add(target)
+        session.flush()  # Ensure IDs are generated
+
+    trader.points -= num
+    target.points += num
+    logger.info(f"数据库: 用户{trader_wxid}给用户{target_wxid}转账{num}积分")
+    return True
+
+
+def _get_user_list(session) -> list:
+    users = session.query(User).all()
+    return [user.wxid for user in users]
+
+
+def _get_llm_thread_id(session, wxid: str, namespace: str = None) -> Union[dict, str]:
+    # Check if it's a chatroom ID
+    if wxid.endswith("@chatroom"):
+        chatroom = session.query(Chatroom).filter_by(chatroom_id=wxid).first()
+        if namespace:
+            return chatroom.llm_thread_id.get(namespace, "") if chatroom else ""
+        else:
+            return chatroom.llm_thread_id if chatroom else {}
+    else:
+        # Regular user
+        user = session.query(User).filter_by(wxid=wxid).first()
+        if namespace:
+            return user.llm_thread_id.get(namespace, "") if user else ""
+        else:
+            return user.llm_thread_id if user else {}
+
+
+def _save_llm_thread_id(session, wxid: str, data: str, namespace: str) -> bool:
+    """保存llm thread id"""
+    if wxid.endswith("@chatroom"):
+        row = session.query(Chatroom).filter_by(chatroom_id=wxid).first()
+        if not row:
+            row = Chatroom(chatroom_id=wxid, llm_thread_id={})
+            session.add(row)
+    else:
+        row = session.query(User).filter_by(wxid=wxid).first()
+        if not row:
+            row = User(wxid=wxid, llm_thread_id={})
+            session.add(row)
+    # 创建新字典并更新
+    new_thread_ids = dict(row.llm_thread_id or {})
+    new_thread_ids[namespace] = data
+    row.llm_thread_id = new_thread_ids
+    logger.info(f"数据库: 成功保存 {wxid} 的 llm thread id")
+    return True
+
+
+def _delete_all_llm_thread_id(session) -> bool:
+    """清除所有llm thread id"""
+    session.query(User).update({User.llm_thread_id: {}})
+    session.query(Chatroom).update({Chatroom.llm_thread_id: {}})
+    return True
+
+
+def _set_signin_streak(session, wxid: str, streak: int) -> bool:
+    """用户连续签到天数设置"""
+    result = session.execute(
+        update(User)
+        .where(User.wxid == wxid)
+        .values(signin_streak=streak)
+    )
+    if result.rowcount == 0:
+        session.add(User(wxid=wxid, signin_streak=streak))
+    logger.info(f"数据库: 用户{wxid}连续签到天数设置为{streak}")
+    return True
+
+
+# CHATROOM
+
+def _get_chatroom_list(session) -> list:
+    chatrooms = session.query(Chatroom).all()
+    return [chatroom.chatroom_id for chatroom in chatrooms]
+
+
+def _get_chatroom_members(session, chatroom_id: str) -> set:
+    chatroom = session.query(Chatroom).filter_by(chatroom_id=chatroom_id).first()
+    return set(chatroom.members) if chatroom else set()
+
+
+def _set_chatroom_members(session, chatroom_id: str, members: set) -> bool:
+    """群成员设置"""
+    chatroom = session.query(Chatroom).filter_by(chatroom_id=chatroom_id).first()
+    if not chatroom:
+        chatroom = Chatroom(chatroom_id=chatroom_id)
+        session.add(chatroom)
+    chatroom.members = list(members)  # Convert set to list for JSON storage
+    logger.info(f"Database: Set chatroom {chatroom_id} members successfully")
+    return True
+
+
+# 会修改用户缓存字段的写操作 -> 参数中 wxid 的个数
+_USER_WRITES = {
+    _add_points: 1,
+    _set_points: 1,
+    _set_signin_stat: 1,
+    _set_signin_streak: 1,
+    _set_whitelist: 1,
+    _safe_trade_points: 2,
+}
+
+
+def _touched_users(ops: list) -> list:
+    return [wxid for op, args in ops for wxid in args[:_USER_WRITES.get(op, 0)]]
+
+
+def _run_batch(session, ops: list) -> Tuple[list, dict]:
+    """在同一个事务中依次执行多个写操作，连续的积分增加按用户合并为一条 UPDATE
+
+    返回各操作的结果，以及受影响用户在事务内的最新数据，用于提交后更新缓存
+    """
+    results = []
+    deltas = {}
+
+    def flush_deltas():
+        for wxid, num in deltas.items():
+            _add_points(session, wxid, num)
+        deltas.clear()
+
+    for op, args in ops:
+        if op is _add_points:
+            wxid, num = args
+            deltas[wxid] = deltas.get(wxid, 0) + num
+            results.append(True)
+            continue
+        flush_deltas()
+        results.append(op(session, *args))
+    flush_deltas()
+
+    touched = _touched_users(ops)
+    return results, _get_users(session, touched) if touched else {}
+
+
+def _update_cache(cache: UserCache, ops: list, users: dict):
+    """写操作提交后更新用户缓存"""
+    if _reset_all_signin_stat in ops:
+        cache.reset_signin()
+    if users:
+        cache.update(users)
+
+
+def _describe(op) -> str:
+    return (op.__doc__ or op.__name__).strip()
+
+
 class XYBotDB(metaclass=Singleton):
+    """同步数据库接口，在异步代码中请使用 AsyncXYBotDB"""
+
     def __init__(self):
         with open("main_config.toml", "rb") as f:
             main_config = tomllib.load(f)
 
         self.database_url = main_config["XYBot"]["XYBotDB-url"]
         self.engine = create_engine(self.database_url)
+        if self.engine.dialect.name == "sqlite":
+            event.listen(self.engine, "connect", _set_sqlite_pragma)
         self.DBSession = sessionmaker(bind=self.engine)
 
         # 创建表
@@ -52,6 +331,10 @@ class XYBotDB(metaclass=Singleton):
         # 创建线程池执行器
         self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="database")
 
+        # 用户缓存，AsyncXYBotDB 共用同一个
+        self.cache = UserCache(main_config["XYBot"].get("XYBotDB-cache-size", 10000),
+                               main_config["XYBot"].get("XYBotDB-leaderboard-size", 100))
+
     def _execute_in_queue(self, method, *args, **kwargs):
         """在队列中执行数据库操作"""
         future = self.executor.submit(method, *args, **kwargs)
@@ -61,376 +344,143 @@ class XYBotDB(metaclass=Singleton):
             logger.error(f"数据库操作失败: {method.__name__} - {str(e)}")
             raise
 
-    # USER
-
-    def add_points(self, wxid: str, num: int) -> bool:
-        """Thread-safe point addition"""
-        return self._execute_in_queue(self._add_points, wxid, num)
-
-    def _add_points(self, wxid: str, num: int) -> bool:
-        """Thread-safe point addition"""
+    def _read(self, op, *args):
         session = self.DBSession()
         try:
-            # Use UPDATE with atomic operation
-            result = session.execute(
-                update(User)
-                .where(User.wxid == wxid)
-                .values(points=User.points + num)
-            )
-            if result.rowcount == 0:
-                # User doesn't exist, create new
-                user = User(wxid=wxid, points=num)
-                session.add(user)
-            logger.info(f"数据库: 用户{wxid}积分增加{num}")
-            session.commit()
-            return True
-        except SQLAlchemyError as e:
-            session.rollback()
-            logger.error(f"数据库: 用户{wxid}积分增加失败, 错误: {e}")
-            return False
+            return op(session, *args)
         finally:
             session.close()
 
-    def set_points(self, wxid: str, num: int) -> bool:
-        """Thread-safe point setting"""
-        return self._execute_in_queue(self._set_points, wxid, num)
-
-    def _set_points(self, wxid: str, num: int) -> bool:
-        """Thread-safe point setting"""
+    def _write(self, op, *args) -> bool:
         session = self.DBSession()
         try:
-            result = session.execute(
-                update(User)
-                .where(User.wxid == wxid)
-                .values(points=num)
-            )
-            if result.rowcount == 0:
-                user = User(wxid=wxid, points=num)
-                session.add(user)
-            logger.info(f"数据库: 用户{wxid}积分设置为{num}")
+            (result,), users = _run_batch(session, [(op, args)])
             session.commit()
-            return True
-        except SQLAlchemyError as e:
+        except Exception as e:
             session.rollback()
-            logger.error(f"数据库: 用户{wxid}积分设置失败, 错误: {e}")
+            logger.error(f"数据库: {_describe(op)}失败, 参数: {args}, 错误: {e}")
             return False
         finally:
             session.close()
+        _update_cache(self.cache, [op], users)
+        return result
 
-    def get_points(self, wxid: str) -> int:
-        """Get user points"""
-        return self._execute_in_queue(self._get_points, wxid)
+    def _user(self, wxid: str) -> CachedUser:
+        user = self.cache.get(wxid)
+        if user is None:
+            version = self.cache.version()
+            row = self._execute_in_queue(self._read, _get_users, [wxid])[wxid]
+            user = self.cache.load(wxid, row, version)
+        return user
+
+    # USER
+
+    def add_points(self, wxid: str, num: int) -> bool:
+        """Thread-safe point addition"""
+        return self._execute_in_queue(self._write, _add_points, wxid, num)
 
-    def _get_points(self, wxid: str) -> int:
+    def set_points(self, wxid: str, num: int) -> bool:
+        """Thread-safe point setting"""
+        return self._execute_in_queue(self._write, _set_points, wxid, num)
+
+    def get_points(self, wxid: str) -> int:
         """Get user points"""
-        session = self.DBSession()
-        try:
-            user = session.query(User).filter_by(wxid=wxid).first()
-            return user.points if user else 0
-        finally:
-            session.close()
+        return self._user(wxid).points
+
+    def get_points_many(self, wxids: Iterable[str]) -> dict:
+        """Get points of several users in one query, returns {wxid: points}"""
+        points = {}
+        missing = []
+        for wxid in wxids:
+            user = self.cache.get(wxid)
+            if user is None:
+                missing.append(wxid)
+            else:
+                points[wxid] = user.points
+        if missing:
+            version = self.cache.version()
+            rows = self._execute_in_queue(self._read, _get_users, missing)
+            for wxid, row in rows.items():
+                points[wxid] = self.cache.load(wxid, row, version).points
+        return points
 
     def get_signin_stat(self, wxid: str) -> datetime.datetime:
         """获取用户签到状态"""
-        return self._execute_in_queue(self._get_signin_stat, wxid)
-
-    def _get_signin_stat(self, wxid: str) -> datetime.datetime:
-        session = self.DBSession()
-        try:
-            user = session.query(User).filter_by(wxid=wxid).first()
-            return user.signin_stat if user else datetime.datetime.fromtimestamp(0)
-        finally:
-            session.close()
+        return self._user(wxid).signin_stat
 
     def set_signin_stat(self, wxid: str, signin_time: datetime.datetime) -> bool:
         """Thread-safe set user's signin time"""
-        return self._execute_in_queue(self._set_signin_stat, wxid, signin_time)
-
-    def _set_signin_stat(self, wxid: str, signin_time: datetime.datetime) -> bool:
-        session = self.DBSession()
-        try:
-            result = session.execute(
-                update(User)
-                .where(User.wxid == wxid)
-                .values(
-                    signin_stat=signin_time,
-                    signin_streak=User.signin_streak
-                )
-            )
-            if result.rowcount == 0:
-                user = User(
-                    wxid=wxid,
-                    signin_stat=signin_time,
-                    signin_streak=0
-                )
-                session.add(user)
-            logger.info(f"数据库: 用户{wxid}登录时间设置为{signin_time}")
-            session.commit()
-            return True
-        except SQLAlchemyError as e:
-            session.rollback()
-            logger.error(f"数据库: 用户{wxid}登录时间设置失败, 错误: {e}")
-            return False
-        finally:
-            session.close()
+        return self._execute_in_queue(self._write, _set_signin_stat, wxid, signin_time)
 
     def reset_all_signin_stat(self) -> bool:
         """Reset all users' signin status"""
-        session = self.DBSession()
-        try:
-            session.query(User).update({User.signin_stat: datetime.datetime.fromtimestamp(0)})
-            session.commit()
-            return True
-        except Exception as e:
-            session.rollback()
-            logger.error(f"数据库: 重置所有用户登录时间失败, 错误: {e}")
-            return False
-        finally:
-            session.close()
+        return self._write(_reset_all_signin_stat)
 
     def get_leaderboard(self, count: int) -> list:
         """Get points leaderboard"""
-        session = self.DBSession()
-        try:
-            users = session.query(User).order_by(User.points.desc()).limit(count).all()
-            return [(user.wxid, user.points) for user in users]
-        finally:
-            session.close()
+        leaderboard = self.cache.leaderboard(count)
+        if leaderboard is not None:
+            return leaderboard
+        if count > self.cache.leaderboard_size:
+            return self._read(_get_leaderboard, count)
+        version = self.cache.version()
+        rows = self._read(_get_leaderboard, self.cache.leaderboard_size)
+        self.cache.set_leaderboard(rows, version)
+        return rows[:count]
 
     def set_whitelist(self, wxid: str, stat: bool) -> bool:
         """Set user's whitelist status"""
-        session = self.DBSession()
-        try:
-            user = session.query(User).filter_by(wxid=wxid).first()
-            if not user:
-                user = User(wxid=wxid)
-                session.add(user)
-            user.whitelist = stat
-            session.commit()
-            logger.info(f"数据库: 用户{wxid}白名单状态设置为{stat}")
-            return True
-        except Exception as e:
-            session.rollback()
-            logger.error(f"数据库: 用户{wxid}白名单状态设置失败, 错误: {e}")
-            return False
-        finally:
-            session.close()
+        return self._write(_set_whitelist, wxid, stat)
 
     def get_whitelist(self, wxid: str) -> bool:
         """Get user's whitelist status"""
-        session = self.DBSession()
-        try:
-            user = session.query(User).filter_by(wxid=wxid).first()
-            return user.whitelist if user else False
-        finally:
-            session.close()
+        return self._user(wxid).whitelist
 
     def get_whitelist_list(self) -> list:
         """Get list of all whitelisted users"""
-        session = self.DBSession()
-        try:
-            users = session.query(User).filter_by(whitelist=True).all()
-            return [user.wxid for user in users]
-        finally:
-            session.close()
+        return self._read(_get_whitelist_list)
 
     def safe_trade_points(self, trader_wxid: str, target_wxid: str, num: int) -> bool:
         """Thread-safe points trading between users"""
-        return self._execute_in_queue(self._safe_trade_points, trader_wxid, target_wxid, num)
-
-    def _safe_trade_points(self, trader_wxid: str, target_wxid: str, num: int) -> bool:
-        """Thread-safe points trading between users"""
-        session = self.DBSession()
-        try:
-            # Start transaction with row-level locking
-            trader = session.query(User).filter_by(wxid=trader_wxid) \
-                .with_for_update().first()  # Acquire row lock
-            target = session.query(User).filter_by(wxid=target_wxid) \
-                .with_for_update().first()  # Acquire row lock
-
-            if not trader:
-                trader = User(wxid=trader_wxid)
-                session.add(trader)
-            if not target:
-                target = User(wxid=target_wxid)
-                session.add(target)
-                session.flush()  # Ensure IDs are generated
-
-            if trader.points >= num:
-                trader.points -= num
-                target.points += num
-                session.commit()
-                logger.info(f"数据库: 用户{trader_wxid}给用户{target_wxid}转账{num}积分")
-                return True
-            logger.info(f"数据库: 转账失败, 用户{trader_wxid}积分不足")
-            session.rollback()
-            return False
-        except SQLAlchemyError as e:
-            session.rollback()
-            logger.error(f"数据库: 转账失败, 错误: {e}")
-            return False
-        finally:
-            session.close()
+        return self._execute_in_queue(self._write, _safe_trade_points, trader_wxid, target_wxid, num)
 
     def get_user_list(self) -> list:
         """Get list of all users"""
-        session = self.DBSession()
-        try:
-            users = session.query(User).all()
-            return [user.wxid for user in users]
-        finally:
-            session.close()
+        return self._read(_get_user_list)
 
     def get_llm_thread_id(self, wxid: str, namespace: str = None) -> Union[dict, str]:
         """Get LLM thread id for user or chatroom"""
-        session = self.DBSession()
-        try:
-            # Check if it's a chatroom ID
-            if wxid.endswith("@chatroom"):
-                chatroom = session.query(Chatroom).filter_by(chatroom_id=wxid).first()
-                if namespace:
-                    return chatroom.llm_thread_id.get(namespace, "") if chatroom else ""
-                else:
-                    return chatroom.llm_thread_id if chatroom else {}
-            else:
-                # Regular user
-                user = session.query(User).filter_by(wxid=wxid).first()
-                if namespace:
-                    return user.llm_thread_id.get(namespace, "") if user else ""
-                else:
-                    return user.llm_thread_id if user else {}
-        finally:
-            session.close()
+        return self._read(_get_llm_thread_id, wxid, namespace)
 
     def save_llm_thread_id(self, wxid: str, data: str, namespace: str) -> bool:
         """Save LLM thread id for user or chatroom"""
-        session = self.DBSession()
-        try:
-            if wxid.endswith("@chatroom"):
-                chatroom = session.query(Chatroom).filter_by(chatroom_id=wxid).first()
-                if not chatroom:
-                    chatroom = Chatroom(
-                        chatroom_id=wxid,
-                        llm_thread_id={}
-                    )
-                    session.add(chatroom)
-                # 创建新字典并更新
-                new_thread_ids = dict(chatroom.llm_thread_id or {})
-                new_thread_ids[namespace] = data
-                chatroom.llm_thread_id = new_thread_ids
-            else:
-                user = session.query(User).filter_by(wxid=wxid).first()
-                if not user:
-                    user = User(
-                        wxid=wxid,
-                        llm_thread_id={}
-                    )
-                    session.add(user)
-                # 创建新字典并更新
-                new_thread_ids = dict(user.llm_thread_id or {})
-                new_thread_ids[namespace] = data
-                user.llm_thread_id = new_thread_ids
-
-            session.commit()
-            logger.info(f"数据库: 成功保存 {wxid} 的 llm thread id")
-            return True
-        except Exception as e:
-            session.rollback()
-            logger.error(f"数据库: 保存用户llm thread id失败, 错误: {e}")
-            return False
-        finally:
-            session.close()
+        return self._write(_save_llm_thread_id, wxid, data, namespace)
 
     def delete_all_llm_thread_id(self):
         """Clear llm thread id for everyone"""
-        session = self.DBSession()
-        try:
-            session.query(User).update({User.llm_thread_id: {}})
-            session.query(Chatroom).update({Chatroom.llm_thread_id: {}})
-            session.commit()
-            return True
-        except Exception as e:
-            session.rollback()
-            logger.error(f"数据库: 清除所有用户llm thread id失败, 错误: {e}")
-            return False
-        finally:
-            session.close()
+        return self._write(_delete_all_llm_thread_id)
 
     def get_signin_streak(self, wxid: str) -> int:
         """Thread-safe get user's signin streak"""
-        return self._execute_in_queue(self._get_signin_streak, wxid)
-
-    def _get_signin_streak(self, wxid: str) -> int:
-        session = self.DBSession()
-        try:
-            user = session.query(User).filter_by(wxid=wxid).first()
-            return user.signin_streak if user else 0
-        finally:
-            session.close()
+        return self._user(wxid).signin_streak
 
     def set_signin_streak(self, wxid: str, streak: int) -> bool:
         """Thread-safe set user's signin streak"""
-        return self._execute_in_queue(self._set_signin_streak, wxid, streak)
-
-    def _set_signin_streak(self, wxid: str, streak: int) -> bool:
-        session = self.DBSession()
-        try:
-            result = session.execute(
-                update(User)
-                .where(User.wxid == wxid)
-                .values(signin_streak=streak)
-            )
-            if result.rowcount == 0:
-                user = User(wxid=wxid, signin_streak=streak)
-                session.add(user)
-            logger.info(f"数据库: 用户{wxid}连续签到天数设置为{streak}")
-            session.commit()
-            return True
-        except SQLAlchemyError as e:
-            session.rollback()
-            logger.error(f"数据库: 用户{wxid}连续签到天数设置失败, 错误: {e}")
-            return False
-        finally:
-            session.close()
+        return self._execute_in_queue(self._write, _set_signin_streak, wxid, streak)
 
     # CHATROOM
 
     def get_chatroom_list(self) -> list:
         """Get list of all chatrooms"""
-        session = self.DBSession()
-        try:
-            chatrooms = session.query(Chatroom).all()
-            return [chatroom.chatroom_id for chatroom in chatrooms]
-        finally:
-            session.close()
+        return self._read(_get_chatroom_list)
 
     def get_chatroom_members(self, chatroom_id: str) -> set:
         """Get members of a chatroom"""
-        session = self.DBSession()
-        try:
-            chatroom = session.query(Chatroom).filter_by(chatroom_id=chatroom_id).first()
-            return set(chatroom.members) if chatroom else set()
-        finally:
-            session.close()
+        return self._read(_get_chatroom_members, chatroom_id)
 
     def set_chatroom_members(self, chatroom_id: str, members: set) -> bool:
         """Set members of a chatroom"""
-        session = self.DBSession()
-        try:
-            chatroom = session.query(Chatroom).filter_by(chatroom_id=chatroom_id).first()
-            if not chatroom:
-                chatroom = Chatroom(chatroom_id=chatroom_id)
-                session.add(chatroom)
-            chatroom.members = list(members)  # Convert set to list for JSON storage
-            logger.info(f"Database: Set chatroom {chatroom_id} members successfully")
-            session.commit()
-            return True
-        except Exception as e:
-            session.rollback()
-            logger.error(f"Database: Set chatroom {chatroom_id} members failed, error: {e}")
-            return False
-        finally:
-            session.close()
+        return self._write(_set_chatroom_members, chatroom_id, members)
 
     def __del__(self):
         """确保关闭时清理资源"""
@@ -438,3 +488,262 @@ class XYBotDB(metaclass=Singleton):
             self.executor.shutdown(wait=True)
         if hasattr(self, 'engine'):
             self.engine.dispose()
+
+
+@dataclass
+class WriteStats:
+    """写队列统计"""
+    queued: int = 0  # 当前排队的写操作数
+    writes: int = 0  # 已执行的写操作数
+    batches: int = 0  # 已提交的事务数
+    max_batch: int = 0  # 单个事务最多包含的写操作数
+    failures: int = 0  # 失败的写操作数
+    last_latency: float = 0.0  # 最近一个事务的耗时(秒)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class AsyncXYBotDB(metaclass=Singleton):
+    """异步数据库接口，方法与 XYBotDB 相同，但都需要 await
+
+    读操作直接使用连接池并发执行；写操作进入单一的写队列，由一个写任务按顺序执行，
+    同一时间排队的写操作合并在一个事务中提交，连续的积分增加按用户合并。
+    写操作和 XYBotDB 一样不会抛出数据库异常，失败时返回 False。
+    """
+
+    def __init__(self):
+        with open("main_config.toml", "rb") as f:
+            main_config = tomllib.load(f)
+        xybot_config = main_config["XYBot"]
+
+        # 同步接口负责建表，并与同步接口共用用户缓存
+        self.cache = XYBotDB().cache
+
+        self.database_url = _async_url(xybot_config["XYBotDB-url"])
+        self.engine = create_async_engine(self.database_url)
+        if self.engine.dialect.name == "sqlite":
+            event.listen(self.engine.sync_engine, "connect", _set_sqlite_pragma)
+        self.DBSession = async_sessionmaker(self.engine, expire_on_commit=False)
+
+        self.write_batch = max(1, xybot_config.get("XYBotDB-write-batch", 100))
+        self.write_delay = xybot_config.get("XYBotDB-write-delay", 5) / 1000
+
+        self.stats = WriteStats()
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+
+    async def _read(self, op, *args):
+        async with self.DBSession() as session:
+            return await session.run_sync(op, *args)
+
+    async def _write(self, op, *args):
+        if self._writer is None or self._writer.done():
+            self._queue = asyncio.Queue()
+            self._writer = asyncio.create_task(self._write_loop())
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((op, args, future))
+        self.stats.queued = self._queue.qsize()
+        # 调用方被取消时写操作仍会执行
+        return await asyncio.shield(future)
+
+    async def _write_loop(self):
+        """写任务，取到 close() 放入的 None 时执行完之前的写操作后退出"""
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            if self.write_delay:
+                # 稍等片刻，让同一时间到达的写操作合并到一个事务
+                await asyncio.sleep(self.write_delay)
+            while len(batch) < self.write_batch and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self.stats.queued = self._queue.qsize()
+
+            try:
+                await self._commit(batch)
+            except Exception as e:
+                logger.exception(f"数据库: 写队列执行失败, 错误: {e}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_result(False)
+
+    async def _commit(self, batch: list):
+        start = time.perf_counter()
+        results = None
+        async with self.DBSession() as session:
+            try:
+                results, users = await session.run_sync(_run_batch, [(op, args) for op, args, _ in batch])
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                results = None
+                if len(batch) == 1:
+                    op, args, _ = batch[0]
+                    self.stats.failures += 1
+                    logger.error(f"数据库: {_describe(op)}失败, 参数: {args}, 错误: {e}")
+
+        if results is not None:
+            _update_cache(self.cache, [op for op, _, _ in batch], users)
+        elif len(batch) > 1:
+            # 整批失败时逐个重试，只让出错的操作失败
+            results = [await self._commit_one(op, args) for op, args, _ in batch]
+        elif results is None:
+            results = [False]
+
+        stats = self.stats
+        stats.batches += 1
+        stats.writes += len(batch)
+        stats.max_batch = max(stats.max_batch, len(batch))
+        stats.last_latency = time.perf_counter() - start
+
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _commit_one(self, op, args):
+        async with self.DBSession() as session:
+            try:
+                (result,), users = await session.run_sync(_run_batch, [(op, args)])
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                self.stats.failures += 1
+                logger.error(f"数据库: {_describe(op)}失败, 参数: {args}, 错误: {e}")
+                return False
+        _update_cache(self.cache, [op], users)
+        return result
+
+    async def _user(self, wxid: str) -> CachedUser:
+        user = self.cache.get(wxid)
+        if user is None:
+            version = self.cache.version()
+            row = (await self._read(_get_users, [wxid]))[wxid]
+            user = self.cache.load(wxid, row, version)
+        return user
+
+    async def close(self):
+        """等待写队列执行完毕并关闭连接池"""
+        if self._writer is not None:
+            # 不取消写任务，正在提交的一批和排队的写操作都执行完后写任务自己退出
+            if not self._writer.done():
+                self._queue.put_nowait(None)
+            await asyncio.gather(self._writer, return_exceptions=True)
+            self._writer = None
+        await self.engine.dispose()
+
+    # USER
+
+    async def add_points(self, wxid: str, num: int) -> bool:
+        """增加用户积分"""
+        return await self._write(_add_points, wxid, num)
+
+    async def set_points(self, wxid: str, num: int) -> bool:
+        """设置用户积分"""
+        return await self._write(_set_points, wxid, num)
+
+    async def get_points(self, wxid: str) -> int:
+        """获取用户积分"""
+        return (await self._user(wxid)).points
+
+    async def get_points_many(self, wxids: Iterable[str]) -> dict:
+        """一次查询多个用户的积分，返回 {wxid: 积分}"""
+        points = {}
+        missing = []
+        for wxid in wxids:
+            user = self.cache.get(wxid)
+            if user is None:
+                missing.append(wxid)
+            else:
+                points[wxid] = user.points
+        if missing:
+            version = self.cache.version()
+            rows = await self._read(_get_users, missing)
+            for wxid, row in rows.items():
+                points[wxid] = self.cache.load(wxid, row, version).points
+        return points
+
+    async def get_signin_stat(self, wxid: str) -> datetime.datetime:
+        """获取用户签到状态"""
+        return (await self._user(wxid)).signin_stat
+
+    async def set_signin_stat(self, wxid: str, signin_time: datetime.datetime) -> bool:
+        """设置用户签到时间"""
+        return await self._write(_set_signin_stat, wxid, signin_time)
+
+    async def reset_all_signin_stat(self) -> bool:
+        """重置所有用户的签到状态"""
+        return await self._write(_reset_all_signin_stat)
+
+    async def get_leaderboard(self, count: int) -> list:
+        """获取积分排行榜，前 XYBotDB-leaderboard-size 名由缓存增量维护"""
+        leaderboard = self.cache.leaderboard(count)
+        if leaderboard is not None:
+            return leaderboard
+        if count > self.cache.leaderboard_size:
+            return await self._read(_get_leaderboard, count)
+        version = self.cache.version()
+        rows = await self._read(_get_leaderboard, self.cache.leaderboard_size)
+        self.cache.set_leaderboard(rows, version)
+        return rows[:count]
+
+    async def set_whitelist(self, wxid: str, stat: bool) -> bool:
+        """设置用户白名单状态"""
+        return await self._write(_set_whitelist, wxid, stat)
+
+    async def get_whitelist(self, wxid: str) -> bool:
+        """获取用户白名单状态"""
+        return (await self._user(wxid)).whitelist
+
+    async def get_whitelist_list(self) -> list:
+        """获取所有白名单用户"""
+        return await self._read(_get_whitelist_list)
+
+    async def safe_trade_points(self, trader_wxid: str, target_wxid: str, num: int) -> bool:
+        """用户之间转账积分，积分不足时返回 False"""
+        return await self._write(_safe_trade_points, trader_wxid, target_wxid, num)
+
+    async def get_user_list(self) -> list:
+        """获取所有用户"""
+        return await self._read(_get_user_list)
+
+    async def get_llm_thread_id(self, wxid: str, namespace: str = None) -> Union[dict, str]:
+        """获取用户或群聊的 LLM thread id"""
+        return await self._read(_get_llm_thread_id, wxid, namespace)
+
+    async def save_llm_thread_id(self, wxid: str, data: str, namespace: str) -> bool:
+        """保存用户或群聊的 LLM thread id"""
+        return await self._write(_save_llm_thread_id, wxid, data, namespace)
+
+    async def delete_all_llm_thread_id(self) -> bool:
+        """清除所有 LLM thread id"""
+        return await self._write(_delete_all_llm_thread_id)
+
+    async def get_signin_streak(self, wxid: str) -> int:
+        """获取用户连续签到天数"""
+        return (await self._user(wxid)).signin_streak
+
+    async def set_signin_streak(self, wxid: str, streak: int) -> bool:
+        """设置用户连续签到天数"""
+        return await self._write(_set_signin_streak, wxid, streak)
+
+    # CHATROOM
+
+    async def get_chatroom_list(self) -> list:
+        """获取所有群聊"""
+        return await self._read(_get_chatroom_list)
+
+    async def get_chatroom_members(self, chatroom_id: str) -> set:
+        """获取群成员"""
+        return await self._read(_get_chatroom_members, chatroom_id)
+
+    async def set_chatroom_members(self, chatroom_id: str, members: set) -> bool:
+        """设置群成员"""
+        return await self._write(_set_chatroom_members, chatroom_id, members)
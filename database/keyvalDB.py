@@ -1,18 +1,23 @@
 import asyncio
+import fnmatch
+import heapq
 import logging
+import time
 import tomllib
 from datetime import datetime, timedelta
-from typing import Optional, Union, List
+from typing import Optional, Union, List, Dict, Iterable
 
 from pydantic import validate_arguments
-from sqlalchemy import Column, String, Text, DateTime, delete, select
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_scoped_session
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy import Column, String, Text, DateTime, delete, select, insert
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import declarative_base
 
 from utils.singleton import Singleton
 
 DeclarativeBase = declarative_base()
 
+Expiry = Optional[Union[int, timedelta]]
+
 
 class KeyValue(DeclarativeBase):
     __tablename__ = 'key_value_store'
@@ -22,37 +27,306 @@ class KeyValue(DeclarativeBase):
     expire_time = Column(DateTime, index=True, comment='过期时间')
 
 
+def _seconds(ex: Expiry) -> Optional[float]:
+    """把过期时间统一为秒数，None 或 0 表示不过期"""
+    if not ex:
+        return None
+    return ex.total_seconds() if isinstance(ex, timedelta) else float(ex)
+
+
+class MemoryBackend:
+    """内存键值存储
+
+    数据保存在 dict 中，过期时间用最小堆管理，后台任务每秒清理一次到期的键；
+    修改过的键定期增量写入 SQLite 快照，启动时从快照恢复。
+    所有操作都在事件循环中同步完成，incr/setnx/mset 等天然是原子的。
+    """
+
+    def __init__(self, db_url: str, snapshot_interval: float = 5):
+        self.engine = create_async_engine(db_url, echo=False, future=True)
+        self.snapshot_interval = snapshot_interval
+
+        self._data: Dict[str, str] = {}
+        self._expires: Dict[str, float] = {}  # 键 -> 过期时间戳
+        self._heap: List[tuple] = []  # (过期时间戳, 键)，键的过期时间被修改后旧条目惰性丢弃
+        self._dirty: set = set()  # 自上次快照后修改或删除过的键
+        self._tasks: List[asyncio.Task] = []
+        self._closing: Optional[asyncio.Event] = None
+
+    async def initialize(self):
+        async with self.engine.begin() as conn:
+            await conn.run_sync(DeclarativeBase.metadata.create_all)
+            rows = await conn.execute(select(KeyValue.key, KeyValue.value, KeyValue.expire_time))
+            now = time.time()
+            for key, value, expire_time in rows:
+                expire_at = expire_time.timestamp() if expire_time else None
+                if expire_at is not None and expire_at <= now:
+                    self._dirty.add(key)
+                    continue
+                self._data[key] = value
+                if expire_at is not None:
+                    self._set_expire(key, expire_at)
+        logging.info(f"键值数据库已从快照恢复 {len(self._data)} 个键")
+
+        self._closing = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._expire_loop()),
+                       asyncio.create_task(self._snapshot_loop())]
+
+    async def close(self):
+        # 过期清理任务直接取消；快照任务不取消，等正在进行的快照写完后自己退出
+        if self._closing is not None:
+            self._closing.set()
+        if self._tasks:
+            self._tasks[0].cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.snapshot()
+        await self.engine.dispose()
+
+    # 内部操作
+
+    def _alive(self, key: str) -> bool:
+        if key not in self._data:
+            return False
+        expire_at = self._expires.get(key)
+        if expire_at is not None and expire_at <= time.time():
+            self._remove(key)
+            return False
+        return True
+
+    def _set_expire(self, key: str, expire_at: Optional[float]):
+        if expire_at is None:
+            self._expires.pop(key, None)
+            return
+        self._expires[key] = expire_at
+        heapq.heappush(self._heap, (expire_at, key))
+
+    def _put(self, key: str, value, ex: Expiry = None, keep_ttl: bool = False):
+        self._data[key] = str(value)
+        if not keep_ttl:
+            seconds = _seconds(ex)
+            self._set_expire(key, time.time() + seconds if seconds else None)
+        self._dirty.add(key)
+
+    def _remove(self, key: str) -> bool:
+        self._expires.pop(key, None)
+        if self._data.pop(key, None) is None:
+            return False
+        self._dirty.add(key)
+        return True
+
+    def purge_expired(self) -> int:
+        """删除到期的键，返回删除数量"""
+        now = time.time()
+        removed = 0
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            expire_at, key = heapq.heappop(heap)
+            if self._expires.get(key) == expire_at:
+                self._remove(key)
+                removed += 1
+        # 过期时间被反复修改时堆里会积累很多失效条目，超过有效条目两倍时重建
+        if len(heap) > 2 * len(self._expires) + 64:
+            self._heap = [(expire_at, key) for key, expire_at in self._expires.items()]
+            heapq.heapify(self._heap)
+        return removed
+
+    async def _expire_loop(self):
+        while True:
+            await asyncio.sleep(1)
+            self.purge_expired()
+
+    async def snapshot(self):
+        """把自上次快照后修改过的键写入 SQLite"""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        upserts = []
+        for key in dirty:
+            if key in self._data:
+                expire_at = self._expires.get(key)
+                upserts.append({
+                    "key": key,
+                    "value": self._data[key],
+                    "expire_time": datetime.fromtimestamp(expire_at) if expire_at is not None else None
+                })
+        try:
+            async with self.engine.begin() as conn:
+                keys = list(dirty)
+                for i in range(0, len(keys), 500):
+                    await conn.execute(delete(KeyValue).where(KeyValue.key.in_(keys[i:i + 500])))
+                if upserts:
+                    await conn.execute(insert(KeyValue), upserts)
+        except BaseException as e:
+            # 下次快照时重试；中途被取消时也放回，不丢失这些键
+            self._dirty |= dirty
+            if not isinstance(e, Exception):
+                raise
+            logging.error(f"键值数据库快照失败: {str(e)}")
+
+    async def _snapshot_loop(self):
+        """定期快照，close() 设置 _closing 后退出"""
+        while not self._closing.is_set():
+            try:
+                await asyncio.wait_for(self._closing.wait(), self.snapshot_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.snapshot()
+
+    # 接口
+
+    async def set(self, key: str, value, ex: Expiry = None) -> bool:
+        self._put(key, value, ex)
+        return True
+
+    async def setnx(self, key: str, value, ex: Expiry = None) -> bool:
+        if self._alive(key):
+            return False
+        self._put(key, value, ex)
+        return True
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._data[key] if self._alive(key) else None
+
+    async def mget(self, keys: Iterable[str]) -> List[Optional[str]]:
+        return [self._data[key] if self._alive(key) else None for key in keys]
+
+    async def mset(self, mapping: Dict[str, Union[str, dict, list]], ex: Expiry = None) -> bool:
+        for key, value in mapping.items():
+            self._put(key, value, ex)
+        return True
+
+    async def incr(self, key: str, amount: int = 1) -> int:
+        current = int(self._data[key]) if self._alive(key) else 0
+        value = current + amount
+        self._put(key, value, keep_ttl=True)
+        return value
+
+    async def delete(self, key: str) -> bool:
+        alive = self._alive(key)
+        self._remove(key)
+        return alive
+
+    async def exists(self, key: str) -> bool:
+        return self._alive(key)
+
+    async def ttl(self, key: str) -> int:
+        if not self._alive(key) or key not in self._expires:
+            return -1
+        remaining = self._expires[key] - time.time()
+        return int(remaining) if remaining > 0 else -2
+
+    async def expire(self, key: str, ex: Union[int, timedelta]) -> bool:
+        if not self._alive(key):
+            return False
+        self._set_expire(key, time.time() + (_seconds(ex) or 0))
+        self._dirty.add(key)
+        return True
+
+    async def keys(self, pattern: str = "*") -> List[str]:
+        self.purge_expired()
+        if pattern == "*":
+            return list(self._data)
+        return [key for key in self._data if fnmatch.fnmatchcase(key, pattern)]
+
+
+class RedisBackend:
+    """使用 WechatAPI 服务已经依赖的 Redis 存储，键名统一加上前缀，避免与 WechatAPI 的数据冲突
+
+    需要安装 redis 包: pip install redis
+    """
+
+    def __init__(self, host: str, port: int, password: str = "", db: int = 0, prefix: str = "xybot:kv:"):
+        import redis.asyncio as redis
+
+        self.redis = redis.Redis(host=host, port=port, password=password or None, db=db, decode_responses=True)
+        self.prefix = prefix
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    async def initialize(self):
+        await self.redis.ping()
+        logging.info("键值数据库使用 Redis 存储")
+
+    async def close(self):
+        await self.redis.aclose()
+
+    async def set(self, key: str, value, ex: Expiry = None) -> bool:
+        return bool(await self.redis.set(self._key(key), str(value), ex=ex or None))
+
+    async def setnx(self, key: str, value, ex: Expiry = None) -> bool:
+        return bool(await self.redis.set(self._key(key), str(value), ex=ex or None, nx=True))
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self.redis.get(self._key(key))
+
+    async def mget(self, keys: Iterable[str]) -> List[Optional[str]]:
+        keys = [self._key(key) for key in keys]
+        return await self.redis.mget(keys) if keys else []
+
+    async def mset(self, mapping: Dict[str, Union[str, dict, list]], ex: Expiry = None) -> bool:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for key, value in mapping.items():
+                pipe.set(self._key(key), str(value), ex=ex or None)
+            await pipe.execute()
+        return True
+
+    async def incr(self, key: str, amount: int = 1) -> int:
+        return await self.redis.incrby(self._key(key), amount)
+
+    async def delete(self, key: str) -> bool:
+        return await self.redis.delete(self._key(key)) > 0
+
+    async def exists(self, key: str) -> bool:
+        return await self.redis.exists(self._key(key)) > 0
+
+    async def ttl(self, key: str) -> int:
+        # Redis 对不存在的键返回 -2，这里与内存存储保持一致返回 -1
+        return max(await self.redis.ttl(self._key(key)), -1)
+
+    async def expire(self, key: str, ex: Union[int, timedelta]) -> bool:
+        return bool(await self.redis.expire(self._key(key), ex))
+
+    async def keys(self, pattern: str = "*") -> List[str]:
+        return [key[len(self.prefix):] async for key in self.redis.scan_iter(match=self._key(pattern), count=500)]
+
+
 class KeyvalDB(metaclass=Singleton):
+    """类 Redis 的异步键值数据库
+
+    默认使用内存存储并定期快照到 keyvalDB-url 指定的 SQLite，
+    keyvalDB-backend = "redis" 时直接使用 WechatAPIServer 配置的 Redis。
+    """
     _instance = None
 
     def __new__(cls):
         with open("main_config.toml", "rb") as f:
             main_config = tomllib.load(f)
-        db_url = main_config["XYBot"]["keyvalDB-url"]
+        xybot_config = main_config["XYBot"]
 
         if cls._instance is None:
             cls._instance = super().__new__(cls)
-            cls._instance.engine = create_async_engine(
-                db_url,
-                echo=False,
-                future=True
-            )
-            cls._async_session_factory = async_scoped_session(
-                sessionmaker(
-                    cls._instance.engine,
-                    class_=AsyncSession,
-                    expire_on_commit=False
-                ),
-                scopefunc=asyncio.current_task
-            )
+            backend = None
+            if xybot_config.get("keyvalDB-backend", "memory") == "redis":
+                api_config = main_config.get("WechatAPIServer", {})
+                try:
+                    backend = RedisBackend(api_config.get("redis-host", "127.0.0.1"),
+                                           api_config.get("redis-port", 6379),
+                                           api_config.get("redis-password", ""),
+                                           api_config.get("redis-db", 0),
+                                           xybot_config.get("keyvalDB-redis-prefix", "xybot:kv:"))
+                except ImportError:
+                    logging.error("未安装 redis 包，键值数据库改用内存存储")
+            if backend is None:
+                backend = MemoryBackend(xybot_config["keyvalDB-url"],
+                                        xybot_config.get("keyvalDB-snapshot-interval", 5))
+            cls._instance.backend = backend
         return cls._instance
 
     async def initialize(self):
         """异步初始化数据库"""
-        async with self.engine.begin() as conn:
-            await conn.run_sync(DeclarativeBase.metadata.create_all)
-        # 启动后台清理任务
-        asyncio.create_task(self._cleanup_expired())
+        await self.backend.initialize()
 
     @validate_arguments
     async def set(
@@ -62,104 +336,55 @@ class KeyvalDB(metaclass=Singleton):
             ex: Optional[Union[int, timedelta]] = None
     ) -> bool:
         """设置键值对，支持过期时间（秒或timedelta）"""
-        async with self._async_session_factory() as session:
-            try:
-                expire_time = None
-                if ex:
-                    # 统一处理时间类型转换
-                    if isinstance(ex, int):
-                        expire_time = datetime.now() + timedelta(seconds=ex)
-                    else:
-                        expire_time = datetime.now() + ex
-
-                kv = KeyValue(
-                    key=key,
-                    value=str(value),
-                    expire_time=expire_time
-                )
-                await session.merge(kv)
-                await session.commit()
-                return True
-            except Exception as e:
-                logging.error(f"设置键值失败: {str(e)}")
-                await session.rollback()
-                return False
+        try:
+            return await self.backend.set(key, value, ex)
+        except Exception as e:
+            logging.error(f"设置键值失败: {str(e)}")
+            return False
+
+    async def setnx(self, key: str, value: Union[str, dict, list], ex: Expiry = None) -> bool:
+        """键不存在时才设置，返回是否设置成功"""
+        return await self.backend.setnx(key, value, ex)
 
     async def get(self, key: str) -> Optional[str]:
         """获取键值，自动处理过期数据"""
-        async with self._async_session_factory() as session:
-            result = await session.get(KeyValue, key)
-            if not result:
-                return None
+        return await self.backend.get(key)
 
-            if result.expire_time and result.expire_time < datetime.now():
-                await session.delete(result)
-                await session.commit()
-                return None
+    async def mget(self, keys: Iterable[str]) -> List[Optional[str]]:
+        """批量获取键值，不存在的键返回 None"""
+        return await self.backend.mget(keys)
 
-            return result.value
+    async def mset(self, mapping: Dict[str, Union[str, dict, list]], ex: Expiry = None) -> bool:
+        """批量设置键值对"""
+        return await self.backend.mset(mapping, ex)
+
+    async def incr(self, key: str, amount: int = 1) -> int:
+        """原子地把整数值增加 amount，键不存在时从0开始，保留原有的过期时间"""
+        return await self.backend.incr(key, amount)
 
     async def delete(self, key: str) -> bool:
         """删除键值"""
-        async with self._async_session_factory() as session:
-            result = await session.execute(delete(KeyValue).where(KeyValue.key == key))
-            await session.commit()
-            return result.rowcount > 0
+        return await self.backend.delete(key)
 
     async def exists(self, key: str) -> bool:
         """检查键是否存在"""
-        async with self._async_session_factory() as session:
-            result = await session.get(KeyValue, key)
-            if result and result.expire_time and result.expire_time < datetime.now():
-                await session.delete(result)
-                await session.commit()
-                return False
-            return result is not None
+        return await self.backend.exists(key)
 
     async def ttl(self, key: str) -> int:
         """获取剩余生存时间（秒）"""
-        async with self._async_session_factory() as session:
-            result = await session.get(KeyValue, key)
-            if not result or not result.expire_time:
-                return -1
-
-            remaining = (result.expire_time - datetime.now()).total_seconds()
-            # 明确返回类型处理
-            return int(remaining) if remaining > 0 else -2
+        return await self.backend.ttl(key)
 
     async def expire(self, key: str, ex: Union[int, timedelta]) -> bool:
         """设置过期时间"""
-        async with self._async_session_factory() as session:
-            result = await session.get(KeyValue, key)
-            if not result:
-                return False
-
-            expire_time = datetime.now() + (ex if isinstance(ex, timedelta) else timedelta(seconds=ex))
-            result.expire_time = expire_time
-            await session.commit()
-            return True
+        return await self.backend.expire(key, ex)
 
     async def keys(self, pattern: str = "*") -> List[str]:
         """查找匹配模式的键"""
-        async with self._async_session_factory() as session:
-            # 显式指定查询列类型
-            query = select(KeyValue.key).where(KeyValue.key.like(pattern.replace("*", "%")))
-            result = await session.execute(query)
-            return [str(row[0]) for row in result.all()]  # 确保返回字符串类型
-
-    async def _cleanup_expired(self, interval: int = 3600):
-        """后台定时清理过期数据"""
-        while True:
-            async with self._async_session_factory() as session:
-                await session.execute(
-                    delete(KeyValue).where(KeyValue.expire_time < datetime.now())
-                )
-                await session.commit()
-            await asyncio.sleep(interval)
+        return await self.backend.keys(pattern)
 
     async def close(self):
-        """关闭数据库连接"""
-        await self.engine.dispose()
+        """写入快照并关闭数据库连接"""
+        await self.backend.close()
 
     async def __aenter__(self):
         return self
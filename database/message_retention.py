@@ -0,0 +1,200 @@
+"""
+消息记录保留策略
+按会话和消息类型配置保留天数，后台任务分小批删除过期消息，每批之间让出数据库，
+避免一次大 DELETE 长时间锁表；删除后执行增量 VACUUM 归还空闲页
+
+规则优先级: 会话规则 > 消息类型规则 > 默认保留天数，天数 <= 0 表示永久保留
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, asdict, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from loguru import logger
+from sqlalchemy import delete, select, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+_current: Optional["RetentionEngine"] = None
+
+
+def get_retention_status() -> Optional[dict]:
+    """返回当前保留策略任务的状态，供管理后台读取，未启动时返回 None"""
+    if _current is None:
+        return None
+    return _current.status()
+
+
+@dataclass
+class RetentionStats:
+    """保留策略执行统计"""
+    running: bool = False  # 是否正在清理
+    current_rule: str = ""  # 正在执行的规则
+    runs: int = 0  # 已完成的清理轮数
+    last_started: float = 0.0  # 最近一轮开始时间(时间戳)
+    last_finished: float = 0.0  # 最近一轮结束时间(时间戳)
+    last_duration: float = 0.0  # 最近一轮耗时(秒)
+    last_deleted: int = 0  # 最近一轮删除的消息数
+    run_deleted: int = 0  # 本轮已删除的消息数
+    total_deleted: int = 0  # 累计删除的消息数
+    deleted_by_rule: Dict[str, int] = field(default_factory=dict)  # 最近一轮各规则删除数
+    vacuumed_pages: int = 0  # 累计增量 VACUUM 回收的页数
+    next_run: float = 0.0  # 下一轮计划时间(时间戳)
+    last_error: str = ""  # 最近一次错误
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class RetentionEngine:
+    """消息记录保留策略任务
+
+    Args:
+        engine: MessageDB 的异步数据库引擎
+        model: 消息表模型
+        config: main_config.toml 中的 [MessageRetention] 配置
+    """
+
+    def __init__(self, engine: AsyncEngine, model, config: Optional[dict] = None):
+        self.engine = engine
+        self.model = model
+        self.config = config or {}
+
+        self.enabled = self.config.get("enable", True)
+        self.default_days = self.config.get("default-days", 3)
+        self.interval = self.config.get("interval", 3600)
+        self.batch_size = max(1, self.config.get("batch-size", 2000))
+        self.batch_pause = self.config.get("batch-pause", 50) / 1000
+        self.vacuum_pages = self.config.get("vacuum-pages", 2000)
+        self.chat_days: Dict[str, int] = dict(self.config.get("chats", {}))
+        self.type_days: Dict[int, int] = {int(k): v for k, v in self.config.get("types", {}).items()}
+
+        self.stats = RetentionStats()
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def start(self):
+        """启动后台清理任务"""
+        global _current
+        _current = self
+        if not self.enabled or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.create_task(self._loop())
+        logger.info("消息记录保留策略已启动: 默认保留{}天 会话规则:{} 类型规则:{} 每批删除:{}",
+                    self.default_days, len(self.chat_days), len(self.type_days), self.batch_size)
+
+    async def stop(self):
+        """停止后台清理任务，正在删除的批次会回滚"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.stats.running = False
+
+    def status(self) -> dict:
+        data = self.stats.as_dict()
+        data.update(enabled=self.enabled, default_days=self.default_days, interval=self.interval,
+                    chats=self.chat_days, types=self.type_days)
+        return data
+
+    def _rules(self, now: datetime) -> List[tuple]:
+        """生成 (规则名, 条件) 列表，各规则覆盖的消息互不重叠"""
+        model = self.model
+        rules = []
+
+        for chat, days in self.chat_days.items():
+            if days > 0:
+                rules.append((f"chat:{chat}", [model.from_wxid == chat,
+                                               model.timestamp < now - timedelta(days=days)]))
+
+        chat_excluded = [model.from_wxid.notin_(list(self.chat_days))] if self.chat_days else []
+        for msg_type, days in self.type_days.items():
+            if days > 0:
+                rules.append((f"type:{msg_type}", [model.msg_type == msg_type, *chat_excluded,
+                                                   model.timestamp < now - timedelta(days=days)]))
+
+        if self.default_days > 0:
+            conditions = [*chat_excluded, model.timestamp < now - timedelta(days=self.default_days)]
+            if self.type_days:
+                conditions.append(model.msg_type.notin_(list(self.type_days)))
+            rules.append(("default", conditions))
+        return rules
+
+    async def run_once(self) -> int:
+        """执行一轮清理，返回删除的消息数。已有一轮在执行时等待其结束后再执行"""
+        async with self._lock:
+            return await self._run()
+
+    async def _run(self) -> int:
+        stats = self.stats
+        stats.running = True
+        stats.run_deleted = 0
+        stats.deleted_by_rule = {}
+        stats.last_started = time.time()
+        start = time.perf_counter()
+
+        try:
+            for name, conditions in self._rules(datetime.now()):
+                stats.current_rule = name
+                stats.deleted_by_rule[name] = await self._delete_chunked(conditions)
+            stats.current_rule = "vacuum"
+            await self._incremental_vacuum()
+        except Exception as e:
+            stats.last_error = f"{stats.current_rule}: {e}"
+            logger.error("清理消息记录失败: 规则:{} 错误:{}", stats.current_rule, e)
+        finally:
+            stats.running = False
+            stats.current_rule = ""
+            stats.runs += 1
+            stats.last_finished = time.time()
+            stats.last_duration = time.perf_counter() - start
+            stats.last_deleted = stats.run_deleted
+
+        if stats.last_deleted:
+            logger.info("清理消息记录完成: 删除{}条 耗时{:.2f}s", stats.last_deleted, stats.last_duration)
+        return stats.last_deleted
+
+    async def _delete_chunked(self, conditions: list) -> int:
+        """每次删除最多 batch-size 条，每批单独提交"""
+        model = self.model
+        chunk = select(model.id).where(*conditions).limit(self.batch_size).scalar_subquery()
+        deleted = 0
+        while True:
+            async with self.engine.begin() as conn:
+                result = await conn.execute(delete(model).where(model.id.in_(chunk)))
+            count = result.rowcount or 0
+            deleted += count
+            self.stats.run_deleted += count
+            self.stats.total_deleted += count
+            if count < self.batch_size:
+                return deleted
+            await asyncio.sleep(self.batch_pause)
+
+    async def _incremental_vacuum(self):
+        """数据库为 auto_vacuum=INCREMENTAL 时回收空闲页"""
+        if self.engine.dialect.name != "sqlite" or self.vacuum_pages <= 0:
+            return
+        async with self.engine.connect() as conn:
+            mode = (await conn.execute(text("PRAGMA auto_vacuum"))).scalar()
+            if mode != 2:
+                return
+            freelist = (await conn.execute(text("PRAGMA freelist_count"))).scalar() or 0
+            if not freelist:
+                return
+            pages = min(freelist, self.vacuum_pages)
+            await conn.commit()
+            # sqlite3 的 execute 对没有返回列的 PRAGMA 只执行一步(回收一页)，executescript 才会执行完
+            raw = await conn.get_raw_connection()
+            await raw.driver_connection.executescript(f"PRAGMA incremental_vacuum({pages})")
+            self.stats.vacuumed_pages += pages
+
+    async def _loop(self):
+        while True:
+            await self.run_once()
+            self.stats.next_run = time.time() + self.interval
+            await asyncio.sleep(self.interval)
@@ -1,21 +1,34 @@
 import asyncio
 import logging
+import time
 import tomllib
-from datetime import datetime, timedelta
+from dataclasses import dataclass, asdict
+from datetime import datetime
 from typing import Optional, List
 
 from pydantic import validate_arguments
-from sqlalchemy import Column, String, Integer, DateTime, Text, Boolean, delete
+from sqlalchemy import Column, String, Integer, DateTime, Text, Boolean, event, insert
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_scoped_session
 from sqlalchemy.orm import declarative_base, sessionmaker
 
+from database.message_retention import RetentionEngine
 from utils.singleton import Singleton
 
 # 使用新的声明式基类
 DeclarativeBase = declarative_base()
 
 
+def _set_sqlite_pragma(dbapi_connection, connection_record):
+    """WAL 模式下读写互不阻塞，synchronous=NORMAL 只在检查点时 fsync，
+    auto_vacuum=INCREMENTAL 让保留策略删除消息后可以增量回收空间(只对新建的数据库生效)"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
 class Message(DeclarativeBase):
     __tablename__ = 'messages'
 
@@ -29,7 +42,29 @@ class Message(DeclarativeBase):
     is_group = Column(Boolean, default=False, comment='是否群消息')
 
 
+@dataclass
+class FlushStats:
+    """写入缓冲统计"""
+    buffered: int = 0  # 当前缓冲中的消息数
+    flushed: int = 0  # 已写入数据库的消息数
+    flushes: int = 0  # 批量写入次数
+    failures: int = 0  # 批量写入失败次数
+    dropped: int = 0  # 缓冲溢出丢弃的消息数
+    last_batch: int = 0  # 最近一次写入的消息数
+    last_latency: float = 0.0  # 最近一次写入耗时(秒)
+    avg_latency: float = 0.0  # 写入耗时的指数移动平均(秒)
+    max_latency: float = 0.0  # 最大写入耗时(秒)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
 class MessageDB(metaclass=Singleton):
+    """消息记录数据库
+
+    save_message 只把消息放进内存缓冲，由后台任务每 batch-size 条或每 flush-interval 毫秒
+    批量写入一次，消息落库不再阻塞消息分发。关闭时会写入剩余的缓冲。
+    """
     _instance = None
 
     def __new__(cls):
@@ -44,6 +79,21 @@ class MessageDB(metaclass=Singleton):
                 echo=False,
                 future=True
             )
+            if cls._instance.engine.dialect.name == "sqlite":
+                event.listen(cls._instance.engine.sync_engine, "connect", _set_sqlite_pragma)
+
+            xybot_config = main_config["XYBot"]
+            cls._instance.batch_size = xybot_config.get("msgDB-batch-size", 200)
+            cls._instance.flush_interval = xybot_config.get("msgDB-flush-interval", 500) / 1000
+            cls._instance.max_buffer = xybot_config.get("msgDB-max-buffer", 20000)
+            cls._instance._buffer = []
+            cls._instance._flush_event = asyncio.Event()
+            cls._instance._flush_lock = asyncio.Lock()
+            cls._instance._flush_task = None
+            cls._instance._closing = False
+            cls._instance.stats = FlushStats()
+            cls._instance.retention = RetentionEngine(cls._instance.engine, Message,
+                                                      main_config.get("MessageRetention", {}))
             cls._async_session_factory = async_scoped_session(
                 sessionmaker(
                     cls._instance.engine,
@@ -58,6 +108,10 @@ class MessageDB(metaclass=Singleton):
         """异步初始化数据库"""
         async with self.engine.begin() as conn:
             await conn.run_sync(DeclarativeBase.metadata.create_all)
+        if self._flush_task is None or self._flush_task.done():
+            self._closing = False
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        self.retention.start()
 
     @validate_arguments(config=dict(arbitrary_types_allowed=True))
     async def save_message(self,
@@ -67,26 +121,74 @@ class MessageDB(metaclass=Singleton):
                            msg_type: int,
                            content: str,
                            is_group: bool = False) -> bool:
-        """异步保存消息到数据库"""
-        async with self._async_session_factory() as session:
-            try:
-                message = Message(
-                    msg_id=msg_id,
-                    sender_wxid=sender_wxid,
-                    from_wxid=from_wxid,
-                    msg_type=msg_type,
-                    content=content,
-                    is_group=is_group,
-                    timestamp=datetime.now()
-                )
-                session.add(message)
-                await session.commit()
+        """保存消息，先放入缓冲，由后台任务批量写入数据库"""
+        if len(self._buffer) >= self.max_buffer:
+            self.stats.dropped += 1
+            logging.error("消息写入缓冲已满，丢弃消息: %s", msg_id)
+            return False
+
+        self._buffer.append({
+            "msg_id": msg_id,
+            "sender_wxid": sender_wxid,
+            "from_wxid": from_wxid,
+            "msg_type": msg_type,
+            "content": content,
+            "is_group": is_group,
+            "timestamp": datetime.now()
+        })
+        self.stats.buffered = len(self._buffer)
+
+        if len(self._buffer) >= self.batch_size:
+            self._flush_event.set()
+        # 后台任务未启动时(例如没有调用 initialize)直接写入
+        if self._flush_task is None:
+            return await self.flush()
+        return True
+
+    async def flush(self) -> bool:
+        """把缓冲中的消息批量写入数据库"""
+        async with self._flush_lock:
+            if not self._buffer:
                 return True
-            except Exception as e:
-                logging.error(f"保存消息失败: {str(e)}")
-                await session.rollback()
+
+            rows, self._buffer = self._buffer, []
+            start = time.perf_counter()
+            try:
+                async with self.engine.begin() as conn:
+                    await conn.execute(insert(Message), rows)
+            except BaseException as e:
+                # 放回缓冲等待下次重试，超出上限的部分丢弃；写入中途被取消时也放回，不丢失这一批
+                pending = rows + self._buffer
+                self.stats.dropped += max(0, len(pending) - self.max_buffer)
+                self._buffer = pending[-self.max_buffer:]
+                self.stats.buffered = len(self._buffer)
+                if not isinstance(e, Exception):
+                    raise
+                self.stats.failures += 1
+                logging.error(f"批量保存消息失败: {str(e)}")
                 return False
 
+            latency = time.perf_counter() - start
+            stats = self.stats
+            stats.flushes += 1
+            stats.flushed += len(rows)
+            stats.last_batch = len(rows)
+            stats.last_latency = latency
+            stats.max_latency = max(stats.max_latency, latency)
+            stats.avg_latency = latency if stats.flushes == 1 else stats.avg_latency * 0.9 + latency * 0.1
+            stats.buffered = len(self._buffer)
+            return True
+
+    async def _flush_loop(self):
+        """后台批量写入任务，close() 设置 _closing 后完成当前这一轮再退出"""
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            await self.flush()
+
     async def get_messages(self,
                            start_time: Optional[datetime] = None,
                            end_time: Optional[datetime] = None,
@@ -96,6 +198,8 @@ class MessageDB(metaclass=Singleton):
                            is_group: Optional[bool] = None,
                            limit: int = 100) -> List[Message]:
         """异步查询消息记录"""
+        # 先写入缓冲，保证能查到刚收到的消息
+        await self.flush()
         async with self._async_session_factory() as session:
             try:
                 query = select(Message).order_by(Message.timestamp.desc()).limit(limit)
@@ -120,29 +224,24 @@ class MessageDB(metaclass=Singleton):
                 return []
 
     async def close(self):
-        """关闭数据库连接"""
+        """写入剩余缓冲并关闭数据库连接"""
+        await self.retention.stop()
+        if self._flush_task is not None:
+            # 不取消任务，等正在进行的写入完成
+            self._closing = True
+            self._flush_event.set()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.flush()
         await self.engine.dispose()
 
-    async def cleanup_messages(self):
-        """每三天清理旧消息"""
-        while True:
-            async with self._async_session_factory() as session:
-                try:
-                    # 计算三天前的时间
-                    three_days_ago = datetime.now() - timedelta(days=3)
-                    # 删除三天前的消息
-                    await session.execute(
-                        delete(Message).where(Message.timestamp < three_days_ago)
-                    )
-                    await session.commit()
-                except Exception as e:
-                    logging.error(f"清理消息失败: {str(e)}")
-                    await session.rollback()
-            await asyncio.sleep(259200)  # 每三天（259200秒）执行一次
+    async def cleanup_messages(self) -> int:
+        """按保留策略立即清理一轮过期消息，返回删除的消息数"""
+        await self.flush()
+        return await self.retention.run_once()
 
     async def __aenter__(self):
-        # 启动清理消息的定时任务
-        asyncio.create_task(self.cleanup_messages())
+        await self.initialize()
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
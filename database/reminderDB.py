@@ -0,0 +1,358 @@
+"""
+备忘录数据库
+所有用户的备忘录保存在同一个 SQLite 文件中，next_fire_time 上有索引
+
+原先每个用户一个 reminder_data/user_<wxid>.db，插件每 30 秒遍历目录、逐个打开并重新计算每条备忘录的提醒时间。
+现在下次提醒时间在写入时计算一次，保存在 next_fire_time 中，插件按它排定定时器。
+第一次启动时自动导入旧的 user_<wxid>.db，导入后文件改名为 user_<wxid>.db.migrated。
+
+备忘录插件和管理后台共用同一个 ReminderDB 实例:
+- 每个线程复用自己的连接(WAL 模式下读不互相阻塞)，写操作用锁串行
+- query() 按 wxid、chat_id、提醒时间范围分页查询，都走索引
+- 新增、修改、删除后通知 subscribe() 注册的监听函数，插件据此更新定时器，不需要重新扫描
+"""
+
+import os
+import sqlite3
+import threading
+import tomllib
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+
+from loguru import logger
+
+from utils.singleton import Singleton
+
+# 重复提醒，提醒后计算下一次的提醒时间；其余类型提醒后删除
+RECURRING_TYPES = frozenset({"daily", "weekly", "monthly", "yearly", "every_hour", "every_day", "every_week"})
+
+LEGACY_DIR = "reminder_data"
+
+# 变更通知的 action
+ADDED, UPDATED, DELETED = "added", "updated", "deleted"
+
+
+@dataclass
+class Reminder:
+    """一条备忘录"""
+    id: int
+    wxid: str  # 创建人
+    content: str
+    reminder_type: str
+    reminder_time: str
+    chat_id: str  # 创建时的会话，提醒发到这里
+    is_done: int = 0
+    next_fire_time: Optional[float] = None  # 下次提醒时间戳，无法计算时为 None
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def next_fire_time(reminder_type: str, reminder_time: str, after: Optional[datetime] = None) -> Optional[datetime]:
+    """计算 after(默认为现在)之后的下一次提醒时间，格式错误或未知类型返回 None
+
+    Args:
+        reminder_type: 提醒类型，one_time/daily/every_day/weekly/monthly/yearly/every_hour/every_week
+        reminder_time: 提醒时间，格式取决于类型
+        after: 从这个时间之后开始计算
+    """
+    now = after or datetime.now()
+    try:
+        if reminder_type == "one_time":
+            return datetime.strptime(reminder_time, '%Y-%m-%d %H:%M:%S')
+
+        elif reminder_type in ("daily", "every_day"):
+            hour, minute = map(int, reminder_time.split(":"))
+            next_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            if next_time <= now:
+                next_time += timedelta(days=1)
+            return next_time
+
+        elif reminder_type == "weekly":
+            weekday, time_str = reminder_time.split()
+            hour, minute = map(int, time_str.split(":"))
+            # weekday 为 1-7(周一到周日)
+            next_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            next_time += timedelta(days=(int(weekday) - 1 - now.weekday()) % 7)
+            if next_time <= now:
+                next_time += timedelta(days=7)
+            return next_time
+
+        elif reminder_type == "monthly":
+            day, time_str = reminder_time.split()
+            day = int(day)
+            hour, minute = map(int, time_str.split(":"))
+            year, month = now.year, now.month
+            for _ in range(13):  # 跳过没有这一天的月份
+                try:
+                    next_time = datetime(year, month, day, hour, minute)
+                except ValueError:
+                    next_time = None
+                if next_time and next_time > now:
+                    return next_time
+                year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+            return None
+
+        elif reminder_type == "yearly":
+            month, day, time_str = reminder_time.split()
+            hour, minute = map(int, time_str.split(":"))
+            month, day = int(month), int(day)
+            for year in range(now.year, now.year + 9):  # 跳过没有这一天的年份(2月29日最多隔8年)
+                try:
+                    next_time = datetime(year, month, day, hour, minute)
+                except ValueError:
+                    next_time = None
+                if next_time and next_time > now:
+                    return next_time
+            return None
+
+        elif reminder_type == "every_hour":
+            return now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+
+        elif reminder_type == "every_week":
+            hour, minute = map(int, reminder_time.split(":"))
+            next_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            if next_time <= now:
+                next_time += timedelta(days=7)
+            return next_time
+
+        else:
+            logger.warning(f"未知的提醒类型: {reminder_type}")
+            return None
+    except ValueError as e:
+        logger.warning(f"时间格式错误: {reminder_time}, 错误信息: {e}")
+        return None
+
+
+def _timestamp(reminder_type: str, reminder_time: str, after: Optional[datetime] = None) -> Optional[float]:
+    next_time = next_fire_time(reminder_type, reminder_time, after)
+    return next_time.timestamp() if next_time else None
+
+
+class ReminderDB(metaclass=Singleton):
+    """备忘录数据库，整个进程共用一个实例
+
+    监听函数形如 listener(action, reminder_id, reminder)，action 为 added/updated/deleted，
+    deleted 时 reminder 为 None。监听函数在执行写操作的线程中被调用，需要自己切换到所属的事件循环。
+    """
+
+    COLUMNS = "id, wxid, content, reminder_type, reminder_time, chat_id, is_done, next_fire_time"
+
+    def __init__(self, db_path: Optional[str] = None):
+        if db_path is None:
+            with open("main_config.toml", "rb") as f:
+                main_config = tomllib.load(f)
+            db_path = main_config["XYBot"].get("reminderDB-path", "database/reminder.db")
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._write_lock = threading.Lock()
+        self._listeners: List[Callable] = []
+
+        conn = self._conn
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS reminders (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                wxid TEXT NOT NULL,
+                content TEXT NOT NULL,
+                reminder_type TEXT NOT NULL,
+                reminder_time TEXT NOT NULL,
+                chat_id TEXT NOT NULL,
+                is_done INTEGER NOT NULL DEFAULT 0,
+                next_fire_time REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_reminders_next_fire ON reminders (next_fire_time) WHERE is_done = 0;
+            DROP INDEX IF EXISTS idx_reminders_wxid;
+            CREATE INDEX IF NOT EXISTS idx_reminders_wxid_next ON reminders (wxid, next_fire_time);
+            CREATE INDEX IF NOT EXISTS idx_reminders_chat_next ON reminders (chat_id, next_fire_time);
+        """)
+        conn.commit()
+        self.migrate_legacy(LEGACY_DIR)
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """当前线程的连接，第一次使用时创建"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+            self._connections.append(conn)
+        return conn
+
+    def close(self):
+        for conn in self._connections:
+            conn.close()
+        self._connections.clear()
+        self._local = threading.local()
+
+    def subscribe(self, listener: Callable):
+        """注册变更监听函数"""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, action: str, reminder_id: int, reminder: Optional[Reminder] = None):
+        for listener in list(self._listeners):
+            try:
+                listener(action, reminder_id, reminder)
+            except Exception as e:
+                logger.error(f"备忘录变更通知失败: {e}")
+
+    @staticmethod
+    def _row(row: tuple) -> Reminder:
+        return Reminder(*row)
+
+    def migrate_legacy(self, data_dir: str) -> int:
+        """导入旧的每用户一个的 user_<wxid>.db，返回导入的备忘录数"""
+        if not os.path.isdir(data_dir):
+            return 0
+        imported = 0
+        for filename in sorted(os.listdir(data_dir)):
+            if not (filename.startswith("user_") and filename.endswith(".db")):
+                continue
+            path = os.path.join(data_dir, filename)
+            try:
+                legacy = sqlite3.connect(path)
+                try:
+                    rows = legacy.execute("SELECT id, wxid, content, reminder_type, reminder_time, chat_id "
+                                          "FROM reminders WHERE is_done = 0").fetchall()
+                except sqlite3.OperationalError:  # 没有建表的空文件
+                    rows = []
+                finally:
+                    legacy.close()
+
+                with self._write_lock, self._conn:
+                    for old_id, wxid, content, reminder_type, reminder_time, chat_id in rows:
+                        cursor = self._conn.execute(
+                            "INSERT INTO reminders (wxid, content, reminder_type, reminder_time, chat_id, next_fire_time) "
+                            "VALUES (?, ?, ?, ?, ?, ?)",
+                            (wxid, content, reminder_type, reminder_time, chat_id,
+                             _timestamp(reminder_type, reminder_time)))
+                        logger.debug(f"导入备忘录 {filename}#{old_id} -> {cursor.lastrowid}")
+                os.replace(path, path + ".migrated")
+                imported += len(rows)
+            except (sqlite3.Error, OSError) as e:
+                logger.error(f"导入旧备忘录数据库 {path} 失败: {e}")
+        if imported:
+            logger.success(f"已从 {data_dir} 导入 {imported} 条备忘录到 {self.db_path}")
+        return imported
+
+    def add(self, wxid: str, content: str, reminder_type: str, reminder_time: str, chat_id: str) -> Reminder:
+        """新增备忘录，同时计算下次提醒时间"""
+        fire_time = _timestamp(reminder_type, reminder_time)
+        with self._write_lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO reminders (wxid, content, reminder_type, reminder_time, chat_id, next_fire_time) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (wxid, content, reminder_type, reminder_time, chat_id, fire_time))
+        reminder = Reminder(cursor.lastrowid, wxid, content, reminder_type, reminder_time, chat_id, 0, fire_time)
+        self._notify(ADDED, reminder.id, reminder)
+        return reminder
+
+    def update(self, reminder_id: int, content: str, reminder_type: str, reminder_time: str,
+               chat_id: str) -> Optional[Reminder]:
+        """修改备忘录并重新计算下次提醒时间，不存在时返回 None"""
+        fire_time = _timestamp(reminder_type, reminder_time)
+        with self._write_lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE reminders SET content = ?, reminder_type = ?, reminder_time = ?, chat_id = ?, "
+                "is_done = 0, next_fire_time = ? WHERE id = ?",
+                (content, reminder_type, reminder_time, chat_id, fire_time, reminder_id))
+        if not cursor.rowcount:
+            return None
+        reminder = self.get(reminder_id)
+        self._notify(UPDATED, reminder_id, reminder)
+        return reminder
+
+    def get(self, reminder_id: int) -> Optional[Reminder]:
+        row = self._conn.execute(f"SELECT {self.COLUMNS} FROM reminders WHERE id = ?", (reminder_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def list_by_wxid(self, wxid: str) -> List[Reminder]:
+        """用户未完成的备忘录，按ID排序"""
+        rows = self._conn.execute(f"SELECT {self.COLUMNS} FROM reminders WHERE wxid = ? AND is_done = 0 "
+                                  "ORDER BY id", (wxid,)).fetchall()
+        return [self._row(row) for row in rows]
+
+    def query(self, wxid: Optional[str] = None, chat_id: Optional[str] = None, due_from: Optional[float] = None,
+              due_to: Optional[float] = None, offset: int = 0, limit: int = 50) -> Tuple[List[Reminder], int]:
+        """分页查询未完成的备忘录，按下次提醒时间排序
+
+        Args:
+            wxid: 创建人
+            chat_id: 会话
+            due_from: 下次提醒时间不早于(时间戳)
+            due_to: 下次提醒时间早于(时间戳)
+            offset: 跳过的条数
+            limit: 最多返回的条数
+
+        Returns:
+            (当前页的备忘录, 符合条件的总数)
+        """
+        conditions, params = ["is_done = 0"], []
+        if wxid:
+            conditions.append("wxid = ?")
+            params.append(wxid)
+        if chat_id:
+            conditions.append("chat_id = ?")
+            params.append(chat_id)
+        if due_from is not None:
+            conditions.append("next_fire_time >= ?")
+            params.append(due_from)
+        if due_to is not None:
+            conditions.append("next_fire_time < ?")
+            params.append(due_to)
+        where = " AND ".join(conditions)
+
+        conn = self._conn
+        total = conn.execute(f"SELECT COUNT(*) FROM reminders WHERE {where}", params).fetchone()[0]
+        # 无法计算提醒时间的排在最后
+        rows = conn.execute(f"SELECT {self.COLUMNS} FROM reminders WHERE {where} "
+                            "ORDER BY next_fire_time IS NULL, next_fire_time, id LIMIT ? OFFSET ?",
+                            (*params, limit, offset)).fetchall()
+        return [self._row(row) for row in rows], total
+
+    def schedule_entries(self) -> List[Tuple[float, int]]:
+        """所有待提醒的 (下次提醒时间戳, ID)，按时间排序"""
+        return self._conn.execute("SELECT next_fire_time, id FROM reminders "
+                                  "WHERE is_done = 0 AND next_fire_time IS NOT NULL "
+                                  "ORDER BY next_fire_time").fetchall()
+
+    def reschedule(self, reminder_id: int, fire_time: Optional[float]) -> bool:
+        """更新下次提醒时间"""
+        with self._write_lock, self._conn:
+            cursor = self._conn.execute("UPDATE reminders SET next_fire_time = ? WHERE id = ?",
+                                        (fire_time, reminder_id))
+        if not cursor.rowcount:
+            return False
+        self._notify(UPDATED, reminder_id, self.get(reminder_id))
+        return True
+
+    def delete(self, reminder_id: int, wxid: Optional[str] = None) -> bool:
+        """删除备忘录，指定 wxid 时只删除该用户的"""
+        with self._write_lock, self._conn:
+            if wxid is None:
+                cursor = self._conn.execute("DELETE FROM reminders WHERE id = ?", (reminder_id,))
+            else:
+                cursor = self._conn.execute("DELETE FROM reminders WHERE id = ? AND wxid = ?", (reminder_id, wxid))
+        if not cursor.rowcount:
+            return False
+        self._notify(DELETED, reminder_id)
+        return True
+
+    def delete_by_wxid(self, wxid: str) -> int:
+        """删除用户的所有备忘录，返回删除数量"""
+        with self._write_lock, self._conn:
+            ids = [row[0] for row in self._conn.execute("SELECT id FROM reminders WHERE wxid = ?", (wxid,))]
+            self._conn.execute("DELETE FROM reminders WHERE wxid = ?", (wxid,))
+        for reminder_id in ids:
+            self._notify(DELETED, reminder_id)
+        return len(ids)
@@ -0,0 +1,150 @@
+"""
+用户数据缓存
+缓存 User 表中积分、签到和白名单字段，按 LRU 淘汰；XYBotDB 和 AsyncXYBotDB 每次写入提交后
+用事务内读到的最新行更新缓存(write-through)，同时增量维护积分排行榜前 N 名，
+排行榜请求不再每次排序整张表。
+
+缓存假设所有对 User 表的写入都经过 XYBotDB 或 AsyncXYBotDB。
+"""
+
+import datetime
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+UserRow = Tuple[int, datetime.datetime, int, bool]  # (points, signin_stat, signin_streak, whitelist)
+
+
+@dataclass(slots=True)
+class CachedUser:
+    points: int = 0
+    signin_stat: datetime.datetime = datetime.datetime.fromtimestamp(0)
+    signin_streak: int = 0
+    whitelist: bool = False
+
+
+class UserCache:
+    """线程安全的用户缓存，同步接口在线程池中读写，异步接口在事件循环中读写
+
+    Args:
+        capacity: 最多缓存的用户数
+        leaderboard_size: 维护的排行榜长度，超过该长度的排行榜请求直接查询数据库
+    """
+
+    def __init__(self, capacity: int = 10000, leaderboard_size: int = 100):
+        self.capacity = max(1, capacity)
+        self.leaderboard_size = max(1, leaderboard_size)
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.RLock()
+        self._users: "OrderedDict[str, CachedUser]" = OrderedDict()
+
+        # 每次写入后递增。读缓存未命中时先记下版本号再查询数据库，如果查询期间该用户被写入过，
+        # 查询结果可能已经过时，不放入缓存
+        self._version = 0
+        self._written: Dict[str, int] = {}
+        self._floor = 0  # _written 被清空时的版本号，早于它开始的查询都视为过时
+
+        self._top: Optional[List[Tuple[int, str]]] = None  # 按积分降序
+        self._top_complete = False  # 用户总数不足 leaderboard_size，排行榜包含了所有用户
+
+    def version(self) -> int:
+        return self._version
+
+    def get(self, wxid: str) -> Optional[CachedUser]:
+        with self._lock:
+            user = self._users.get(wxid)
+            if user is None:
+                self.misses += 1
+                return None
+            self._users.move_to_end(wxid)
+            self.hits += 1
+            return user
+
+    def load(self, wxid: str, row: Optional[UserRow], version: int) -> CachedUser:
+        """放入从数据库读到的行(不存在的用户为 None)，返回对应的缓存对象"""
+        user = CachedUser(*row) if row else CachedUser()
+        with self._lock:
+            if version < self._floor or self._written.get(wxid, -1) > version:
+                return user
+            self._store(wxid, user)
+        return user
+
+    def update(self, rows: Dict[str, Optional[UserRow]]):
+        """写入提交后，用事务内读到的最新行更新缓存和排行榜"""
+        with self._lock:
+            self._version += 1
+            if len(self._written) > self.capacity:
+                self._written.clear()
+                self._floor = self._version
+            for wxid, row in rows.items():
+                self._written[wxid] = self._version
+                user = CachedUser(*row) if row else CachedUser()
+                self._store(wxid, user)
+                self._update_top(wxid, user.points)
+
+    def reset_signin(self):
+        """所有用户的签到状态被重置"""
+        epoch = datetime.datetime.fromtimestamp(0)
+        with self._lock:
+            self._version += 1
+            self._floor = self._version
+            self._written.clear()
+            for user in self._users.values():
+                user.signin_stat = epoch
+
+    def _store(self, wxid: str, user: CachedUser):
+        self._users[wxid] = user
+        self._users.move_to_end(wxid)
+        while len(self._users) > self.capacity:
+            self._users.popitem(last=False)
+
+    # 排行榜
+
+    def leaderboard(self, count: int) -> Optional[List[Tuple[str, int]]]:
+        """返回前 count 名，缓存不可用时返回 None"""
+        with self._lock:
+            if self._top is None or count > self.leaderboard_size:
+                return None
+            if len(self._top) < count and not self._top_complete:
+                return None
+            return [(wxid, points) for points, wxid in self._top[:count]]
+
+    def set_leaderboard(self, rows: Iterable[Tuple[str, int]], version: int):
+        """放入从数据库读到的前 leaderboard_size 名"""
+        rows = list(rows)
+        with self._lock:
+            if version != self._version:
+                return
+            self._top = [(points, wxid) for wxid, points in rows]
+            self._top_complete = len(rows) < self.leaderboard_size
+
+    def _update_top(self, wxid: str, points: int):
+        top = self._top
+        if top is None:
+            return
+
+        was_member = False
+        for i, (_, member) in enumerate(top):
+            if member == wxid:
+                del top[i]
+                was_member = True
+                break
+
+        # 积分不低于当前最后一名，或者排行榜本来就包含所有用户时才需要插入
+        if self._top_complete or (top and points >= top[-1][0]):
+            position = len(top)
+            for i, (member_points, _) in enumerate(top):
+                if points > member_points:
+                    position = i
+                    break
+            top.insert(position, (points, wxid))
+            if len(top) > self.leaderboard_size:
+                top.pop()
+                self._top_complete = False
+        elif was_member and not self._top_complete:
+            # 原来的成员掉出了排行榜，无法知道下一名是谁，等下次请求时重新加载
+            self._top = None
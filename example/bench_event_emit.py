@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+"""
+EventManager.emit 微基准测试
+对比每个处理函数深拷贝消息(copy_message=True，旧行为)、写时复制视图和消息模型(XYBot 现在分发的)的分发耗时，
+分别改变处理函数数量和消息负载大小。
+第二张表是常见的小文本消息，对比写时复制视图和消息模型，消息模型的耗时包括每条消息创建模型(from_dict)
+
+用法: python example/bench_event_emit.py
+"""
+
+import asyncio
+import base64
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.decorators import on_image_message, on_text_message  # noqa: E402
+from utils.event_manager import EventManager  # noqa: E402
+from utils.message import ImageMessage, TextMessage  # noqa: E402
+
+HANDLER_COUNTS = [1, 5, 20]
+PAYLOAD_SIZES = [1024, 256 * 1024, 2 * 1024 * 1024]
+ROUNDS = 20
+TEXT_ROUNDS = 20000
+
+
+def make_plugin(copy_message: bool):
+    class BenchPlugin:
+        @on_image_message(copy_message=copy_message)
+        async def handle_image(self, bot, message):
+            # 模拟常见的读取
+            return bool(message["FromWxid"]) and len(message["Content"]) > 0
+
+    return BenchPlugin()
+
+
+def make_text_plugin():
+    class BenchTextPlugin:
+        @on_text_message
+        async def handle_text(self, bot, message):
+            # 模拟常见的读取，返回 None 继续执行后面的处理函数
+            if message["FromWxid"] and message["Content"].startswith("签到"):
+                return False
+
+    return BenchTextPlugin()
+
+
+def make_message(size: int) -> dict:
+    return {
+        "MsgId": 1,
+        "MsgType": 3,
+        "FromWxid": "123@chatroom",
+        "ToWxid": "wxid_bot",
+        "SenderWxid": "wxid_sender",
+        "IsGroup": True,
+        "Ats": [],
+        "MsgSource": "<msgsource><silence>1</silence></msgsource>",
+        "Content": base64.b64encode(os.urandom(size * 3 // 4)).decode(),
+    }
+
+
+def make_text_message() -> dict:
+    """XYBot 预处理后的群文本消息，共16个字段"""
+    return {
+        "MsgId": 1234567890,
+        "FromUserName": {"string": "123@chatroom"},
+        "ToUserName": {"string": "wxid_bot"},
+        "MsgType": 1,
+        "Content": "今天天气怎么样",
+        "Status": 3,
+        "ImgStatus": 1,
+        "ImgBuf": {"iLen": 0},
+        "CreateTime": 1700000000,
+        "MsgSource": "<msgsource><silence>1</silence><membercount>100</membercount></msgsource>",
+        "NewMsgId": 1234567890123456789,
+        "MsgSeq": 123456,
+        "FromWxid": "123@chatroom",
+        "ToWxid": "wxid_bot",
+        "SenderWxid": "wxid_sender",
+        "IsGroup": True,
+        "Ats": [],
+    }
+
+
+async def bench_text(handler_count: int, model: bool) -> float:
+    EventManager._handlers.clear()
+    EventManager._indexes.clear()
+    for _ in range(handler_count):
+        EventManager.bind_instance(make_text_plugin())
+
+    message = make_text_message()
+    start = time.perf_counter()
+    for _ in range(TEXT_ROUNDS):
+        await EventManager.emit("text_message", None, TextMessage.from_dict(message) if model else message)
+    return (time.perf_counter() - start) / TEXT_ROUNDS * 1e6
+
+
+async def bench(handler_count: int, size: int, copy_message: bool, model: bool = False) -> float:
+    EventManager._handlers.clear()
+    for _ in range(handler_count):
+        EventManager.bind_instance(make_plugin(copy_message))
+
+    message = ImageMessage.from_dict(make_message(size)) if model else make_message(size)
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        await EventManager.emit("image_message", None, message)
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+
+async def main():
+    print(f"{'处理函数数':>8} {'负载大小':>10} {'深拷贝(ms)':>12} {'写时复制(ms)':>14} {'消息模型(ms)':>14} {'加速比':>8}")
+    for handler_count in HANDLER_COUNTS:
+        for size in PAYLOAD_SIZES:
+            deep = await bench(handler_count, size, True)
+            view = await bench(handler_count, size, False)
+            model = await bench(handler_count, size, False, model=True)
+            print(f"{handler_count:>12} {size // 1024:>10}KB {deep:>14.4f} {view:>16.4f} {model:>16.4f} "
+                  f"{deep / model:>10.1f}x")
+
+    print()
+    print(f"{'处理函数数':>8} {'写时复制(us)':>14} {'消息模型(us)':>14} {'每个处理函数差值(us)':>20}")
+    for handler_count in HANDLER_COUNTS:
+        view = await bench_text(handler_count, False)
+        model = await bench_text(handler_count, True)
+        print(f"{handler_count:>12} {view:>16.2f} {model:>16.2f} {(model - view) / handler_count:>24.2f}")
+    EventManager._handlers.clear()
+    EventManager._indexes.clear()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+"""
+消息解析微基准测试
+对比旧的预处理方式(每个处理步骤各自 ET.fromstring，字段逐个 find)和 utils.message_parser 的单次解析，
+样本为抓取的文本、引用、文件、拍一拍消息(wxid等已替换)
+
+用法: python example/bench_message_parser.py
+"""
+
+import sys
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.message_parser import (parse_appmsg, parse_ats, parse_file, parse_pat, parse_quote,  # noqa: E402
+                                  parse_system)
+
+ROUNDS = 5000
+
+TEXT_MSGSOURCE = ("<msgsource><atuserlist><![CDATA[wxid_bot,wxid_friend]]></atuserlist><pua>1</pua>"
+                  "<silence>0</silence><membercount>312</membercount>"
+                  "<signature>V1_abcdEFGH|v1_abcdEFGH</signature><tmp_node><publisher-id></publisher-id></tmp_node>"
+                  "</msgsource>")
+PLAIN_MSGSOURCE = ("<msgsource><pua>1</pua><silence>1</silence><membercount>312</membercount>"
+                   "<signature>V1_abcdEFGH|v1_abcdEFGH</signature></msgsource>")
+
+QUOTE_TEXT = (
+    '<?xml version="1.0"?><msg><appmsg appid="" sdkver="0"><title>这是什么意思</title><des></des><action></action>'
+    '<type>57</type><showtype>0</showtype><soundtype>0</soundtype><mediatagname></mediatagname><messageext></messageext>'
+    '<messageaction></messageaction><content></content><contentattr>0</contentattr><url></url><lowurl></lowurl>'
+    '<dataurl></dataurl><lowdataurl></lowdataurl><songalbumurl></songalbumurl><songlyric></songlyric>'
+    '<appattach><totallen>0</totallen><attachid></attachid><emoticonmd5></emoticonmd5><fileext></fileext>'
+    '<aeskey></aeskey></appattach><extinfo></extinfo><sourceusername></sourceusername>'
+    '<sourcedisplayname></sourcedisplayname><thumburl></thumburl><md5></md5><statextstr></statextstr>'
+    '<refermsg><type>1</type><svrid>1234567890123456789</svrid><fromusr>123456@chatroom</fromusr>'
+    '<chatusr>wxid_friend</chatusr><displayname>朋友</displayname>'
+    '<msgsource>&lt;msgsource&gt;&lt;silence&gt;0&lt;/silence&gt;&lt;/msgsource&gt;</msgsource>'
+    '<content>明天下午三点开会</content><createtime>1735000000</createtime></refermsg></appmsg>'
+    '<fromusername>wxid_sender</fromusername><scene>0</scene><appinfo><version>1</version><appname></appname>'
+    '</appinfo><commenturl></commenturl></msg>'
+)
+QUOTE_XML = QUOTE_TEXT.replace(
+    "<type>1</type><svrid>",
+    "<type>49</type><svrid>",
+).replace(
+    "<content>明天下午三点开会</content>",
+    "<content>&lt;msg&gt;&lt;appmsg appid=\"\" sdkver=\"0\"&gt;&lt;title&gt;年度报告.pdf&lt;/title&gt;"
+    "&lt;des&gt;&lt;/des&gt;&lt;action&gt;view&lt;/action&gt;&lt;type&gt;6&lt;/type&gt;&lt;showtype&gt;0&lt;/showtype&gt;"
+    "&lt;url&gt;&lt;/url&gt;&lt;appattach&gt;&lt;totallen&gt;1048576&lt;/totallen&gt;"
+    "&lt;attachid&gt;@cdn_abcdef_1&lt;/attachid&gt;&lt;fileext&gt;pdf&lt;/fileext&gt;"
+    "&lt;aeskey&gt;0123456789abcdef&lt;/aeskey&gt;&lt;/appattach&gt;&lt;md5&gt;d41d8cd98f00b204e9800998ecf8427e"
+    "&lt;/md5&gt;&lt;/appmsg&gt;&lt;/msg&gt;</content>",
+)
+FILE = (
+    '<?xml version="1.0"?><msg><appmsg appid="" sdkver="0"><title>年度报告.pdf</title><des></des><action></action>'
+    '<type>6</type><showtype>0</showtype><content></content><url></url><appattach><totallen>1048576</totallen>'
+    '<attachid>@cdn_abcdef_1</attachid><emoticonmd5></emoticonmd5><fileext>pdf</fileext>'
+    '<cdnattachurl>3057020100044b30490201000204</cdnattachurl><aeskey>0123456789abcdef</aeskey>'
+    '<encryver>1</encryver><overwrite_newmsgid>1234567890</overwrite_newmsgid><fileuploadtoken>v1_token'
+    '</fileuploadtoken></appattach><extinfo></extinfo><sourceusername></sourceusername>'
+    '<md5>d41d8cd98f00b204e9800998ecf8427e</md5></appmsg><fromusername>wxid_sender</fromusername><scene>0</scene>'
+    '<appinfo><version>1</version><appname></appname></appinfo><commenturl></commenturl></msg>'
+)
+PAT = (
+    '<sysmsg type="pat"><pat><fromusername>wxid_friend</fromusername><chatusername>123456@chatroom</chatusername>'
+    '<pattedusername>wxid_bot</pattedusername><patsuffix><![CDATA[的脑袋]]></patsuffix>'
+    '<patsuffixversion>0</patsuffixversion><template><![CDATA["${wxid_friend}" 拍了拍 "${wxid_bot}" 的脑袋]]>'
+    '</template></pat></sysmsg>'
+)
+
+
+# 旧实现，与改动前 XYBot 中的代码一致
+
+def legacy_ats(msg_source):
+    try:
+        root = ET.fromstring(msg_source)
+        ats = root.find("atuserlist").text if root.find("atuserlist") is not None else ""
+    except Exception:
+        ats = ""
+    ats = ats.strip(",").split(",") if ats else []
+    return ats if ats and ats[0] != "" else []
+
+
+def legacy_xml_type(content):
+    return int(ET.fromstring(content).find("appmsg").find("type").text)
+
+
+def legacy_quote(content):
+    legacy_xml_type(content)
+    quote = {}
+    root = ET.fromstring(content)
+    appmsg = root.find("appmsg")
+    text = appmsg.find("title").text
+    refermsg = appmsg.find("refermsg")
+    quote["MsgType"] = int(refermsg.find("type").text)
+    for key, tag in (("NewMsgId", "svrid"), ("ToWxid", "fromusr"), ("FromWxid", "chatusr"),
+                     ("Nickname", "displayname"), ("MsgSource", "msgsource"), ("Createtime", "createtime"),
+                     ("Content", "content")):
+        quote[key] = refermsg.find(tag).text
+    if quote["MsgType"] == 49:
+        quote_appmsg = ET.fromstring(quote["Content"]).find("appmsg")
+        for key, tag in (("Content", "title"), ("destination", "des"), ("action", "action"), ("url", "url"),
+                         ("lowurl", "lowurl"), ("dataurl", "dataurl"), ("lowdataurl", "lowdataurl"),
+                         ("songlyric", "songlyric"), ("extinfo", "extinfo"), ("sourceusername", "sourceusername"),
+                         ("sourcedisplayname", "sourcedisplayname"), ("thumburl", "thumburl"), ("md5", "md5"),
+                         ("statextstr", "statextstr")):
+            quote[key] = quote_appmsg.find(tag).text if isinstance(quote_appmsg.find(tag), ET.Element) else ""
+        for key, tag in (("XmlType", "type"), ("showtype", "showtype"), ("soundtype", "soundtype"),
+                         ("directshare", "directshare")):
+            quote[key] = int(quote_appmsg.find(tag).text) if isinstance(quote_appmsg.find(tag), ET.Element) else 0
+        quote["appattach"] = {}
+        for tag in ("attachid", "emoticonmd5", "fileext", "cdnthumbaeskey", "aeskey"):
+            element = quote_appmsg.find("appattach").find(tag)
+            quote["appattach"][tag] = element.text if isinstance(element, ET.Element) else ""
+        element = quote_appmsg.find("appattach").find("totallen")
+        quote["appattach"]["totallen"] = int(element.text) if isinstance(element, ET.Element) else 0
+    return text, quote
+
+
+def legacy_file(content):
+    legacy_xml_type(content)
+    root = ET.fromstring(content)
+    return (root.find("appmsg").find("title").text,
+            root.find("appmsg").find("appattach").find("attachid").text,
+            root.find("appmsg").find("appattach").find("fileext").text)
+
+
+def legacy_pat(content):
+    ET.fromstring(content).attrib["type"]
+    pat = ET.fromstring(content).find("pat")
+    return pat.find("fromusername").text, pat.find("pattedusername").text, pat.find("patsuffix").text
+
+
+def parsed_quote(content):
+    appmsg = parse_appmsg(content)
+    return appmsg.title, parse_quote(appmsg)
+
+
+def parsed_file(content):
+    return parse_file(parse_appmsg(content))
+
+
+def parsed_pat(content):
+    return parse_pat(parse_system(content))
+
+
+CASES = [
+    ("文本(@)", TEXT_MSGSOURCE, legacy_ats, parse_ats),
+    ("文本(无@)", PLAIN_MSGSOURCE, legacy_ats, parse_ats),
+    ("引用文本", QUOTE_TEXT, legacy_quote, parsed_quote),
+    ("引用文件", QUOTE_XML, legacy_quote, parsed_quote),
+    ("文件", FILE, legacy_file, parsed_file),
+    ("拍一拍", PAT, legacy_pat, parsed_pat),
+]
+
+
+def bench(func, payload) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        func(payload)
+    return (time.perf_counter() - start) / ROUNDS * 1_000_000
+
+
+def main():
+    print(f"{'消息':<10} {'旧实现(us)':>12} {'单次解析(us)':>14} {'加速比':>8}")
+    for name, payload, legacy, parsed in CASES:
+        old = bench(legacy, payload)
+        new = bench(parsed, payload)
+        print(f"{name:<10} {old:>14.2f} {new:>16.2f} {old / new:>10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
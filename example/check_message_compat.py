@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+"""
+消息模型兼容性检查
+用自带的插件分别处理旧格式的消息字典和新的消息模型(utils.message)，对比两次的结果
+
+样本消息先经过 XYBot 预处理，得到分发给插件的消息模型；旧格式的消息字典由 Message.to_dict() 得到，
+与改动前分发的字典相同。每个处理函数分别拿到旧的写时复制视图和新的 MessageOverlay 各执行一次，
+记录调用的机器人接口和抛出的异常，两次不一致即为不兼容。
+另外检查处理函数拿到的消息经过 json.dumps、dict | dict、pickle 后与旧格式的消息字典相同。
+机器人客户端是只记录调用的假客户端，不会发出任何消息；缺少依赖无法导入的插件会被跳过。
+在临时目录中运行(链接到仓库中的文件)，插件创建的数据库写在临时目录的 database 下，不会写入仓库。
+
+用法: python example/check_message_compat.py
+"""
+
+import asyncio
+import atexit
+import copy
+import importlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# 插件按相对路径读取配置文件，工作目录中除 database 外都链接到仓库
+WORK_DIR = Path(tempfile.mkdtemp(prefix="xybot_compat_"))
+for entry in ROOT.iterdir():
+    if entry.name not in ("database", ".git"):
+        (WORK_DIR / entry.name).symlink_to(entry)
+(WORK_DIR / "database").mkdir()
+os.chdir(WORK_DIR)
+atexit.register(shutil.rmtree, WORK_DIR, True)
+
+from loguru import logger  # noqa: E402
+
+from utils.event_manager import EventManager  # noqa: E402
+from utils.message_view import MessageView, private_copy  # noqa: E402
+from utils.plugin_base import PluginBase  # noqa: E402
+from utils.xybot import XYBot  # noqa: E402
+
+BOT_WXID = "wxid_bot"
+GROUP = "123456@chatroom"
+TIMEOUT = 5
+
+
+class FakeContacts:
+    def invalidate(self, wxid):
+        pass
+
+    def invalidate_chatroom(self, chatroom):
+        pass
+
+
+class FakeBot:
+    """记录所有接口调用的假客户端"""
+
+    def __init__(self):
+        self.wxid = BOT_WXID
+        self.nickname = "机器人"
+        self.alias = ""
+        self.phone = ""
+        self.contacts = FakeContacts()
+        self.calls = []
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+
+        async def call(*args, **kwargs):
+            self.calls.append(name)
+            return None
+
+        return call
+
+
+class FakeDB:
+    async def save_message(self, **kwargs):
+        pass
+
+
+def raw(msg_type: int, content: str, from_wxid: str = GROUP, **extra) -> dict:
+    return {"MsgId": 1001, "NewMsgId": 900001, "MsgType": msg_type, "FromUserName": {"string": from_wxid},
+            "ToWxid": {"string": BOT_WXID}, "Content": {"string": content}, "CreateTime": 1735000000,
+            "MsgSource": "<msgsource><silence>0</silence></msgsource>", "Status": 3, **extra}
+
+
+SAMPLES = [
+    raw(1, "hello", from_wxid="wxid_friend"),
+    raw(1, "wxid_friend:\n菜单"),
+    raw(1, "wxid_friend:\n@机器人 你好",
+        MsgSource=f"<msgsource><atuserlist><![CDATA[{BOT_WXID}]]></atuserlist></msgsource>"),
+    raw(3, 'wxid_friend:\n<msg><img aeskey="k" cdnmidimgurl="c" length="3"/></msg>'),
+    raw(34, 'wxid_friend:\n<msg><voicemsg voiceurl="u" length="1024" voicelength="2000"/></msg>'),
+    raw(43, 'wxid_friend:\n<msg><videomsg aeskey="k" cdnvideourl="u" length="2048" playlength="3"/></msg>'),
+    raw(47, 'wxid_friend:\n<msg><emoji md5="d41d8cd98f00b204e9800998ecf8427e" len="1024"/></msg>'),
+    raw(49, "wxid_friend:\n<msg><appmsg><title>报告.pdf</title><type>6</type><appattach><totallen>10</totallen>"
+            "<attachid>@cdn_1</attachid><fileext>pdf</fileext></appattach></appmsg></msg>"),
+    raw(49, "wxid_friend:\n<msg><appmsg><title>这是什么</title><type>57</type><refermsg><type>1</type>"
+            "<svrid>42</svrid><fromusr>123456@chatroom</fromusr><chatusr>wxid_other</chatusr>"
+            "<displayname>别人</displayname><msgsource></msgsource><content>明天开会</content>"
+            "<createtime>1735000000</createtime></refermsg></appmsg></msg>"),
+    raw(49, "wxid_friend:\n<msg><appmsg><title>文章</title><des>摘要</des><type>5</type>"
+            "<url>https://example.com</url></appmsg></msg>"),
+    raw(10002, '<sysmsg type="pat"><pat><fromusername>wxid_friend</fromusername>'
+               f'<pattedusername>{BOT_WXID}</pattedusername><patsuffix></patsuffix></pat></sysmsg>'),
+    raw(10002, '<sysmsg type="mmchatroombarannouncememt"><mmchatroombarannouncememt>公告'
+               '</mmchatroombarannouncememt></sysmsg>'),
+]
+
+
+async def collect_messages() -> list:
+    """让样本消息经过 XYBot 预处理，收集分发的 (事件类型, 消息模型)"""
+    emitted = []
+
+    async def capture(event_type, bot, message):
+        emitted.append((event_type, message))
+
+    xybot = XYBot.__new__(XYBot)
+    xybot.bot = FakeBot()
+    xybot.update_profile(BOT_WXID, "机器人", "", "")
+    xybot.ignore_protection = True
+    xybot.ignore_mode = ""
+    xybot.whitelist, xybot.blacklist = [], []
+    xybot.legacy_media_fields = False
+    xybot.msg_db = FakeDB()
+
+    original = EventManager.emit
+    EventManager.emit = capture
+    try:
+        for sample in SAMPLES:
+            await xybot.process_message(copy.deepcopy(sample))
+    finally:
+        EventManager.emit = original
+    return emitted
+
+
+def load_plugins() -> tuple[list, list]:
+    plugins, skipped = [], []
+    for plugin_dir in sorted((ROOT / "plugins").iterdir()):
+        if not (plugin_dir / "main.py").exists():
+            continue
+        try:
+            module = importlib.import_module(f"plugins.{plugin_dir.name}.main")
+            for _, obj in inspect.getmembers(module):
+                if inspect.isclass(obj) and issubclass(obj, PluginBase) and obj is not PluginBase \
+                        and obj.__module__ == module.__name__:
+                    plugins.append(obj())
+        except BaseException as e:
+            skipped.append((plugin_dir.name, f"{type(e).__name__}: {e}"))
+    return plugins, skipped
+
+
+def check_serialization(emitted: list) -> list:
+    """处理函数拿到的消息序列化后应与旧格式的消息字典相同，返回不一致的描述"""
+    problems = []
+    for event_type, model in emitted:
+        expected = model.to_dict()
+        message = private_copy(model)
+        checks = {
+            "json.dumps": lambda: json.loads(json.dumps(message, default=str)) ==
+                                  json.loads(json.dumps(expected, default=str)),
+            "dict |": lambda: (message | {"Extra": 1}) == {**expected, "Extra": 1},
+            "dict()": lambda: dict(message) == expected,
+            "pickle": lambda: pickle.loads(pickle.dumps(message)) == expected,
+            "deepcopy": lambda: copy.deepcopy(message) == expected,
+        }
+        try:
+            pickle.dumps(expected)
+        except Exception:  # 含有下载句柄等无法序列化的对象，旧格式的字典也一样
+            del checks["pickle"], checks["deepcopy"]
+        for name, check in checks.items():
+            try:
+                ok = check()
+            except Exception as e:
+                ok = f"{type(e).__name__}: {e}"
+            if ok is not True:
+                problems.append(f"{event_type} {name}: {ok or '结果不同'}")
+    return problems
+
+
+async def run(handler, message) -> tuple:
+    bot = FakeBot()
+    try:
+        result = await asyncio.wait_for(handler(bot, message), TIMEOUT)
+        outcome = "ok" if not isinstance(result, bool) else str(result)
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+    except Exception as e:
+        outcome = type(e).__name__
+    return outcome, bot.calls
+
+
+async def main():
+    logger.remove()
+    emitted = await collect_messages()
+    serialization = check_serialization(emitted)
+    plugins, skipped = load_plugins()
+
+    checked, mismatches = 0, []
+    for plugin in plugins:
+        for name, method in inspect.getmembers(plugin, inspect.ismethod):
+            event_type = getattr(method, "_event_type", None)
+            for emitted_type, model in emitted:
+                if emitted_type != event_type:
+                    continue
+                if getattr(method, "_copy_message", False):
+                    legacy, current = copy.deepcopy(model.to_dict()), copy.deepcopy(model)
+                else:
+                    legacy, current = MessageView(model.to_dict()), private_copy(model)
+                before = await run(method, legacy)
+                after = await run(method, current)
+                checked += 1
+                if before != after:
+                    mismatches.append((f"{type(plugin).__name__}.{name}", event_type, before, after))
+
+    print(f"消息样本: {len(emitted)}  插件: {len(plugins)}  处理函数调用: {checked}")
+    for name, reason in skipped:
+        print(f"跳过 {name}: {reason}")
+    for name, event_type, before, after in mismatches:
+        print(f"不一致 {name} [{event_type}]\n    旧: {before}\n    新: {after}")
+    for problem in serialization:
+        print(f"序列化不一致 {problem}")
+    failures = len(mismatches) + len(serialization)
+    print("兼容" if not failures else f"{failures} 处不一致")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""
+消息发送调度检查
+按顺序等待发给同一接收人的消息，检查相邻两条之间的间隔不小于 1/chat-rate；
+再检查发给不同接收人的消息不受彼此的会话限速影响。发送函数是只记录发送时间的假函数。
+
+用法: python example/check_send_scheduler.py
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from WechatAPI.Client.send_scheduler import SendScheduler  # noqa: E402
+
+CHAT_RATE = 5
+SENDS = 6
+TOLERANCE = 0.02  # 计时误差(秒)
+
+
+async def main():
+    scheduler = SendScheduler({"chat-rate": CHAT_RATE, "chat-burst": 1, "global-rate": 100, "global-burst": 100,
+                               "report-interval": 0})
+    sent = []
+
+    async def send(wxid, content):
+        sent.append((wxid, time.monotonic()))
+
+    failures = []
+
+    # 同一接收人，上一条发完再发下一条，每条之间队列都是空的
+    for i in range(SENDS):
+        await scheduler.submit("wxid_a", send, "wxid_a", f"消息{i}")
+    gaps = [b[1] - a[1] for a, b in zip(sent, sent[1:])]
+    if min(gaps) < 1 / CHAT_RATE - TOLERANCE:
+        failures.append(f"同一接收人的间隔过短: {', '.join(f'{gap:.3f}' for gap in gaps)}")
+    print(f"同一接收人 {SENDS} 条，最小间隔 {min(gaps):.3f}s (应不小于 {1 / CHAT_RATE:.3f}s)")
+
+    # 不同接收人不互相等待
+    sent.clear()
+    started = time.monotonic()
+    await asyncio.gather(*(scheduler.submit(f"wxid_{i}", send, f"wxid_{i}", "你好") for i in range(SENDS)))
+    elapsed = time.monotonic() - started
+    if elapsed >= 1 / CHAT_RATE:
+        failures.append(f"不同接收人被会话限速拖慢: {elapsed:.3f}s")
+    print(f"不同接收人 {SENDS} 条，用时 {elapsed:.3f}s")
+
+    await scheduler.close()
+    for failure in failures:
+        print(f"失败: {failure}")
+    print("通过" if not failures else f"{len(failures)} 项失败")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
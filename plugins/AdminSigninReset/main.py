@@ -1,7 +1,7 @@
 import tomllib
 
 from WechatAPI import WechatAPIClient
-from database.XYBotDB import XYBotDB
+from database.XYBotDB import AsyncXYBotDB
 from utils.decorators import *
 from utils.plugin_base import PluginBase
 
@@ -28,9 +28,9 @@ class AdminSignInReset(PluginBase):
 
         self.admins = main_config["admins"]
 
-        self.db = XYBotDB()
+        self.db = AsyncXYBotDB()
 
-    @on_text_message
+    @on_text_message(commands=lambda self: self.command)
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -47,5 +47,5 @@ class AdminSignInReset(PluginBase):
             await bot.send_text_message(message["FromWxid"], "-----XYBot-----\n❌你配用这个指令吗？😡")
             return
 
-        self.db.reset_all_signin_stat()
+        await self.db.reset_all_signin_stat()
         await bot.send_text_message(message["FromWxid"], "-----XYBot-----\n成功重置签到状态！")
@@ -1,7 +1,7 @@
 import tomllib
 
 from WechatAPI import WechatAPIClient
-from database.XYBotDB import XYBotDB
+from database.XYBotDB import AsyncXYBotDB
 from utils.decorators import *
 from utils.plugin_base import PluginBase
 
@@ -28,9 +28,9 @@ class AdminWhitelist(PluginBase):
 
         self.admins = main_config["admins"]
 
-        self.db = XYBotDB()
+        self.db = AsyncXYBotDB()
 
-    @on_text_message
+    @on_text_message(commands=["添加白名单", "移除白名单", "白名单列表"])
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -60,7 +60,7 @@ class AdminWhitelist(PluginBase):
                 await bot.send_text_message(message["FromWxid"], "-----XYBot-----\n❌请不要手动@！")
                 return
 
-            self.db.set_whitelist(change_wxid, True)
+            await self.db.set_whitelist(change_wxid, True)
 
             nickname = await bot.get_nickname(change_wxid)
             await bot.send_text_message(message["FromWxid"],
@@ -79,14 +79,14 @@ class AdminWhitelist(PluginBase):
                 await bot.send_text_message(message["FromWxid"], "-----XYBot-----\n❌请不要手动@！")
                 return
 
-            self.db.set_whitelist(change_wxid, False)
+            await self.db.set_whitelist(change_wxid, False)
 
             nickname = await bot.get_nickname(change_wxid)
             await bot.send_text_message(message["FromWxid"],
                                         f"-----XYBot-----\n成功把 {nickname if nickname else ''} {change_wxid} 移出白名单！")
 
         elif command[0] == "白名单列表":
-            whitelist = self.db.get_whitelist_list()
+            whitelist = await self.db.get_whitelist_list()
             whitelist = "\n".join([f"{wxid} {await bot.get_nickname(wxid)}" for wxid in whitelist])
             await bot.send_text_message(message["FromWxid"], f"-----XYBot-----\n白名单列表：\n{whitelist}")
 
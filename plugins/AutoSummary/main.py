@@ -257,7 +257,7 @@ class AutoSummary(PluginBase):
                     return False
         return True
 
-    @on_file_message(priority=50)
+    @on_file_message(priority=50, legacy_media=False)
     async def handle_file_message(self, bot: 'WechatAPIClient', message: Dict) -> bool:
         if not self.dify_enable:
             return True
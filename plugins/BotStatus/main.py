@@ -28,7 +28,7 @@ class BotStatus(PluginBase):
         self.version = main_config["version"]
         self.status_message = config["status-message"]
 
-    @on_text_message
+    @on_text_message(commands=lambda self: self.command)
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
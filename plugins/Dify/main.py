@@ -12,7 +12,6 @@ from collections import defaultdict
 from enum import Enum
 import urllib.parse
 import mimetypes
-import base64
 
 import aiohttp
 import filetype
@@ -20,7 +19,7 @@ from loguru import logger
 import speech_recognition as sr
 import os
 from WechatAPI import WechatAPIClient
-from database.XYBotDB import XYBotDB
+from database.XYBotDB import AsyncXYBotDB
 from utils.decorators import *
 from utils.plugin_base import PluginBase
 from gtts import gTTS
@@ -341,7 +340,7 @@ class Dify(PluginBase):
             logger.error(f"加载Dify插件配置文件失败: {e}")
             raise
 
-        self.db = XYBotDB()
+        self.db = AsyncXYBotDB()
         self.image_cache = {}
         self.image_cache_timeout = 60
         # 添加文件存储目录配置
@@ -1038,7 +1037,7 @@ class Dify(PluginBase):
 
         return False
 
-    @on_voice_message(priority=20)
+    @on_voice_message(priority=20, legacy_media=False)
     async def handle_voice(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -1207,7 +1206,7 @@ class Dify(PluginBase):
         try:
             logger.debug(f"开始调用 Dify API - 用户消息: {processed_query}")
             logger.debug(f"文件列表: {formatted_files}")
-            conversation_id = self.db.get_llm_thread_id(message["FromWxid"], namespace="dify")
+            conversation_id = await self.db.get_llm_thread_id(message["FromWxid"], namespace="dify")
 
             user_wxid = message["SenderWxid"]
             try:
@@ -1261,7 +1260,7 @@ class Dify(PluginBase):
                         ai_resp = api_response.get("data", {}).get("answer", "")
                         new_con_id = api_response.get("data", {}).get("conversation_id", "")
                         if new_con_id and new_con_id != conversation_id:
-                            self.db.save_llm_thread_id(message["FromWxid"], new_con_id, "dify")
+                            await self.db.save_llm_thread_id(message["FromWxid"], new_con_id, "dify")
                         logger.debug(f"API代理返回: {ai_resp}")
 
                         if ai_resp:
@@ -1313,12 +1312,12 @@ class Dify(PluginBase):
 
                             new_con_id = resp_json.get("conversation_id", "")
                             if new_con_id and new_con_id != conversation_id:
-                                self.db.save_llm_thread_id(message["FromWxid"], new_con_id, "dify")
+                                await self.db.save_llm_thread_id(message["FromWxid"], new_con_id, "dify")
                             ai_resp = ai_resp.rstrip()
                             logger.debug(f"Dify响应: {ai_resp}")
                         elif resp.status == 404:
                             logger.warning("会话ID不存在，重置会话ID并重试")
-                            self.db.save_llm_thread_id(message["FromWxid"], "", "dify")
+                            await self.db.save_llm_thread_id(message["FromWxid"], "", "dify")
                             # 重要：在递归调用时必须传递原始模型，不要重新选择
                             return await self.dify(bot, message, processed_query, files=files, specific_model=model)
                         elif resp.status == 400:
@@ -1531,15 +1530,15 @@ class Dify(PluginBase):
         wxid = message["SenderWxid"]
         if wxid in self.admins and self.admin_ignore:
             return True
-        elif self.db.get_whitelist(wxid) and self.whitelist_ignore:
+        elif await self.db.get_whitelist(wxid) and self.whitelist_ignore:
             return True
         else:
-            if self.db.get_points(wxid) < (model_config or self.current_model).price:
+            if await self.db.get_points(wxid) < (model_config or self.current_model).price:
                 await bot.send_text_message(message["FromWxid"],
                                             XYBOT_PREFIX +
                                             INSUFFICIENT_POINTS_MESSAGE.format(price=(model_config or self.current_model).price))
                 return False
-            self.db.add_points(wxid, -((model_config or self.current_model).price))
+            await self.db.add_points(wxid, -((model_config or self.current_model).price))
             return True
 
     async def audio_to_text(self, bot: WechatAPIClient, message: dict) -> str:
@@ -1552,7 +1551,7 @@ class Dify(PluginBase):
         mp3_file = "temp_audio.mp3"
         try:
             with open(silk_file, "wb") as f:
-                f.write(message["Content"])
+                f.write(await message["Media"].read())
 
             command = f"ffmpeg -y -i {silk_file} -ar 16000 -ac 1 -f mp3 {mp3_file}"
             process = subprocess.run(command, shell=True, check=True, capture_output=True, text=True)
@@ -1617,38 +1616,28 @@ class Dify(PluginBase):
             logger.error(f"text-to-audio 接口调用异常: {e}")
             await bot.send_text_message(message["FromWxid"], f"{TEXT_TO_VOICE_FAILED}: {str(e)}")
 
-    @on_image_message(priority=20)
+    @on_image_message(priority=20, legacy_media=False)
     async def handle_image(self, bot: WechatAPIClient, message: dict):
         """处理图片消息"""
         if not self.enable:
             return
 
-        try:
-            # 解析XML获取图片信息
-            xml_content = message.get("Content")
-            if isinstance(xml_content, str):
-                try:
-                    # 从XML中提取base64图片数据
-                    image_base64 = xml_content.split(',')[-1]  # 获取base64部分
-                    # 转换base64为二进制
-                    try:
-                        image_content = base64.b64decode(image_base64)
-                        # 验证是否为有效的图片数据
-                        Image.open(io.BytesIO(image_content))
-
-                        self.image_cache[message["FromWxid"]] = {
-                            "content": image_content,
-                            "timestamp": time.time()
-                        }
-                        logger.debug(f"已缓存用户 {message['FromWxid']} 的图片")
-                    except Exception as e:
-                        logger.error(f"图片数据无效: {e}")
-                except Exception as e:
-                    logger.error(f"处理base64数据失败: {e}")
-                    logger.debug(f"Base64数据: {image_base64[:100]}...")  # 只打印前100个字符
-            else:
-                logger.error("图片消息内容不是字符串格式")
+        media = message.get("Media")
+        if media is None:
+            logger.error("图片消息没有 Media 字段")
+            return
 
+        try:
+            # 图片在第一次读取时才下载
+            image_content = await media.read()
+            # 验证是否为有效的图片数据
+            Image.open(io.BytesIO(image_content))
+
+            self.image_cache[message["FromWxid"]] = {
+                "content": image_content,
+                "timestamp": time.time()
+            }
+            logger.debug(f"已缓存用户 {message['FromWxid']} 的图片")
         except Exception as e:
             logger.error(f"处理图片消息失败: {e}")
             logger.error(f"错误详情: {traceback.format_exc()}")
@@ -1737,7 +1726,7 @@ class Dify(PluginBase):
             logger.error(f"下载或发送文件失败: {e}")
             await bot.send_text_message(message["FromWxid"], f"处理文件失败: {str(e)}")
 
-    @on_file_message(priority=20)
+    @on_file_message(priority=20, legacy_media=False)
     async def handle_file(self, bot: WechatAPIClient, message: dict):
         """处理文件消息"""
         if not self.enable:
@@ -47,25 +47,25 @@ class ExamplePlugin(PluginBase):
             return
         logger.info("收到了被@消息，中等优先级")
 
-    @on_voice_message()
+    @on_voice_message(legacy_media=False)
     async def handle_voice(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
         logger.info("收到了语音消息，最低优先级")
 
-    @on_image_message
+    @on_image_message(legacy_media=False)
     async def handle_image(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
         logger.info("收到了图片消息")
 
-    @on_video_message
+    @on_video_message(legacy_media=False)
     async def handle_video(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
         logger.info("收到了视频消息")
 
-    @on_file_message
+    @on_file_message(legacy_media=False)
     async def handle_file(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -1,4 +1,3 @@
-import asyncio
 import tomllib
 from datetime import datetime
 
@@ -33,7 +32,7 @@ class GetContact(PluginBase):
 
         self.admins = main_config["admins"]
 
-    @on_text_message
+    @on_text_message(commands=lambda self: self.command)
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -55,53 +54,26 @@ class GetContact(PluginBase):
         start_time = datetime.now()
         logger.info("开始获取通讯录信息时间：{}", start_time)
 
-        id_list = []
-        wx_seq, chatroom_seq = 0, 0
-        while True:
-            contact_list = await bot.get_contract_list(wx_seq, chatroom_seq)
-            id_list.extend(contact_list["ContactUsernameList"])
-            wx_seq = contact_list["CurrentWxcontactSeq"]
-            chatroom_seq = contact_list["CurrentChatRoomContactSeq"]
-            if contact_list["CountinueFlag"] != 1:
-                break
+        # 管理员主动获取通讯录时从头同步，顺便刷新缓存
+        id_list = await bot.contacts.list_ids(refresh=True)
 
         get_list_time = datetime.now()
         logger.info("获取通讯录信息列表耗时：{}", get_list_time - start_time)
 
-        # 使用协程池处理联系人信息获取
-        info_list = []
-
-        async def fetch_contacts(id_chunk):
-            contact_info = await bot.get_contact(id_chunk)
-            return contact_info
-
-        chunks = [id_list[i:i + 20] for i in range(0, len(id_list), 20)]
-
-        sem = asyncio.Semaphore(20)
-
-        async def worker(chunk):
-            async with sem:
-                return await fetch_contacts(chunk[:-1])  # 去掉最后一个ID，保持与原代码一致
-
-        tasks = [worker(chunk) for chunk in chunks]
-        results = await asyncio.gather(*tasks)
-
-        # 合并结果
-        for result in results:
-            info_list.extend(result)
+        contacts = await bot.contacts.get_many(id_list)
 
         done_time = datetime.now()
         logger.info("获取通讯录详细信息耗时：{}", done_time - get_list_time)
         logger.info("获取通讯录信息总耗时：{}", done_time - start_time)
 
         clean_info = []
-        for info in info_list:
-            if info.get("UserName", {}).get("string", ""):
-                clean_info.append({
-                    "Wxid": info.get("UserName", {}).get("string", ""),
-                    "Nickname": info.get("NickName", {}).get("string", ""),
-                    "Remark": info.get("Remark", {}).get("string"),
-                    "Alias": info.get("Alias", "")})
+        for wxid in id_list:
+            contact = contacts[wxid]
+            clean_info.append({
+                "Wxid": wxid,
+                "Nickname": contact["nickname"],
+                "Remark": contact["remark"],
+                "Alias": contact["alias"]})
 
         table = str(tabulate(clean_info, headers="keys", stralign="left"))
 
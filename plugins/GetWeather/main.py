@@ -28,7 +28,7 @@ class GetWeather(PluginBase):
         self.command_format = config["command-format"]
         self.api_key = config["api-key"]
 
-    @on_text_message
+    @on_text_message(regex="天气")
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
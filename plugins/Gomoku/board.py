@@ -0,0 +1,104 @@
+"""
+五子棋棋盘和棋盘图片
+
+- 棋盘用两个整数位棋盘表示黑子和白子，每行多留一位空位，横向和斜向数子时不会跨行
+- 落子后只从该点向四个方向数连子，不再扫描整个棋盘
+- 底图只读取一次；每局游戏保存一张已画好所有棋子的画布，落子时只画新的棋子，
+  复制画布、画高亮和PNG编码在线程池中完成
+"""
+
+import asyncio
+from functools import lru_cache
+from io import BytesIO
+from typing import Optional, Tuple
+
+from PIL import Image, ImageDraw
+
+SIZE = 17
+STRIDE = SIZE + 1  # 每行末尾留一位空位
+DIRECTIONS = (1, STRIDE, STRIDE + 1, STRIDE - 1)  # 横、竖、右下斜、左下斜
+
+BLACK, WHITE = 0, 1
+
+BOARD_IMAGE = "resource/images/gomoku_board_original.png"
+ORIGIN, SPACING, RADIUS = 24, 27, 8  # 第一个交叉点的像素坐标、格距、棋子半径
+STONE_COLORS = ("black", "white")
+
+
+class Board:
+    """17x17 五子棋棋盘"""
+
+    __slots__ = ("stones", "moves")
+
+    def __init__(self):
+        self.stones = [0, 0]  # 黑子、白子的位棋盘
+        self.moves = 0
+
+    @staticmethod
+    def _bit(x: int, y: int) -> int:
+        return 1 << (y * STRIDE + x)
+
+    def occupied(self, x: int, y: int) -> bool:
+        return bool((self.stones[BLACK] | self.stones[WHITE]) & self._bit(x, y))
+
+    def place(self, x: int, y: int, color: int) -> bool:
+        """落子，返回是否连成五子"""
+        self.stones[color] |= self._bit(x, y)
+        self.moves += 1
+        return self._five_from(y * STRIDE + x, self.stones[color])
+
+    @staticmethod
+    def _five_from(index: int, stones: int) -> bool:
+        for step in DIRECTIONS:
+            count = 1
+            i = index + step
+            while count < 5 and stones >> i & 1:
+                count += 1
+                i += step
+            i = index - step
+            while count < 5 and i >= 0 and stones >> i & 1:
+                count += 1
+                i -= step
+            if count >= 5:
+                return True
+        return False
+
+    @property
+    def full(self) -> bool:
+        return self.moves >= SIZE * SIZE
+
+
+@lru_cache(maxsize=1)
+def _base_image() -> Image.Image:
+    with Image.open(BOARD_IMAGE) as image:
+        return image.convert("RGBA")
+
+
+def _stone_box(x: int, y: int) -> Tuple[int, int, int, int]:
+    cx, cy = ORIGIN + x * SPACING, ORIGIN + y * SPACING
+    return cx - RADIUS, cy - RADIUS, cx + RADIUS, cy + RADIUS
+
+
+def _encode(canvas: Image.Image, highlight: Optional[Tuple[int, int]]) -> bytes:
+    if highlight:
+        ImageDraw.Draw(canvas).ellipse(_stone_box(*highlight), outline="red", width=2)
+    output = BytesIO()
+    canvas.save(output, format="PNG", compress_level=1)
+    return output.getvalue()
+
+
+class BoardCanvas:
+    """一局游戏的棋盘图片"""
+
+    __slots__ = ("canvas",)
+
+    def __init__(self):
+        self.canvas = _base_image().copy()
+
+    def add_stone(self, x: int, y: int, color: int):
+        ImageDraw.Draw(self.canvas).ellipse(_stone_box(x, y), fill=STONE_COLORS[color])
+
+    async def render(self, highlight: Optional[Tuple[int, int]] = None) -> bytes:
+        """返回PNG图片，highlight 为要用红圈标出的最新落子"""
+        # 复制一份再交给线程池，编码期间画布可以继续落子
+        return await asyncio.to_thread(_encode, self.canvas.copy(), highlight)
@@ -1,20 +1,38 @@
 import asyncio
-import base64
+import heapq
+import time
 import tomllib
+from dataclasses import dataclass
 from random import sample
+from typing import Optional
 
-from PIL import Image, ImageDraw
+from loguru import logger
 
 from WechatAPI import WechatAPIClient
-from database.XYBotDB import XYBotDB
+from database.XYBotDB import AsyncXYBotDB
 from utils.decorators import *
 from utils.plugin_base import PluginBase
+from .board import BLACK, WHITE, Board, BoardCanvas
+
+
+@dataclass(slots=True)
+class Game:
+    """一局五子棋"""
+    game_id: str
+    black: str
+    white: str
+    chatroom: str
+    status: str = 'inviting'  # inviting/playing
+    turn: str = ''
+    board: Optional[Board] = None
+    canvas: Optional[BoardCanvas] = None
+    deadline: float = 0.0  # 邀请或当前回合的超时时间(time.monotonic())，0为没有超时
 
 
 class Gomoku(PluginBase):
     description = "五子棋游戏"
     author = "HenryXiaoYang"
-    version = "1.0.0"
+    version = "1.1.0"
 
     def __init__(self):
         super().__init__()
@@ -33,13 +51,30 @@ class Gomoku(PluginBase):
         self.accept_game_commands = config["accept-game-commands"]
         self.play_game_commands = config["play-game-commands"]
 
-        self.db = XYBotDB()
+        self.db = AsyncXYBotDB()
 
         # 游戏状态存储
-        self.gomoku_games = {}  # 存储所有进行中的游戏
+        self.gomoku_games = {}  # 存储所有进行中的游戏，游戏ID -> Game
         self.gomoku_players = {}  # 存储玩家与游戏的对应关系
 
-    @on_text_message
+        # 所有游戏的邀请和回合超时由一个任务处理
+        self._deadlines = []  # (超时时间, 游戏ID)，超时时间被修改后旧条目到期时丢弃
+        self._wakeup = asyncio.Event()
+        self._timeout_task = None
+
+    async def on_enable(self, bot=None):
+        await super().on_enable(bot)
+        self._timeout_task = asyncio.create_task(self._run_timeouts(bot))
+
+    async def on_disable(self):
+        if self._timeout_task:
+            self._timeout_task.cancel()
+            await asyncio.gather(self._timeout_task, return_exceptions=True)
+            self._timeout_task = None
+        await super().on_disable()
+
+    @on_text_message(commands=lambda self: [*self.command, *self.create_game_commands, *self.accept_game_commands,
+                                         *self.play_game_commands])
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -97,17 +132,9 @@ class Gomoku(PluginBase):
         await bot.send_at_message(room_id, out_message, [invitee_wxid])
 
         # 创建游戏数据
-        self.gomoku_games[game_id] = {
-            'black': sender,
-            'white': invitee_wxid,
-            'board': None,
-            'turn': None,
-            'status': 'inviting',
-            'chatroom': room_id,
-            'timeout_task': asyncio.create_task(
-                self._handle_invite_timeout(bot, game_id, sender, invitee_wxid, room_id)
-            )
-        }
+        game = Game(game_id, black=sender, white=invitee_wxid, chatroom=room_id)
+        self.gomoku_games[game_id] = game
+        self._set_deadline(game)
 
     async def accept_game(self, bot: WechatAPIClient, message: dict):
         """接受五子棋游戏"""
@@ -134,29 +161,28 @@ class Gomoku(PluginBase):
 
         game = self.gomoku_games[game_id]
 
-        if game['white'] != sender:
+        if game.white != sender:
             await bot.send_text_message(room_id, '-----XYBot-----\n❌您没有被邀请参加该游戏！')
             return
 
-        if game['status'] != 'inviting':
+        if game.status != 'inviting':
             await bot.send_text_message(room_id, '-----XYBot-----\n❌该游戏已经开始或结束！')
             return
 
-        if room_id != game['chatroom']:
+        if room_id != game.chatroom:
             await bot.send_text_message(room_id, '-----XYBot-----\n❌请在原群聊中接受邀请！')
             return
 
-        # 取消超时任务
-        game['timeout_task'].cancel()
-
         # 初始化游戏
-        game['status'] = 'playing'
-        game['board'] = [[0 for _ in range(17)] for _ in range(17)]
-        game['turn'] = game['black']
+        game.status = 'playing'
+        game.board = Board()
+        game.canvas = BoardCanvas()
+        game.turn = game.black
+        game.deadline = 0
 
         # 发送游戏开始信息
-        black_nick = await bot.get_nickname(game['black'])
-        white_nick = await bot.get_nickname(game['white'])
+        black_nick = await bot.get_nickname(game.black)
+        white_nick = await bot.get_nickname(game.white)
 
         start_msg = (
             f"-----XYBot-----\n"
@@ -175,13 +201,10 @@ class Gomoku(PluginBase):
         await bot.send_text_message(room_id, start_msg)
 
         # 发送棋盘
-        board_base64 = self._draw_board(game_id)
-        await bot.send_image_message(room_id, board_base64)
+        await bot.send_image_message(room_id, await game.canvas.render())
 
         # 设置回合超时
-        game['timeout_task'] = asyncio.create_task(
-            self._handle_turn_timeout(bot, game_id, game['black'], room_id)
-        )
+        self._set_deadline(game)
 
     async def play_game(self, bot: WechatAPIClient, message: dict):
         """处理下棋操作"""
@@ -207,11 +230,11 @@ class Gomoku(PluginBase):
         game_id = self.gomoku_players[sender]
         game = self.gomoku_games[game_id]
 
-        if game['status'] != 'playing':
+        if game.status != 'playing':
             await bot.send_text_message(room_id, '-----XYBot-----\n❌游戏已经结束！')
             return
 
-        if sender != game['turn']:
+        if sender != game.turn:
             await bot.send_text_message(room_id, '-----XYBot-----\n❌还没到您的回合！')
             return
 
@@ -228,27 +251,28 @@ class Gomoku(PluginBase):
             await bot.send_text_message(room_id, '-----XYBot-----\n❌坐标超出范围！')
             return
 
-        if game['board'][y][x] != 0:
+        if game.board.occupied(x, y):
             await bot.send_text_message(room_id, '-----XYBot-----\n❌该位置已有棋子！')
             return
 
-        # 取消超时任务
-        game['timeout_task'].cancel()
+        # 取消回合超时
+        game.deadline = 0
 
         # 落子
-        game['board'][y][x] = 1 if sender == game['black'] else 2
+        color = BLACK if sender == game.black else WHITE
+        won = game.board.place(x, y, color)
+        game.canvas.add_stone(x, y, color)
 
         # 绘制并发送新棋盘
-        board_base64 = self._draw_board(game_id, highlight=(x, y))
-        await bot.send_image_message(room_id, board_base64)
+        await bot.send_image_message(room_id, await game.canvas.render(highlight=(x, y)))
 
         # 检查是否获胜
-        winner = self._check_winner(game_id)
+        winner = ('black' if color == BLACK else 'white') if won else 'draw' if game.board.full else ''
         if winner:
             if winner == 'draw':
                 await bot.send_text_message(room_id, f'-----XYBot-----\n🎉五子棋游戏 {game_id} 结束！\n\n平局！⚖️')
             else:
-                winner_wxid = game['black'] if winner == 'black' else game['white']
+                winner_wxid = game.black if winner == 'black' else game.white
                 winner_nick = await bot.get_nickname(winner_wxid)
                 await bot.send_text_message(
                     room_id,
@@ -257,19 +281,17 @@ class Gomoku(PluginBase):
                 )
 
             # 清理游戏数据
-            self.gomoku_players.pop(game['black'])
-            self.gomoku_players.pop(game['white'])
-            self.gomoku_games.pop(game_id)
+            self._end_game(game)
             return
 
         # 切换回合
-        game['turn'] = game['white'] if sender == game['black'] else game['black']
+        game.turn = game.white if sender == game.black else game.black
 
         # 发送回合信息
         current_nick = await bot.get_nickname(sender)
-        next_nick = await bot.get_nickname(game['turn'])
-        current_color = '⚫️' if sender == game['black'] else '⚪️'
-        next_color = '⚫️' if game['turn'] == game['black'] else '⚪️'
+        next_nick = await bot.get_nickname(game.turn)
+        current_color = '⚫️' if sender == game.black else '⚪️'
+        next_color = '⚫️' if game.turn == game.black else '⚪️'
 
         turn_msg = (
             f"-----XYBot-----\n"
@@ -284,9 +306,7 @@ class Gomoku(PluginBase):
         await bot.send_text_message(room_id, turn_msg)
 
         # 设置新的回合超时
-        game['timeout_task'] = asyncio.create_task(
-            self._handle_turn_timeout(bot, game_id, game['turn'], room_id)
-        )
+        self._set_deadline(game)
 
     def _generate_game_id(self) -> str:
         """生成游戏ID"""
@@ -296,114 +316,69 @@ class Gomoku(PluginBase):
             if game_id not in self.gomoku_games:
                 return game_id
 
-    def _draw_board(self, game_id: str, highlight: tuple = None) -> str:
-        """绘制棋盘并返回base64编码"""
-        board_img = Image.open('resource/images/gomoku_board_original.png')
-        draw = ImageDraw.Draw(board_img)
-
-        board = self.gomoku_games[game_id]['board']
-
-        # 绘制棋子
-        for y in range(17):
-            for x in range(17):
-                if board[y][x] != 0:
-                    color = 'black' if board[y][x] == 1 else 'white'
-                    draw.ellipse(
-                        (24 + x * 27 - 8, 24 + y * 27 - 8,
-                         24 + x * 27 + 8, 24 + y * 27 + 8),
-                        fill=color
-                    )
-
-        # 绘制高亮
-        if highlight:
-            x, y = highlight
-            draw.ellipse(
-                (24 + x * 27 - 8, 24 + y * 27 - 8,
-                 24 + x * 27 + 8, 24 + y * 27 + 8),
-                outline='red',
-                width=2
-            )
-
-        # 转换为bytes
-        from io import BytesIO
-        img_byte_arr = BytesIO()
-        board_img.save(img_byte_arr, format='PNG')
-        img_byte_arr = img_byte_arr.getvalue()
-
-        # 转换为base64
-        return base64.b64encode(img_byte_arr).decode()
-
-    def _check_winner(self, game_id: str) -> str:
-        """检查是否有获胜者"""
-        board = self.gomoku_games[game_id]['board']
-
-        # 检查所有方向
-        directions = [(0, 1), (1, 0), (1, 1), (1, -1)]
-
-        for y in range(17):
-            for x in range(17):
-                if board[y][x] == 0:
+    def _end_game(self, game: Game):
+        """清理游戏数据"""
+        self.gomoku_players.pop(game.black, None)
+        self.gomoku_players.pop(game.white, None)
+        self.gomoku_games.pop(game.game_id, None)
+
+    def _set_deadline(self, game: Game):
+        """从现在开始计算邀请或回合超时"""
+        game.deadline = time.monotonic() + self.timeout
+        heapq.heappush(self._deadlines, (game.deadline, game.game_id))
+        if self._deadlines[0][1] == game.game_id:
+            self._wakeup.set()
+
+    async def _run_timeouts(self, bot: WechatAPIClient):
+        """睡眠到最早的超时时间，处理所有到期的游戏"""
+        while True:
+            now = time.monotonic()
+            while self._deadlines and self._deadlines[0][0] <= now:
+                deadline, game_id = heapq.heappop(self._deadlines)
+                game = self.gomoku_games.get(game_id)
+                # 已经结束、已经落子或者重新计时的游戏
+                if game is None or game.deadline != deadline:
                     continue
-
-                for dx, dy in directions:
-                    count = 1
-                    nx, ny = x + dx, y + dy
-
-                    while (0 <= nx < 17 and 0 <= ny < 17 and
-                           board[ny][nx] == board[y][x]):
-                        count += 1
-                        nx += dx
-                        ny += dy
-
-                    if count >= 5:
-                        return 'black' if board[y][x] == 1 else 'white'
-
-        # 检查平局
-        if all(board[y][x] != 0 for y in range(17) for x in range(17)):
-            return 'draw'
-
-        return ''
-
-    async def _handle_invite_timeout(self, bot: WechatAPIClient, game_id: str,
-                                     inviter: str, invitee: str, room_id: str):
+                try:
+                    if game.status == 'inviting':
+                        await self._handle_invite_timeout(bot, game)
+                    else:
+                        await self._handle_turn_timeout(bot, game)
+                except Exception as e:
+                    logger.exception(f"处理五子棋游戏 {game_id} 超时出错: {e}")
+
+            self._wakeup.clear()
+            timeout = self._deadlines[0][0] - time.monotonic() if self._deadlines else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _handle_invite_timeout(self, bot: WechatAPIClient, game: Game):
         """处理邀请超时"""
-        await asyncio.sleep(self.timeout)
+        # 清理游戏数据
+        self._end_game(game)
 
-        if (game_id in self.gomoku_games and
-                self.gomoku_games[game_id]['status'] == 'inviting'):
-            # 清理游戏数据
-            self.gomoku_players.pop(inviter)
-            self.gomoku_players.pop(invitee)
-            self.gomoku_games.pop(game_id)
-
-            await bot.send_at_message(
-                room_id,
-                f'-----XYBot-----\n❌五子棋游戏 {game_id} 邀请超时！',
-                [inviter]
-            )
-
-    async def _handle_turn_timeout(self, bot: WechatAPIClient, game_id: str,
-                                   player: str, room_id: str):
+        await bot.send_at_message(
+            game.chatroom,
+            f'-----XYBot-----\n❌五子棋游戏 {game.game_id} 邀请超时！',
+            [game.black]
+        )
+
+    async def _handle_turn_timeout(self, bot: WechatAPIClient, game: Game):
         """处理回合超时"""
-        await asyncio.sleep(self.timeout)
+        player = game.turn
+        winner = game.white if player == game.black else game.black
 
-        if (game_id in self.gomoku_games and
-                self.gomoku_games[game_id]['status'] == 'playing' and
-                self.gomoku_games[game_id]['turn'] == player):
-            game = self.gomoku_games[game_id]
-            winner = game['white'] if player == game['black'] else game['black']
+        # 清理游戏数据
+        self._end_game(game)
 
-            # 清理游戏数据
-            self.gomoku_players.pop(game['black'])
-            self.gomoku_players.pop(game['white'])
-            self.gomoku_games.pop(game_id)
-
-            loser_nick = await bot.get_nickname(player)
-            winner_nick = await bot.get_nickname(winner)
-
-            await bot.send_text_message(
-                room_id,
-                f'-----XYBot-----\n'
-                f'{loser_nick} 落子超时！\n'
-                f'🏆 {winner_nick} 获胜！'
-            )
+        loser_nick = await bot.get_nickname(player)
+        winner_nick = await bot.get_nickname(winner)
+
+        await bot.send_text_message(
+            game.chatroom,
+            f'-----XYBot-----\n'
+            f'{loser_nick} 落子超时！\n'
+            f'🏆 {winner_nick} 获胜！'
+        )
@@ -1,11 +1,10 @@
-import asyncio
 import tomllib
 from datetime import datetime
-from random import randint
 
 import aiohttp
 
 from WechatAPI import WechatAPIClient
+from utils.broadcast import Broadcaster
 from utils.decorators import *
 from utils.plugin_base import PluginBase
 
@@ -30,21 +29,6 @@ class GoodMorning(PluginBase):
         if not self.enable:
             return
 
-        id_list = []
-        wx_seq, chatroom_seq = 0, 0
-        while True:
-            contact_list = await bot.get_contract_list(wx_seq, chatroom_seq)
-            id_list.extend(contact_list["ContactUsernameList"])
-            wx_seq = contact_list["CurrentWxcontactSeq"]
-            chatroom_seq = contact_list["CurrentChatRoomContactSeq"]
-            if contact_list["CountinueFlag"] != 1:
-                break
-
-        chatrooms = []
-        for id in id_list:
-            if id.endswith("@chatroom"):
-                chatrooms.append(id)
-
         async with aiohttp.request("GET", "https://zj.v.api.aa1.cn/api/bk/?num=1&type=json") as req:
             resp = await req.json()
             history_today = "N/A"
@@ -58,6 +42,4 @@ class GoodMorning(PluginBase):
                    "📖历史上的今天：\n"
                    f"{history_today}")
 
-        for chatroom in chatrooms:
-            await bot.send_text_message(chatroom, message)
-            await asyncio.sleep(randint(1, 5))
+        await Broadcaster().send(bot, "GoodMorning.daily_task", text=message)
@@ -6,7 +6,6 @@ import asyncio
 from io import BytesIO
 from typing import Optional
 import xml.etree.ElementTree as ET # 导入 XML 解析库
-import base64
 from PIL import Image # 导入 Pillow Image
 
 from loguru import logger
@@ -107,7 +106,7 @@ class KolorsVirtualTryOn(PluginBase):
             self.enable = False
     
     async def save_image_from_message(self, bot: WechatAPIClient, message: dict) -> Optional[str]:
-        """从消息中获取并保存图片 (根据文档，Content 字段包含 Base64)
+        """从消息中获取并保存图片 (图片内容在 Media 字段中)
 
         Args:
             bot: 微信API客户端
@@ -120,31 +119,26 @@ class KolorsVirtualTryOn(PluginBase):
             timestamp = int(time.time())
             image_path = f"resource/KolorsVirtualTryOn/temp/image_{timestamp}.jpg"
             
-            # 从消息中获取 Base64 内容
-            image_base64 = message.get("Content")
-            if not image_base64 or not isinstance(image_base64, str):
-                logger.error(f"图片消息的 Content 字段无效或不是字符串: {type(image_base64)}")
+            # 图片在第一次读取时才下载
+            media = message.get("Media")
+            if media is None:
+                logger.error("图片消息没有 Media 字段")
                 # 打印消息键以供调试
-                logger.debug(f"图片消息 Keys: {list(message.keys())}") 
+                logger.debug(f"图片消息 Keys: {list(message.keys())}")
                 return None
-            
-            # Base64 解码
+
             try:
-                # 移除可能的 data:image/...;base64, 前缀 (虽然文档示例没有，但保险起见)
-                if "," in image_base64:
-                    image_base64 = image_base64.split(',')[-1]
-                image_data = base64.b64decode(image_base64)
-            except Exception as decode_error:
-                logger.error(f"Base64 解码失败: {decode_error}")
-                logger.debug(f"Base64 字符串 (前100字符): {image_base64[:100]}...")
+                image_data = await media.read()
+            except Exception as download_error:
+                logger.error(f"下载图片失败: {download_error}")
                 return None
-            
-            # 验证图片数据是否为 bytes 类型且非空
-            if not isinstance(image_data, bytes) or len(image_data) == 0:
-                logger.error(f"解码后的图片数据无效或为空")
+
+            # 验证图片数据是否非空
+            if not image_data:
+                logger.error(f"下载的图片数据为空")
                 return None
-                
-            logger.info(f"成功从 Content 解码图片，大小: {len(image_data)} bytes")
+
+            logger.info(f"成功下载图片，大小: {len(image_data)} bytes")
             
             # 新增验证步骤
             try:
@@ -327,7 +321,7 @@ class KolorsVirtualTryOn(PluginBase):
         # 如果处理了命令，返回 False 阻止其他插件；否则返回 True
         return not command_handled
     
-    @on_image_message(priority=90) # 提高图片处理优先级
+    @on_image_message(priority=90, legacy_media=False) # 提高图片处理优先级
     async def handle_image(self, bot: WechatAPIClient, message: dict):
         """处理图片消息"""
         logger.info(f"KolorsVirtualTryOn收到图片消息: {message.get('MsgId')}")
@@ -1,9 +1,8 @@
-import asyncio
 import tomllib
 from random import choice
 
 from WechatAPI import WechatAPIClient
-from database.XYBotDB import XYBotDB
+from database.XYBotDB import AsyncXYBotDB
 from utils.decorators import *
 from utils.plugin_base import PluginBase
 
@@ -25,9 +24,9 @@ class Leaderboard(PluginBase):
         self.command = config["command"]
         self.max_count = config["max-count"]
 
-        self.db = XYBotDB()
+        self.db = AsyncXYBotDB()
 
-    @on_text_message
+    @on_text_message(commands=lambda self: self.command)
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -39,11 +38,11 @@ class Leaderboard(PluginBase):
             return
 
         if "群" in command[0]:
-            chatroom_members = await bot.get_chatroom_member_list(message["FromWxid"])
+            chatroom_members = await bot.contacts.members(message["FromWxid"])
             data = []
+            member_points = await self.db.get_points_many(member["UserName"] for member in chatroom_members)
             for member in chatroom_members:
-                wxid = member["UserName"]
-                points = self.db.get_points(wxid)
+                points = member_points[member["UserName"]]
                 if points == 0:
                     continue
                 data.append((member["NickName"], points))
@@ -61,30 +60,10 @@ class Leaderboard(PluginBase):
                 out_message += f"\n{emoji}{'' if emoji else str(rank) + '.'} {nickname}   {points}分  {random_emoji}"
 
         else:
-            data = self.db.get_leaderboard(self.max_count)
+            data = await self.db.get_leaderboard(self.max_count)
 
             wxids = [i[0] for i in data]
-            nicknames = []
-
-            async def get_nicknames_chunk(chunk_wxids):
-                return await bot.get_nickname(chunk_wxids)
-
-            # 将wxids分成每组20个
-            chunks = [wxids[i:i + 20] for i in range(0, len(wxids), 20)]
-            # 使用信号量限制并发数为2
-            sem = asyncio.Semaphore(2)
-
-            async def worker(chunk):
-                async with sem:
-                    return await get_nicknames_chunk(chunk)
-
-            # 并发执行所有请求
-            tasks = [worker(chunk) for chunk in chunks]
-            results = await asyncio.gather(*tasks)
-
-            # 将所有结果合并到nicknames列表中
-            for result in results:
-                nicknames.extend(result)
+            nicknames = await bot.contacts.nicknames(wxids)
 
             out_message = "-----XYBot积分排行榜-----"
             rank_emojis = ["👑", "🥈", "🥉"]
@@ -3,7 +3,7 @@ import tomllib
 from tabulate import tabulate
 
 from WechatAPI import WechatAPIClient
-from database.XYBotDB import XYBotDB
+from database.XYBotDB import AsyncXYBotDB
 from utils.decorators import *
 from utils.plugin_base import PluginBase
 from utils.plugin_manager import plugin_manager
@@ -17,7 +17,7 @@ class ManagePlugin(PluginBase):
     def __init__(self):
         super().__init__()
 
-        self.db = XYBotDB()
+        self.db = AsyncXYBotDB()
 
         with open("plugins/ManagePlugin/config.toml", "rb") as f:
             plugin_config = tomllib.load(f)
@@ -31,7 +31,7 @@ class ManagePlugin(PluginBase):
         self.command = plugin_config["command"]
         self.admins = main_config["admins"]
 
-    @on_text_message
+    @on_text_message(commands=lambda self: self.command)
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         content = str(message["Content"]).strip()
         command = content.split(" ")
@@ -6,7 +6,6 @@ import uuid # For temporary file names
 import aiofiles # For async file operations
 import base64 # <-- Import base64
 import math # <-- Import math for ceiling division
-from pydub import AudioSegment # <-- Import pydub
 import io # Already imported by fish_audio_sdk, but good practice
 from typing import Dict, List, Any, Optional, Tuple, AsyncGenerator
 from loguru import logger
@@ -15,7 +14,7 @@ import time
 import re
 import aiohttp
 
-from WechatAPI import WechatAPIClient
+from WechatAPI import WechatAPIClient, transcoder
 from utils.decorators import on_text_message, on_at_message
 from utils.plugin_base import PluginBase
 
@@ -1073,9 +1072,8 @@ class OpenManus(PluginBase):
                     
                     # 验证音频文件是否有效
                     try:
-                        # 尝试使用pydub加载音频文件以验证其有效性
-                        audio_segment = AudioSegment.from_file(audio_path, format=audio_format)
-                        duration_ms = len(audio_segment)
+                        # 在转码进程池中解码以验证音频有效性，不阻塞事件循环
+                        duration_ms = await transcoder.duration(audio_data, audio_format)
                         
                         # 直接使用原格式发送
                         try:
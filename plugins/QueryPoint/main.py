@@ -1,7 +1,7 @@
 import tomllib
 
 from WechatAPI import WechatAPIClient
-from database.XYBotDB import XYBotDB
+from database.XYBotDB import AsyncXYBotDB
 from utils.decorators import *
 from utils.plugin_base import PluginBase
 
@@ -22,9 +22,9 @@ class QueryPoint(PluginBase):
         self.enable = config["enable"]
         self.command = config["command"]
 
-        self.db = XYBotDB()
+        self.db = AsyncXYBotDB()
 
-    @on_text_message
+    @on_text_message(commands=lambda self: self.command)
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -37,7 +37,7 @@ class QueryPoint(PluginBase):
 
         query_wxid = message["SenderWxid"]
 
-        points = self.db.get_points(query_wxid)
+        points = await self.db.get_points(query_wxid)
 
         output = ("\n"
                   f"-----XYBot-----\n"
@@ -25,7 +25,7 @@ class RandomPicture(PluginBase):
         self.enable = config["enable"]
         self.command = config["command"]
 
-    @on_text_message
+    @on_text_message(commands=lambda self: self.command)
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -1,14 +1,15 @@
 import asyncio
+import heapq
 import re
 import tomllib
 from typing import List, Optional
 
 from loguru import logger
 from WechatAPI import WechatAPIClient
-from database.XYBotDB import XYBotDB
-from utils.decorators import on_text_message, schedule
+from database.XYBotDB import AsyncXYBotDB
+from database.reminderDB import DELETED, RECURRING_TYPES, Reminder as ReminderRecord, ReminderDB, next_fire_time
+from utils.decorators import on_text_message
 from utils.plugin_base import PluginBase
-import os
 import sqlite3
 from datetime import datetime, timedelta
 from dateutil import parser
@@ -19,7 +20,7 @@ from utils.event_manager import EventManager
 class Reminder(PluginBase):
     description = "备忘录插件"
     author = "老夏的金库"
-    version = "1.2.1"  # 更新版本号
+    version = "1.3.0"  # 更新版本号
 
     def __init__(self):
         super().__init__()
@@ -40,10 +41,17 @@ class Reminder(PluginBase):
         self.whitelist_ignore = plugin_config["whitelist_ignore"]
         self.http_proxy = plugin_config["http-proxy"]
 
-        self.db = XYBotDB()
+        self.misfire_grace = plugin_config.get("misfire-grace", 60)
+
+        self.db = AsyncXYBotDB()
+        self.store = ReminderDB()
         self.processed_message_ids = set()
-        self.data_dir = "reminder_data"
-        os.makedirs(self.data_dir, exist_ok=True)
+
+        self._heap = []  # (提醒时间戳, 备忘录ID)，改期或删除后旧条目在到期时丢弃
+        self._wakeup = asyncio.Event()
+        self._loop = None
+        self._scheduler_task = None
+        self._send_tasks = set()
 
         self.store_command = "记录"
         self.query_command = ["我的记录"]
@@ -58,35 +66,7 @@ class Reminder(PluginBase):
             # ... 添加其他插件的触发命令
         ]
 
-    def get_db_path(self, wxid: str) -> str:
-        db_name = f"user_{wxid}.db"
-        return os.path.join(self.data_dir, db_name)
-
-    def create_table(self, db_path: str):
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        try:
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS reminders (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    wxid TEXT NOT NULL,
-                    content TEXT NOT NULL,
-                    reminder_type TEXT NOT NULL,
-                    reminder_time TEXT NOT NULL,
-                    chat_id TEXT NOT NULL,  -- 新增字段，存储创建时的聊天ID
-                    is_done INTEGER NOT NULL DEFAULT 0
-                )
-            """)
-            conn.commit()
-        except sqlite3.Error as e:
-            logger.exception(f"创建数据库表失败: {e}")
-        finally:
-            conn.close()
-
     async def store_reminder(self, wxid: str, content: str, reminder_type: str, reminder_time: str, chat_id: str) -> Optional[int]:
-        db_path = self.get_db_path(wxid)
-        self.create_table(db_path)
-        
         # 如果是相对时间类型，计算绝对时间并转换为 one_time
         if reminder_type in ["minutes_later", "hours_later", "days_later"]:
             now = datetime.now()
@@ -103,74 +83,46 @@ class Reminder(PluginBase):
             reminder_type = "one_time"
 
         try:
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO reminders (wxid, content, reminder_type, reminder_time, chat_id) VALUES (?, ?, ?, ?, ?)",
-                           (wxid, content, reminder_type, reminder_time, chat_id))
-            new_id = cursor.lastrowid
-            conn.commit()
+            reminder = self.store.add(wxid, content, reminder_type, reminder_time, chat_id)
             logger.info(f"用户 {wxid} 存储备忘录成功: {content}, {reminder_type}, {reminder_time}, chat_id={chat_id}")
-            return new_id
+            return reminder.id
         except sqlite3.Error as e:
             logger.exception(f"存储备忘录失败: {e}")
             return None
-        finally:
-            conn.close()
 
     async def query_reminders(self, wxid: str) -> List[tuple]:
-        db_path = self.get_db_path(wxid)
-        if not os.path.exists(db_path):
-            return []
         try:
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, content, reminder_type, reminder_time, chat_id FROM reminders WHERE wxid = ? AND is_done = 0", (wxid,))
-            results = cursor.fetchall()
-            conn.close()
-            return results
+            return [(r.id, r.content, r.reminder_type, r.reminder_time, r.chat_id)
+                    for r in self.store.list_by_wxid(wxid)]
         except sqlite3.Error as e:
             logger.exception(f"查询用户 {wxid} 的备忘录失败: {e}")
             return []
-        finally:
-            conn.close()
 
     async def delete_reminder(self, wxid: str, reminder_id: int) -> bool:
-        db_path = self.get_db_path(wxid)
-        if not os.path.exists(db_path):
-            logger.warning(f"用户 {wxid} 的数据库不存在")
-            return False
+        # 定时器中的条目在到期时发现记录不存在后丢弃
         try:
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM reminders WHERE id = ? AND wxid = ?", (reminder_id, wxid))
-            conn.commit()
+            if not self.store.delete(reminder_id, wxid):
+                logger.warning(f"用户 {wxid} 没有备忘录 {reminder_id}")
+                return False
             logger.info(f"删除备忘录 {reminder_id} 成功")
             return True
         except sqlite3.Error as e:
             logger.exception(f"删除备忘录失败: {e}")
             return False
-        finally:
-            conn.close()
 
     async def delete_all_reminders(self, wxid: str) -> bool:
-        db_path = self.get_db_path(wxid)
-        if not os.path.exists(db_path):
-            logger.warning(f"用户 {wxid} 的数据库不存在")
-            return False
         try:
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM reminders WHERE wxid = ?", (wxid,))
-            conn.commit()
+            if not self.store.delete_by_wxid(wxid):
+                logger.warning(f"用户 {wxid} 没有备忘录")
+                return False
             logger.info(f"删除用户 {wxid} 的所有备忘录成功")
             return True
         except sqlite3.Error as e:
             logger.exception(f"删除所有备忘录失败: {e}")
             return False
-        finally:
-            conn.close()
 
-    @on_text_message(priority=90)
+    @on_text_message(priority=90, prefixes=lambda self: [self.store_command, *self.query_command, self.delete_command,
+                                                          self.help_command])
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         wxid = message["SenderWxid"]
         content = message["Content"].strip()
@@ -453,59 +405,94 @@ class Reminder(PluginBase):
 
         return True
 
-    @schedule('interval', seconds=30)
-    async def check_reminders(self, bot: WechatAPIClient):
-        now = datetime.now()
-        buffer_time = timedelta(seconds=30)
-        check_start = now - buffer_time
-        check_end = now + buffer_time
-        
-        wxids = set()
-
-        for filename in os.listdir(self.data_dir):
-            if filename.startswith("user_") and filename.endswith(".db"):
-                wxid = filename[5:-3]
-                wxids.add(wxid)
+    async def on_enable(self, bot=None):
+        await super().on_enable(bot)
+        self._loop = asyncio.get_running_loop()
+        self._load_schedule()
+        self.store.subscribe(self._on_store_change)
+        self._scheduler_task = asyncio.create_task(self._run_scheduler(bot))
+
+    async def on_disable(self):
+        self.store.unsubscribe(self._on_store_change)
+        if self._scheduler_task:
+            self._scheduler_task.cancel()
+            await asyncio.gather(self._scheduler_task, return_exceptions=True)
+            self._scheduler_task = None
+        await super().on_disable()
+
+    def _schedule(self, fire_time: Optional[float], reminder_id: int):
+        """把备忘录加入定时器，比当前最早的还早时唤醒调度任务"""
+        if fire_time is None:
+            return
+        heapq.heappush(self._heap, (fire_time, reminder_id))
+        if self._heap[0][1] == reminder_id:
+            self._wakeup.set()
+
+    def _on_store_change(self, action: str, reminder_id: int, reminder: Optional[ReminderRecord]):
+        """ReminderDB 的变更通知，管理后台的修改来自另一个线程"""
+        if action == DELETED or reminder is None:
+            return  # 堆中的旧条目到期时丢弃
+        self._loop.call_soon_threadsafe(self._schedule, reminder.next_fire_time, reminder_id)
+
+    def _load_schedule(self):
+        """从数据库装载所有待提醒的备忘录
+
+        机器人停止期间错过的重复提醒不再补发，直接排到下一次；错过的一次性提醒立即发送。
+        """
+        now = time.time()
+        self._heap = []
+        for fire_time, reminder_id in self.store.schedule_entries():
+            if fire_time < now - self.misfire_grace:
+                reminder = self.store.get(reminder_id)
+                if reminder.reminder_type in RECURRING_TYPES:
+                    fire_time = next_fire_time(reminder.reminder_type, reminder.reminder_time)
+                    fire_time = fire_time.timestamp() if fire_time else None
+                    self.store.reschedule(reminder_id, fire_time)
+                    if fire_time is None:
+                        continue
+            self._heap.append((fire_time, reminder_id))
+        heapq.heapify(self._heap)
+        logger.info(f"已装载 {len(self._heap)} 条待提醒的备忘录")
+
+    async def _run_scheduler(self, bot: WechatAPIClient):
+        """按最小堆睡眠到最早的提醒时间，新增了更早的提醒时被唤醒"""
+        while True:
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                fire_time, reminder_id = heapq.heappop(self._heap)
+                try:
+                    await self._fire(bot, fire_time, reminder_id)
+                except Exception as e:
+                    logger.exception(f"处理备忘录 {reminder_id} 时出错: {e}")
 
-        for wxid in wxids:
+            self._wakeup.clear()
+            # 最多睡 5 分钟，系统时间被调整时也能及时纠正
+            timeout = min(self._heap[0][0] - time.time(), 300) if self._heap else 300
             try:
-                reminders = await self.query_reminders(wxid)
-                if reminders:
-                    for id, content, reminder_type, reminder_time, chat_id in reminders:
-                        try:
-                            if reminder_type == "every_day":
-                                next_time = await self.calculate_remind_time("every_day", reminder_time)
-                            else:
-                                next_time = await self.calculate_remind_time(reminder_type, reminder_time)
-                            
-                            if next_time and check_start <= next_time <= check_end:
-                                await self.send_reminder(bot, wxid, content, id, chat_id)
-                                
-                                if reminder_type in ["daily", "weekly", "monthly", "yearly", "every_hour", "every_day", "every_week"]:
-                                    new_next_time = await self.calculate_remind_time(reminder_type, reminder_time)
-                                    if new_next_time:
-                                        db_path = self.get_db_path(wxid)
-                                        conn = sqlite3.connect(db_path)
-                                        cursor = conn.cursor()
-                                        try:
-                                            cursor.execute(
-                                                "UPDATE reminders SET reminder_time = ? WHERE id = ?",
-                                                (reminder_time, id)
-                                            )
-                                            conn.commit()
-                                            logger.info(f"已更新提醒 {id} 的下次提醒时间为 {new_next_time}")
-                                        except sqlite3.Error as e:
-                                            logger.error(f"更新提醒时间失败: {e}")
-                                        finally:
-                                            conn.close()
-                                else:
-                                    await self.delete_reminder(wxid, id)
-                                
-                        except ValueError as e:
-                            logger.warning(f"时间格式错误，无法执行提醒 {id}: {e}")
-                            
-            except Exception as e:
-                logger.exception(f"处理用户 {wxid} 的提醒时出错: {e}")
+                await asyncio.wait_for(self._wakeup.wait(), max(timeout, 0))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _fire(self, bot: WechatAPIClient, fire_time: float, reminder_id: int):
+        reminder = self.store.get(reminder_id)
+        # 已删除或者已改期的备忘录，堆中的旧条目直接丢弃
+        if reminder is None or reminder.is_done or reminder.next_fire_time != fire_time:
+            return
+
+        if reminder.reminder_type in RECURRING_TYPES:
+            next_time = next_fire_time(reminder.reminder_type, reminder.reminder_time,
+                                       after=datetime.fromtimestamp(fire_time))
+            next_time = next_time.timestamp() if next_time else None
+            self.store.reschedule(reminder_id, next_time)  # 通过变更通知加入定时器
+            if next_time:
+                logger.info(f"已更新提醒 {reminder_id} 的下次提醒时间为 {datetime.fromtimestamp(next_time)}")
+        else:
+            self.store.delete(reminder_id)
+
+        task = asyncio.create_task(self.send_reminder(bot, reminder.wxid, reminder.content, reminder_id,
+                                                      reminder.chat_id))
+        self._send_tasks.add(task)
+        task.add_done_callback(self._send_tasks.discard)
 
     async def send_reminder(self, bot: WechatAPIClient, wxid: str, content: str, reminder_id: int, chat_id: str):
         try:
@@ -584,113 +571,18 @@ class Reminder(PluginBase):
 
         if wxid in self.admins and self.admin_ignore:
             return True
-        elif self.db.get_whitelist(wxid) and self.whitelist_ignore:
+        elif await self.db.get_whitelist(wxid) and self.whitelist_ignore:
             return True
         else:
-            if self.db.get_points(wxid) < self.price:
+            if await self.db.get_points(wxid) < self.price:
                 error_msg = f"\n😭-----老夏的金库-----\n你的积分不够啦！需要 {self.price} 积分"
                 if is_group_chat:
                     await bot.send_at_message(chat_id, error_msg, [wxid])
                 else:
                     await bot.send_text_message(chat_id, error_msg)
                 return False
-            self.db.add_points(wxid, -self.price)
+            await self.db.add_points(wxid, -self.price)
             return True
 
     async def calculate_remind_time(self, reminder_type: str, reminder_time: str) -> Optional[datetime]:
-        now = datetime.now()
-        try:
-            if reminder_type == "one_time":
-                if isinstance(reminder_time, str):
-                    try:
-                        return datetime.strptime(reminder_time, '%Y-%m-%d %H:%M:%S')
-                    except ValueError:
-                        logger.warning(f"无法解析 one_time 时间格式: {reminder_time}")
-                        return None
-                return None
-                
-            elif reminder_type == "every_day":
-                if not reminder_time:
-                    return None
-                hour, minute = map(int, reminder_time.split(":"))
-                next_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
-                if next_time <= now:
-                    next_time += timedelta(days=1)
-                return next_time
-            
-            elif reminder_type == "daily":
-                hour, minute = map(int, reminder_time.split(":"))
-                next_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
-                if next_time <= now:
-                    next_time += timedelta(days=1)
-                return next_time
-            
-            elif reminder_type == "weekly":
-                weekday, time_str = reminder_time.split()
-                weekday = int(weekday)
-                hour, minute = map(int, time_str.split(":"))
-                days_ahead = weekday - now.weekday()
-                if days_ahead <= 0:
-                    days_ahead += 7
-                next_time = now + timedelta(days=days_ahead)
-                return next_time.replace(hour=hour, minute=minute, second=0, microsecond=0)
-            
-            elif reminder_type == "monthly":
-                day, time_str = reminder_time.split()
-                day = int(day)
-                hour, minute = map(int, time_str.split(":"))
-                next_time = now.replace(day=day, hour=hour, minute=minute, second=0, microsecond=0)
-                if next_time <= now:
-                    month = next_time.month + 1
-                    year = next_time.year
-                    if month > 12:
-                        month = 1
-                        year += 1
-                    next_time = next_time.replace(year=year, month=month)
-                return next_time
-            
-            elif reminder_type == "yearly":
-                month, day, time_str = reminder_time.split()
-                month, day = int(month), int(day)
-                hour, minute = map(int, time_str.split(":"))
-                next_time = now.replace(month=month, day=day, hour=hour, minute=minute, second=0, microsecond=0)
-                if next_time <= now:
-                    next_time = next_time.replace(year=now.year + 1)
-                return next_time
-            
-            elif reminder_type == "every_hour":
-                next_time = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
-                return next_time
-            
-            elif reminder_type == "every_week":
-                hour, minute = map(int, reminder_time.split(":"))
-                next_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
-                if next_time <= now:
-                    next_time += timedelta(days=7)
-                return next_time
-            
-            else:
-                logger.warning(f"未知的提醒类型: {reminder_type}")
-                return None
-        except ValueError as e:
-            logger.warning(f"时间格式错误: {reminder_time}, 错误信息: {e}")
-            return None
-
-    async def create_reminder_task(self, bot: WechatAPIClient, wxid: str, content: str, remind_time: datetime, message_id: int, new_id: int):
-        now = datetime.now()
-        if remind_time <= now:
-            logger.warning(f"提醒时间 {remind_time} 已经过去，无法创建定时任务")
-            return
-        delay = (remind_time - now).total_seconds()
-
-        async def reminder_callback():
-            try:
-                await self.send_reminder(bot, wxid, content, new_id, chat_id) # type: ignore
-            except Exception as e:
-                logger.exception(f"执行定时任务失败: {e}")
-
-        asyncio.create_task(self.schedule_reminder(delay, reminder_callback))
-
-    async def schedule_reminder(self, delay: float, callback):
-        await asyncio.sleep(delay)
-        await callback()
\ No newline at end of file
+        return next_fire_time(reminder_type, reminder_time)
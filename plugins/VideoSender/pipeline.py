@@ -0,0 +1,199 @@
+"""
+视频处理
+原先先用 ffmpeg -i 读一遍时长，再 ffmpeg 重新封装一遍，最后再 ffmpeg 截一次封面，
+三次都读写 temp_videos 下固定的文件名，同时处理两个视频时会互相覆盖。
+
+- 每个任务使用自己的临时目录
+- 时长直接从 MP4 的 mvhd 头读取，一次 ffmpeg 同时输出重新封装的视频和封面
+- 同时运行的 ffmpeg 数量有上限
+- 处理结果按原视频的内容哈希缓存在磁盘上，同一个视频再次发送时不再处理；
+  输出相同，发送时也会命中客户端的CDN引用缓存，不再重新上传
+"""
+
+import asyncio
+import hashlib
+import os
+import shutil
+import struct
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+from loguru import logger
+
+# 最近这么多秒内用过的缓存不淘汰，避免还在上传的视频被其他任务删除
+EVICT_GRACE = 600
+
+
+def mp4_duration(data: bytes) -> Optional[float]:
+    """从 MP4/MOV 的 moov/mvhd 中读取时长(秒)，不是 MP4 或者找不到时返回 None"""
+
+    def boxes(start: int, end: int):
+        while start + 8 <= end:
+            size, kind = struct.unpack_from(">I4s", data, start)
+            header = 8
+            if size == 1:
+                if start + 16 > end:
+                    return
+                size, header = struct.unpack_from(">Q", data, start + 8)[0], 16
+            elif size == 0:
+                size = end - start
+            if size < header:
+                return
+            yield kind, start + header, min(start + size, end)
+            start += size
+
+    try:
+        for kind, body, end in boxes(0, len(data)):
+            if kind != b"moov":
+                continue
+            for child, child_body, _ in boxes(body, end):
+                if child != b"mvhd":
+                    continue
+                if data[child_body] == 1:
+                    timescale, duration = struct.unpack_from(">IQ", data, child_body + 20)
+                else:
+                    timescale, duration = struct.unpack_from(">II", data, child_body + 12)
+                return duration / timescale if timescale else None
+    except struct.error:
+        pass
+    return None
+
+
+@dataclass
+class ProcessedVideo:
+    """处理后的视频"""
+    video: Path
+    thumbnail: Optional[Path]  # 截取失败时为 None
+    duration: Optional[float]  # 原视频时长(秒)
+
+
+class VideoPipeline:
+    """视频处理流水线
+
+    Args:
+        ffmpeg_path: ffmpeg 路径
+        temp_dir: 临时目录，处理结果缓存在其中的 cache 目录
+        workers: 同时运行的 ffmpeg 进程数
+        cache_size: 最多缓存多少个视频
+        timeout: 单个视频的处理超时，单位秒
+    """
+
+    def __init__(self, ffmpeg_path: str, temp_dir: str = "temp_videos", workers: int = 2, cache_size: int = 20,
+                 timeout: float = 60):
+        self.ffmpeg_path = ffmpeg_path
+        self.temp_dir = Path(temp_dir)
+        self.cache_dir = self.temp_dir / "cache"
+        self.cache_size = cache_size
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max(1, workers))
+        self._pending: Dict[str, asyncio.Future] = {}  # 正在处理的内容哈希，同一个视频同时请求时只处理一次
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        for job_dir in self.temp_dir.glob("job_*"):  # 上次异常退出留下的
+            shutil.rmtree(job_dir, ignore_errors=True)
+
+    async def process(self, video_data: bytes) -> Optional[ProcessedVideo]:
+        """重新封装视频并截取封面，失败时返回 None"""
+        digest = hashlib.blake2b(video_data, digest_size=16).hexdigest()
+        cached = self._cached(digest)
+        if cached:
+            logger.debug(f"视频处理命中缓存: {digest}")
+            return cached
+
+        pending = self._pending.get(digest)
+        if pending:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[digest] = future
+        try:
+            result = await self._process(digest, video_data)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_result(None)
+            if isinstance(e, Exception):
+                logger.exception(f"处理视频失败: {e}")
+                return None
+            raise
+        finally:
+            del self._pending[digest]
+
+    def _cached(self, digest: str) -> Optional[ProcessedVideo]:
+        video = self.cache_dir / f"{digest}.mp4"
+        if not video.exists():
+            return None
+        thumbnail = self.cache_dir / f"{digest}.jpg"
+        try:
+            os.utime(video)  # 按修改时间淘汰，最近使用的放在最后
+        except OSError:
+            return None
+        return ProcessedVideo(video, thumbnail if thumbnail.exists() else None, None)
+
+    async def _process(self, digest: str, video_data: bytes) -> Optional[ProcessedVideo]:
+        duration = mp4_duration(video_data)
+        job_dir = Path(await asyncio.to_thread(tempfile.mkdtemp, prefix="job_", dir=self.temp_dir))
+        try:
+            input_path, video_path, thumbnail_path = job_dir / "input", job_dir / "video.mp4", job_dir / "thumb.jpg"
+            await asyncio.to_thread(input_path.write_bytes, video_data)
+
+            # 重新封装的输出使用默认的流选择(一路视频、一路音频)，不带数据、字幕、时间码等流，
+            # 否则这些流无法放入 MP4 时整个处理失败
+            args = [self.ffmpeg_path, "-hide_banner", "-nostdin", "-y", "-i", str(input_path), "-c", "copy"]
+            if duration:
+                logger.info(f"处理视频：时长{duration:.2f}秒")
+                # 将秒数除以1000，微信播放器会将毫秒当做秒显示
+                adjusted_seconds = duration / 1000
+                args += ["-metadata:s:v", f"duration={adjusted_seconds}", "-metadata", f"duration={adjusted_seconds}"]
+            else:
+                logger.warning("无法提取时长信息，使用默认处理")
+            # 同一次运行中截取封面，不足1秒的视频取第一帧
+            args += [str(video_path),
+                     "-map", "0:v:0", "-ss", "1" if not duration or duration > 1 else "0", "-frames:v", "1",
+                     str(thumbnail_path)]
+
+            async with self._semaphore:
+                process = await asyncio.create_subprocess_exec(*args, stdout=asyncio.subprocess.DEVNULL,
+                                                               stderr=asyncio.subprocess.PIPE)
+                try:
+                    _, stderr = await asyncio.wait_for(process.communicate(), self.timeout)
+                except asyncio.TimeoutError:
+                    process.kill()
+                    await process.wait()
+                    logger.error(f"处理视频超时({self.timeout}秒)")
+                    return None
+
+            if process.returncode != 0 or not video_path.exists():
+                logger.error(f"ffmpeg 处理视频失败: {stderr.decode(errors='ignore')[-500:]}")
+                return None
+
+            cached_video = self.cache_dir / f"{digest}.mp4"
+            cached_thumbnail = self.cache_dir / f"{digest}.jpg"
+            has_thumbnail = thumbnail_path.exists() and thumbnail_path.stat().st_size > 0
+            if has_thumbnail:
+                os.replace(thumbnail_path, cached_thumbnail)
+            else:
+                logger.warning("未能成功提取缩略图")
+            os.replace(video_path, cached_video)  # 最后放入视频，存在视频即表示缓存完整
+            await asyncio.to_thread(self._evict)
+            return ProcessedVideo(cached_video, cached_thumbnail if has_thumbnail else None, duration)
+        finally:
+            await asyncio.to_thread(shutil.rmtree, job_dir, True)
+
+    def _evict(self):
+        """只保留最近使用的 cache_size 个视频"""
+        now = time.time()
+        videos = []
+        for video in self.cache_dir.glob("*.mp4"):
+            try:
+                videos.append((video.stat().st_mtime, video))
+            except FileNotFoundError:
+                continue
+        videos.sort(reverse=True)
+        for mtime, video in videos[self.cache_size:]:
+            if now - mtime < EVICT_GRACE:
+                continue
+            video.unlink(missing_ok=True)
+            video.with_suffix(".jpg").unlink(missing_ok=True)
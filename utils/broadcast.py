@@ -0,0 +1,238 @@
+"""
+群发模块
+定时任务向所有群推送同一条消息时使用，替代各插件自己遍历通讯录、逐个发送并 sleep 的写法
+
+- 目标群从 bot.contacts 的联系人缓存中获取，只解析一次
+- 图片只上传一次，之后由 bot.media_cache 转发CDN引用
+- 按 [Broadcast] 中配置的速率发送，消息使用群发优先级
+- 每发完一个目标就把进度写入 data/broadcast，崩溃重启后 resume() 继续发送未完成的目标
+- 返回每个目标的发送结果
+"""
+
+import asyncio
+import json
+import os
+import time
+import tomllib
+from dataclasses import dataclass, asdict, field
+from datetime import datetime
+from typing import Dict, List, Optional, Union
+
+from loguru import logger
+
+from WechatAPI import WechatAPIClient
+from WechatAPI.Client.send_scheduler import PRIORITY_BROADCAST, TokenBucket, send_priority
+from utils.singleton import Singleton
+
+
+@dataclass
+class BroadcastResult:
+    """群发结果"""
+    job_id: str
+    run_id: str
+    total: int = 0  # 目标数
+    succeeded: List[str] = field(default_factory=list)  # 发送成功的目标
+    failed: Dict[str, str] = field(default_factory=dict)  # 发送失败的目标 -> 错误
+    resumed: int = 0  # 上次运行中已经发送成功、本次跳过的目标数
+    cdn_reused: int = 0  # 通过CDN引用转发、没有重新上传的次数(同一时间其他图片发送也会计入)
+    started: float = 0.0  # 开始时间(时间戳)
+    finished: float = 0.0  # 结束时间(时间戳)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class Broadcaster(metaclass=Singleton):
+    """群发器
+
+    用法:
+        result = await Broadcaster().send(bot, "News.noon", image=image_byte)
+        result = await Broadcaster().send(bot, "GoodMorning", text=message)
+    """
+
+    def __init__(self):
+        with open("main_config.toml", "rb") as f:
+            main_config = tomllib.load(f)
+        config = main_config.get("Broadcast", {})
+
+        self.rate = config.get("rate", 0.5)
+        self.concurrency = max(1, config.get("concurrency", 2))
+        self.state_dir = config.get("state-dir", "data/broadcast")
+        self.resume_max_age = config.get("resume-max-age", 3600)
+
+    async def send(self, bot: WechatAPIClient, job_id: str, *, text: Optional[str] = None,
+                   image: Union[str, bytes, os.PathLike, None] = None, link: Optional[dict] = None,
+                   targets: Optional[List[str]] = None, run_id: Optional[str] = None) -> BroadcastResult:
+        """向多个目标发送同一条消息，text、image、link 三选一
+
+        Args:
+            bot: 机器人客户端
+            job_id: 群发任务名，用于保存进度，例如 "News.noon"
+            text: 文本内容
+            image: 图片，支持base64字符串，图片byte，图片路径
+            link: send_link_message 的参数，例如 {"url": ..., "title": ..., "description": ..., "thumb_url": ...}
+            targets: 目标列表，默认为通讯录中的所有群
+            run_id: 本次运行的标识，默认为当天日期。与上次运行相同时跳过已发送成功的目标，即同一天重复触发不会重复发送
+        """
+        if sum(payload is not None for payload in (text, image, link)) != 1:
+            raise ValueError("text、image、link 必须且只能提供一个")
+        if isinstance(image, os.PathLike):
+            with open(image, "rb") as f:
+                image = f.read()
+
+        run_id = run_id or datetime.now().strftime("%Y-%m-%d")
+        state = self._load(job_id)
+        if state and state.get("run_id") == run_id:
+            # 同一次运行的进度，继续发送未完成的目标
+            targets = state["targets"]
+            done = set(state["done"])
+        else:
+            if targets is None:
+                targets = await bot.contacts.chatrooms()
+            done = set()
+            state = {"job_id": job_id, "run_id": run_id, "created": time.time(), "targets": targets,
+                     "done": [], "failed": {}, "finished": False}
+            state["payload"] = {"text": text, "link": link, "image": None}
+            if image is not None:
+                state["payload"]["image"] = "base64" if isinstance(image, str) else "bytes"
+                self._save_payload(job_id, image)
+            self._save(job_id, state)
+
+        result = BroadcastResult(job_id=job_id, run_id=run_id, total=len(targets), resumed=len(done),
+                                 started=time.time())
+        result.succeeded.extend(target for target in targets if target in done)
+        pending = [target for target in targets if target not in done]
+        if state.get("finished") and not pending:
+            result.failed.update(state.get("failed", {}))
+            result.finished = time.time()
+            return result
+
+        logger.info("开始群发: 任务:{} 运行:{} 目标:{} 已完成:{}", job_id, run_id, len(targets), len(done))
+        with send_priority(PRIORITY_BROADCAST):
+            await self._run(bot, job_id, state, pending, result, text, image, link)
+
+        state["finished"] = True
+        self._save(job_id, state)
+        self._remove_payload(job_id)  # 只有 resume() 继续未完成的群发时需要
+        result.finished = time.time()
+        logger.info("群发完成: 任务:{} 成功:{} 失败:{} 跳过:{} CDN转发:{} 耗时:{:.1f}s", job_id,
+                    len(result.succeeded) - result.resumed, len(result.failed), result.resumed, result.cdn_reused,
+                    result.finished - result.started)
+        return result
+
+    async def _run(self, bot: WechatAPIClient, job_id: str, state: dict, pending: List[str],
+                   result: BroadcastResult, text: Optional[str], image, link: Optional[dict]):
+        bucket = TokenBucket(self.rate, 1)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        cache_hits = bot.media_cache.hits
+
+        async def send_one(target: str):
+            try:
+                if text is not None:
+                    await bot.send_text_message(target, text)
+                elif link is not None:
+                    await bot.send_link_message(target, **link)
+                else:
+                    await bot.send_image_message(target, image)
+            except Exception as e:
+                result.failed[target] = str(e)
+                state["failed"][target] = str(e)
+                logger.error("群发失败: 任务:{} 目标:{} 错误:{}", job_id, target, e)
+            else:
+                result.succeeded.append(target)
+                state["done"].append(target)
+                state["failed"].pop(target, None)
+            self._save(job_id, state)
+
+        async def paced(target: str):
+            async with semaphore:
+                await send_one(target)
+
+        tasks = []
+        for target in pending:
+            while (delay := bucket.delay(time.monotonic())) > 0:
+                await asyncio.sleep(delay)
+            bucket.take(time.monotonic())
+
+            if image is not None and len(result.succeeded) == result.resumed:
+                # 图片先发给第一个目标，上传成功后其余目标并发转发CDN引用
+                await paced(target)
+                continue
+            tasks.append(asyncio.create_task(paced(target)))
+        await asyncio.gather(*tasks)
+        result.cdn_reused = bot.media_cache.hits - cache_hits
+
+    async def resume(self, bot: WechatAPIClient):
+        """启动时继续发送上次崩溃时未完成的群发，超过 resume-max-age 的任务直接放弃"""
+        if not os.path.isdir(self.state_dir):
+            return
+        for name in os.listdir(self.state_dir):
+            if not name.endswith(".json"):
+                continue
+            job_id = name[:-len(".json")]
+            state = self._load(job_id)
+            if not state or state.get("finished"):
+                continue
+            if time.time() - state.get("created", 0) > self.resume_max_age:
+                logger.warning("群发任务中断时间过久，不再继续: 任务:{} 运行:{}", job_id, state.get("run_id"))
+                state["finished"] = True
+                self._save(job_id, state)
+                self._remove_payload(job_id)
+                continue
+
+            payload = state.get("payload", {})
+            image = None
+            if payload.get("image"):
+                image = self._load_payload(job_id)
+                if image is None:
+                    logger.warning("群发任务的图片已丢失，无法继续: 任务:{}", job_id)
+                    continue
+                if payload["image"] == "base64":
+                    image = image.decode()
+            logger.info("继续未完成的群发: 任务:{} 运行:{} 剩余:{}", job_id, state.get("run_id"),
+                        len(state["targets"]) - len(state["done"]))
+            try:
+                await self.send(bot, job_id, text=payload.get("text"), image=image, link=payload.get("link"),
+                                run_id=state["run_id"])
+            except Exception as e:
+                logger.error("继续群发失败: 任务:{} 错误:{}", job_id, e)
+
+    def _path(self, job_id: str, suffix: str) -> str:
+        return os.path.join(self.state_dir, f"{job_id}{suffix}")
+
+    def _load(self, job_id: str) -> Optional[dict]:
+        try:
+            with open(self._path(job_id, ".json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("读取群发进度失败: 任务:{} 错误:{}", job_id, e)
+            return None
+
+    def _save(self, job_id: str, state: dict):
+        # 先写临时文件再替换，崩溃时不会留下写了一半的进度
+        os.makedirs(self.state_dir, exist_ok=True)
+        path = self._path(job_id, ".json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+    def _save_payload(self, job_id: str, image: Union[str, bytes]):
+        os.makedirs(self.state_dir, exist_ok=True)
+        data = image.encode() if isinstance(image, str) else image
+        with open(self._path(job_id, ".payload"), "wb") as f:
+            f.write(data)
+
+    def _remove_payload(self, job_id: str):
+        try:
+            os.remove(self._path(job_id, ".payload"))
+        except FileNotFoundError:
+            pass
+
+    def _load_payload(self, job_id: str) -> Optional[bytes]:
+        try:
+            with open(self._path(job_id, ".payload"), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
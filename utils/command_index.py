@@ -0,0 +1,135 @@
+"""
+指令索引模块
+插件可以在事件装饰器中声明指令关键字(commands)、前缀(prefixes)或正则(regex)，
+EventManager 据此为每种事件建立索引，一条消息只会分发给可能匹配的处理函数和未声明指令的处理函数
+
+索引只做预筛选：处理函数仍然需要自己判断指令，索引保证不会漏掉处理函数能接受的消息
+"""
+
+import re
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# 开头的@提及，例如 "@XYBot 签到"
+_MENTION_PATTERN = re.compile(r"^(?:@\S+\s+)+")
+
+_TERMINAL = ""  # 前缀树中标记前缀结束的键
+
+
+def _as_list(value: Any, instance: object) -> List[str]:
+    """把装饰器中声明的值统一为字符串列表，支持 str、可迭代对象和以插件实例为参数的函数"""
+    if value is None:
+        return []
+    if callable(value) and not isinstance(value, re.Pattern):
+        value = value(instance)
+    if value is None:
+        return []
+    if isinstance(value, (str, re.Pattern)):
+        return [value]
+    result = []
+    for item in value:
+        if isinstance(item, (list, tuple, set)):
+            result.extend(item)
+        elif item:
+            result.append(item)
+    return result
+
+
+def routing_keys(content: str) -> Tuple[str, ...]:
+    """提取用于匹配的文本，返回去掉首尾空白的内容，以及去掉开头@提及后的内容"""
+    stripped = content.strip()
+    without_mention = _MENTION_PATTERN.sub("", stripped, count=1)
+    if without_mention != stripped:
+        return stripped, without_mention
+    return (stripped,)
+
+
+class CommandIndex:
+    """单个事件类型的处理函数索引
+
+    Args:
+        handlers: 已按优先级排好序的 (handler, instance, priority) 列表
+    """
+
+    def __init__(self, handlers: List[Tuple[Callable, object, int]]):
+        self.handlers = handlers
+        self.catch_all: Set[int] = set()
+        self.commands: Dict[str, Set[int]] = {}
+        self.prefix_trie: Dict[str, Any] = {}
+        self.regexes: List[Tuple[int, re.Pattern]] = []
+        self.combined_regex: Optional[re.Pattern] = None
+
+        for position, (handler, instance, _priority) in enumerate(handlers):
+            commands = _as_list(getattr(handler, '_commands', None), instance)
+            prefixes = _as_list(getattr(handler, '_prefixes', None), instance)
+            regexes = _as_list(getattr(handler, '_regex', None), instance)
+
+            if not (commands or prefixes or regexes):
+                self.catch_all.add(position)
+                continue
+
+            for command in commands:
+                self.commands.setdefault(command, set()).add(position)
+            for prefix in prefixes:
+                self._add_prefix(prefix, position)
+            for pattern in regexes:
+                self.regexes.append((position, re.compile(pattern) if isinstance(pattern, str) else pattern))
+
+        # 合并成一个正则做预检查，大部分消息一次 search 就能排除所有正则处理函数
+        if len(self.regexes) > 1 and all(pattern.flags == re.UNICODE for _, pattern in self.regexes):
+            try:
+                self.combined_regex = re.compile("|".join(f"(?:{pattern.pattern})" for _, pattern in self.regexes))
+            except re.error:
+                self.combined_regex = None
+
+    @property
+    def routed(self) -> bool:
+        """是否有处理函数声明了指令"""
+        return len(self.catch_all) < len(self.handlers)
+
+    def _add_prefix(self, prefix: str, position: int):
+        node = self.prefix_trie
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node.setdefault(_TERMINAL, set()).add(position)
+
+    def _match_prefixes(self, text: str, matched: Set[int]):
+        node = self.prefix_trie
+        for char in text:
+            if _TERMINAL in node:
+                matched.update(node[_TERMINAL])
+            node = node.get(char)
+            if node is None:
+                return
+        if _TERMINAL in node:
+            matched.update(node[_TERMINAL])
+
+    def match(self, content: str) -> Set[int]:
+        """返回可能匹配该内容的处理函数位置"""
+        matched = set(self.catch_all)
+
+        for text in routing_keys(content):
+            if self.commands:
+                parts = text.split(None, 1)
+                if parts and parts[0] in self.commands:
+                    matched.update(self.commands[parts[0]])
+            if self.prefix_trie:
+                self._match_prefixes(text, matched)
+
+        if self.regexes and (self.combined_regex is None or self.combined_regex.search(content)):
+            for position, pattern in self.regexes:
+                if position not in matched and pattern.search(content):
+                    matched.add(position)
+
+        return matched
+
+    def select(self, message: Mapping) -> Iterable[Tuple[Callable, object, int]]:
+        """按优先级返回应当处理该消息的处理函数"""
+        content = message.get("Content") if isinstance(message, Mapping) else None
+        if not self.routed or not isinstance(content, str):
+            return self.handlers
+
+        matched = self.match(content)
+        if len(matched) == len(self.handlers):
+            return self.handlers
+        return [self.handlers[position] for position in sorted(matched)]
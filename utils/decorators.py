@@ -1,12 +1,17 @@
 from functools import wraps
-from typing import Callable, Union
+from typing import Callable, Iterable, Union
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 
+from WechatAPI.Client.send_scheduler import PRIORITY_BROADCAST, send_priority
+
 scheduler = AsyncIOScheduler()
 
+# 指令声明: 字符串、字符串列表，或以插件实例为参数返回列表的函数
+Routes = Union[str, Iterable[str], Callable[[object], Iterable[str]], None]
+
 
 def schedule(
         trigger: Union[str, CronTrigger, IntervalTrigger],
@@ -20,13 +25,16 @@ def schedule(
     - @schedule('interval', seconds=30)
     - @schedule('cron', hour=8, minute=30, second=30)
     - @schedule('date', run_date='2024-01-01 00:00:00')
+
+    定时任务中发送的消息使用群发优先级，排在交互回复之后发送。
     """
     def decorator(func: Callable):
         job_id = f"{func.__module__}.{func.__qualname__}"
 
         @wraps(func)
         async def wrapper(self, *args, **kwargs):
-            return await func(self, *args, **kwargs)
+            with send_priority(PRIORITY_BROADCAST):
+                return await func(self, *args, **kwargs)
 
         setattr(wrapper, '_is_scheduled', True)
         setattr(wrapper, '_schedule_trigger', trigger)
@@ -56,182 +64,115 @@ def remove_job_safe(scheduler: AsyncIOScheduler, job_id: str):
         pass
 
 
-def on_text_message(priority=50):
-    """文本消息装饰器"""
+def _event_decorator(event_type: str, priority=50, copy_message: bool = False,
+                     commands: Routes = None, prefixes: Routes = None, regex: Routes = None,
+                     legacy_media: bool = True):
+    """生成事件处理装饰器
+
+    Args:
+        event_type: 事件类型
+        priority: 优先级，0-99，越大越先执行。无参数调用时为被装饰的函数
+        copy_message: 是否需要消息的完整私有副本(深拷贝)。默认处理函数拿到的是写时复制视图，
+            只有需要在嵌套结构之间保留引用关系等特殊情况才需要开启
+        commands: 指令关键字，消息的第一个词是其中之一时才调用
+        prefixes: 指令前缀，消息以其中之一开头时才调用
+        regex: 正则表达式，消息中能搜索到其中之一时才调用
+        legacy_media: 仅图片、语音、视频、文件消息。为 True(默认)时分发前先下载媒体内容，填入旧的
+            Content(图片base64/语音wav)、Video、File 字段，兼容还没有改用 message["Media"] 的处理函数。
+            只读取 message["Media"] 或不读取媒体内容的处理函数应设为 False，媒体内容在读取时才下载
+
+    commands/prefixes/regex 可以是字符串、列表，或者以插件实例为参数返回列表的函数
+    (例如 ``commands=lambda self: self.command``，用于从配置文件读取指令)。
+    三者都不填时处理函数会收到该类型的所有消息。
+    """
     def decorator(func):
         if callable(priority):  # 无参数调用时
             func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'text_message')
+            setattr(func_to_decorate, '_event_type', event_type)
             setattr(func_to_decorate, '_priority', 50)
+            setattr(func_to_decorate, '_copy_message', copy_message)
+            setattr(func_to_decorate, '_legacy_media', legacy_media)
             return func_to_decorate
         # 有参数调用时
-        setattr(func, '_event_type', 'text_message')
+        setattr(func, '_event_type', event_type)
         setattr(func, '_priority', min(max(priority, 0), 99))
+        setattr(func, '_copy_message', copy_message)
+        setattr(func, '_commands', commands)
+        setattr(func, '_prefixes', prefixes)
+        setattr(func, '_regex', regex)
+        setattr(func, '_legacy_media', legacy_media)
         return func
 
     return decorator if not callable(priority) else decorator(priority)
 
 
-def on_image_message(priority=50):
-    """图片消息装饰器"""
-    def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'image_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'image_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
+def on_text_message(priority=50, copy_message: bool = False, commands: Routes = None, prefixes: Routes = None,
+                    regex: Routes = None):
+    """文本消息装饰器"""
+    return _event_decorator('text_message', priority, copy_message, commands, prefixes, regex)
 
-    return decorator if not callable(priority) else decorator(priority)
 
+def on_image_message(priority=50, copy_message: bool = False, commands: Routes = None, prefixes: Routes = None,
+                     regex: Routes = None, legacy_media: bool = True):
+    """图片消息装饰器"""
+    return _event_decorator('image_message', priority, copy_message, commands, prefixes, regex, legacy_media)
 
-def on_voice_message(priority=50):
-    """语音消息装饰器"""
-    def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'voice_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'voice_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
 
-    return decorator if not callable(priority) else decorator(priority)
+def on_voice_message(priority=50, copy_message: bool = False, commands: Routes = None, prefixes: Routes = None,
+                     regex: Routes = None, legacy_media: bool = True):
+    """语音消息装饰器"""
+    return _event_decorator('voice_message', priority, copy_message, commands, prefixes, regex, legacy_media)
 
 
-def on_emoji_message(priority=50):
+def on_emoji_message(priority=50, copy_message: bool = False, commands: Routes = None, prefixes: Routes = None,
+                     regex: Routes = None):
     """表情消息装饰器"""
-    def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'emoji_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'emoji_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
-
-    return decorator if not callable(priority) else decorator(priority)
+    return _event_decorator('emoji_message', priority, copy_message, commands, prefixes, regex)
 
 
-def on_file_message(priority=50):
+def on_file_message(priority=50, copy_message: bool = False, commands: Routes = None, prefixes: Routes = None,
+                    regex: Routes = None, legacy_media: bool = True):
     """文件消息装饰器"""
-    def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'file_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'file_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
-
-    return decorator if not callable(priority) else decorator(priority)
+    return _event_decorator('file_message', priority, copy_message, commands, prefixes, regex, legacy_media)
 
 
-def on_quote_message(priority=50):
+def on_quote_message(priority=50, copy_message: bool = False, commands: Routes = None, prefixes: Routes = None,
+                     regex: Routes = None):
     """引用消息装饰器"""
-    def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'quote_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'quote_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
-
-    return decorator if not callable(priority) else decorator(priority)
+    return _event_decorator('quote_message', priority, copy_message, commands, prefixes, regex)
 
 
-def on_video_message(priority=50):
+def on_video_message(priority=50, copy_message: bool = False, commands: Routes = None, prefixes: Routes = None,
+                     regex: Routes = None, legacy_media: bool = True):
     """视频消息装饰器"""
-    def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'video_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'video_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
-
-    return decorator if not callable(priority) else decorator(priority)
+    return _event_decorator('video_message', priority, copy_message, commands, prefixes, regex, legacy_media)
 
 
-def on_pat_message(priority=50):
+def on_pat_message(priority=50, copy_message: bool = False, commands: Routes = None, prefixes: Routes = None,
+                   regex: Routes = None):
     """拍一拍消息装饰器"""
-    def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'pat_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'pat_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
-
-    return decorator if not callable(priority) else decorator(priority)
+    return _event_decorator('pat_message', priority, copy_message, commands, prefixes, regex)
 
 
-def on_at_message(priority=50):
+def on_at_message(priority=50, copy_message: bool = False, commands: Routes = None, prefixes: Routes = None,
+                  regex: Routes = None):
     """被@消息装饰器"""
-    def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'at_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'at_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
-
-    return decorator if not callable(priority) else decorator(priority)
+    return _event_decorator('at_message', priority, copy_message, commands, prefixes, regex)
 
 
-def on_system_message(priority=50):
+def on_system_message(priority=50, copy_message: bool = False, commands: Routes = None, prefixes: Routes = None,
+                      regex: Routes = None):
     """系统消息装饰器"""
-    def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'system_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'system_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
-
-    return decorator if not callable(priority) else decorator(priority)
+    return _event_decorator('system_message', priority, copy_message, commands, prefixes, regex)
 
 
-def on_other_message(priority=50):
+def on_other_message(priority=50, copy_message: bool = False, commands: Routes = None, prefixes: Routes = None,
+                     regex: Routes = None):
     """其他消息装饰器"""
-    def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'other_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'other_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
-
-    return decorator if not callable(priority) else decorator(priority)
+    return _event_decorator('other_message', priority, copy_message, commands, prefixes, regex)
 
 
-def on_article_message(priority=50):
+def on_article_message(priority=50, copy_message: bool = False, commands: Routes = None, prefixes: Routes = None,
+                       regex: Routes = None):
     """公众号文章消息装饰器"""
-    def decorator(func):
-        if callable(priority):
-            func_to_decorate = priority
-            setattr(func_to_decorate, '_event_type', 'article_message')
-            setattr(func_to_decorate, '_priority', 50)
-            return func_to_decorate
-        setattr(func, '_event_type', 'article_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
-
-    return decorator if not callable(priority) else decorator(priority)
\ No newline at end of file
+    return _event_decorator('article_message', priority, copy_message, commands, prefixes, regex)
@@ -1,9 +1,13 @@
 import copy
 from typing import Callable, Dict, List
 
+from .command_index import CommandIndex
+from .message_view import private_copy
+
 
 class EventManager:
     _handlers: Dict[str, List[tuple[Callable, object, int]]] = {}
+    _indexes: Dict[str, CommandIndex] = {}
 
     @classmethod
     def bind_instance(cls, instance: object):
@@ -19,6 +23,19 @@ class EventManager:
                 cls._handlers[event_type].append((method, instance, priority))
                 # 按优先级排序，优先级高的在前
                 cls._handlers[event_type].sort(key=lambda x: x[2], reverse=True)
+                cls._indexes[event_type] = CommandIndex(cls._handlers[event_type])
+
+    @classmethod
+    def has_handlers(cls, event_type: str) -> bool:
+        """是否有处理函数订阅了该事件"""
+        return bool(cls._handlers.get(event_type))
+
+    @classmethod
+    def wants_legacy_media(cls, event_type: str, message) -> bool:
+        """这条消息会分发到的处理函数中，是否有需要旧媒体字段(没有声明 legacy_media=False)的"""
+        index = cls._indexes.get(event_type)
+        handlers = index.select(message) if index is not None else cls._handlers.get(event_type, [])
+        return any(getattr(handler, '_legacy_media', True) for handler, instance, priority in handlers)
 
     @classmethod
     async def emit(cls, event_type: str, *args, **kwargs) -> None:
@@ -27,10 +44,20 @@ class EventManager:
             return
 
         api_client, message = args
-        for handler, instance, priority in cls._handlers[event_type]:
-            # 只对 message 进行深拷贝，api_client 保持不变
-            handler_args = (api_client, copy.deepcopy(message))
-            new_kwargs = {k: copy.deepcopy(v) for k, v in kwargs.items()}
+
+        # 根据插件声明的指令筛选处理函数，没有声明指令的处理函数总是会被调用
+        index = cls._indexes.get(event_type)
+        handlers = index.select(message) if index is not None else cls._handlers[event_type]
+
+        for handler, instance, priority in handlers:
+            if getattr(handler, '_copy_message', False):
+                # 处理函数声明需要完整的私有副本
+                handler_args = (api_client, copy.deepcopy(message))
+                new_kwargs = {k: copy.deepcopy(v) for k, v in kwargs.items()}
+            else:
+                # 消息模型的可写视图或写时复制视图，字段共享，处理函数的修改互不影响
+                handler_args = (api_client, private_copy(message))
+                new_kwargs = {k: private_copy(v) for k, v in kwargs.items()}
 
             result = await handler(*handler_args, **new_kwargs)
 
@@ -50,3 +77,4 @@ class EventManager:
                 for handler, inst, priority in cls._handlers[event_type]
                 if inst is not instance
             ]
+            cls._indexes[event_type] = CommandIndex(cls._handlers[event_type])
@@ -0,0 +1,435 @@
+"""
+系统日志读取模块
+管理后台"系统日志"使用
+
+原先每次请求都要 glob 十来个路径，再 readlines() 读入整个最新日志、逐行跑三个正则，只为取最后100行；
+页面还每分钟重新请求一次，每次请求本身又往日志里写一行。
+
+- 日志文件列表缓存 DISCOVER_TTL 秒，不再每次请求都 glob
+- 取最后 N 条时从文件末尾按块向前读，只读需要的部分
+- 每个日志文件有一个稀疏索引：大约每 INDEX_BLOCK 字节一段，记录段的起始位置、第一条日志的时间和段内出现过的级别。
+  按时间范围查询时二分定位，按级别过滤时跳过不含该级别的段；索引只增量扫描新追加的部分
+- 返回的 cursor/end 是文件中的字节偏移，用 before/after 翻页
+- follow() 读取某个位置之后新追加的日志，管理后台的 WebSocket 用它推送新日志
+"""
+
+import glob
+import os
+import re
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from itertools import islice
+from typing import BinaryIO, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOG_DIRS = ("logs", "_data/logs")
+LOG_PATTERNS = ("XYBot_*.log", "latest.log", "xybot.log")
+DISCOVER_TTL = 5
+
+READ_BLOCK = 64 * 1024
+INDEX_BLOCK = 64 * 1024
+FOLLOW_BATCH = 500  # follow() 每次最多返回的条数
+
+# main.py 中文件日志的格式: {time:YYYY-MM-DD HH:mm:ss} | {level} | {message}
+# 不以它开头的行(例如异常堆栈)属于上一条日志
+HEADER = re.compile(rb"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) \| ([A-Z]+) *\| ?")
+
+# 级别及其数值，与 loguru 一致；API 是 main.py 中自定义的级别
+LEVELS = {"api": 1, "trace": 5, "debug": 10, "info": 20, "success": 25, "warning": 30, "error": 40, "critical": 50}
+LEVEL_BITS = {name: 1 << i for i, name in enumerate(LEVELS)}
+ALL_LEVELS = (1 << len(LEVELS)) - 1
+DEFAULT_LEVEL = "info"  # 无法识别级别的日志按 info 处理
+
+
+def select_levels(level: Optional[str] = None, min_level: Optional[str] = None) -> Optional[FrozenSet[str]]:
+    """要返回的级别，None 为不过滤
+
+    Args:
+        level: 只要这个级别
+        min_level: 这个级别及以上
+
+    Raises:
+        ValueError: 未知的级别
+    """
+    if level and level.lower() != "all":
+        if level.lower() not in LEVELS:
+            raise ValueError(f"未知的日志级别: {level}")
+        return frozenset({level.lower()})
+    if min_level and min_level.lower() != "all":
+        if min_level.lower() not in LEVELS:
+            raise ValueError(f"未知的日志级别: {min_level}")
+        threshold = LEVELS[min_level.lower()]
+        return frozenset(name for name, no in LEVELS.items() if no >= threshold)
+    return None
+
+
+def _level_name(level: str) -> str:
+    return level if level in LEVELS else DEFAULT_LEVEL
+
+
+def _mask(levels: Optional[FrozenSet[str]]) -> int:
+    if levels is None:
+        return ALL_LEVELS
+    mask = 0
+    for level in levels:
+        mask |= LEVEL_BITS[level]
+    return mask
+
+
+def _normalize_time(value: Optional[str]) -> Optional[str]:
+    """时间参数统一成日志中的格式，前缀比较即可，例如 2024-01-01T08:00 -> 2024-01-01 08:00"""
+    return value.strip().replace("T", " ") if value else None
+
+
+@dataclass
+class LogRecord:
+    """一条日志，可能有多行"""
+    offset: int  # 在文件中的起始字节偏移
+    end: int  # 结束字节偏移，即下一条日志的起始位置
+    timestamp: Optional[str]
+    level: str
+    message: str
+    raw: str
+
+    def as_dict(self) -> dict:
+        return {"offset": self.offset, "timestamp": self.timestamp, "level": self.level,
+                "message": self.message, "raw": self.raw}
+
+
+def _header_bit(match: re.Match) -> int:
+    return LEVEL_BITS[_level_name(match.group(2).decode().lower())]
+
+
+def _record(offset: int, end: int, lines: List[bytes], mask: int = ALL_LEVELS) -> Optional[LogRecord]:
+    """由一条日志的各行生成 LogRecord，空白或级别不在 mask 中时返回 None"""
+    match = HEADER.match(lines[0])
+    if match is not None and not _header_bit(match) & mask:
+        return None
+    raw = "\n".join(line.rstrip(b"\r").decode("utf-8", errors="replace") for line in lines).rstrip()
+    if not raw:
+        return None
+    if match is None:  # 文件开头不属于任何日志的行
+        return LogRecord(offset, end, None, DEFAULT_LEVEL, raw, raw)
+    return LogRecord(offset, end, match.group(1).decode(), match.group(2).decode().lower(), raw[match.end():], raw)
+
+
+def _lines_forward(f: BinaryIO, lo: int, hi: int) -> Iterator[Tuple[int, bytes]]:
+    """从 lo 读到 hi，产生 (行起始偏移, 行内容)，不产生 hi 之前没有换行符的最后一段"""
+    f.seek(lo)
+    pos = start = lo
+    rest = b""
+    while pos < hi:
+        chunk = f.read(min(READ_BLOCK, hi - pos))
+        if not chunk:
+            break
+        pos += len(chunk)
+        lines = (rest + chunk).split(b"\n")
+        rest = lines.pop()
+        for line in lines:
+            yield start, line
+            start += len(line) + 1
+
+
+def _lines_backward(f: BinaryIO, lo: int, hi: int) -> Iterator[Tuple[int, bytes]]:
+    """从 hi 向前读到 lo，逆序产生 (行起始偏移, 行内容)，hi 应当在行首"""
+    pos = hi
+    rest = b""
+    while pos > lo:
+        size = min(READ_BLOCK, pos - lo)
+        pos -= size
+        f.seek(pos)
+        data = f.read(size) + rest
+        lines = data.split(b"\n")
+        # 块的第一段可能是上一块中某行的后半部分，留到下一块拼完整
+        rest = lines.pop(0) if pos > lo else b""
+        end = pos + len(data)
+        for line in reversed(lines):
+            start = end - len(line)
+            if start < hi:  # hi 前面的换行符之后的空段不是一行
+                yield start, line
+            end = start - 1
+
+
+def _records_forward(f: BinaryIO, lo: int, hi: int, mask: int = ALL_LEVELS) -> Iterator[LogRecord]:
+    lines: List[bytes] = []
+    offset = end = lo
+    for start, line in _lines_forward(f, lo, hi):
+        if lines and HEADER.match(line):
+            record = _record(offset, start, lines, mask)
+            if record:
+                yield record
+            lines = []
+        if not lines:
+            offset = start
+        lines.append(line)
+        end = start + len(line) + 1
+    if lines:
+        record = _record(offset, end, lines, mask)
+        if record:
+            yield record
+
+
+def _records_backward(f: BinaryIO, lo: int, hi: int, mask: int = ALL_LEVELS) -> Iterator[LogRecord]:
+    lines: List[bytes] = []
+    end = first = hi
+    for start, line in _lines_backward(f, lo, hi):
+        lines.append(line)
+        first = start
+        if HEADER.match(line):
+            lines.reverse()
+            record = _record(start, end, lines, mask)
+            if record:
+                yield record
+            lines = []
+            end = start
+    if lines:
+        lines.reverse()
+        record = _record(first, end, lines, mask)
+        if record:
+            yield record
+
+
+def _complete_end(f: BinaryIO, size: int) -> int:
+    """最后一个换行符之后的位置，之后是正在写入的不完整的行"""
+    pos = size
+    while pos > 0:
+        step = min(4096, pos)
+        pos -= step
+        f.seek(pos)
+        index = f.read(step).rfind(b"\n")
+        if index >= 0:
+            return pos + index + 1
+    return 0
+
+
+class LogIndex:
+    """单个日志文件的稀疏索引，每段都从一条日志的开头开始"""
+
+    def __init__(self):
+        self.ident: Optional[Tuple[int, int]] = None  # (st_dev, st_ino)，文件被替换时重建
+        self.offsets: List[int] = []
+        self.timestamps: List[str] = []  # 段内第一条日志的时间
+        self.masks: List[int] = []  # 段内出现过的级别
+        self.indexed = 0  # 已索引到的位置
+
+    def update(self, f: BinaryIO, end: int, ident: Tuple[int, int]):
+        """扫描 indexed 到 end 之间新追加的部分"""
+        if ident != self.ident or end < self.indexed:
+            self.__init__()
+            self.ident = ident
+        for start, line in _lines_forward(f, self.indexed, end):
+            match = HEADER.match(line)
+            if match:
+                if not self.offsets or start - self.offsets[-1] >= INDEX_BLOCK:
+                    self.offsets.append(start)
+                    self.timestamps.append(match.group(1).decode())
+                    self.masks.append(0)
+                self.masks[-1] |= _header_bit(match)
+            elif not self.offsets:
+                self.offsets.append(start)
+                self.timestamps.append("")
+                self.masks.append(LEVEL_BITS[DEFAULT_LEVEL])
+            self.indexed = start + len(line) + 1
+
+    def spans(self, lo: int, hi: int, mask: int, since: Optional[str], until: Optional[str]) -> List[Tuple[int, int]]:
+        """[lo, hi) 中可能有符合条件的日志的区间，按位置排序，相邻的合并"""
+        first, last = 0, len(self.offsets)
+        if since:
+            first = max(bisect_right(self.timestamps, since) - 1, 0)
+        if until:
+            last = bisect_left(self.timestamps, until)
+        spans: List[Tuple[int, int]] = []
+        for i in range(first, last):
+            if not self.masks[i] & mask:
+                continue
+            start = max(self.offsets[i], lo)
+            end = min(self.offsets[i + 1] if i + 1 < len(self.offsets) else self.indexed, hi)
+            if start >= end:
+                continue
+            if spans and spans[-1][1] == start:
+                spans[-1] = (spans[-1][0], end)
+            else:
+                spans.append((start, end))
+        return spans
+
+
+class LogReader:
+    """系统日志读取，整个进程共用一个实例 log_reader
+
+    管理后台在线程池中调用，文件列表和索引用锁保护。
+    """
+
+    def __init__(self):
+        self._files: List[str] = []
+        self._discovered = float("-inf")
+        self._indexes: Dict[str, LogIndex] = {}
+        self._lock = threading.Lock()
+
+    def log_files(self) -> List[str]:
+        """找到的日志文件，最近修改的在前"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._discovered < DISCOVER_TTL:
+                return list(self._files)
+
+        found: Dict[str, float] = {}
+        for base in {os.getcwd(), ROOT_DIR}:
+            for log_dir in LOG_DIRS:
+                for pattern in LOG_PATTERNS:
+                    for path in glob.glob(os.path.join(base, log_dir, pattern)):
+                        path = os.path.realpath(path)
+                        try:
+                            if os.path.isfile(path):
+                                found[path] = os.path.getmtime(path)
+                        except OSError:
+                            continue
+        files = sorted(found, key=found.get, reverse=True)
+
+        with self._lock:
+            self._files, self._discovered = files, now
+            for path in [path for path in self._indexes if path not in found]:
+                del self._indexes[path]
+        return list(files)
+
+    def resolve(self, name: Optional[str] = None) -> Optional[str]:
+        """文件名为 name 的日志文件，不指定或找不到时为最新的日志文件"""
+        files = self.log_files()
+        if not files:
+            return None
+        if name:
+            for path in files:
+                if os.path.basename(path) == name:
+                    return path
+        return files[0]
+
+    def _update_index(self, path: str, f: BinaryIO, end: int) -> LogIndex:
+        stat = os.fstat(f.fileno())
+        with self._lock:
+            index = self._indexes.setdefault(path, LogIndex())
+            index.update(f, end, (stat.st_dev, stat.st_ino))
+            return index
+
+    def read(self, name: Optional[str] = None, limit: int = 100, before: Optional[int] = None,
+             after: Optional[int] = None, levels: Optional[FrozenSet[str]] = None, since: Optional[str] = None,
+             until: Optional[str] = None) -> Optional[dict]:
+        """读取一页日志，按时间正序返回，没有日志文件时返回 None
+
+        不指定 after 时返回 before(默认为文件末尾)之前最后的 limit 条；指定 after 时返回 after 之后最早的 limit 条。
+
+        Args:
+            name: 日志文件名，默认为最新的日志文件
+            limit: 最多返回的条数
+            before: 字节偏移，只返回在它之前的日志
+            after: 字节偏移，只返回在它之后的日志
+            levels: 要返回的级别，见 select_levels()
+            since: 时间不早于，格式同日志中的时间，可以只写前缀
+            until: 时间早于
+
+        Returns:
+            logs: 日志
+            current_log: 日志文件名
+            cursor: 继续翻页的位置；向前翻页时作为下一次的 before，指定了 after 时作为下一次的 after
+            end: 当前文件末尾(最后一个完整行之后)，作为 after 或 WebSocket 的起点只获取之后的新日志
+            has_more: 是否还有更多
+        """
+        path = self.resolve(name)
+        if path is None:
+            return None
+        since, until = _normalize_time(since), _normalize_time(until)
+
+        with open(path, "rb") as f:
+            end = _complete_end(f, os.fstat(f.fileno()).st_size)
+            lo = min(max(after or 0, 0), end)
+            hi = min(max(before, lo), end) if before is not None else end
+            mask = _mask(levels)
+            if mask != ALL_LEVELS or since or until:
+                spans = self._update_index(path, f, end).spans(lo, hi, mask, since, until)
+            else:
+                spans = [(lo, hi)]
+
+            def matches(record: LogRecord) -> bool:
+                if levels is not None and _level_name(record.level) not in levels:
+                    return False
+                if since and (record.timestamp or "") < since:
+                    return False
+                if until and (record.timestamp or "") >= until:
+                    return False
+                return True
+
+            if after is not None:
+                records: Iterable[LogRecord] = (record for start, stop in spans
+                                                for record in _records_forward(f, start, stop, mask))
+            else:
+                records = (record for start, stop in reversed(spans)
+                           for record in _records_backward(f, start, stop, mask))
+            page = list(islice(filter(matches, records), limit + 1))
+
+        has_more = len(page) > limit
+        page = page[:limit]
+        if after is not None:
+            cursor = page[-1].end if has_more else hi
+        else:
+            page.reverse()
+            cursor = page[0].offset if page else lo
+        return {
+            "logs": [record.as_dict() for record in page],
+            "current_log": os.path.basename(path),
+            "cursor": cursor,
+            "end": end,
+            "has_more": has_more,
+        }
+
+    def follow(self, path: Optional[str], position: Optional[int], levels: Optional[FrozenSet[str]] = None,
+               limit: int = FOLLOW_BATCH, rotate: bool = True) -> Tuple[Optional[str], int, List[LogRecord]]:
+        """读取 path 中 position 之后新追加的完整日志
+
+        path 为 None 时使用最新的日志文件，position 为 None 时从末尾开始；
+        rotate 为 True 时(开始跟随时 path 是最新的日志文件)，path 已经读完、并且有了更新的日志文件时(日志轮转)，
+        转到新文件。新文件的第一条日志不早于 path 的最后一条时从开头读，否则从末尾读。
+        rotate 为 False 时只跟随 path，不会转到其他文件。
+
+        Returns:
+            (下一次读取的文件, 下一次读取的位置, 新日志中级别符合 levels 的)
+        """
+        latest = self.resolve()
+        if path is None or not os.path.exists(path):
+            path, position = latest, None
+        if path is None:
+            return None, 0, []
+
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            end = _complete_end(f, size)
+            if position is None:
+                return path, end, []
+            if position > size:  # 文件被截断
+                position = 0
+            records = list(islice(_records_forward(f, position, end, _mask(levels)), limit)) if end > position else []
+
+            if len(records) == limit:
+                position = records[-1].end
+            elif not records and rotate and latest and latest != path:
+                return latest, self._rotation_start(f, end, latest), []
+            else:
+                position = max(end, position)
+        if levels is not None:
+            records = [record for record in records if _level_name(record.level) in levels]
+        return path, position, records
+
+    @staticmethod
+    def _rotation_start(old: BinaryIO, old_end: int, path: str) -> int:
+        """日志轮转后从新文件 path 的哪里开始读: 第一条日志不早于旧文件的最后一条时为开头，否则为末尾"""
+        last = next(_records_backward(old, 0, old_end), None)
+        with open(path, "rb") as f:
+            end = _complete_end(f, os.fstat(f.fileno()).st_size)
+            first = next(_records_forward(f, 0, end), None)
+        if first is None:
+            return 0
+        if last is not None and last.timestamp and first.timestamp and first.timestamp >= last.timestamp:
+            return 0
+        return end
+
+
+log_reader = LogReader()
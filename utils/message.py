@@ -0,0 +1,217 @@
+"""
+消息模型模块
+XYBot 分发给插件的消息对象
+
+每种消息一个不可变的 slots 类，对象本身只有一个槽位，引用 XYBot 预处理后的消息字典，字典不复制。
+消息对象同时是一个只读的 Mapping，旧插件按 dict 的方式读取即可:
+
+    message["Content"]、message.get("Ats", [])、"Quote" in message
+
+也可以直接用属性读取，属性在读取时从消息字典中取值:
+
+    message.content、message.sender_wxid、message.ats
+
+通过消息对象读取到的列表是 tuple，字典是只读的 MappingProxyType，处理函数之间无法互相影响。
+处理函数拿到的是 MessageOverlay(写时复制的 dict)，写入的字段只对自己可见；
+copy_message=True 的处理函数拿到的是深拷贝得到的普通 dict。
+"""
+
+import copy
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, ClassVar, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    from WechatAPI import MediaHandle
+
+
+def freeze(value: Any) -> Any:
+    """把 dict/list 递归转为只读的 MappingProxyType/tuple"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def _field(key: str, default: Any = None) -> property:
+    """按 dict 键读取的只读属性"""
+
+    def getter(self):
+        return freeze(self._data.get(key, default))
+
+    return property(getter, doc=f'message["{key}"]')
+
+
+class Message(Mapping):
+    """消息基类，表情消息和链接分享消息直接使用
+
+    Attributes:
+        msg_id (int): 消息ID
+        msg_type (int): 消息类型
+        from_wxid (str): 会话wxid，群聊为群wxid，私聊为对方wxid
+        to_wxid (str): 接收人wxid
+        sender_wxid (str): 实际发送人wxid
+        is_group (bool): 是否群聊消息
+        content (Any): 消息内容，文本或XML
+    """
+    __slots__ = ("_data",)
+
+    # dict 键 -> 属性名
+    KEYS: ClassVar[Dict[str, str]] = {
+        "MsgId": "msg_id", "MsgType": "msg_type", "FromWxid": "from_wxid", "ToWxid": "to_wxid",
+        "SenderWxid": "sender_wxid", "IsGroup": "is_group", "Content": "content",
+    }
+
+    msg_id: int = _field("MsgId", 0)
+    msg_type: int = _field("MsgType", 0)
+    from_wxid: str = _field("FromWxid", "")
+    to_wxid: str = _field("ToWxid", "")
+    sender_wxid: str = _field("SenderWxid", "")
+    is_group: bool = _field("IsGroup", False)
+    content: Any = _field("Content", "")
+
+    def __init__(self, message: Dict[str, Any]):
+        object.__setattr__(self, "_data", message)
+
+    @classmethod
+    def from_dict(cls, message: Dict[str, Any]) -> "Message":
+        """由 XYBot 预处理后的消息字典创建，字典本身不复制，交给消息对象后不应再修改"""
+        return cls(message)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} 不可修改")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} 不可修改")
+
+    def __getitem__(self, key: str) -> Any:
+        return freeze(self._data[key])
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return freeze(self._data.get(key, default))
+
+    def __contains__(self, key) -> bool:
+        return key in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self._data!r})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转为普通 dict，嵌套的 dict/list 也复制一份"""
+        return {key: copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+                for key, value in self._data.items()}
+
+    def __copy__(self) -> "Message":
+        return self
+
+    def __deepcopy__(self, memo) -> Dict[str, Any]:
+        return copy.deepcopy(self._data, memo)
+
+    def __reduce__(self):
+        return dict, (self.to_dict(),)
+
+
+class TextMessage(Message):
+    """文本消息，text_message 和 at_message 事件
+
+    Attributes:
+        ats (Tuple[str, ...]): 被@的wxid
+    """
+    __slots__ = ()
+    KEYS: ClassVar[Dict[str, str]] = {**Message.KEYS, "Ats": "ats"}
+
+    ats: Tuple[str, ...] = _field("Ats", ())
+
+
+class ImageMessage(Message):
+    """图片消息，content 为图片XML
+
+    Attributes:
+        media (MediaHandle): 图片内容，第一次读取时下载。XML中没有下载地址时为 None
+    """
+    __slots__ = ()
+    KEYS: ClassVar[Dict[str, str]] = {**Message.KEYS, "Media": "media"}
+
+    media: Optional["MediaHandle"] = _field("Media")
+
+
+class VoiceMessage(Message):
+    """语音消息，content 为语音XML
+
+    Attributes:
+        media (MediaHandle): wav格式的语音，第一次读取时下载并转换。无法下载时为 None
+    """
+    __slots__ = ()
+    KEYS: ClassVar[Dict[str, str]] = {**Message.KEYS, "Media": "media"}
+
+    media: Optional["MediaHandle"] = _field("Media")
+
+
+class VideoMessage(Message):
+    """视频消息，content 为视频XML
+
+    Attributes:
+        media (MediaHandle): 视频内容，第一次读取时下载
+    """
+    __slots__ = ()
+    KEYS: ClassVar[Dict[str, str]] = {**Message.KEYS, "Media": "media"}
+
+    media: Optional["MediaHandle"] = _field("Media")
+
+
+class QuoteMessage(Message):
+    """引用消息，content 为回复的文本
+
+    Attributes:
+        quote (Mapping): 被引用的消息，格式见插件开发文档
+    """
+    __slots__ = ()
+    KEYS: ClassVar[Dict[str, str]] = {**Message.KEYS, "Quote": "quote"}
+
+    quote: Mapping = _field("Quote", {})
+
+
+class FileMessage(Message):
+    """文件消息，content 为文件XML
+
+    Attributes:
+        filename (str): 文件名
+        file_extend (str): 扩展名
+        media (MediaHandle): 文件内容，第一次读取时下载
+    """
+    __slots__ = ()
+    KEYS: ClassVar[Dict[str, str]] = {**Message.KEYS, "Filename": "filename", "FileExtend": "file_extend",
+                                      "Media": "media"}
+
+    filename: Optional[str] = _field("Filename")
+    file_extend: Optional[str] = _field("FileExtend")
+    media: Optional["MediaHandle"] = _field("Media")
+
+
+class PatMessage(Message):
+    """拍一拍消息
+
+    Attributes:
+        patter (str): 拍者wxid
+        patted (str): 被拍者wxid
+        pat_suffix (str): 拍一拍后缀
+    """
+    __slots__ = ()
+    KEYS: ClassVar[Dict[str, str]] = {**Message.KEYS, "Patter": "patter", "Patted": "patted",
+                                      "PatSuffix": "pat_suffix"}
+
+    patter: Optional[str] = _field("Patter")
+    patted: Optional[str] = _field("Patted")
+    pat_suffix: Optional[str] = _field("PatSuffix")
+
+
+class SystemMessage(Message):
+    """系统消息，content 为 sysmsg XML"""
+    __slots__ = ()
@@ -0,0 +1,184 @@
+"""
+消息分发模块
+使用有界队列和固定数量的worker处理消息，替代每条消息一个 create_task
+
+- 同一会话(FromWxid)内的消息按接收顺序依次处理，不同会话之间并行处理
+- 队列满时按配置的过载策略处理: drop(丢弃新消息)、defer(阻塞等待，向同步循环施加背压)、
+  shed(丢弃低优先级类型的消息，其余消息等待)
+"""
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from loguru import logger
+
+OVERLOAD_POLICIES = ("drop", "defer", "shed")
+
+
+@dataclass
+class DispatchStats:
+    """分发统计数据"""
+    submitted: int = 0  # 提交的消息数
+    processed: int = 0  # 处理完成的消息数
+    failed: int = 0  # 处理时抛出异常的消息数
+    dropped: int = 0  # 队列满被丢弃的消息数
+    shed: int = 0  # 队列满被丢弃的低优先级消息数
+    deferred: int = 0  # 队列满时等待入队的次数
+    depth: int = 0  # 当前排队中的消息数
+    max_depth: int = 0  # 历史最大排队数
+    busy_workers: int = 0  # 正在处理消息的worker数
+    conversations: int = 0  # 有待处理消息的会话数
+    last_lag: float = 0.0  # 最近一条消息从入队到开始处理的延迟(秒)
+    avg_lag: float = 0.0  # 入队延迟的指数移动平均(秒)
+    max_lag: float = 0.0  # 最大入队延迟(秒)
+
+    def record_lag(self, lag: float):
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self.avg_lag = lag if self.processed == 0 else self.avg_lag * 0.9 + lag * 0.1
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class MessageDispatcher:
+    """有界、按会话保序的消息分发器
+
+    用法:
+        dispatcher = MessageDispatcher(xybot.process_message, config.get("MessageDispatcher", {}))
+        dispatcher.start()
+        await dispatcher.submit(message)
+    """
+
+    def __init__(self, handler: Callable[[Dict[str, Any]], Awaitable[Any]], config: Optional[dict] = None,
+                 self_wxid: str = ""):
+        self.handler = handler
+        self.config = config or {}
+        self.self_wxid = self_wxid
+
+        self.workers = max(1, self.config.get("workers", 16))
+        self.max_queue = max(1, self.config.get("max-queue", 1000))
+        self.policy = self.config.get("overload-policy", "defer")
+        if self.policy not in OVERLOAD_POLICIES:
+            logger.warning("未知的过载策略: {}，使用 defer", self.policy)
+            self.policy = "defer"
+        self.low_priority_types = set(self.config.get("low-priority-types", [47, 51, 10002]))
+        self.report_interval = self.config.get("report-interval", 300)
+
+        self.stats = DispatchStats()
+
+        # 会话 -> 待处理消息。会话在处理中或在就绪队列中时才存在于此字典
+        self._pending: Dict[str, Deque[Tuple[float, Dict[str, Any]]]] = {}
+        self._ready: asyncio.Queue = asyncio.Queue()
+        self._space = asyncio.Condition()
+        self._tasks: list[asyncio.Task] = []
+        self._last_report = time.monotonic()
+
+    def conversation_key(self, message: Dict[str, Any]) -> str:
+        """计算消息所属会话，群聊为群ID，私聊为对方wxid"""
+        from_wxid = message.get("FromUserName", {}).get("string", "")
+        to_wxid = message.get("ToWxid", {}).get("string", "")
+        if to_wxid.endswith("@chatroom"):
+            return to_wxid
+        if self.self_wxid and from_wxid == self.self_wxid:
+            return to_wxid
+        return from_wxid
+
+    def start(self):
+        """启动worker"""
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info("消息分发器已启动: worker数:{} 队列上限:{} 过载策略:{}", self.workers, self.max_queue, self.policy)
+
+    async def stop(self, timeout: float = 10):
+        """等待队列处理完毕后停止worker"""
+        try:
+            await asyncio.wait_for(self.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("消息分发器停止超时，仍有 {} 条消息未处理", self.stats.depth)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def join(self):
+        """等待所有已提交的消息处理完毕"""
+        async with self._space:
+            await self._space.wait_for(lambda: not self._pending)
+
+    async def submit(self, message: Dict[str, Any]) -> bool:
+        """提交消息，返回是否入队"""
+        self.stats.submitted += 1
+        self._maybe_report()
+
+        if self.stats.depth >= self.max_queue:
+            if self.policy == "drop":
+                self.stats.dropped += 1
+                logger.warning("消息队列已满，丢弃消息: 消息ID:{}", message.get("MsgId", ""))
+                return False
+            if self.policy == "shed" and message.get("MsgType") in self.low_priority_types:
+                self.stats.shed += 1
+                logger.debug("消息队列已满，丢弃低优先级消息: 消息ID:{} 类型:{}",
+                             message.get("MsgId", ""), message.get("MsgType"))
+                return False
+
+            self.stats.deferred += 1
+            async with self._space:
+                await self._space.wait_for(lambda: self.stats.depth < self.max_queue)
+
+        key = self.conversation_key(message)
+        queue = self._pending.get(key)
+        if queue is None:
+            queue = self._pending[key] = deque()
+            self._ready.put_nowait(key)
+        queue.append((time.monotonic(), message))
+
+        self.stats.depth += 1
+        self.stats.max_depth = max(self.stats.max_depth, self.stats.depth)
+        self.stats.conversations = len(self._pending)
+        return True
+
+    async def _worker(self, index: int):
+        while True:
+            key = await self._ready.get()
+            queue = self._pending[key]
+            enqueued_at, message = queue.popleft()
+
+            self.stats.record_lag(time.monotonic() - enqueued_at)
+            self.stats.busy_workers += 1
+            try:
+                await self.handler(message)
+            except Exception as e:
+                self.stats.failed += 1
+                logger.exception("处理消息失败: 消息ID:{} 错误:{}", message.get("MsgId", ""), e)
+            finally:
+                self.stats.busy_workers -= 1
+                self.stats.processed += 1
+                self.stats.depth -= 1
+
+                # 同一会话还有消息则重新排队，保证会话内顺序
+                if queue:
+                    self._ready.put_nowait(key)
+                else:
+                    del self._pending[key]
+                self.stats.conversations = len(self._pending)
+
+                async with self._space:
+                    self._space.notify_all()
+
+    def _maybe_report(self):
+        if not self.report_interval:
+            return
+        now = time.monotonic()
+        if now - self._last_report >= self.report_interval:
+            self._last_report = now
+            stats = self.stats
+            logger.debug("消息分发统计: 排队:{} 最大排队:{} 会话:{} 忙碌worker:{}/{} 已处理:{} 失败:{} 丢弃:{} "
+                         "降级丢弃:{} 等待入队:{} 平均延迟:{:.3f}s 最大延迟:{:.3f}s",
+                         stats.depth, stats.max_depth, stats.conversations, stats.busy_workers, self.workers,
+                         stats.processed, stats.failed, stats.dropped, stats.shed, stats.deferred,
+                         stats.avg_lag, stats.max_lag)
@@ -0,0 +1,215 @@
+"""
+消息日志模块
+XYBot 处理每条消息时输出的日志
+
+原先每条消息都以 INFO 级别输出完整的 Content，图片、语音、视频、表情、链接消息是整段XML，
+xml消息还会在 DEBUG 级别再输出一遍。消息多的群里，日志格式化和写文件占了可观的CPU，日志文件也很快占满磁盘。
+
+- 日志中的消息内容截断到 content-length 个字符，超出的部分只记录长度和哈希
+- 媒体、表情、xml、系统消息按 sample-rate 采样；每个会话按 chat-rate/chat-burst 限流，
+  被省略的条数附在该会话下一条日志中
+- 可选的结构化记录(JSON)写入 file 指定的文件，默认不输出；打开后每条消息会在普通日志和结构化日志中各写一次
+- 运行时可以对某个 wxid(会话或发送人)打开详细日志，这些消息不采样、不限流、不截断
+"""
+
+import hashlib
+import random
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Mapping, Optional
+
+from loguru import logger
+
+# 按 sample-rate 采样的消息，文本、引用、文件、拍一拍消息总是记录(仍然受会话限流)
+SAMPLED_KINDS = {"图片消息", "语音消息", "视频消息", "表情消息", "链接分享消息", "系统消息"}
+
+# 限流和省略计数最多跟踪的会话数，超出时丢弃最早的
+MAX_CHATS = 10000
+
+
+@dataclass
+class MessageLogStats:
+    """消息日志统计数据"""
+    logged: int = 0  # 记录的消息数
+    verbose: int = 0  # 其中详细记录的消息数
+    sampled: int = 0  # 采样省略的消息数
+    limited: int = 0  # 会话限流省略的消息数
+    truncated: int = 0  # 内容被截断的消息数
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class MessageLog:
+    """消息日志，整个进程共用一个实例 message_log
+
+    管理后台在另一个线程中调用 set_verbose/clear_verbose，详细日志名单用锁保护。
+    """
+
+    def __init__(self, config: Optional[dict] = None):
+        self.stats = MessageLogStats()
+        self._buckets: Dict[str, list] = {}  # 会话 -> [令牌数, 上次补充时间]
+        self._suppressed: Dict[str, int] = {}  # 会话 -> 上次记录之后省略的条数
+        self._verbose: Dict[str, float] = {}  # wxid -> 到期时间(time.time())，0为不过期
+        self._lock = threading.Lock()
+        self._sink_id = None
+        self._last_report = time.monotonic()
+        self.configure(config or {})
+
+    def configure(self, config: dict):
+        """应用配置，重新添加结构化日志文件 sink"""
+        self.config = config
+        self.content_length = config.get("content-length", 100)
+        self.sample_rate = min(max(config.get("sample-rate", 1.0), 0.0), 1.0)
+        self.chat_rate = config.get("chat-rate", 2)
+        self.chat_burst = max(1, config.get("chat-burst", 10))
+        self.report_interval = config.get("report-interval", 300)
+        with self._lock:
+            for wxid in config.get("verbose", []):
+                self._verbose[wxid] = 0
+
+        if self._sink_id is not None:
+            logger.remove(self._sink_id)
+            self._sink_id = None
+        if config.get("file"):
+            self._sink_id = logger.add(
+                config["file"],
+                serialize=True,
+                enqueue=True,
+                encoding="utf-8",
+                level="INFO",
+                rotation=config.get("rotation", "00:01"),
+                retention=config.get("retention", "3 days"),
+                filter=lambda record: record["extra"].get("event") == "message",
+            )
+
+    def close(self):
+        """移除结构化日志文件 sink"""
+        if self._sink_id is not None:
+            logger.remove(self._sink_id)
+            self._sink_id = None
+
+    def set_verbose(self, wxid: str, minutes: float = 0):
+        """对 wxid(会话或发送人)打开详细日志，minutes 分钟后自动关闭，0为不关闭"""
+        with self._lock:
+            self._verbose[wxid] = time.time() + minutes * 60 if minutes > 0 else 0
+        logger.info("已打开 {} 的详细消息日志{}", wxid, f"，{minutes} 分钟后关闭" if minutes > 0 else "")
+
+    def clear_verbose(self, wxid: str) -> bool:
+        """关闭 wxid 的详细日志"""
+        with self._lock:
+            removed = self._verbose.pop(wxid, None) is not None
+        if removed:
+            logger.info("已关闭 {} 的详细消息日志", wxid)
+        return removed
+
+    def verbose_list(self) -> Dict[str, float]:
+        """打开了详细日志的 wxid -> 到期时间戳(0为不过期)"""
+        with self._lock:
+            self._expire_verbose()
+            return dict(self._verbose)
+
+    def _expire_verbose(self):
+        now = time.time()
+        for wxid in [wxid for wxid, expires in self._verbose.items() if expires and expires <= now]:
+            del self._verbose[wxid]
+
+    def is_verbose(self, *wxids: Optional[str]) -> bool:
+        if not self._verbose:
+            return False
+        with self._lock:
+            self._expire_verbose()
+            return any(wxid in self._verbose for wxid in wxids if wxid)
+
+    def preview(self, content: Any) -> str:
+        """截断后的内容，超出部分替换为长度和哈希"""
+        if content is None:
+            return ""
+        if not isinstance(content, str):
+            return f"<{type(content).__name__}>"
+        if len(content) <= self.content_length:
+            return content
+        digest = hashlib.blake2b(content.encode(), digest_size=4).hexdigest()
+        return f"{content[:self.content_length]}…(共{len(content)}字 #{digest})"
+
+    def _allow(self, chat: str) -> bool:
+        """会话令牌桶限流"""
+        if not self.chat_rate:
+            return True
+        now = time.monotonic()
+        bucket = self._buckets.get(chat)
+        if bucket is None:
+            bucket = self._buckets[chat] = [float(self.chat_burst), now]
+            if len(self._buckets) > MAX_CHATS:  # 会话太多时丢弃最早的
+                del self._buckets[next(iter(self._buckets))]
+        else:
+            bucket[0] = min(self.chat_burst, bucket[0] + (now - bucket[1]) * self.chat_rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return True
+        return False
+
+    def _suppress(self, chat: str):
+        self._suppressed[chat] = self._suppressed.get(chat, 0) + 1
+        if len(self._suppressed) > MAX_CHATS:  # 会话太多时丢弃最早的
+            del self._suppressed[next(iter(self._suppressed))]
+
+    def received(self, kind: str, message: Mapping, **fields):
+        """记录收到的消息
+
+        Args:
+            kind (str): 消息种类，例如 文本消息、图片消息
+            message (Mapping): XYBot 预处理后的消息
+            **fields: 附加字段，例如 ats、quote，会一起写入结构化记录
+        """
+        chat = message.get("FromWxid") or ""
+        sender = message.get("SenderWxid") or message.get("ActualUserWxid") or ""
+        verbose = self.is_verbose(chat, sender)
+
+        if not verbose:
+            if kind in SAMPLED_KINDS and self.sample_rate < 1 and random.random() >= self.sample_rate:
+                self.stats.sampled += 1
+                self._suppress(chat)
+                self._maybe_report()
+                return
+            if not self._allow(chat):
+                self.stats.limited += 1
+                self._suppress(chat)
+                self._maybe_report()
+                return
+
+        content = message.get("Content", "")
+        if verbose:
+            preview = content if isinstance(content, str) else self.preview(content)
+            self.stats.verbose += 1
+        else:
+            preview = self.preview(content)
+            if preview is not content:
+                self.stats.truncated += 1
+        suppressed = self._suppressed.pop(chat, 0)
+        self.stats.logged += 1
+
+        extra = "".join(f" {key}:{value}" for key, value in fields.items())
+        logger.bind(event="message", kind=kind, msg_id=message.get("MsgId", ""), msg_type=message.get("MsgType"),
+                    chat=chat, sender=sender, is_group=message.get("IsGroup"),
+                    length=len(content) if isinstance(content, str) else None, content=preview,
+                    suppressed=suppressed, verbose=verbose, **fields).info(
+            "收到{}: 消息ID:{} 来自:{} 发送人:{}{} 内容:{}{}",
+            kind, message.get("MsgId", ""), chat, sender, extra, preview,
+            f" (此前省略 {suppressed} 条)" if suppressed else "")
+        self._maybe_report()
+
+    def _maybe_report(self):
+        if not self.report_interval:
+            return
+        now = time.monotonic()
+        if now - self._last_report >= self.report_interval:
+            self._last_report = now
+            logger.debug("消息日志统计: 记录 {} 条(详细 {} 条，截断 {} 条)，采样省略 {} 条，限流省略 {} 条",
+                         self.stats.logged, self.stats.verbose, self.stats.truncated,
+                         self.stats.sampled, self.stats.limited)
+
+
+message_log = MessageLog()
@@ -0,0 +1,265 @@
+"""
+消息解析模块
+XYBot 预处理消息时使用的解析函数
+
+原先同一条消息的 Content 会被 ET.fromstring 解析好几次: 先解析一次判断 appmsg 类型，
+引用、文件消息的处理函数再各自解析一次，引用消息的每个字段还要 find 两次；
+每条文本消息都要为了 atuserlist 解析一遍 MsgSource。
+这里每段XML只解析一次，节点的子元素一次遍历取出，解析结果直接交给后续处理；
+@ 列表用预编译的正则从 MsgSource 中取出，不构建XML树。
+"""
+
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+_ATUSERLIST = re.compile(r"<atuserlist>\s*(?:<!\[CDATA\[)?(.*?)(?:]]>)?\s*</atuserlist>", re.S)
+
+
+class MessageParseError(ValueError):
+    """消息内容不是预期的格式"""
+
+
+@dataclass(slots=True)
+class Envelope:
+    """拆分出发送人后的消息
+
+    Attributes:
+        from_wxid (str): 会话wxid，群聊为群wxid，私聊为对方wxid
+        sender_wxid (str): 实际发送人wxid
+        is_group (bool): 是否群聊消息
+        content (str): 去掉发送人前缀后的内容
+    """
+    from_wxid: str
+    sender_wxid: str
+    is_group: bool
+    content: str
+
+
+@dataclass(slots=True)
+class AppMsg:
+    """xml消息(MsgType 49)的 appmsg 节点
+
+    Attributes:
+        type (int): appmsg 类型，57引用 6文件 5链接 74上传中的文件
+        fields (Dict[str, Optional[str]]): 子元素的标签 -> 文本
+        element (ET.Element): appmsg 节点，需要更深的节点时使用
+    """
+    type: int
+    fields: Dict[str, Optional[str]]
+    element: ET.Element
+
+    @property
+    def title(self) -> Optional[str]:
+        return self.fields.get("title")
+
+
+@dataclass(slots=True)
+class FileInfo:
+    """文件消息中的附件信息"""
+    filename: Optional[str]
+    attach_id: Optional[str]
+    file_ext: Optional[str]
+
+
+@dataclass(slots=True)
+class SystemMsg:
+    """系统消息(MsgType 10002)
+
+    Attributes:
+        type (str): sysmsg 的 type 属性，例如 pat、revokemsg
+        element (ET.Element): sysmsg 根节点
+    """
+    type: str
+    element: ET.Element
+
+
+@dataclass(slots=True)
+class PatInfo:
+    """拍一拍"""
+    patter: Optional[str]
+    patted: Optional[str]
+    suffix: Optional[str]
+
+
+def strip_xml(content: str) -> str:
+    """去掉XML内容中的换行和制表符"""
+    return content.replace("\n", "").replace("\t", "")
+
+
+def split_sender(content: str, from_wxid: str, to_wxid: str, self_wxid: str, separator: str = ":") -> Envelope:
+    """拆分群聊消息内容前的发送人，私聊消息的发送人就是 from_wxid
+
+    Args:
+        content (str): 消息内容，群聊消息以 "发送人wxid" + separator 开头
+        from_wxid (str): FromUserName
+        to_wxid (str): ToUserName
+        self_wxid (str): 机器人wxid，群聊消息没有发送人前缀时视为自己发送；自己发出的私聊消息会话wxid取 to_wxid
+        separator (str, optional): 发送人与内容的分隔符，文本消息为 ":\\n". 默认为 ":"
+
+    Returns:
+        Envelope: 拆分结果
+    """
+    if from_wxid.endswith("@chatroom"):
+        sender, found, rest = content.partition(separator)
+        if found:
+            return Envelope(from_wxid, sender, True, rest)
+        return Envelope(from_wxid, self_wxid, True, content)
+
+    return Envelope(to_wxid if from_wxid == self_wxid else from_wxid, from_wxid, False, content)
+
+
+def parse_ats(msg_source: str) -> List[str]:
+    """从 MsgSource 中取出被@的wxid列表"""
+    if not msg_source or "<atuserlist" not in msg_source:
+        return []
+    match = _ATUSERLIST.search(msg_source)
+    if match is None:
+        return []
+    ats = match.group(1).strip().strip(",")
+    return ats.split(",") if ats else []
+
+
+def child_texts(element: Optional[ET.Element]) -> Dict[str, Optional[str]]:
+    """一次遍历取出所有子元素的文本，同名子元素取第一个，与 find 一致"""
+    if element is None:
+        return {}
+    return {child.tag: child.text for child in reversed(element)}
+
+
+def _text(fields: Dict[str, Optional[str]], tag: str) -> str:
+    return fields.get(tag) or ""
+
+
+def _int(fields: Dict[str, Optional[str]], tag: str) -> int:
+    """取整数字段，缺失、为空或不是数字时为 0"""
+    value = fields.get(tag)
+    try:
+        return int(value) if value and value.strip() else 0
+    except ValueError:
+        return 0
+
+
+def _fromstring(content: str) -> ET.Element:
+    try:
+        return ET.fromstring(content)
+    except ET.ParseError as e:
+        raise MessageParseError(f"XML格式错误: {e}") from e
+
+
+def attributes(content: str, tag: str) -> Dict[str, str]:
+    """解析XML并取出根节点下 tag 子元素的属性，子元素不存在时返回空字典，例如图片消息的 img、语音消息的 voicemsg
+
+    Raises:
+        MessageParseError: XML格式错误
+    """
+    element = _fromstring(content).find(tag)
+    return dict(element.attrib) if element is not None else {}
+
+
+def parse_appmsg(content: str) -> AppMsg:
+    """解析xml消息的 appmsg 节点
+
+    Raises:
+        MessageParseError: XML格式错误，或者缺少 appmsg、type 节点
+    """
+    appmsg = _fromstring(content).find("appmsg")
+    if appmsg is None:
+        raise MessageParseError("XML 中未找到 appmsg 节点")
+    fields = child_texts(appmsg)
+    if "type" not in fields:
+        raise MessageParseError("XML 中未找到 type 节点")
+    try:
+        type_value = int(fields["type"])
+    except (TypeError, ValueError):
+        raise MessageParseError(f"appmsg 类型不是数字: {fields['type']}") from None
+    return AppMsg(type_value, fields, appmsg)
+
+
+# 被引用的xml消息中取出的字段: 结果中的键 -> appmsg 子元素标签
+_QUOTE_XML_TEXT_FIELDS = (
+    ("destination", "des"), ("action", "action"), ("url", "url"), ("lowurl", "lowurl"),
+    ("dataurl", "dataurl"), ("lowdataurl", "lowdataurl"), ("songlyric", "songlyric"),
+)
+_QUOTE_XML_INT_FIELDS = (("XmlType", "type"), ("showtype", "showtype"), ("soundtype", "soundtype"))
+_QUOTE_XML_TAIL_TEXT_FIELDS = ("extinfo", "sourceusername", "sourcedisplayname", "thumburl", "md5", "statextstr")
+_QUOTE_ATTACH_TEXT_FIELDS = ("attachid", "emoticonmd5", "fileext", "cdnthumbaeskey", "aeskey")
+
+
+def parse_quote(appmsg: AppMsg) -> Dict:
+    """取出引用消息(appmsg 类型57)中被引用的消息，格式同 message["Quote"]
+
+    Raises:
+        MessageParseError: 缺少 refermsg 节点，或者被引用的xml消息格式错误
+    """
+    refer = child_texts(appmsg.element.find("refermsg"))
+    if not refer:
+        raise MessageParseError("引用消息中未找到 refermsg 节点")
+
+    quote = {"MsgType": _int(refer, "type")}
+    if quote["MsgType"] not in (1, 49):
+        return quote
+
+    quote["NewMsgId"] = refer.get("svrid")
+    quote["ToWxid"] = refer.get("fromusr")
+    quote["FromWxid"] = refer.get("chatusr")
+    quote["Nickname"] = refer.get("displayname")
+    quote["MsgSource"] = refer.get("msgsource")
+    quote["Content"] = refer.get("content")
+    quote["Createtime"] = refer.get("createtime")
+
+    if quote["MsgType"] == 49:  # 被引用的是xml消息，内容是另一段XML
+        inner = _fromstring(quote["Content"] or "").find("appmsg")
+        fields = child_texts(inner)
+        quote["Content"] = _text(fields, "title")
+        for key, tag in _QUOTE_XML_TEXT_FIELDS:
+            quote[key] = _text(fields, tag)
+        for key, tag in _QUOTE_XML_INT_FIELDS:
+            quote[key] = _int(fields, tag)
+        attach = child_texts(inner.find("appattach") if inner is not None else None)
+        quote["appattach"] = {"totallen": _int(attach, "totallen")}
+        for tag in _QUOTE_ATTACH_TEXT_FIELDS:
+            quote["appattach"][tag] = _text(attach, tag)
+        for tag in _QUOTE_XML_TAIL_TEXT_FIELDS:
+            quote[tag] = _text(fields, tag)
+        quote["directshare"] = _int(fields, "directshare")
+
+    return quote
+
+
+def parse_file(appmsg: AppMsg) -> FileInfo:
+    """取出文件消息(appmsg 类型6)的附件信息
+
+    Raises:
+        MessageParseError: 缺少 appattach 节点或 attachid
+    """
+    attach = child_texts(appmsg.element.find("appattach"))
+    if not attach.get("attachid"):
+        raise MessageParseError("文件消息中未找到 attachid")
+    return FileInfo(appmsg.title, attach["attachid"], attach.get("fileext"))
+
+
+def parse_system(content: str) -> SystemMsg:
+    """解析系统消息的 sysmsg 根节点
+
+    Raises:
+        MessageParseError: XML格式错误或者缺少 type 属性
+    """
+    root = _fromstring(content)
+    if "type" not in root.attrib:
+        raise MessageParseError("系统消息缺少 type 属性")
+    return SystemMsg(root.attrib["type"], root)
+
+
+def parse_pat(system: SystemMsg) -> PatInfo:
+    """取出拍一拍系统消息中的拍者、被拍者和后缀
+
+    Raises:
+        MessageParseError: 缺少 pat 节点
+    """
+    pat = system.element.find("pat")
+    if pat is None:
+        raise MessageParseError("拍一拍消息中未找到 pat 节点")
+    fields = child_texts(pat)
+    return PatInfo(fields.get("fromusername"), fields.get("pattedusername"), fields.get("patsuffix"))
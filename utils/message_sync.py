@@ -0,0 +1,230 @@
+"""
+消息同步模块
+负责从WechatAPI拉取新消息，替代固定0.5秒间隔的轮询循环
+
+支持的同步模式:
+- fixed: 固定间隔轮询（旧行为）
+- adaptive: 自适应退避，消息密集时紧密轮询，空闲时指数退避
+- long-poll: 长轮询，服务端挂起请求直到有新消息；服务端不支持时自动降级为 adaptive
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field, asdict
+from typing import AsyncIterator, Dict, List, Optional, Type
+
+from loguru import logger
+
+
+@dataclass
+class SyncStats:
+    """同步统计数据"""
+    cycles: int = 0  # 同步次数
+    idle_cycles: int = 0  # 没有新消息的同步次数
+    errors: int = 0  # 同步失败次数
+    messages: int = 0  # 累计收到的消息数
+    last_batch: int = 0  # 最近一次同步收到的消息数
+    max_batch: int = 0  # 单次同步最多收到的消息数
+    last_latency: float = 0.0  # 最近一次同步耗时(秒)
+    avg_latency: float = 0.0  # 同步耗时的指数移动平均(秒)
+    max_latency: float = 0.0  # 最大同步耗时(秒)
+    current_delay: float = 0.0  # 当前同步间隔(秒)
+    mode: str = ""  # 当前同步模式
+    started_at: float = field(default_factory=time.time)
+
+    def record(self, batch: int, latency: float):
+        """记录一次同步"""
+        self.cycles += 1
+        self.last_batch = batch
+        self.messages += batch
+        self.max_batch = max(self.max_batch, batch)
+        if batch == 0:
+            self.idle_cycles += 1
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+        # 指数移动平均，平滑单次抖动
+        self.avg_latency = latency if self.cycles == 1 else self.avg_latency * 0.9 + latency * 0.1
+
+    @property
+    def messages_per_sync(self) -> float:
+        return self.messages / self.cycles if self.cycles else 0.0
+
+    def as_dict(self) -> dict:
+        data = asdict(self)
+        data["messages_per_sync"] = round(self.messages_per_sync, 3)
+        data["uptime"] = round(time.time() - self.started_at, 1)
+        return data
+
+
+class SyncStrategy:
+    """同步策略基类，决定每次同步的超时时间和下一次同步前的等待时间"""
+    name = "base"
+
+    def __init__(self, config: dict):
+        self.config = config
+
+    @property
+    def request_timeout(self) -> float:
+        return self.config.get("request-timeout", 10)
+
+    def next_delay(self, batch: int, latency: float) -> float:
+        raise NotImplementedError
+
+    def on_error(self) -> float:
+        return self.config.get("error-delay", 5)
+
+
+class FixedStrategy(SyncStrategy):
+    """固定间隔轮询"""
+    name = "fixed"
+
+    def next_delay(self, batch: int, latency: float) -> float:
+        return self.config.get("interval", 0.5)
+
+
+class AdaptiveStrategy(SyncStrategy):
+    """自适应退避：收到消息后立即回到最小间隔，连续空闲时按倍数退避到最大间隔"""
+    name = "adaptive"
+
+    def __init__(self, config: dict):
+        super().__init__(config)
+        self.min_interval = config.get("min-interval", 0.05)
+        self.max_interval = config.get("max-interval", 2.0)
+        self.backoff_factor = config.get("backoff-factor", 2.0)
+        # 空闲几次之后才开始退避，避免一条消息后马上放慢
+        self.idle_grace = config.get("idle-grace", 2)
+        self._delay = self.min_interval
+        self._idle = 0
+
+    def reset(self):
+        self._delay = self.min_interval
+        self._idle = 0
+
+    def next_delay(self, batch: int, latency: float) -> float:
+        if batch > 0:
+            self.reset()
+            return 0 if batch >= self.config.get("burst-batch", 10) else self.min_interval
+
+        self._idle += 1
+        if self._idle > self.idle_grace:
+            self._delay = min(self._delay * self.backoff_factor, self.max_interval)
+        return self._delay
+
+
+class LongPollStrategy(AdaptiveStrategy):
+    """长轮询：服务端挂起请求，请求返回后立即发起下一次
+
+    如果空响应总是很快返回，说明服务端不支持长轮询，此时退化为自适应退避。
+    """
+    name = "long-poll"
+
+    def __init__(self, config: dict):
+        super().__init__(config)
+        self.hold = config.get("long-poll-timeout", 30)
+        self.detect_threshold = config.get("long-poll-detect", 1.0)
+        self.detect_cycles = config.get("long-poll-detect-cycles", 5)
+        self._fast_empty = 0
+        self.supported = True
+
+    @property
+    def request_timeout(self) -> float:
+        return self.hold + self.config.get("request-timeout", 10) if self.supported else super().request_timeout
+
+    def next_delay(self, batch: int, latency: float) -> float:
+        if not self.supported:
+            return super().next_delay(batch, latency)
+
+        if batch == 0 and latency < self.detect_threshold:
+            self._fast_empty += 1
+            if self._fast_empty >= self.detect_cycles:
+                self.supported = False
+                logger.warning("WechatAPI服务端不支持长轮询，已降级为自适应轮询")
+            return super().next_delay(batch, latency)
+
+        self._fast_empty = 0
+        self.reset()
+        return 0
+
+
+STRATEGIES: Dict[str, Type[SyncStrategy]] = {
+    FixedStrategy.name: FixedStrategy,
+    AdaptiveStrategy.name: AdaptiveStrategy,
+    LongPollStrategy.name: LongPollStrategy,
+}
+
+
+def register_strategy(strategy: Type[SyncStrategy]):
+    """注册自定义同步策略"""
+    STRATEGIES[strategy.name] = strategy
+    return strategy
+
+
+class MessageSync:
+    """消息同步器
+
+    用法:
+        sync = MessageSync(bot, config.get("MessageSync", {}))
+        async for messages in sync:
+            ...
+    """
+
+    def __init__(self, bot, config: Optional[dict] = None):
+        self.bot = bot
+        self.config = config or {}
+
+        mode = self.config.get("mode", "adaptive")
+        if mode not in STRATEGIES:
+            logger.warning("未知的消息同步模式: {}，使用 adaptive", mode)
+            mode = "adaptive"
+        self.strategy = STRATEGIES[mode](self.config)
+
+        self.stats = SyncStats(mode=mode)
+        self.report_interval = self.config.get("report-interval", 300)
+        self._last_report = time.monotonic()
+        self._running = False
+
+    async def sync_once(self) -> List[dict]:
+        """同步一次，返回新消息列表"""
+        start = time.monotonic()
+        data = await self.bot.sync_message(timeout=self.strategy.request_timeout)
+        latency = time.monotonic() - start
+
+        messages = (data or {}).get("AddMsgs") or []
+        self.stats.record(len(messages), latency)
+        self.stats.current_delay = self.strategy.next_delay(len(messages), latency)
+        if isinstance(self.strategy, LongPollStrategy) and not self.strategy.supported:
+            self.stats.mode = AdaptiveStrategy.name
+        return messages
+
+    def _maybe_report(self):
+        if not self.report_interval:
+            return
+        now = time.monotonic()
+        if now - self._last_report >= self.report_interval:
+            self._last_report = now
+            stats = self.stats
+            logger.debug("消息同步统计: 模式:{} 同步次数:{} 空闲次数:{} 消息数:{} 平均每次:{:.2f} 平均耗时:{:.3f}s "
+                         "最大耗时:{:.3f}s 当前间隔:{:.2f}s 失败:{}",
+                         stats.mode, stats.cycles, stats.idle_cycles, stats.messages, stats.messages_per_sync,
+                         stats.avg_latency, stats.max_latency, stats.current_delay, stats.errors)
+
+    def stop(self):
+        self._running = False
+
+    async def __aiter__(self) -> AsyncIterator[List[dict]]:
+        self._running = True
+        while self._running:
+            try:
+                messages = await self.sync_once()
+            except Exception as e:
+                self.stats.errors += 1
+                logger.warning("获取新消息失败 {}", e)
+                await asyncio.sleep(self.strategy.on_error())
+                continue
+
+            if messages:
+                yield messages
+
+            self._maybe_report()
+            if self.stats.current_delay > 0:
+                await asyncio.sleep(self.stats.current_delay)
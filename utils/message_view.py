@@ -0,0 +1,158 @@
+"""
+消息视图模块
+EventManager 分发事件时为每个处理函数提供的写时复制(copy-on-write)消息视图
+
+原先每个处理函数都会拿到一份 copy.deepcopy 的消息，图片、语音、视频、文件消息的
+base64 内容动辄数MB，有多少个处理函数就要复制多少份。
+MessageView 只浅拷贝顶层字段，str/bytes 等不可变的大字段直接共享；
+嵌套的 dict/list/set 在第一次被访问时才复制，所以处理函数修改消息不会影响其他处理函数。
+MessageView 重写了 __iter__，dict(view)、{**view}、dict.update(view) 等也会经过 __getitem__ 读取，
+json.dumps 经过 items()，view | {...} 和 {...} | view 由 __or__/__ror__ 处理，拿到的嵌套结构都是私有副本。
+pickle、copy.deepcopy 直接序列化或深拷贝，不需要私有化。
+
+XYBot 分发的消息模型(utils.message.Message)本身不可变，MessageOverlay 是它上面的 MessageView，
+拷贝的是消息模型引用的消息字典，另外可以通过 message 属性按属性读取消息模型。
+"""
+
+import copy
+from typing import Any
+
+from .message import Message
+
+_CONTAINERS = (dict, list, set)
+
+
+def private_copy(value: Any) -> Any:
+    """为处理函数生成一份私有的值: 消息模型转为 MessageOverlay，dict 转为 MessageView，list/set 复制容器本身，其余不可变值直接共享"""
+    if isinstance(value, Message):
+        return MessageOverlay(value)
+    if isinstance(value, MessageView):
+        return MessageView(value)
+    if isinstance(value, dict):
+        return MessageView(value)
+    if isinstance(value, list):
+        return [private_copy(item) for item in value]
+    if isinstance(value, set):
+        return set(value)
+    return value
+
+
+class MessageView(dict):
+    """写时复制的消息视图，可当作普通 dict 使用"""
+    __slots__ = ("_owned",)
+
+    def __init__(self, source=(), **kwargs):
+        super().__init__(source, **kwargs)
+        self._owned = set()  # 已经私有化(或由处理函数自己写入)的键
+
+    def _own(self, key, value):
+        if key not in self._owned and isinstance(value, _CONTAINERS):
+            value = private_copy(value)
+            dict.__setitem__(self, key, value)
+        self._owned.add(key)
+        return value
+
+    def _own_all(self):
+        for key, value in dict.items(self):
+            if key not in self._owned:
+                self._own(key, value)
+
+    def __getitem__(self, key):
+        return self._own(key, dict.__getitem__(self, key))
+
+    def get(self, key, default=None):
+        if dict.__contains__(self, key):
+            return self[key]
+        return default
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self._owned.add(key)
+
+    def setdefault(self, key, default=None):
+        if dict.__contains__(self, key):
+            return self[key]
+        self[key] = default
+        return default
+
+    def pop(self, key, *default):
+        if dict.__contains__(self, key):
+            self._own(key, dict.__getitem__(self, key))
+        self._owned.discard(key)
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        if key not in self._owned:
+            value = private_copy(value)
+        self._owned.discard(key)
+        return key, value
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def __iter__(self):
+        # 不再是 dict 自己的 __iter__，dict()、{**view} 等会改为通过 keys() 和 __getitem__ 复制
+        return dict.__iter__(self)
+
+    def values(self):
+        self._own_all()
+        return dict.values(self)
+
+    def items(self):
+        self._own_all()
+        return dict.items(self)
+
+    def __or__(self, other):
+        if not isinstance(other, dict):
+            return NotImplemented
+        merged = dict(self)
+        merged.update(other)
+        return merged
+
+    def __ror__(self, other):
+        if not isinstance(other, dict):
+            return NotImplemented
+        merged = dict(other)
+        merged.update(self)
+        return merged
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def copy(self):
+        return MessageView(self)
+
+    def __copy__(self):
+        return MessageView(self)
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(dict(dict.items(self)), memo)
+
+    def __reduce__(self):
+        return dict, (dict(dict.items(self)),)
+
+
+class MessageOverlay(MessageView):
+    """消息模型的写时复制视图，可当作普通 dict 使用，message 为背后的消息模型
+
+    与 MessageView 相同，只浅拷贝消息模型引用的消息字典，嵌套的 dict/list 在第一次被访问时才复制。
+    """
+    __slots__ = ("message",)
+
+    def __init__(self, message: Message):
+        dict.__init__(self, message._data)
+        self._owned = set()
+        self.message = message
+
+    def copy(self):
+        overlay = MessageOverlay.__new__(MessageOverlay)
+        dict.update(overlay, self)
+        overlay._owned = set()
+        overlay.message = self.message
+        return overlay
+
+    def __copy__(self):
+        return self.copy()
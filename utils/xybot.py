@@ -1,13 +1,18 @@
 import tomllib
-import xml.etree.ElementTree as ET
-from typing import Dict, Any
+from typing import Any, Dict, Optional
 
 from loguru import logger
 
-from WechatAPI import WechatAPIClient
+from WechatAPI import MediaHandle, WechatAPIClient
 from WechatAPI.Client.protect import protector
 from database.messsagDB import MessageDB
 from utils.event_manager import EventManager
+from utils.message import (FileMessage, ImageMessage, Message, PatMessage, QuoteMessage, SystemMessage, TextMessage,
+                           VideoMessage, VoiceMessage)
+from utils.message_log import message_log
+from utils.message_parser import (AppMsg, Envelope, MessageParseError, SystemMsg, attributes, parse_appmsg,
+                                  parse_ats, parse_file, parse_pat, parse_quote, parse_system, split_sender,
+                                  strip_xml)
 
 
 class XYBot:
@@ -27,6 +32,10 @@ class XYBot:
         self.whitelist = main_config.get("XYBot", {}).get("whitelist", [])
         self.blacklist = main_config.get("XYBot", {}).get("blacklist", [])
 
+        # 兼容旧插件: 分发图片、语音、视频、文件消息前先下载，填入原来的 Content/Video/File 字段
+        # 只有声明了 legacy_media=False 的处理函数不需要预先下载，关闭后总是不预先下载
+        self.legacy_media_fields = main_config.get("XYBot", {}).get("legacy-media-fields", True)
+
         self.msg_db = MessageDB()
 
     def update_profile(self, wxid: str, nickname: str, alias: str, phone: str):
@@ -36,6 +45,24 @@ class XYBot:
         self.alias = alias
         self.phone = phone
 
+    def unpack(self, message: Dict[str, Any], separator: str = ":", strip: bool = True) -> Envelope:
+        """取出消息内容，拆分群聊消息的发送人，填入 Content、SenderWxid、FromWxid、IsGroup
+
+        Args:
+            message (Dict[str, Any]): 原始消息
+            separator (str, optional): 群聊消息中发送人与内容的分隔符. 默认为 ":"
+            strip (bool, optional): 是否先去掉内容中的换行和制表符(XML内容). 默认为 True
+        """
+        content = message.get("Content", {}).get("string", "")
+        if strip:
+            content = strip_xml(content)
+        envelope = split_sender(content, message["FromWxid"], message["ToWxid"], self.wxid, separator)
+        message["Content"] = envelope.content
+        message["SenderWxid"] = envelope.sender_wxid
+        message["FromWxid"] = envelope.from_wxid
+        message["IsGroup"] = envelope.is_group
+        return envelope
+
     async def process_message(self, message: Dict[str, Any]):
         """处理接收到的消息"""
 
@@ -65,6 +92,8 @@ class XYBot:
             await self.process_xml_message(message)
         elif msg_type == 10002:  # 系统消息
             await self.process_system_message(message)
+        elif msg_type == 10000:  # 系统提示(入群、退群、修改群名、添加好友等)
+            self.process_notice_message(message)
         elif msg_type == 37:  # 好友请求
             if self.ignore_protection or not protector.check(14400):
                 await EventManager.emit("friend_request", self.bot, message)
@@ -77,35 +106,8 @@ class XYBot:
 
     async def process_text_message(self, message: Dict[str, Any]):
         """处理文本消息"""
-        message["Content"] = message.get("Content", {}).get("string", "")
-
-        if message["FromWxid"].endswith("@chatroom"):  # 群聊消息
-            message["IsGroup"] = True
-            split_content = message["Content"].split(":\n", 1)
-            if len(split_content) > 1:
-                message["Content"] = split_content[1]
-                message["SenderWxid"] = split_content[0]
-            else:
-                message["Content"] = split_content[0]
-                message["SenderWxid"] = self.wxid
-        else:
-            message["SenderWxid"] = message["FromWxid"]
-            if message["FromWxid"] == self.wxid:
-                message["FromWxid"] = message["ToWxid"]
-            message["IsGroup"] = False
-
-        try:
-            root = ET.fromstring(message.get("MsgSource", ""))
-            ats = root.find("atuserlist").text if root.find("atuserlist") is not None else ""
-        except Exception as e:
-            logger.error("解析文本消息失败: {}", e)
-            ats = ""
-
-        if ats:
-            ats = ats.strip(",").split(",")
-        else:
-            ats = []
-        message["Ats"] = ats if ats and ats[0] != "" else []
+        self.unpack(message, separator=":\n", strip=False)
+        message["Ats"] = parse_ats(message.get("MsgSource", ""))
 
         await self.msg_db.save_message(
             msg_id=int(message.get("MsgId", 0)),
@@ -117,48 +119,27 @@ class XYBot:
         )
 
         if self.wxid in message.get("Ats", []):
-            logger.info("收到被@消息: 消息ID:{} 来自:{} 发送人:{} @:{} 内容:{}", 
-                        message.get("MsgId", ""), message["FromWxid"], 
-                        message["SenderWxid"], message["Ats"], message["Content"])
+            message_log.received("被@消息", message, ats=message["Ats"])
             if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
                 if self.ignore_protection or not protector.check(14400):
-                    await EventManager.emit("at_message", self.bot, message)
+                    await EventManager.emit("at_message", self.bot, TextMessage.from_dict(message))
                 else:
                     logger.warning("风控保护: 新设备登录后4小时内请挂机")
             return
 
-        logger.info("收到文本消息: 消息ID:{} 来自:{} 发送人:{} @:{} 内容:{}", 
-                    message.get("MsgId", ""), message["FromWxid"], 
-                    message["SenderWxid"], message["Ats"], message["Content"])
+        message_log.received("文本消息", message, ats=message["Ats"])
 
         if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
             if self.ignore_protection or not protector.check(14400):
-                await EventManager.emit("text_message", self.bot, message)
+                await EventManager.emit("text_message", self.bot, TextMessage.from_dict(message))
             else:
                 logger.warning("风控保护: 新设备登录后4小时内请挂机")
 
     async def process_image_message(self, message: Dict[str, Any]):
         """处理图片消息"""
-        message["Content"] = message.get("Content", {}).get("string", "").replace("\n", "").replace("\t", "")
-
-        if message["FromWxid"].endswith("@chatroom"):
-            message["IsGroup"] = True
-            split_content = message["Content"].split(":", 1)
-            if len(split_content) > 1:
-                message["Content"] = split_content[1]
-                message["SenderWxid"] = split_content[0]
-            else:
-                message["Content"] = split_content[0]
-                message["SenderWxid"] = self.wxid
-        else:
-            message["SenderWxid"] = message["FromWxid"]
-            if message["FromWxid"] == self.wxid:
-                message["FromWxid"] = message["ToWxid"]
-            message["IsGroup"] = False
+        self.unpack(message)
 
-        logger.info("收到图片消息: 消息ID:{} 来自:{} 发送人:{} XML:{}", 
-                    message.get("MsgId", ""), message["FromWxid"], 
-                    message["SenderWxid"], message["Content"])
+        message_log.received("图片消息", message)
 
         await self.msg_db.save_message(
             msg_id=int(message.get("MsgId", 0)),
@@ -169,48 +150,30 @@ class XYBot:
             is_group=message["IsGroup"]
         )
 
-        aeskey, cdnmidimgurl = None, None
         try:
-            root = ET.fromstring(message["Content"])
-            img_element = root.find('img')
-            if img_element is not None:
-                aeskey = img_element.get('aeskey')
-                cdnmidimgurl = img_element.get('cdnmidimgurl')
-        except Exception as e:
+            img = attributes(message["Content"], "img")
+        except MessageParseError as e:
             logger.error("解析图片消息失败: {}, 内容: {}", e, message["Content"])
             return
+        aeskey, cdnmidimgurl = img.get("aeskey"), img.get("cdnmidimgurl")
 
         if aeskey and cdnmidimgurl:
-            message["Content"] = await self.bot.download_image(aeskey, cdnmidimgurl)
+            # 处理函数第一次读取时才下载
+            message["Media"] = self.bot.image_media(aeskey, cdnmidimgurl)
 
         if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
             if self.ignore_protection or not protector.check(14400):
-                await EventManager.emit("image_message", self.bot, message)
+                if "Media" in message and self.needs_legacy_media("image_message", message):
+                    message["Content"] = await message["Media"].base64()
+                await EventManager.emit("image_message", self.bot, ImageMessage.from_dict(message))
             else:
                 logger.warning("风控保护: 新设备登录后4小时内请挂机")
 
     async def process_voice_message(self, message: Dict[str, Any]):
         """处理语音消息"""
-        message["Content"] = message.get("Content", {}).get("string", "").replace("\n", "").replace("\t", "")
-
-        if message["FromWxid"].endswith("@chatroom"):
-            message["IsGroup"] = True
-            split_content = message["Content"].split(":", 1)
-            if len(split_content) > 1:
-                message["Content"] = split_content[1]
-                message["SenderWxid"] = split_content[0]
-            else:
-                message["Content"] = split_content[0]
-                message["SenderWxid"] = self.wxid
-        else:
-            message["SenderWxid"] = message["FromWxid"]
-            if message["FromWxid"] == self.wxid:
-                message["FromWxid"] = message["ToWxid"]
-            message["IsGroup"] = False
+        self.unpack(message)
 
-        logger.info("收到语音消息: 消息ID:{} 来自:{} 发送人:{} XML:{}", 
-                    message.get("MsgId", ""), message["FromWxid"], 
-                    message["SenderWxid"], message["Content"])
+        message_log.received("语音消息", message)
 
         await self.msg_db.save_message(
             msg_id=int(message.get("MsgId", 0)),
@@ -221,53 +184,42 @@ class XYBot:
             is_group=message["IsGroup"]
         )
 
-        if message["IsGroup"] or not message.get("ImgBuf", {}).get("buffer", ""):
-            voiceurl, length = None, None
+        silk = None
+        silk_base64 = message.get("ImgBuf", {}).get("buffer", "")
+        if message["IsGroup"] or not silk_base64:
             try:
-                root = ET.fromstring(message["Content"])
-                voicemsg_element = root.find('voicemsg')
-                if voicemsg_element is not None:
-                    voiceurl = voicemsg_element.get('voiceurl')
-                    length = int(voicemsg_element.get('length'))
-            except Exception as e:
+                voicemsg = attributes(message["Content"], "voicemsg")
+                voiceurl, length = voicemsg.get("voiceurl"), int(voicemsg.get("length") or 0)
+            except (MessageParseError, ValueError) as e:
                 logger.error("解析语音消息失败: {}, 内容: {}", e, message["Content"])
                 return
 
             if voiceurl and length:
-                silk_base64 = await self.bot.download_voice(message["MsgId"], voiceurl, length)
-                message["Content"] = await self.bot.silk_base64_to_wav_byte(silk_base64)
+                silk = self.bot.voice_media(message["MsgId"], voiceurl, length)
         else:
-            silk_base64 = message.get("ImgBuf", {}).get("buffer", "")
-            message["Content"] = await self.bot.silk_base64_to_wav_byte(silk_base64)
+            silk = MediaHandle.of(silk_base64)
+
+        if silk is not None:
+            async def silk_to_wav() -> bytes:
+                return await self.bot.silk_byte_to_byte_wav_byte(await silk.read())
+
+            # 处理函数第一次读取时才下载并转换为wav
+            message["Media"] = MediaHandle.lazy(silk_to_wav)
 
         if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
             if self.ignore_protection or not protector.check(14400):
-                await EventManager.emit("voice_message", self.bot, message)
+                if "Media" in message and self.needs_legacy_media("voice_message", message):
+                    message["Content"] = await message["Media"].read()
+                await EventManager.emit("voice_message", self.bot, VoiceMessage.from_dict(message))
             else:
                 logger.warning("风控保护: 新设备登录后4小时内请挂机")
 
     async def process_emoji_message(self, message: Dict[str, Any]):
         """处理表情消息"""
-        message["Content"] = message.get("Content", {}).get("string", "").replace("\n", "").replace("\t", "")
-
-        if message["FromWxid"].endswith("@chatroom"):  # 群聊消息
-            message["IsGroup"] = True
-            split_content = message["Content"].split(":\n", 1)
-            if len(split_content) > 1:
-                message["Content"] = split_content[1]
-                message["ActualUserWxid"] = split_content[0]
-            else:
-                message["Content"] = split_content[0]
-                message["ActualUserWxid"] = self.wxid
-        else:
-            message["ActualUserWxid"] = message["FromWxid"]
-            if message["FromWxid"] == self.wxid:
-                message["FromWxid"] = message["ToWxid"]
-            message["IsGroup"] = False
+        self.unpack(message)
+        message["ActualUserWxid"] = message["SenderWxid"]
 
-        logger.info("收到表情消息: 消息ID:{} 来自:{} 发送人:{} XML:{}", 
-                    message.get("MsgId", ""), message["FromWxid"], 
-                    message["ActualUserWxid"], message["Content"])
+        message_log.received("表情消息", message)
 
         await self.msg_db.save_message(
             msg_id=int(message.get("MsgId", 0)),
@@ -280,28 +232,13 @@ class XYBot:
 
         if self.ignore_check(message["FromWxid"], message["ActualUserWxid"]):
             if self.ignore_protection or not protector.check(14400):
-                await EventManager.emit("emoji_message", self.bot, message)
+                await EventManager.emit("emoji_message", self.bot, Message.from_dict(message))
             else:
                 logger.warning("风控保护: 新设备登录后4小时内请挂机")
 
     async def process_xml_message(self, message: Dict[str, Any]):
         """处理xml消息"""
-        message["Content"] = message.get("Content", {}).get("string", "").replace("\n", "").replace("\t", "")
-
-        if message["FromWxid"].endswith("@chatroom"):
-            message["IsGroup"] = True
-            split_content = message["Content"].split(":", 1)
-            if len(split_content) > 1:
-                message["Content"] = split_content[1]
-                message["SenderWxid"] = split_content[0]
-            else:
-                message["Content"] = split_content[0]
-                message["SenderWxid"] = self.wxid
-        else:
-            message["SenderWxid"] = message["FromWxid"]
-            if message["FromWxid"] == self.wxid:
-                message["FromWxid"] = message["ToWxid"]
-            message["IsGroup"] = False
+        self.unpack(message)
 
         # 保存消息到数据库（即使解析失败也保存）
         await self.msg_db.save_message(
@@ -314,141 +251,56 @@ class XYBot:
         )
 
         try:
-            root = ET.fromstring(message["Content"])
-            appmsg = root.find("appmsg")
-            if appmsg is None:
-                logger.warning("XML 中未找到 appmsg 节点，内容: {}", message["Content"])
-                return
-            type_element = appmsg.find("type")
-            if type_element is None:
-                logger.warning("XML 中未找到 type 节点，内容: {}", message["Content"])
-                return
-            type_value = int(type_element.text)
-            logger.debug("解析到的 XML 类型: {}, 完整内容: {}", type_value, message["Content"])
-        except ET.ParseError as e:
+            appmsg = parse_appmsg(message["Content"])
+        except MessageParseError as e:
             logger.error("解析 XML 失败: {}, 完整内容: {}", e, message["Content"])
             return
-        except Exception as e:
-            logger.error("处理 XML 时发生异常: {}, 完整内容: {}", e, message["Content"])
-            return
+        type_value = appmsg.type
+        logger.debug("解析到的 XML 类型: {}, 消息ID:{}", type_value, message.get("MsgId", ""))
 
         if type_value == 57:  # 引用消息
-            await self.process_quote_message(message)
+            await self.process_quote_message(message, appmsg)
         elif type_value == 6:  # 文件消息
-            await self.process_file_message(message)
+            await self.process_file_message(message, appmsg)
         elif type_value == 5:  # 公众号文章或链接分享消息
-            logger.info("收到链接分享消息: 消息ID:{} 来自:{} 发送人:{} XML:{}", 
-                        message.get("MsgId", ""), message["FromWxid"], 
-                        message["SenderWxid"], message["Content"])
-            logger.debug("完整 XML 内容: {}", message["Content"])
+            message_log.received("链接分享消息", message)
             if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
                 if self.ignore_protection or not protector.check(14400):
                     logger.debug("触发 article_message 事件: 消息ID: {}", message.get("MsgId", ""))
-                    await EventManager.emit("article_message", self.bot, message)
+                    await EventManager.emit("article_message", self.bot, Message.from_dict(message))
                 else:
                     logger.warning("风控保护: 新设备登录后4小时内请挂机")
         elif type_value == 74:  # 文件消息，但还在上传，不用管
             logger.debug("收到上传中文件消息: 消息ID:{} 来自:{}", message.get("MsgId", ""), message["FromWxid"])
         else:
-            logger.info("未知的 XML 消息类型: {}, 完整内容: {}", type_value, message["Content"])
+            logger.info("未知的 XML 消息类型: {}, 内容: {}", type_value, message_log.preview(message["Content"]))
 
-    async def process_quote_message(self, message: Dict[str, Any]):
-        """处理引用消息"""
-        quote_message = {}
+    async def process_quote_message(self, message: Dict[str, Any], appmsg: Optional[AppMsg] = None):
+        """处理引用消息，appmsg 为 process_xml_message 已经解析好的节点"""
         try:
-            root = ET.fromstring(message["Content"])
-            appmsg = root.find("appmsg")
-            text = appmsg.find("title").text
-            refermsg = appmsg.find("refermsg")
-
-            quote_message["MsgType"] = int(refermsg.find("type").text)
-
-            if quote_message["MsgType"] == 1:  # 文本消息
-                quote_message["NewMsgId"] = refermsg.find("svrid").text
-                quote_message["ToWxid"] = refermsg.find("fromusr").text
-                quote_message["FromWxid"] = refermsg.find("chatusr").text
-                quote_message["Nickname"] = refermsg.find("displayname").text
-                quote_message["MsgSource"] = refermsg.find("msgsource").text
-                quote_message["Content"] = refermsg.find("content").text
-                quote_message["Createtime"] = refermsg.find("createtime").text
-
-            elif quote_message["MsgType"] == 49:  # 引用消息
-                quote_message["NewMsgId"] = refermsg.find("svrid").text
-                quote_message["ToWxid"] = refermsg.find("fromusr").text
-                quote_message["FromWxid"] = refermsg.find("chatusr").text
-                quote_message["Nickname"] = refermsg.find("displayname").text
-                quote_message["MsgSource"] = refermsg.find("msgsource").text
-                quote_message["Createtime"] = refermsg.find("createtime").text
-
-                quote_message["Content"] = refermsg.find("content").text
-
-                quote_root = ET.fromstring(quote_message["Content"])
-                quote_appmsg = quote_root.find("appmsg")
-
-                quote_message["Content"] = quote_appmsg.find("title").text if isinstance(quote_appmsg.find("title"), ET.Element) else ""
-                quote_message["destination"] = quote_appmsg.find("des").text if isinstance(quote_appmsg.find("des"), ET.Element) else ""
-                quote_message["action"] = quote_appmsg.find("action").text if isinstance(quote_appmsg.find("action"), ET.Element) else ""
-                quote_message["XmlType"] = int(quote_appmsg.find("type").text) if isinstance(quote_appmsg.find("type"), ET.Element) else 0
-                quote_message["showtype"] = int(quote_appmsg.find("showtype").text) if isinstance(quote_appmsg.find("showtype"), ET.Element) else 0
-                quote_message["soundtype"] = int(quote_appmsg.find("soundtype").text) if isinstance(quote_appmsg.find("soundtype"), ET.Element) else 0
-                quote_message["url"] = quote_appmsg.find("url").text if isinstance(quote_appmsg.find("url"), ET.Element) else ""
-                quote_message["lowurl"] = quote_appmsg.find("lowurl").text if isinstance(quote_appmsg.find("lowurl"), ET.Element) else ""
-                quote_message["dataurl"] = quote_appmsg.find("dataurl").text if isinstance(quote_appmsg.find("dataurl"), ET.Element) else ""
-                quote_message["lowdataurl"] = quote_appmsg.find("lowdataurl").text if isinstance(quote_appmsg.find("lowdataurl"), ET.Element) else ""
-                quote_message["songlyric"] = quote_appmsg.find("songlyric").text if isinstance(quote_appmsg.find("songlyric"), ET.Element) else ""
-                quote_message["appattach"] = {}
-                quote_message["appattach"]["totallen"] = int(quote_appmsg.find("appattach").find("totallen").text) if isinstance(quote_appmsg.find("appattach").find("totallen"), ET.Element) else 0
-                quote_message["appattach"]["attachid"] = quote_appmsg.find("appattach").find("attachid").text if isinstance(quote_appmsg.find("appattach").find("attachid"), ET.Element) else ""
-                quote_message["appattach"]["emoticonmd5"] = quote_appmsg.find("appattach").find("emoticonmd5").text if isinstance(quote_appmsg.find("appattach").find("emoticonmd5"), ET.Element) else ""
-                quote_message["appattach"]["fileext"] = quote_appmsg.find("appattach").find("fileext").text if isinstance(quote_appmsg.find("appattach").find("fileext"), ET.Element) else ""
-                quote_message["appattach"]["cdnthumbaeskey"] = quote_appmsg.find("appattach").find("cdnthumbaeskey").text if isinstance(quote_appmsg.find("appattach").find("cdnthumbaeskey"), ET.Element) else ""
-                quote_message["appattach"]["aeskey"] = quote_appmsg.find("appattach").find("aeskey").text if isinstance(quote_appmsg.find("appattach").find("aeskey"), ET.Element) else ""
-                quote_message["extinfo"] = quote_appmsg.find("extinfo").text if isinstance(quote_appmsg.find("extinfo"), ET.Element) else ""
-                quote_message["sourceusername"] = quote_appmsg.find("sourceusername").text if isinstance(quote_appmsg.find("sourceusername"), ET.Element) else ""
-                quote_message["sourcedisplayname"] = quote_appmsg.find("sourcedisplayname").text if isinstance(quote_appmsg.find("sourcedisplayname"), ET.Element) else ""
-                quote_message["thumburl"] = quote_appmsg.find("thumburl").text if isinstance(quote_appmsg.find("thumburl"), ET.Element) else ""
-                quote_message["md5"] = quote_appmsg.find("md5").text if isinstance(quote_appmsg.find("md5"), ET.Element) else ""
-                quote_message["statextstr"] = quote_appmsg.find("statextstr").text if isinstance(quote_appmsg.find("statextstr"), ET.Element) else ""
-                quote_message["directshare"] = int(quote_appmsg.find("directshare").text) if isinstance(quote_appmsg.find("directshare"), ET.Element) else 0
-
-        except Exception as e:
+            appmsg = appmsg or parse_appmsg(message["Content"])
+            text = appmsg.title
+            quote_message = parse_quote(appmsg)
+        except ValueError as e:
             logger.error("解析引用消息失败: {}, 完整内容: {}", e, message["Content"])
             return
 
         message["Content"] = text
         message["Quote"] = quote_message
 
-        logger.info("收到引用消息: 消息ID:{} 来自:{} 发送人:{} 内容:{} 引用:{}", 
-                    message.get("MsgId", ""), message["FromWxid"], 
-                    message["SenderWxid"], message["Content"], message["Quote"])
+        message_log.received("引用消息", message, quote_type=quote_message.get("MsgType"),
+                             quote=message_log.preview(quote_message.get("Content")))
 
         if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
             if self.ignore_protection or not protector.check(14400):
-                await EventManager.emit("quote_message", self.bot, message)
+                await EventManager.emit("quote_message", self.bot, QuoteMessage.from_dict(message))
             else:
                 logger.warning("风控保护: 新设备登录后4小时内请挂机")
 
     async def process_video_message(self, message):
-        message["Content"] = message.get("Content", {}).get("string", "")
-
-        if message["FromWxid"].endswith("@chatroom"):
-            message["IsGroup"] = True
-            split_content = message["Content"].split(":", 1)
-            if len(split_content) > 1:
-                message["Content"] = split_content[1]
-                message["SenderWxid"] = split_content[0]
-            else:
-                message["Content"] = split_content[0]
-                message["SenderWxid"] = self.wxid
-        else:
-            message["SenderWxid"] = message["FromWxid"]
-            if message["FromWxid"] == self.wxid:
-                message["FromWxid"] = message["ToWxid"]
-            message["IsGroup"] = False
+        self.unpack(message, strip=False)
 
-        logger.info("收到视频消息: 消息ID:{} 来自:{} 发送人:{} XML:{}", 
-                    message.get("MsgId", ""), message["FromWxid"], 
-                    message["SenderWxid"], message["Content"])
+        message_log.received("视频消息", message)
 
         await self.msg_db.save_message(
             msg_id=int(message.get("MsgId", 0)),
@@ -459,31 +311,29 @@ class XYBot:
             is_group=message["IsGroup"]
         )
 
-        message["Video"] = await self.bot.download_video(message.get("MsgId", 0))
+        # 处理函数第一次读取时才下载
+        message["Media"] = self.bot.video_media(message.get("MsgId", 0))
 
         if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
             if self.ignore_protection or not protector.check(14400):
-                await EventManager.emit("video_message", self.bot, message)
+                if self.needs_legacy_media("video_message", message):
+                    message["Video"] = await message["Media"].base64()
+                await EventManager.emit("video_message", self.bot, VideoMessage.from_dict(message))
             else:
                 logger.warning("风控保护: 新设备登录后4小时内请挂机")
 
-    async def process_file_message(self, message: Dict[str, Any]):
-        """处理文件消息"""
+    async def process_file_message(self, message: Dict[str, Any], appmsg: Optional[AppMsg] = None):
+        """处理文件消息，appmsg 为 process_xml_message 已经解析好的节点"""
         try:
-            root = ET.fromstring(message["Content"])
-            filename = root.find("appmsg").find("title").text
-            attach_id = root.find("appmsg").find("appattach").find("attachid").text
-            file_extend = root.find("appmsg").find("appattach").find("fileext").text
-        except Exception as e:
+            file = parse_file(appmsg or parse_appmsg(message["Content"]))
+        except MessageParseError as e:
             logger.error("解析文件消息失败: {}, 内容: {}", e, message["Content"])
             return
 
-        message["Filename"] = filename
-        message["FileExtend"] = file_extend
+        message["Filename"] = file.filename
+        message["FileExtend"] = file.file_ext
 
-        logger.info("收到文件消息: 消息ID:{} 来自:{} 发送人:{} XML:{}", 
-                    message.get("MsgId", ""), message["FromWxid"], 
-                    message["SenderWxid"], message["Content"])
+        message_log.received("文件消息", message)
 
         await self.msg_db.save_message(
             msg_id=int(message.get("MsgId", 0)),
@@ -494,72 +344,65 @@ class XYBot:
             is_group=message["IsGroup"]
         )
 
-        message["File"] = await self.bot.download_attach(attach_id)
+        # 处理函数第一次读取时才下载
+        message["Media"] = self.bot.attach_media(file.attach_id)
 
         if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
             if self.ignore_protection or not protector.check(14400):
-                await EventManager.emit("file_message", self.bot, message)
+                if self.needs_legacy_media("file_message", message):
+                    message["File"] = await message["Media"].base64()
+                await EventManager.emit("file_message", self.bot, FileMessage.from_dict(message))
             else:
                 logger.warning("风控保护: 新设备登录后4小时内请挂机")
 
     async def process_system_message(self, message: Dict[str, Any]):
         """处理系统消息"""
-        message["Content"] = message.get("Content", {}).get("string", "")
-
-        if message["FromWxid"].endswith("@chatroom"):
-            message["IsGroup"] = True
-            split_content = message["Content"].split(":", 1)
-            if len(split_content) > 1:
-                message["Content"] = split_content[1]
-                message["SenderWxid"] = split_content[0]
-            else:
-                message["Content"] = split_content[0]
-                message["SenderWxid"] = self.wxid
-        else:
-            message["SenderWxid"] = message["FromWxid"]
-            if message["FromWxid"] == self.wxid:
-                message["FromWxid"] = message["ToWxid"]
-            message["IsGroup"] = False
+        self.unpack(message, strip=False)
 
         try:
-            root = ET.fromstring(message["Content"])
-            msg_type = root.attrib["type"]
-        except Exception as e:
+            system = parse_system(message["Content"])
+        except MessageParseError as e:
             logger.error("解析系统消息失败: {}, 内容: {}", e, message["Content"])
             return
 
-        if msg_type == "pat":
-            await self.process_pat_message(message)
-        elif msg_type == "ClientCheckGetExtInfo":
+        if system.type == "pat":
+            await self.process_pat_message(message, system)
+        elif system.type == "ClientCheckGetExtInfo":
             pass
         else:
-            logger.info("收到系统消息: {}, 完整内容: {}", message, message["Content"])
+            if message["IsGroup"]:
+                # 群成员、群公告等变化都以系统消息通知
+                self.bot.contacts.invalidate_chatroom(message["FromWxid"])
+            message_log.received("系统消息", message, sys_type=system.type)
             if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
                 if self.ignore_protection or not protector.check(14400):
-                    await EventManager.emit("system_message", self.bot, message)
+                    await EventManager.emit("system_message", self.bot, SystemMessage.from_dict(message))
                 else:
                     logger.warning("风控保护: 新设备登录后4小时内请挂机")
 
-    async def process_pat_message(self, message: Dict[str, Any]):
-        """处理拍一拍请求消息"""
+    def process_notice_message(self, message: Dict[str, Any]):
+        """处理系统提示，让联系人缓存中对应的群或联系人失效"""
+        from_wxid = message["FromWxid"]
+        if from_wxid.endswith("@chatroom"):
+            self.bot.contacts.invalidate_chatroom(from_wxid)
+        elif from_wxid:
+            self.bot.contacts.invalidate(from_wxid)
+        logger.info("收到系统提示: {} {}", from_wxid, message.get("Content", {}).get("string", ""))
+
+    async def process_pat_message(self, message: Dict[str, Any], system: Optional[SystemMsg] = None):
+        """处理拍一拍请求消息，system 为 process_system_message 已经解析好的系统消息"""
         try:
-            root = ET.fromstring(message["Content"])
-            pat = root.find("pat")
-            patter = pat.find("fromusername").text
-            patted = pat.find("pattedusername").text
-            pat_suffix = pat.find("patsuffix").text
-        except Exception as e:
+            pat = parse_pat(system or parse_system(message["Content"]))
+        except MessageParseError as e:
             logger.error("解析拍一拍消息失败: {}, 内容: {}", e, message["Content"])
             return
 
-        message["Patter"] = patter
-        message["Patted"] = patted
-        message["PatSuffix"] = pat_suffix
+        message["Patter"] = pat.patter
+        message["Patted"] = pat.patted
+        message["PatSuffix"] = pat.suffix
 
-        logger.info("收到拍一拍消息: 消息ID:{} 来自:{} 发送人:{} 拍者:{} 被拍:{} 后缀:{}", 
-                    message.get("MsgId", ""), message["FromWxid"], 
-                    message["SenderWxid"], message["Patter"], 
-                    message["Patted"], message["PatSuffix"])
+        message_log.received("拍一拍消息", message, patter=message["Patter"], patted=message["Patted"],
+                             suffix=message["PatSuffix"])
 
         await self.msg_db.save_message(
             msg_id=int(message.get("MsgId", 0)),
@@ -572,10 +415,14 @@ class XYBot:
 
         if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
             if self.ignore_protection or not protector.check(14400):
-                await EventManager.emit("pat_message", self.bot, message)
+                await EventManager.emit("pat_message", self.bot, PatMessage.from_dict(message))
             else:
                 logger.warning("风控保护: 新设备登录后4小时内请挂机")
 
+    def needs_legacy_media(self, event_type: str, message: Dict[str, Any]) -> bool:
+        """分发前是否要先下载媒体内容，填入旧的 Content、Video、File 字段"""
+        return self.legacy_media_fields and EventManager.wants_legacy_media(event_type, message)
+
     def ignore_check(self, FromWxid: str, SenderWxid: str):
         if self.ignore_mode == "Whitelist":
             return (FromWxid in self.whitelist) or (SenderWxid in self.whitelist)